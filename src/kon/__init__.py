@@ -1,9 +1,37 @@
 import abc
-from typing import Iterable, Protocol, TypeVar, cast, Union, runtime_checkable
+import importlib
+import mmap
+import os
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Set, Tuple, TypeVar, Union, runtime_checkable
 
-from .parser import KonParser, MultilineStringBehaviour
+from . import _accel
+from .parser import DuplicateKeys, KonFeedParser, KonParser, MultilineStringBehaviour, NumericLists
+from .tokenizer import _FLOAT_KEYWORDS, _KEYWORDS, InternStrings
 from .types import KonObject, KonDictionary
 
+if TYPE_CHECKING:
+    import asyncio
+
+    from .check import validate
+    from .layers import load_layers
+    from .parallel import load_many
+    from .query import extract
+    from .schema import Schema
+    from .spans import patch
+    from .watcher import awatch, watch
+
+# The modules of functions that are only imported once they are used, as
+# they import much more than parsing needs (threads, processes, hashing)
+_LAZY = {
+    'validate': 'check',
+    'load_layers': 'layers',
+    'load_many': 'parallel',
+    'extract': 'query',
+    'patch': 'spans',
+    'watch': 'watcher',
+    'awatch': 'watcher',
+}
+
 try:
     from typing_extensions import Reader, Writer # type: ignore
 except ImportError:
@@ -22,105 +50,187 @@ except ImportError:
         def write(self, data: _T_contra, /) -> int: ...
 
 
-def _dump_dict(
-    object: KonDictionary,
-    pretty: bool = False,
-    indent_width: int = 2,
-    _depth: int = 0,
-    _is_top_level=False,
-) -> str:
-    """Serialize a dictionary to KON format string."""
+_NOTHING: Any = object()
 
-    if len(object) == 0:
-        return '{}'
-    
-    def _child_top_level(child: KonObject):
-        """Check if a child object should be treated as top-level for formatting."""
-        if not pretty:
-            return False
-        if isinstance(child, dict):
-            return len(child) == 1
-        elif isinstance(child, Iterable) and not isinstance(child, str):
-            child = list(child)
-            return len(child) == 1
-        return False
-    
-    rl = []
-    for k, v in object.items():
-        # Determine separator between key and value
-        # Use space for dict values, no space for iterables, an equals sign for primitives
-        inbetween = " = "
-        if isinstance(v, dict):
-            inbetween = " "
-        elif isinstance(v, Iterable) and not isinstance(v, str):
-            inbetween = ""
-        rl.append(
-            dumps(
-                k,
-                _is_top_level=False,
-                pretty=pretty and len(object) != 1,
-                indent_width=indent_width,
-                _depth=_depth + 1 if not _is_top_level else _depth,
-            )
-            + inbetween
-            + dumps(
-                v,
-                _is_top_level=_child_top_level(v),
-                _no_indent=True,
-                pretty=pretty,
-                indent_width=indent_width,
-                _depth=_depth if _is_top_level or (pretty and len(object) == 1) else _depth + 1,
-            )
-        )
-
-    prefix = _depth * indent_width * " " if pretty else ""
-    if pretty and len(object) != 1:
-        prefp = "{\n"
-        postp = f"\n{prefix}}}"
-        join_str = "\n"
-    else:
-        prefp = "{"
-        postp = "}"
-        join_str = ", "
 
-    if _is_top_level:
-        return join_str.join(rl)
-    return prefp + join_str.join(rl) + postp
+class _DumpFrame:
+    """
+    A list or a dictionary being serialized by `dumps`. Keys and list
+    elements are dumped with `pretty` and `depth`, prefixed by `indent`,
+    dictionary values with `value_pretty` and `value_depth`.
+    """
+    __slots__ = (
+        'items', 'is_dict', 'pre', 'join', 'post', 'first', 'pending', 'bracketed', 'marker',
+        'pretty', 'depth', 'indent', 'value_pretty', 'value_depth',
+    )
+
+    def __init__(self, items: Iterator, is_dict: bool, pre: str, join: str, post: str, bracketed: bool, marker: int) -> None:
+        self.items = items
+        self.is_dict = is_dict
+        self.pre = pre
+        self.join = join
+        self.post = post
+        self.first = True
+        # The value of the entry whose key is being dumped
+        self.pending: KonObject = _NOTHING
+        self.bracketed = bracketed
+        self.marker = marker
+
 
+# The number of fragments `iterdump` joins into each string it yields
+_CHUNK_FRAGMENTS = 1024
+# The number of dumped strings `iterdump` keeps for reuse
+_CACHED_STRINGS = 1024
 
-def _dump_list(
-    object: Iterable[KonObject],
+
+def iterdump(
+    object: KonObject,
+    *,
     pretty: bool = False,
     indent_width: int = 2,
-    _depth: int = 0,
-) -> str:
-    prefix = _depth * indent_width * " " if pretty else ""
-    object = list(object)
-    if len(object) == 0:
-        return '()'
-    if pretty and len(object) != 1:
-        prefp = "(\n"
-        postp = f"\n{prefix})"
-        join_str = "\n"
-    else:
-        prefp = "("
-        postp = ")"
-        join_str = ", "
-
-    return (
-        prefp
-        + join_str.join(
-            dumps(
-                i,
-                _is_top_level=False,
-                pretty=pretty and len(object) != 1,
-                indent_width=indent_width,
-                _depth=_depth if len(object) == 1 else _depth + 1,
-            )
-            for i in object
-        )
-        + postp
-    )
+    max_depth: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Serializes a Python object into Kon, yielding the output in fragments.
+        Nested lists and dictionaries are serialized on an explicit stack
+        instead of recursively, so the nesting depth is only limited by
+        `max_depth` (and memory). Only the fragments of the current chunk are
+        held at any time, the joined fragments are identical to `dumps`.
+
+        Args:
+            object (KonObject): The Python object to be serialized. Must be a
+                valid `KonObject` (dict, list, str, int, float, bool, or None).
+            pretty (bool, optional): If True, the output string will be formatted
+                with newlines and indentation for readability. Defaults to False.
+            indent_width (int, optional): The number of spaces for each indentation
+                level when `pretty` is True. Defaults to 2.
+            max_depth (int, optional): The maximum nesting depth of lists and
+                dictionaries written with brackets. Defaults to None, which
+                means no limit.
+
+        Raises:
+            TypeError: If the object contains a type that cannot be serialized.
+            ValueError: If the object contains a circular reference or is
+                nested deeper than `max_depth`.
+
+        Yields:
+            str: Consecutive fragments of the serialized object.
+    """
+    out: List[str] = []
+    # Indentation prefixes by depth
+    indents: List[str] = [""]
+    # Dumped keys and list elements, most dictionaries share their keys
+    strings: Dict[str, str] = {}
+    dumpers = _SCALAR_DUMPERS
+    stack: List[_DumpFrame] = []
+    # Containers that are being serialized, by their id
+    markers: Set[int] = set()
+    nesting = 0
+    frame: Optional[_DumpFrame] = None
+    is_pretty, depth, no_indent, is_top_level = pretty, 0, False, True
+    while True:
+        # Dump `object`, a list or a dictionary is opened and continued below
+        prefix = _indent(indents, depth, indent_width) if is_pretty and not no_indent else ""
+        scalar = _dump_scalar(object)
+        if scalar is not None:
+            out.append(prefix + scalar)
+        elif isinstance(object, dict):
+            if len(object) == 0:
+                out.append(prefix + '{}')
+            else:
+                frame = _open_frame(object, iter(object.items()), True, len(object), is_pretty, indents[depth] if is_pretty else "", is_top_level, markers)
+                frame.pretty = is_pretty and len(object) != 1
+                frame.depth = depth + 1 if not is_top_level else depth
+                frame.value_pretty = is_pretty
+                frame.value_depth = depth if is_top_level or (is_pretty and len(object) == 1) else depth + 1
+        else:
+            # Sequences know their length, any other iterable is materialized
+            # exactly once, as it may be a generator that can't be restarted.
+            # Arrays (e.g. of `numeric_lists`) convert their elements in bulk
+            if isinstance(object, (list, tuple)):
+                items = object
+            elif hasattr(object, 'tolist'):
+                items = object.tolist() # type: ignore
+            else:
+                items = object if isinstance(object, Sequence) else list(object) # type: ignore
+            length = len(items)
+            if length == 0:
+                out.append(prefix + '()')
+            else:
+                frame = _open_frame(object, iter(items), False, length, is_pretty, indents[depth] if is_pretty else "", False, markers)
+                frame.pretty = is_pretty and length != 1
+                frame.depth = depth if length == 1 else depth + 1
+        if frame is not None:
+            frame.indent = _indent(indents, frame.depth, indent_width) if frame.pretty else ""
+            if frame.bracketed:
+                nesting += 1
+                if max_depth is not None and nesting > max_depth:
+                    raise ValueError(f'maximum nesting depth of {max_depth} exceeded')
+            out.append(prefix + frame.pre)
+            stack.append(frame)
+            frame = None
+
+        # Continue with the innermost list or dictionary, until there is
+        # another list or dictionary to dump
+        while True:
+            if len(out) >= _CHUNK_FRAGMENTS:
+                yield ''.join(out)
+                out.clear()
+            if len(stack) == 0:
+                if out:
+                    yield ''.join(out)
+                return
+            top = stack[-1]
+            v = top.pending
+            if v is _NOTHING:
+                item = next(top.items, _NOTHING)
+                if item is _NOTHING:
+                    stack.pop()
+                    markers.discard(top.marker)
+                    if top.bracketed:
+                        nesting -= 1
+                    out.append(top.post)
+                    continue
+                if top.first:
+                    top.first = False
+                else:
+                    out.append(top.join)
+                if top.is_dict:
+                    item, v = item
+                if type(item) is str:
+                    scalar = strings.get(item)
+                    if scalar is None:
+                        scalar = _dump_str(item)
+                        if len(strings) < _CACHED_STRINGS:
+                            strings[item] = scalar
+                else:
+                    dumper = dumpers.get(type(item), _dump_scalar)
+                    scalar = dumper(item) if dumper is not None else None
+                if scalar is None:
+                    top.pending = v
+                    object, is_pretty, depth, no_indent, is_top_level = item, top.pretty, top.depth, False, False
+                    break
+                out.append(top.indent + scalar)
+                if v is _NOTHING:
+                    continue
+            else:
+                top.pending = _NOTHING
+            # The key was dumped, continue with its value
+            dumper = dumpers.get(type(v), _dump_scalar)
+            scalar = dumper(v) if dumper is not None else None
+            if scalar is not None:
+                out.append(" = " + scalar)
+                continue
+            # Use space for dict values, no space for iterables
+            if isinstance(v, dict):
+                out.append(" ")
+                # A pretty dictionary with a single entry is written without braces
+                is_top_level = top.value_pretty and len(v) == 1
+            else:
+                out.append("")
+                is_top_level = False
+            object, is_pretty, depth, no_indent = v, top.value_pretty, top.value_depth, True
+            break
 
 
 def dumps(
@@ -128,12 +238,11 @@ def dumps(
     *,
     pretty: bool = False,
     indent_width: int = 2,
-    _no_indent: bool = False,
-    _depth: int = 0,
-    _is_top_level=True,
+    max_depth: Optional[int] = None,
 ) -> str:
     """
     Serializes a Python object into a Kon-formatted string.
+
         Args:
             object (KonObject): The Python object to be serialized. Must be a
                 valid `KonObject` (dict, list, str, int, float, bool, or None).
@@ -141,33 +250,100 @@ def dumps(
                 with newlines and indentation for readability. Defaults to False.
             indent_width (int, optional): The number of spaces for each indentation
                 level when `pretty` is True. Defaults to 2.
+            max_depth (int, optional): The maximum nesting depth of lists and
+                dictionaries written with brackets. Defaults to None, which
+                means no limit.
 
         Raises:
             TypeError: If the object contains a type that cannot be serialized.
+            ValueError: If the object contains a circular reference or is
+                nested deeper than `max_depth`.
 
         Returns:
             str: The serialized string representation of the object.
     """
-    prefix = _depth * indent_width * " " if pretty and not _no_indent else ""
+    speedups = _accel.speedups
+    if speedups is not None and type(indent_width) is int and (max_depth is None or type(max_depth) is int):
+        return speedups.dumps(object, pretty, indent_width, max_depth, _dump_scalar)
+    return ''.join(iterdump(object, pretty=pretty, indent_width=indent_width, max_depth=max_depth))
+
+
+def _dump_str(object: str) -> str:
+    # Keywords are quoted, they would be read back as another type
+    if object.isidentifier() and object not in _KEYWORDS and object not in _FLOAT_KEYWORDS:
+        return object
+    return repr(object)
+
+
+def _dump_scalar(object: KonObject) -> Optional[str]:
+    """Serializes anything but a list or a dictionary, which return None."""
     if isinstance(object, dict):
-        return prefix + _dump_dict(cast(KonDictionary, object), pretty, indent_width, _depth, _is_top_level)
+        return None
     elif isinstance(object, (int, float, bool)):
-        return prefix + str(object).lower()
+        return str(object).lower()
     elif isinstance(object, str):
-        if object.isidentifier():
-            return prefix + object
-        return prefix + repr(object)
+        return _dump_str(object)
     elif isinstance(object, Iterable):
-        return prefix + _dump_list(object, pretty, indent_width, _depth)
+        return None
     elif object is None:
-        return prefix + "null"
+        return "null"
+    raise TypeError(
+        f"Dumped value must be a {KonObject}, but found value is {object!r}"
+    )
+
+
+# Serializers by exact type, None for lists and dictionaries. Subclasses and
+# other types fall back to `_dump_scalar`.
+_SCALAR_DUMPERS: Dict[type, Optional[Callable[[Any], Optional[str]]]] = {
+    str: _dump_str,
+    int: int.__repr__,
+    float: float.__repr__,
+    bool: lambda object: "true" if object else "false",
+    type(None): lambda object: "null",
+    dict: None,
+    list: None,
+    tuple: None,
+}
+
+
+def _indent(indents: List[str], depth: int, indent_width: int) -> str:
+    """Returns the indentation of `depth`, caching it in `indents`."""
+    while len(indents) <= depth:
+        indents.append(len(indents) * indent_width * " ")
+    return indents[depth]
+
+
+def _open_frame(
+    object: KonObject,
+    items: Iterator,
+    is_dict: bool,
+    length: int,
+    pretty: bool,
+    indent: str,
+    is_top_level: bool,
+    markers: Set[int],
+) -> _DumpFrame:
+    """Starts serializing a list or a dictionary with `length` items, `indent` is the indentation of its closing bracket."""
+    marker = id(object)
+    if marker in markers:
+        raise ValueError('circular reference detected')
+    markers.add(marker)
+    opening, closing = ('{', '}') if is_dict else ('(', ')')
+    if pretty and length != 1:
+        pre = opening + "\n"
+        post = "\n" + indent + closing
+        join = "\n"
     else:
-        raise TypeError(
-            f"Dumped value must be a {KonObject}, but found value is {object!r}"
-        )
+        pre = opening
+        post = closing
+        join = ", "
+    if is_top_level:
+        # A top-level dictionary is written without its braces
+        pre = post = ""
+    return _DumpFrame(items, is_dict, pre, join, post, not is_top_level, marker)
 
 
-def loads(source: Union[str, bytes, bytearray], *, allow_implicit_dicts=True, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, **kwargs) -> KonObject:
+def loads(source: Union[str, bytes, bytearray], *, allow_implicit_dicts=True, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, max_depth: Optional[int] = None, lazy: bool = False, duplicate_keys: Union[DuplicateKeys, str] = DuplicateKeys.LAST_WINS, intern: Union[InternStrings, str, None] = None, intern_table: Optional[Dict[str, str]] = None, numeric_lists: Union[NumericLists, str, None] = None, schema: Optional['Schema'] = None, object_pairs_hook: Optional[Callable[[List[Tuple[Any, KonObject]]], Any]] = None, list_hook: Optional[Callable[[List[KonObject]], Any]] = None, workers: Optional[int] = None, **kwargs) -> KonObject:
     """
     Parse a Kon-formatted string, bytes, or bytearray into a Python object.
 
@@ -179,22 +355,195 @@ def loads(source: Union[str, bytes, bytearray], *, allow_implicit_dicts=True, mu
         multiline_string_behaviour (MultilineStringBehaviour, optional): Defines
             how multiline strings are handled. Defaults to
             MultilineStringBehaviour.IGNORE.
+        max_depth (int, optional): The maximum nesting depth of lists and
+            dictionaries, deeper sources raise a ValueError. Defaults to None,
+            which means no limit.
+        lazy (bool, optional): If True, lists and dictionaries written with
+            brackets are only parsed once they are used, see `kon.lazy`.
+            Defaults to False.
+        duplicate_keys (DuplicateKeys | str, optional): What happens to a
+            key that is set more than once in a dictionary, or at the top
+            level. Defaults to DuplicateKeys.LAST_WINS.
+        intern (InternStrings | str, optional): Which strings to intern
+            (`'keys'`, `'keys+identifiers'` or `'all'`), so that equal ones
+            share a single object. Defaults to None, which interns none.
+        intern_table (dict, optional): The strings interned so far, to share
+            them with other parses. Defaults to None, which means a new
+            table for this parse.
+        numeric_lists (NumericLists | str, optional): What lists of only
+            ints and floats are turned into, `'array'` for an `array.array`
+            or `'numpy'` for a `numpy.ndarray`, which take a fraction of the
+            memory of a list. Most of them are converted in bulk, without
+            parsing each element. Defaults to None, which keeps them as lists.
+        schema (kon.schema.Schema, optional): A decoder compiled by
+            `kon.schema.compile`, which builds the objects of its type while
+            parsing, instead of dictionaries and lists. Defaults to None.
+        object_pairs_hook (callable, optional): Called with the `(key, value)`
+            pairs of every dictionary, in order, and returns what it is
+            parsed into. Defaults to None, which means a dict.
+        list_hook (callable, optional): Called with the elements of every
+            list, and returns what it is parsed into. Defaults to None, which
+            means a list.
+        workers (int, optional): The number of processes to parse a large
+            source with, each parsing a chunk between its top-level entries.
+            The result is the same as without them. Sources smaller than
+            256 KiB per worker use fewer of them. The processes are started
+            by the first call, and kept for the later ones. Defaults to
+            None, which means the source is parsed in this process.
         **kwargs: Additional keyword arguments to be passed to the `KonParser`.
 
+    Raises:
+        ValueError: If the source is invalid, or `workers` is less than 1,
+            or `workers` or `numeric_lists` is combined with `lazy`, or
+            `schema` or a hook is combined with each other or `lazy`,
+            `numeric_lists` or `workers`.
+        TypeError: If the source contains a type violation, or a value does
+            not have the type that `schema` expects there.
+        ImportError: If `numeric_lists` is `'numpy'`, but NumPy is not
+            installed.
+
     Returns:
         KonObject: An object representing the parsed Kon data.
     """
-    parser = KonParser(source, allow_implicit_dicts=allow_implicit_dicts, multiline_string_behaviour=multiline_string_behaviour, **kwargs)
+    if workers is not None:
+        from .parallel import _parse_split
+        return _parse_split(source, workers, dict(allow_implicit_dicts=allow_implicit_dicts, multiline_string_behaviour=multiline_string_behaviour, max_depth=max_depth, lazy=lazy, duplicate_keys=duplicate_keys, intern=intern, intern_table=intern_table, numeric_lists=numeric_lists, schema=schema, object_pairs_hook=object_pairs_hook, list_hook=list_hook, **kwargs))
+    parser = KonParser(source, allow_implicit_dicts=allow_implicit_dicts, multiline_string_behaviour=multiline_string_behaviour, max_depth=max_depth, lazy=lazy, duplicate_keys=duplicate_keys, intern=intern, intern_table=intern_table, numeric_lists=numeric_lists, schema=schema, object_pairs_hook=object_pairs_hook, list_hook=list_hook, **kwargs)
     return parser.parse()
 
 
 def dump(object: KonObject, file: Writer, **kwargs):
-    result = dumps(object, **kwargs)
-    file.write(result)
+    """
+    Serializes a Python object into a Kon-formatted file.
+        The output is written in chunks as it is produced by `iterdump`, so
+        it is never held in memory as a whole.
+
+        Args:
+            object (KonObject): The Python object to be serialized.
+            file (Writer): A text file or any object with a `write` method.
+            **kwargs: Additional keyword arguments to be passed to `iterdump`.
+    """
+    for chunk in iterdump(object, **kwargs):
+        file.write(chunk)
 
     
 def load(file: Reader, **kwargs) -> KonObject:
     src = file.read()
     return loads(src, **kwargs)
 
-__all__ = ('dumps', 'loads', 'dump', 'load', 'KonParser', 'MultilineStringBehaviour', 'KonDictionary', 'KonObject')
+
+def load_path(path: Union[str, 'os.PathLike[str]'], *, chunk_size: int = 1 << 20, **kwargs) -> KonObject:
+    """
+    Parses a Kon-formatted file by its path.
+
+    The file is memory mapped and decoded `chunk_size` bytes at a time (see
+    :meth:`KonParser.from_buffer`), so it is never held in memory as a whole
+    besides the parsed objects. Files that can't be mapped are read instead,
+    and so are files parsed with `lazy`, which keeps the source around.
+
+    Args:
+        path (str | os.PathLike): The path of the UTF-8 encoded file.
+        chunk_size (int, optional): The number of bytes decoded at a time.
+            Defaults to 1 MiB.
+        **kwargs: Additional keyword arguments to be passed to the `KonParser`.
+
+    Returns:
+        KonObject: An object representing the parsed Kon data.
+    """
+    with open(path, 'rb') as file:
+        if kwargs.get('lazy'):
+            return loads(file.read(), **kwargs)
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Empty files, pipes and the like
+            return KonParser.from_buffer(file.read(), chunk_size=chunk_size, **kwargs).parse()
+        with buffer:
+            view = memoryview(buffer)
+            try:
+                return KonParser.from_buffer(view, chunk_size=chunk_size, **kwargs).parse()
+            finally:
+                # The map can only be closed once no views of it are left
+                view.release()
+
+
+def iterload(file: Reader, *, chunk_size: int = 1 << 16, **kwargs) -> Iterator[Tuple[KonObject, KonObject]]:
+    """
+    Parses a Kon-formatted file incrementally, yielding its top-level
+    key/value pairs as soon as each of them was parsed.
+
+    The file is read `chunk_size` characters (or bytes) at a time, and only
+    the part of it that was not parsed yet is kept in memory, so memory use
+    grows with the largest top-level entry instead of the whole file.
+
+    Unlike `load`, which merges the top-level entries into a single
+    dictionary, every entry is yielded in order, even when a key repeats.
+
+    Args:
+        file (Reader): A text or binary file, binary files are decoded as UTF-8.
+        chunk_size (int, optional): How much to read from the file at a time.
+            Defaults to 65536.
+        **kwargs: Additional keyword arguments to be passed to the `KonFeedParser`
+            (`allow_implicit_dicts`, `multiline_string_behaviour`, `max_depth`).
+
+    Raises:
+        ValueError: If the source is invalid, or its top-level value is not
+            a dictionary.
+        TypeError: If the source contains a type violation.
+
+    Returns:
+        Iterator[tuple]: The top-level key/value pairs.
+    """
+    parser = KonFeedParser(**kwargs)
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            break
+        parser.feed(data)
+        yield from parser
+    parser.close()
+    yield from parser
+
+
+async def aiterload(reader: 'asyncio.StreamReader', *, chunk_size: int = 1 << 16, **kwargs) -> AsyncIterator[Tuple[KonObject, KonObject]]:
+    """
+    Like `iterload`, but reads from an `asyncio.StreamReader`, e.g. one of
+    a connection opened with `asyncio.open_connection`, until its end.
+
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+        chunk_size (int, optional): How many bytes to read at a time.
+            Defaults to 65536.
+        **kwargs: Additional keyword arguments to be passed to the
+            `KonFeedParser`.
+
+    Returns:
+        AsyncIterator[tuple]: The top-level key/value pairs.
+    """
+    parser = KonFeedParser(**kwargs)
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        parser.feed(data)
+        for pair in parser:
+            yield pair
+    parser.close()
+    for pair in parser:
+        yield pair
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    # Only looked up once
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY))
+
+
+__all__ = ('dumps', 'iterdump', 'loads', 'dump', 'load', 'load_path', 'load_many', 'load_layers', 'extract', 'validate', 'patch', 'watch', 'awatch', 'iterload', 'aiterload', 'KonParser', 'KonFeedParser', 'MultilineStringBehaviour', 'DuplicateKeys', 'InternStrings', 'NumericLists', 'KonDictionary', 'KonObject')
@@ -0,0 +1,126 @@
+"""
+The command line interface, `python -m kon COMMAND`:
+
+    check PATHS... [-j N] [--format text|json]
+        Checks Kon files, and the `.kon` files in directories, see
+        :func:`kon.check.validate`. Prints each error as `path:line:column:
+        message`, or as a JSON object per line, and exits with 1 if there
+        were any.
+
+    convert [INPUT] [-o OUTPUT] [--from kon|json|ndjson] [--to kon|json|ndjson] [--pretty] [--stats]
+        Converts between Kon and JSON or NDJSON, an entry at a time, see
+        :mod:`kon.convert`. Reads stdin and writes stdout by default. With
+        `--stats`, prints the entries, size and throughput to stderr.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+from typing import Iterator, List, Optional
+
+from .check import check_paths
+from .convert import json_to_kon, kon_to_json
+from .parser import DuplicateKeys
+
+
+def _files(paths: List[str]) -> Iterator[str]:
+    """The files among `paths`, and the `.kon` files in the directories among them, in order."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, directories, names in os.walk(path):
+            directories.sort()
+            for name in sorted(names):
+                if name.endswith('.kon'):
+                    yield os.path.join(directory, name)
+
+
+def _check(arguments: argparse.Namespace) -> int:
+    files = list(_files(arguments.paths))
+    options = {'max_depth': arguments.max_depth, 'duplicate_keys': arguments.duplicate_keys}
+    invalid = 0
+    errors = 0
+    for path, diagnostics in check_paths(files, workers=arguments.jobs, **options):
+        if diagnostics:
+            invalid += 1
+            errors += len(diagnostics)
+        for diagnostic in diagnostics:
+            if arguments.format == 'json':
+                print(json.dumps({'path': path, **diagnostic._asdict()}, ensure_ascii=False))
+            else:
+                print(f'{path}:{diagnostic}')
+    print(f'checked {len(files)} files, found {errors} errors in {invalid} files', file=sys.stderr)
+    return 1 if errors else 0
+
+
+# The format of a file, by its extension
+_FORMATS = {'.kon': 'kon', '.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+def _format(path: Optional[str]) -> Optional[str]:
+    if path is None or path == '-':
+        return None
+    return _FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def _convert(arguments: argparse.Namespace) -> int:
+    source = arguments.source or _format(arguments.input)
+    target = arguments.target or _format(arguments.output)
+    if source is None:
+        source = 'json' if target == 'kon' else 'kon'
+    if target is None:
+        target = 'json' if source == 'kon' else 'kon'
+    if (source == 'kon') == (target == 'kon'):
+        raise ValueError(f'can only convert from or to kon, not from {source} to {target}')
+    with contextlib.ExitStack() as stack:
+        if arguments.input == '-':
+            input = sys.stdin.buffer
+        else:
+            input = stack.enter_context(open(arguments.input, 'rb'))
+        if arguments.output is None or arguments.output == '-':
+            output = sys.stdout
+        else:
+            output = stack.enter_context(open(arguments.output, 'w', encoding='utf-8'))
+        if source == 'kon':
+            stats = kon_to_json(input, output, ndjson=target == 'ndjson', max_depth=arguments.max_depth)
+        else:
+            stats = json_to_kon(input, output, ndjson=source == 'ndjson', pretty=arguments.pretty)
+        output.flush()
+    if arguments.stats:
+        print(f'converted {stats.entries} entries, {stats.read / 1e6:.2f} MB in {stats.seconds:.3f} s, {stats.throughput:.2f} MB/s', file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs a command with the arguments `argv` (by default those of the process), returns its exit status."""
+    parser = argparse.ArgumentParser(prog='python -m kon', description='Tools for Kon files.')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+    check = commands.add_parser('check', help='check files for errors, without loading them', description='Checks Kon files for errors, without building their values.')
+    check.add_argument('paths', nargs='+', metavar='PATH', help='a file, or a directory to check the .kon files in')
+    check.add_argument('-j', '--jobs', type=int, default=None, metavar='N', help='the number of processes, defaults to one per CPU')
+    check.add_argument('--format', choices=('text', 'json'), default='text', help='"text" for path:line:column: message lines, "json" for a JSON object per line')
+    check.add_argument('--max-depth', type=int, default=None, metavar='N', help='the maximum nesting depth')
+    check.add_argument('--duplicate-keys', choices=[policy.value for policy in DuplicateKeys], default=DuplicateKeys.LAST_WINS.value, help='what a key that is set twice is, "error" to report it')
+    check.set_defaults(run=_check)
+    convert = commands.add_parser('convert', help='convert between Kon and JSON or NDJSON', description='Converts between Kon and JSON or NDJSON, an entry at a time.')
+    convert.add_argument('input', nargs='?', default='-', metavar='INPUT', help='the file to convert, defaults to stdin')
+    convert.add_argument('-o', '--output', default=None, metavar='OUTPUT', help='the file to write, defaults to stdout')
+    convert.add_argument('--from', dest='source', choices=('kon', 'json', 'ndjson'), default=None, help='the format of INPUT, defaults to that of its extension, or kon')
+    convert.add_argument('--to', dest='target', choices=('kon', 'json', 'ndjson'), default=None, help='the format of OUTPUT, defaults to that of its extension, or json from kon and kon otherwise')
+    convert.add_argument('--pretty', action='store_true', help='format Kon output with newlines and indentation')
+    convert.add_argument('--max-depth', type=int, default=None, metavar='N', help='the maximum nesting depth of Kon input')
+    convert.add_argument('--stats', action='store_true', help='print the number of entries and the throughput to stderr')
+    convert.set_defaults(run=_convert)
+    arguments = parser.parse_args(argv)
+    try:
+        return arguments.run(arguments)
+    except ValueError as error:
+        parser.error(str(error))
+        raise AssertionError('unreachable')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+Selects the backend of the tokenizer and of `dumps`.
+
+The optional `kon._speedups` extension (built from `_speedups.c`) runs their
+common paths in C, with exactly the same results and errors as the
+pure-Python code, which is used when the extension is not available. Setting
+the `KON_PURE_PYTHON` environment variable to anything but an empty string
+or `0` forces the pure-Python backend.
+"""
+import os
+from types import ModuleType
+from typing import Optional
+
+speedups: Optional[ModuleType] = None
+"""The `kon._speedups` extension, or None for the pure-Python backend."""
+
+if os.environ.get('KON_PURE_PYTHON', '') in ('', '0'):
+    try:
+        from . import _speedups as speedups # type: ignore
+    except ImportError:
+        pass
+
+
+def backend() -> str:
+    """Returns the backend in use, `'compiled'` or `'pure'`."""
+    return 'pure' if speedups is None else 'compiled'
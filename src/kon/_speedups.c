@@ -0,0 +1,1108 @@
+/*
+ * Optional compiled speedups for `kon`, see `kon/_accel.py`.
+ *
+ * Implements the common paths of the `KonTokenizer` token stream methods, the
+ * bracket matching of lazy parsing and `dumps`, with exactly the behaviour of
+ * the pure-Python code. Anything else
+ * (batch ends and the general scanning path of the tokenizer, subclasses and
+ * unknown types in `dumps`) is left to the pure-Python code.
+ *
+ * Build it in place with:
+ *
+ *     cc -O2 -shared -fPIC $(python3-config --includes) src/kon/_speedups.c \
+ *         -o src/kon/_speedups$(python3-config --extension-suffix)
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+/* Raw token kinds, by the first character of the token */
+enum {
+    K_SKIPPED,
+    K_NEWLINE,
+    K_COMMENT,
+    K_PUNCTUATION,
+    K_IDENTIFIER,
+    K_NUMBER,
+    K_STRING,
+    K_GENERAL,
+    K_BATCH_END,
+};
+
+static unsigned char kinds[128];
+
+/* Token kinds returned to the parser, the same strings as in kon.tokenizer */
+static PyObject *s_number, *s_string, *s_identifier, *s_entry, *s_general;
+static PyObject *s_chars[128];
+
+static PyObject *s_null, *s_true, *s_false, *s_empty, *s_space, *s_assign;
+static PyObject *s_open_dict, *s_open_dict_nl, *s_close_dict;
+static PyObject *s_open_list, *s_open_list_nl, *s_close_list;
+static PyObject *s_newline, *s_comma;
+static PyObject *s_attr_tokens, *s_attr_index, *s_attr_apply_multiline, *s_attr_items, *s_attr_tolist;
+static PyObject *float_keywords;
+static PyObject *sequence_abc;
+
+/* Tokenizer */
+
+static int
+classify(PyObject *token)
+{
+    Py_UCS4 c;
+    if (PyUnicode_GET_LENGTH(token) == 0)
+        return K_GENERAL;
+    c = PyUnicode_READ_CHAR(token, 0);
+    if (c >= 128)
+        return K_SKIPPED;
+    return kinds[c];
+}
+
+static PyObject *
+identifier_value(PyObject *token)
+{
+    Py_ssize_t length = PyUnicode_GET_LENGTH(token);
+    int contains;
+    if (length == 4 && PyUnicode_CompareWithASCIIString(token, "null") == 0)
+        Py_RETURN_NONE;
+    if (length == 4 && PyUnicode_CompareWithASCIIString(token, "true") == 0)
+        Py_RETURN_TRUE;
+    if (length == 5 && PyUnicode_CompareWithASCIIString(token, "false") == 0)
+        Py_RETURN_FALSE;
+    if (length <= 8) {
+        contains = PySet_Contains(float_keywords, token);
+        if (contains < 0)
+            return NULL;
+        if (contains)
+            return PyFloat_FromString(token);
+    }
+    Py_INCREF(token);
+    return token;
+}
+
+static PyObject *
+number_value(PyObject *token)
+{
+    Py_ssize_t length = PyUnicode_GET_LENGTH(token);
+    Py_UCS4 c;
+    if (length >= 2 && PyUnicode_READ_CHAR(token, 0) == '0') {
+        c = PyUnicode_READ_CHAR(token, 1);
+        if (c == 'x' || c == 'o' || c == 'b')
+            return PyLong_FromUnicodeObject(token, 0);
+    }
+    if (PyUnicode_FindChar(token, '.', 0, length, 1) >= 0
+        || PyUnicode_FindChar(token, 'e', 0, length, 1) >= 0
+        || PyUnicode_FindChar(token, 'E', 0, length, 1) >= 0)
+        return PyFloat_FromString(token);
+    return PyLong_FromUnicodeObject(token, 10);
+}
+
+/* Replaces the single character escapes of a string body */
+static PyObject *
+unescape(PyObject *body)
+{
+    Py_ssize_t length = PyUnicode_GET_LENGTH(body), i, n = 0;
+    int kind = PyUnicode_KIND(body);
+    void *data = PyUnicode_DATA(body);
+    Py_UCS4 *buffer, c;
+    PyObject *result;
+
+    buffer = PyMem_New(Py_UCS4, length);
+    if (buffer == NULL)
+        return PyErr_NoMemory();
+    for (i = 0; i < length; i++) {
+        c = PyUnicode_READ(kind, data, i);
+        if (c == '\\' && i + 1 < length) {
+            c = PyUnicode_READ(kind, data, ++i);
+            if (c == 'n')
+                c = '\n';
+            else if (c == 'r')
+                c = '\r';
+            else if (c == 't')
+                c = '\t';
+        }
+        buffer[n++] = c;
+    }
+    result = PyUnicode_FromKindAndData(PyUnicode_4BYTE_KIND, buffer, n);
+    PyMem_Free(buffer);
+    return result;
+}
+
+static PyObject *
+string_value(PyObject *tokenizer, PyObject *token)
+{
+    Py_ssize_t length = PyUnicode_GET_LENGTH(token);
+    PyObject *body, *result;
+    int is_multiline;
+
+    body = PyUnicode_Substring(token, 1, length - 1);
+    if (body == NULL)
+        return NULL;
+    length -= 2;
+    is_multiline = PyUnicode_FindChar(body, '\n', 0, length, 1) >= 0;
+    if (PyUnicode_FindChar(body, '\\', 0, length, 1) >= 0) {
+        Py_SETREF(body, unescape(body));
+        if (body == NULL)
+            return NULL;
+    }
+    if (!is_multiline)
+        return body;
+    result = PyObject_CallMethodObjArgs(tokenizer, s_attr_apply_multiline, body, Py_None, NULL);
+    Py_DECREF(body);
+    return result;
+}
+
+static PyObject *
+token_value(PyObject *tokenizer, int kind, PyObject *token)
+{
+    if (kind == K_IDENTIFIER)
+        return identifier_value(token);
+    if (kind == K_NUMBER)
+        return number_value(token);
+    return string_value(tokenizer, token);
+}
+
+/* Converts a raw `key = value` token to a `(key, value)` pair */
+static PyObject *
+entry_value(PyObject *tokenizer, PyObject *token, Py_ssize_t assign)
+{
+    Py_ssize_t length = PyUnicode_GET_LENGTH(token), key_end = assign, start = assign + 1, end = length;
+    PyObject *raw, *key, *value, *result;
+
+    while (key_end > 0 && Py_UNICODE_ISSPACE(PyUnicode_READ_CHAR(token, key_end - 1)))
+        key_end--;
+    while (start < end && Py_UNICODE_ISSPACE(PyUnicode_READ_CHAR(token, start)))
+        start++;
+    while (end > start && Py_UNICODE_ISSPACE(PyUnicode_READ_CHAR(token, end - 1)))
+        end--;
+
+    raw = PyUnicode_Substring(token, 0, key_end);
+    if (raw == NULL)
+        return NULL;
+    key = identifier_value(raw);
+    Py_DECREF(raw);
+    if (key == NULL)
+        return NULL;
+    raw = PyUnicode_Substring(token, start, end);
+    if (raw == NULL) {
+        Py_DECREF(key);
+        return NULL;
+    }
+    value = token_value(tokenizer, classify(raw), raw);
+    Py_DECREF(raw);
+    if (value == NULL) {
+        Py_DECREF(key);
+        return NULL;
+    }
+    result = PyTuple_Pack(2, key, value);
+    Py_DECREF(key);
+    Py_DECREF(value);
+    return result;
+}
+
+static PyObject *
+kind_name(int kind, PyObject *token)
+{
+    switch (kind) {
+    case K_IDENTIFIER:
+        return s_identifier;
+    case K_NUMBER:
+        return s_number;
+    case K_STRING:
+        return s_string;
+    case K_GENERAL:
+        return s_general;
+    default:
+        return s_chars[PyUnicode_READ_CHAR(token, 0)];
+    }
+}
+
+/* Reads the `_tokens` and `_index` of a tokenizer */
+static PyObject *
+load_tokens(PyObject *tokenizer, Py_ssize_t *index)
+{
+    PyObject *tokens, *value;
+    tokens = PyObject_GetAttr(tokenizer, s_attr_tokens);
+    if (tokens == NULL)
+        return NULL;
+    if (!PyList_CheckExact(tokens)) {
+        Py_DECREF(tokens);
+        PyErr_SetString(PyExc_TypeError, "tokens must be a list");
+        return NULL;
+    }
+    value = PyObject_GetAttr(tokenizer, s_attr_index);
+    if (value == NULL) {
+        Py_DECREF(tokens);
+        return NULL;
+    }
+    *index = PyLong_AsSsize_t(value);
+    Py_DECREF(value);
+    if (*index == -1 && PyErr_Occurred()) {
+        Py_DECREF(tokens);
+        return NULL;
+    }
+    return tokens;
+}
+
+static int
+store_index(PyObject *tokenizer, Py_ssize_t index)
+{
+    PyObject *value = PyLong_FromSsize_t(index);
+    int result;
+    if (value == NULL)
+        return -1;
+    result = PyObject_SetAttr(tokenizer, s_attr_index, value);
+    Py_DECREF(value);
+    return result;
+}
+
+/* Consumes the value or entry token at `index - 1`, returns its `(kind, value)` pair */
+static PyObject *
+consume_value(PyObject *tokenizer, int kind, PyObject *token, Py_ssize_t index)
+{
+    Py_ssize_t assign;
+    PyObject *value, *result;
+
+    if (store_index(tokenizer, index) < 0)
+        return NULL;
+    if (kind == K_IDENTIFIER
+        && (assign = PyUnicode_FindChar(token, '=', 0, PyUnicode_GET_LENGTH(token), 1)) >= 0) {
+        value = entry_value(tokenizer, token, assign);
+        kind = -1;
+    }
+    else {
+        value = token_value(tokenizer, kind, token);
+    }
+    if (value == NULL)
+        return NULL;
+    result = PyTuple_Pack(2, kind == -1 ? s_entry : kind_name(kind, token), value);
+    Py_DECREF(value);
+    return result;
+}
+
+/*
+ * The token stream functions below take a tokenizer and mirror its methods
+ * of the same name. They return None where the pure-Python method has to
+ * take over, without consuming anything.
+ */
+
+static PyObject *
+speedups_next(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *tokenizer, *tokens, *token, *result = NULL;
+    Py_ssize_t index, size;
+    int newlines, kind;
+
+    if (nargs != 2) {
+        PyErr_SetString(PyExc_TypeError, "next() takes exactly 2 arguments");
+        return NULL;
+    }
+    tokenizer = args[0];
+    newlines = PyObject_IsTrue(args[1]);
+    if (newlines < 0)
+        return NULL;
+    tokens = load_tokens(tokenizer, &index);
+    if (tokens == NULL)
+        return NULL;
+    size = PyList_GET_SIZE(tokens);
+    while (index < size) {
+        token = PyList_GET_ITEM(tokens, index);
+        index++;
+        kind = classify(token);
+        if (kind == K_SKIPPED || kind == K_COMMENT || (kind == K_NEWLINE && newlines))
+            continue;
+        if (kind == K_BATCH_END || kind == K_GENERAL)
+            break;
+        if (kind == K_IDENTIFIER || kind == K_NUMBER || kind == K_STRING) {
+            result = consume_value(tokenizer, kind, token, index);
+            goto done;
+        }
+        if (store_index(tokenizer, index) < 0)
+            goto done;
+        result = PyTuple_Pack(2, kind_name(kind, token), Py_None);
+        goto done;
+    }
+    Py_INCREF(Py_None);
+    result = Py_None;
+done:
+    Py_DECREF(tokens);
+    return result;
+}
+
+static PyObject *
+speedups_next_element(PyObject *module, PyObject *tokenizer)
+{
+    PyObject *tokens, *token, *result = NULL;
+    Py_ssize_t index, size;
+    int kind;
+
+    tokens = load_tokens(tokenizer, &index);
+    if (tokens == NULL)
+        return NULL;
+    size = PyList_GET_SIZE(tokens);
+    for (; index < size; index++) {
+        token = PyList_GET_ITEM(tokens, index);
+        kind = classify(token);
+        if (kind == K_SKIPPED || kind == K_NEWLINE)
+            continue;
+        if (kind == K_BATCH_END)
+            break;
+        if (kind == K_IDENTIFIER || kind == K_NUMBER || kind == K_STRING) {
+            result = consume_value(tokenizer, kind, token, index + 1);
+            goto done;
+        }
+        if (store_index(tokenizer, index) < 0)
+            goto done;
+        result = PyTuple_Pack(2, kind_name(kind, token), Py_None);
+        goto done;
+    }
+    Py_INCREF(Py_None);
+    result = Py_None;
+done:
+    Py_DECREF(tokens);
+    return result;
+}
+
+/* Skips whitespace, and newlines too if `newlines` is set, then returns the kind of the next token */
+static PyObject *
+peek_kind(PyObject *tokenizer, int newlines)
+{
+    PyObject *tokens, *token, *result = NULL;
+    Py_ssize_t index, size;
+    int kind;
+
+    tokens = load_tokens(tokenizer, &index);
+    if (tokens == NULL)
+        return NULL;
+    size = PyList_GET_SIZE(tokens);
+    for (; index < size; index++) {
+        token = PyList_GET_ITEM(tokens, index);
+        kind = classify(token);
+        if (kind == K_SKIPPED || (kind == K_NEWLINE && newlines))
+            continue;
+        if (kind == K_BATCH_END)
+            break;
+        if (store_index(tokenizer, index) < 0)
+            goto done;
+        result = kind_name(kind, token);
+        Py_INCREF(result);
+        goto done;
+    }
+    Py_INCREF(Py_None);
+    result = Py_None;
+done:
+    Py_DECREF(tokens);
+    return result;
+}
+
+static PyObject *
+speedups_peek(PyObject *module, PyObject *tokenizer)
+{
+    return peek_kind(tokenizer, 0);
+}
+
+static PyObject *
+speedups_skip_whitespace(PyObject *module, PyObject *tokenizer)
+{
+    return peek_kind(tokenizer, 1);
+}
+
+/* Lazy parsing */
+
+static PyObject *
+speedups_match_bracket(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    PyObject *source;
+    Py_ssize_t pos, offset, end, start, length, size = 0, capacity = 16;
+    Py_UCS4 c, quote, closing;
+    Py_UCS1 *expected, *resized;
+    const void *data;
+    int kind;
+
+    if (nargs != 3) {
+        PyErr_SetString(PyExc_TypeError, "match_bracket() takes exactly 3 arguments");
+        return NULL;
+    }
+    source = args[0];
+    if (!PyUnicode_Check(source) || PyUnicode_READY(source) < 0) {
+        if (!PyErr_Occurred())
+            PyErr_SetString(PyExc_TypeError, "source must be a str");
+        return NULL;
+    }
+    pos = PyLong_AsSsize_t(args[1]);
+    if (pos == -1 && PyErr_Occurred())
+        return NULL;
+    offset = PyLong_AsSsize_t(args[2]);
+    if (offset == -1 && PyErr_Occurred())
+        return NULL;
+    length = PyUnicode_GET_LENGTH(source);
+    kind = PyUnicode_KIND(source);
+    data = PyUnicode_DATA(source);
+    if (pos < 0 || pos >= length) {
+        PyErr_SetString(PyExc_IndexError, "string index out of range");
+        return NULL;
+    }
+    expected = PyMem_Malloc(capacity);
+    if (expected == NULL)
+        return PyErr_NoMemory();
+    /* The closing brackets of the open ones, innermost last */
+    expected[size++] = PyUnicode_READ(kind, data, pos) == '{' ? '}' : ')';
+    for (end = pos + 1; end < length; end++) {
+        c = PyUnicode_READ(kind, data, end);
+        switch (c) {
+        case '{':
+        case '(':
+            if (size == capacity) {
+                resized = PyMem_Realloc(expected, capacity * 2);
+                if (resized == NULL) {
+                    PyErr_NoMemory();
+                    goto error;
+                }
+                expected = resized;
+                capacity *= 2;
+            }
+            expected[size++] = c == '{' ? '}' : ')';
+            break;
+        case '}':
+        case ')':
+            closing = expected[--size];
+            if (c != closing) {
+                PyErr_Format(PyExc_ValueError, "expected a newline, \"%c\" or a comma at index %zd, but found %c",
+                             (int)closing, offset + end, (int)c);
+                goto error;
+            }
+            if (size == 0) {
+                PyMem_Free(expected);
+                return PyLong_FromSsize_t(end);
+            }
+            break;
+        case '"':
+        case '\'':
+            /* Strings may contain brackets, skip them as a whole */
+            quote = c;
+            start = end;
+            for (end++; ; end++) {
+                if (end >= length) {
+                    PyErr_Format(PyExc_ValueError, "unterminated string at index %zd", offset + start);
+                    goto error;
+                }
+                c = PyUnicode_READ(kind, data, end);
+                if (c == quote)
+                    break;
+                if (c == '\\')
+                    end++;
+            }
+            break;
+        case '#':
+            /* So may comments */
+            while (end + 1 < length && PyUnicode_READ(kind, data, end + 1) != '\n')
+                end++;
+            break;
+        }
+    }
+    PyErr_Format(PyExc_ValueError, "unclosed \"%c\" at index %zd", (int)PyUnicode_READ(kind, data, pos), offset + pos);
+error:
+    PyMem_Free(expected);
+    return NULL;
+}
+
+/* Serializer */
+
+typedef struct {
+    PyObject *items;
+    PyObject *pre;
+    PyObject *join;
+    PyObject *post;
+    /* The value of the entry whose key is being dumped, or NULL */
+    PyObject *pending;
+    PyObject *marker;
+    PyObject *indent;
+    Py_ssize_t depth;
+    Py_ssize_t value_depth;
+    char is_dict;
+    char first;
+    char bracketed;
+    char pretty;
+    char value_pretty;
+} Frame;
+
+typedef struct {
+    /* A str that is written into, and resized to what was written when done */
+    PyObject *out;
+    Py_ssize_t length;
+    Py_UCS4 maxchar;
+    PyObject *indents;
+    PyObject *markers;
+    PyObject *fallback;
+    Py_ssize_t indent_width;
+    Frame *stack;
+    Py_ssize_t size;
+    Py_ssize_t capacity;
+} Dumper;
+
+static void
+clear_frame(Frame *frame)
+{
+    Py_CLEAR(frame->items);
+    Py_CLEAR(frame->pre);
+    Py_CLEAR(frame->join);
+    Py_CLEAR(frame->post);
+    Py_CLEAR(frame->pending);
+    Py_CLEAR(frame->marker);
+    Py_CLEAR(frame->indent);
+}
+
+/* Returns a borrowed reference to the indentation of `depth` */
+static PyObject *
+get_indent(Dumper *d, Py_ssize_t depth)
+{
+    PyObject *indent, *count;
+    while (PyList_GET_SIZE(d->indents) <= depth) {
+        count = PyLong_FromSsize_t(PyList_GET_SIZE(d->indents) * d->indent_width);
+        if (count == NULL)
+            return NULL;
+        indent = PyNumber_Multiply(count, s_space);
+        Py_DECREF(count);
+        if (indent == NULL)
+            return NULL;
+        if (PyList_Append(d->indents, indent) < 0) {
+            Py_DECREF(indent);
+            return NULL;
+        }
+        Py_DECREF(indent);
+    }
+    return PyList_GET_ITEM(d->indents, depth);
+}
+
+/* Appends `text` to the output, growing it by half, and widening its kind when `text` needs a wider one */
+static int
+emit(Dumper *d, PyObject *text)
+{
+    Py_ssize_t length = PyUnicode_GET_LENGTH(text), capacity;
+    Py_UCS4 maxchar = PyUnicode_MAX_CHAR_VALUE(text);
+    PyObject *wider;
+
+    if (length == 0)
+        return 0;
+    capacity = PyUnicode_GET_LENGTH(d->out);
+    if (maxchar > d->maxchar) {
+        if (length > capacity - d->length)
+            capacity = d->length + length + (d->length + length) / 2;
+        wider = PyUnicode_New(capacity, maxchar);
+        if (wider == NULL)
+            return -1;
+        if (d->length > 0 && PyUnicode_CopyCharacters(wider, 0, d->out, 0, d->length) < 0) {
+            Py_DECREF(wider);
+            return -1;
+        }
+        Py_SETREF(d->out, wider);
+        d->maxchar = maxchar;
+    }
+    else if (length > capacity - d->length) {
+        if (PyUnicode_Resize(&d->out, d->length + length + (d->length + length) / 2) < 0)
+            return -1;
+    }
+    if (PyUnicode_CopyCharacters(d->out, d->length, text, 0, length) < 0)
+        return -1;
+    d->length += length;
+    return 0;
+}
+
+/* Serializes a scalar into `*result`. Returns 1 for a scalar, 0 for a list or a dictionary and -1 on errors. */
+static int
+dump_scalar(Dumper *d, PyObject *object, PyObject **result)
+{
+    PyTypeObject *type = Py_TYPE(object);
+    PyObject *text;
+    if (type == &PyUnicode_Type) {
+        if (PyUnicode_IsIdentifier(object)) {
+            /* Keywords are quoted, they would be read back as another type */
+            text = identifier_value(object);
+            if (text == NULL)
+                return -1;
+            if (text == object) {
+                *result = object;
+                return 1;
+            }
+            Py_DECREF(text);
+        }
+        text = PyObject_Repr(object);
+    }
+    else if (type == &PyLong_Type || type == &PyFloat_Type) {
+        text = PyObject_Repr(object);
+    }
+    else if (type == &PyBool_Type) {
+        text = object == Py_True ? s_true : s_false;
+        Py_INCREF(text);
+    }
+    else if (object == Py_None) {
+        text = s_null;
+        Py_INCREF(text);
+    }
+    else if (type == &PyDict_Type || type == &PyList_Type || type == &PyTuple_Type) {
+        return 0;
+    }
+    else {
+        text = PyObject_CallFunctionObjArgs(d->fallback, object, NULL);
+        if (text == Py_None) {
+            Py_DECREF(text);
+            return 0;
+        }
+    }
+    if (text == NULL)
+        return -1;
+    *result = text;
+    return 1;
+}
+
+/* Pushes a frame for a list or a dictionary with `length` items, `indent` is the indentation of its closing bracket */
+static Frame *
+open_frame(Dumper *d, PyObject *object, PyObject *items, int is_dict, Py_ssize_t length, int pretty, PyObject *indent, int is_top_level)
+{
+    Frame *frame;
+    PyObject *marker;
+    int contains;
+
+    marker = PyLong_FromVoidPtr(object);
+    if (marker == NULL)
+        return NULL;
+    contains = PySet_Contains(d->markers, marker);
+    if (contains != 0) {
+        if (contains > 0)
+            PyErr_SetString(PyExc_ValueError, "circular reference detected");
+        Py_DECREF(marker);
+        return NULL;
+    }
+    if (PySet_Add(d->markers, marker) < 0) {
+        Py_DECREF(marker);
+        return NULL;
+    }
+    if (d->size == d->capacity) {
+        Py_ssize_t capacity = d->capacity * 2 + 16;
+        Frame *stack = PyMem_Realloc(d->stack, capacity * sizeof(Frame));
+        if (stack == NULL) {
+            Py_DECREF(marker);
+            PyErr_NoMemory();
+            return NULL;
+        }
+        d->stack = stack;
+        d->capacity = capacity;
+    }
+    frame = &d->stack[d->size];
+    memset(frame, 0, sizeof(Frame));
+    frame->marker = marker;
+    frame->items = PyObject_GetIter(items);
+    if (frame->items == NULL) {
+        clear_frame(frame);
+        return NULL;
+    }
+    if (is_top_level) {
+        /* A top-level dictionary is written without its braces */
+        frame->pre = s_empty;
+        frame->post = s_empty;
+        frame->join = pretty && length != 1 ? s_newline : s_comma;
+        Py_INCREF(frame->post);
+    }
+    else if (pretty && length != 1) {
+        frame->pre = is_dict ? s_open_dict_nl : s_open_list_nl;
+        frame->join = s_newline;
+        frame->post = PyUnicode_FromFormat("\n%U%U", indent, is_dict ? s_close_dict : s_close_list);
+        if (frame->post == NULL) {
+            clear_frame(frame);
+            return NULL;
+        }
+    }
+    else {
+        frame->pre = is_dict ? s_open_dict : s_open_list;
+        frame->join = s_comma;
+        frame->post = is_dict ? s_close_dict : s_close_list;
+        Py_INCREF(frame->post);
+    }
+    Py_INCREF(frame->pre);
+    Py_INCREF(frame->join);
+    frame->is_dict = (char)is_dict;
+    frame->first = 1;
+    frame->bracketed = (char)!is_top_level;
+    d->size++;
+    return frame;
+}
+
+static int
+unpack_item(PyObject *item, PyObject **key, PyObject **value)
+{
+    PyObject *pair;
+    if (PyTuple_CheckExact(item) && PyTuple_GET_SIZE(item) == 2) {
+        pair = item;
+        Py_INCREF(pair);
+    }
+    else {
+        pair = PySequence_Tuple(item);
+        if (pair == NULL)
+            return -1;
+        if (PyTuple_GET_SIZE(pair) != 2) {
+            if (PyTuple_GET_SIZE(pair) > 2)
+                PyErr_SetString(PyExc_ValueError, "too many values to unpack (expected 2)");
+            else
+                PyErr_Format(PyExc_ValueError, "not enough values to unpack (expected 2, got %zd)", PyTuple_GET_SIZE(pair));
+            Py_DECREF(pair);
+            return -1;
+        }
+    }
+    *key = PyTuple_GET_ITEM(pair, 0);
+    *value = PyTuple_GET_ITEM(pair, 1);
+    Py_INCREF(*key);
+    Py_INCREF(*value);
+    Py_DECREF(pair);
+    return 0;
+}
+
+/*
+ * The same explicit stack serializer as `kon.iterdump`, see there. Unlike
+ * the pure-Python version, the object being dumped is always an owned
+ * reference.
+ */
+static PyObject *
+speedups_dumps(PyObject *module, PyObject *args)
+{
+    PyObject *object, *max_depth_object, *fallback, *result = NULL;
+    PyObject *scalar = NULL, *prefix, *items = NULL, *item, *value;
+    Py_ssize_t indent_width, max_depth = PY_SSIZE_T_MAX, nesting = 0, depth = 0, length;
+    int pretty, is_pretty, no_indent = 0, is_top_level = 1, status, is_sequence, overflow;
+    Frame *frame, *top;
+    Dumper d = {NULL, 0, 127, NULL, NULL, NULL, 0, NULL, 0, 0};
+
+    if (!PyArg_ParseTuple(args, "OpnOO:dumps", &object, &pretty, &indent_width, &max_depth_object, &fallback))
+        return NULL;
+    if (max_depth_object != Py_None) {
+        max_depth = PyLong_AsLongLongAndOverflow(max_depth_object, &overflow);
+        if (max_depth == -1 && PyErr_Occurred())
+            return NULL;
+        if (overflow)
+            max_depth = overflow > 0 ? PY_SSIZE_T_MAX : -1;
+    }
+    d.out = PyUnicode_New(256, d.maxchar);
+    d.indents = PyList_New(0);
+    d.markers = PySet_New(NULL);
+    d.fallback = fallback;
+    d.indent_width = indent_width;
+    if (d.out == NULL || d.indents == NULL || d.markers == NULL)
+        goto error;
+    Py_INCREF(object);
+    is_pretty = pretty;
+    while (1) {
+        /* Dump `object`, a list or a dictionary is opened and continued below */
+        frame = NULL;
+        if (is_pretty && !no_indent) {
+            prefix = get_indent(&d, depth);
+            if (prefix == NULL)
+                goto error;
+        }
+        else {
+            prefix = s_empty;
+        }
+        status = dump_scalar(&d, object, &scalar);
+        if (status < 0)
+            goto error;
+        if (status > 0) {
+            if (emit(&d, prefix) < 0 || emit(&d, scalar) < 0)
+                goto error;
+            Py_CLEAR(scalar);
+        }
+        else if (PyDict_Check(object)) {
+            length = PyObject_Size(object);
+            if (length < 0)
+                goto error;
+            if (length == 0) {
+                if (emit(&d, prefix) < 0 || emit(&d, s_open_dict) < 0 || emit(&d, s_close_dict) < 0)
+                    goto error;
+            }
+            else {
+                items = PyObject_CallMethodObjArgs(object, s_attr_items, NULL);
+                if (items == NULL)
+                    goto error;
+                frame = open_frame(&d, object, items, 1, length, is_pretty, is_pretty ? get_indent(&d, depth) : s_empty, is_top_level);
+                Py_CLEAR(items);
+                if (frame == NULL)
+                    goto error;
+                frame->pretty = is_pretty && length != 1;
+                frame->depth = is_top_level ? depth : depth + 1;
+                frame->value_pretty = (char)is_pretty;
+                frame->value_depth = is_top_level || (is_pretty && length == 1) ? depth : depth + 1;
+            }
+        }
+        else {
+            /* Sequences know their length, any other iterable is materialized
+               exactly once, as it may be a generator that can't be restarted.
+               Arrays (e.g. of numeric_lists) convert their elements in bulk */
+            if (PyList_Check(object) || PyTuple_Check(object)) {
+                items = object;
+                Py_INCREF(items);
+            }
+            else if (PyObject_HasAttr(object, s_attr_tolist)) {
+                items = PyObject_CallMethodObjArgs(object, s_attr_tolist, NULL);
+                if (items == NULL)
+                    goto error;
+            }
+            else {
+                is_sequence = PyObject_IsInstance(object, sequence_abc);
+                if (is_sequence < 0)
+                    goto error;
+                if (is_sequence) {
+                    items = object;
+                    Py_INCREF(items);
+                }
+                else {
+                    items = PySequence_List(object);
+                    if (items == NULL)
+                        goto error;
+                }
+            }
+            length = PyObject_Size(items);
+            if (length < 0)
+                goto error;
+            if (length == 0) {
+                if (emit(&d, prefix) < 0 || emit(&d, s_open_list) < 0 || emit(&d, s_close_list) < 0)
+                    goto error;
+            }
+            else {
+                frame = open_frame(&d, object, items, 0, length, is_pretty, is_pretty ? get_indent(&d, depth) : s_empty, 0);
+                if (frame == NULL)
+                    goto error;
+                frame->pretty = is_pretty && length != 1;
+                frame->depth = length == 1 ? depth : depth + 1;
+            }
+            Py_CLEAR(items);
+        }
+        Py_CLEAR(object);
+        if (frame != NULL) {
+            if (frame->bracketed) {
+                nesting++;
+                if (nesting > max_depth) {
+                    PyErr_Format(PyExc_ValueError, "maximum nesting depth of %S exceeded", max_depth_object);
+                    goto error;
+                }
+            }
+            if (emit(&d, prefix) < 0 || emit(&d, frame->pre) < 0)
+                goto error;
+            frame->indent = frame->pretty ? get_indent(&d, frame->depth) : s_empty;
+            if (frame->indent == NULL)
+                goto error;
+            Py_INCREF(frame->indent);
+        }
+
+        /* Continue with the innermost list or dictionary, until there is
+           another list or dictionary to dump */
+        while (1) {
+            if (d.size == 0) {
+                /* Shrunk in place, without a copy */
+                if (PyUnicode_Resize(&d.out, d.length) < 0)
+                    goto error;
+                result = d.out;
+                d.out = NULL;
+                goto done;
+            }
+            top = &d.stack[d.size - 1];
+            value = top->pending;
+            if (value == NULL) {
+                item = PyIter_Next(top->items);
+                if (item == NULL) {
+                    if (PyErr_Occurred())
+                        goto error;
+                    if (PySet_Discard(d.markers, top->marker) < 0)
+                        goto error;
+                    if (top->bracketed)
+                        nesting--;
+                    status = emit(&d, top->post);
+                    clear_frame(top);
+                    d.size--;
+                    if (status < 0)
+                        goto error;
+                    continue;
+                }
+                if (top->first)
+                    top->first = 0;
+                else if (emit(&d, top->join) < 0) {
+                    Py_DECREF(item);
+                    goto error;
+                }
+                if (top->is_dict) {
+                    status = unpack_item(item, &object, &value);
+                    Py_DECREF(item);
+                    if (status < 0)
+                        goto error;
+                }
+                else {
+                    object = item;
+                }
+                status = dump_scalar(&d, object, &scalar);
+                if (status < 0) {
+                    Py_XDECREF(value);
+                    goto error;
+                }
+                if (status == 0) {
+                    top->pending = value;
+                    is_pretty = top->pretty;
+                    depth = top->depth;
+                    no_indent = 0;
+                    is_top_level = 0;
+                    break;
+                }
+                Py_CLEAR(object);
+                status = emit(&d, top->indent) < 0 || emit(&d, scalar) < 0;
+                Py_CLEAR(scalar);
+                if (status) {
+                    Py_XDECREF(value);
+                    goto error;
+                }
+                if (value == NULL)
+                    continue;
+            }
+            else {
+                top->pending = NULL;
+            }
+            /* The key was dumped, continue with its value */
+            status = dump_scalar(&d, value, &scalar);
+            if (status < 0) {
+                Py_DECREF(value);
+                goto error;
+            }
+            if (status > 0) {
+                Py_DECREF(value);
+                status = emit(&d, s_assign) < 0 || emit(&d, scalar) < 0;
+                Py_CLEAR(scalar);
+                if (status)
+                    goto error;
+                continue;
+            }
+            object = value;
+            /* Use space for dict values, no space for iterables */
+            if (PyDict_Check(object)) {
+                if (emit(&d, s_space) < 0)
+                    goto error;
+                /* A pretty dictionary with a single entry is written without braces */
+                is_top_level = 0;
+                if (top->value_pretty) {
+                    length = PyObject_Size(object);
+                    if (length < 0)
+                        goto error;
+                    is_top_level = length == 1;
+                }
+            }
+            else {
+                is_top_level = 0;
+            }
+            is_pretty = top->value_pretty;
+            depth = top->value_depth;
+            no_indent = 1;
+            break;
+        }
+    }
+
+error:
+    Py_XDECREF(object);
+    Py_XDECREF(scalar);
+    Py_XDECREF(items);
+done:
+    while (d.size > 0)
+        clear_frame(&d.stack[--d.size]);
+    PyMem_Free(d.stack);
+    Py_XDECREF(d.out);
+    Py_XDECREF(d.indents);
+    Py_XDECREF(d.markers);
+    return result;
+}
+
+static PyMethodDef speedups_methods[] = {
+    {"next", (PyCFunction)(void (*)(void))speedups_next, METH_FASTCALL,
+     "next(tokenizer, newlines)\n--\n\nKonTokenizer.next, or None to leave it to the pure-Python method."},
+    {"next_element", speedups_next_element, METH_O,
+     "next_element(tokenizer)\n--\n\nKonTokenizer.next_element, or None to leave it to the pure-Python method."},
+    {"peek", speedups_peek, METH_O,
+     "peek(tokenizer)\n--\n\nKonTokenizer.peek, or None to leave it to the pure-Python method."},
+    {"skip_whitespace", speedups_skip_whitespace, METH_O,
+     "skip_whitespace(tokenizer)\n--\n\nKonTokenizer.skip_whitespace, or None to leave it to the pure-Python method."},
+    {"match_bracket", (PyCFunction)(void (*)(void))speedups_match_bracket, METH_FASTCALL,
+     "match_bracket(source, pos, offset)\n--\n\nKonTokenizer._match_bracket, `offset` is added to the indices in errors."},
+    {"dumps", speedups_dumps, METH_VARARGS,
+     "dumps(object, pretty, indent_width, max_depth, fallback)\n--\n\n"
+     "kon.dumps, `fallback` serializes types other than the exact built-in ones."},
+    {NULL, NULL, 0, NULL},
+};
+
+static struct PyModuleDef speedups_module = {
+    PyModuleDef_HEAD_INIT,
+    "kon._speedups",
+    "Optional compiled speedups for kon.",
+    -1,
+    speedups_methods,
+};
+
+#define INTERN(variable, text) \
+    if ((variable = PyUnicode_InternFromString(text)) == NULL) return NULL;
+
+PyMODINIT_FUNC
+PyInit__speedups(void)
+{
+    const char *c;
+    PyObject *abc;
+    int i;
+
+    memset(kinds, K_SKIPPED, sizeof(kinds));
+    kinds[0] = K_BATCH_END;
+    kinds['\n'] = K_NEWLINE;
+    kinds['#'] = K_COMMENT;
+    for (c = "{}()=,+-"; *c; c++)
+        kinds[(unsigned char)*c] = K_PUNCTUATION;
+    for (c = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$:"; *c; c++)
+        kinds[(unsigned char)*c] = K_IDENTIFIER;
+    for (c = "0123456789"; *c; c++)
+        kinds[(unsigned char)*c] = K_NUMBER;
+    kinds['"'] = K_STRING;
+    kinds['\''] = K_STRING;
+    for (i = 0; i < 128; i++) {
+        if ((s_chars[i] = PyUnicode_FromOrdinal(i)) == NULL)
+            return NULL;
+        PyUnicode_InternInPlace(&s_chars[i]);
+    }
+
+    INTERN(s_number, "number");
+    INTERN(s_string, "string");
+    INTERN(s_identifier, "identifier");
+    INTERN(s_entry, "entry");
+    INTERN(s_general, "general");
+    INTERN(s_null, "null");
+    INTERN(s_true, "true");
+    INTERN(s_false, "false");
+    INTERN(s_empty, "");
+    INTERN(s_space, " ");
+    INTERN(s_assign, " = ");
+    INTERN(s_open_dict, "{");
+    INTERN(s_open_dict_nl, "{\n");
+    INTERN(s_close_dict, "}");
+    INTERN(s_open_list, "(");
+    INTERN(s_open_list_nl, "(\n");
+    INTERN(s_close_list, ")");
+    INTERN(s_newline, "\n");
+    INTERN(s_comma, ", ");
+    INTERN(s_attr_tokens, "_tokens");
+    INTERN(s_attr_index, "_index");
+    INTERN(s_attr_apply_multiline, "_apply_multiline");
+    INTERN(s_attr_items, "items");
+    INTERN(s_attr_tolist, "tolist");
+
+    abc = Py_BuildValue("(sssssss)", "inf", "infinity", "Inf", "Infinity", "nan", "Nan", "NaN");
+    if (abc == NULL)
+        return NULL;
+    float_keywords = PyFrozenSet_New(abc);
+    Py_DECREF(abc);
+    if (float_keywords == NULL)
+        return NULL;
+
+    abc = PyImport_ImportModule("collections.abc");
+    if (abc == NULL)
+        return NULL;
+    sequence_abc = PyObject_GetAttrString(abc, "Sequence");
+    Py_DECREF(abc);
+    if (sequence_abc == NULL)
+        return NULL;
+
+    return PyModule_Create(&speedups_module);
+}
@@ -0,0 +1,372 @@
+"""
+KONB, a compact binary encoding of parsed Kon documents, see :func:`dumps`,
+:func:`loads` and :func:`load_path`.
+
+KONB is meant for reloading documents that rarely change: decoding it reads
+each value in one step instead of tokenizing and parsing it. It keeps every
+type that the parser produces: ints of any size, floats (including inf, nan
+and -0.0), strings (including lone surrogates), booleans, None, lists, and
+dictionaries with keys of any of these scalar types.
+
+A document is the magic number `KONB`, a format version, and a single
+value. A value is a tag byte followed by its payload:
+
+- None, false and true are only a tag.
+- An int is a signed 8, 32 or 64 bit integer, or the length of a larger one
+  and its signed little-endian bytes.
+- A float is an IEEE 754 double.
+- A string is the length and the UTF-8 bytes of its first occurrence, or the
+  index of that occurrence in the table of strings seen so far, so that keys
+  that are repeated in every dictionary are only stored once.
+- A list or a dictionary is the number of its elements or entries, followed
+  by the elements, or the keys and values of the entries, in order.
+
+All numbers are little-endian. Lengths, counts and string indices are stored
+in 8, 16 or 32 bits, as small as they fit.
+"""
+import io
+import hashlib
+import itertools
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Set, Tuple, Union
+
+from .types import KonObject
+
+_MAGIC = b'KONB'
+_VERSION = 1
+
+# Tags of the values
+_NONE = 0x00
+_FALSE = 0x01
+_TRUE = 0x02
+_INT8 = 0x03
+_INT32 = 0x04
+_INT64 = 0x05
+_BIGINT = 0x06
+_FLOAT = 0x07
+_STR8 = 0x08
+_STR32 = 0x09
+_REF8 = 0x0a
+_REF16 = 0x0b
+_REF32 = 0x0c
+_LIST8 = 0x0d
+_LIST32 = 0x0e
+_DICT8 = 0x0f
+_DICT32 = 0x10
+
+_TAGGED_INT8 = struct.Struct('<Bb')
+_TAGGED_INT32 = struct.Struct('<Bi')
+_TAGGED_INT64 = struct.Struct('<Bq')
+_TAGGED_FLOAT = struct.Struct('<Bd')
+_TAGGED_U8 = struct.Struct('<BB')
+_TAGGED_U16 = struct.Struct('<BH')
+_TAGGED_U32 = struct.Struct('<BI')
+_I32 = struct.Struct('<i')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+
+# The header of a cache file: the magic number, the size and modification
+# time (in nanoseconds) of the source, and a digest of the parser options,
+# followed by the document
+_CACHE_MAGIC = b'KONBCACH'
+_CACHE_HEADER = struct.Struct('<8sQq8s')
+
+_NOTHING: Any = object()
+
+
+def dumps(object: KonObject) -> bytes:
+    """
+    Encodes a Python object as a KONB document, see :mod:`kon.binary`.
+
+    Nested lists and dictionaries are encoded on an explicit stack instead
+    of recursively, so the nesting depth is only limited by memory. Tuples,
+    and arrays such as those of `numeric_lists`, are encoded as lists.
+
+    Args:
+        object: The object to be encoded, a `KonObject`.
+
+    Raises:
+        TypeError: If the object contains a type that cannot be encoded.
+        ValueError: If the object contains a circular reference.
+
+    Returns:
+        bytes: The encoded document.
+    """
+    out = bytearray(_MAGIC)
+    out.append(_VERSION)
+    strings: Dict[str, int] = {}
+    # Containers that are being encoded, by their id, and the iterators of
+    # their remaining elements (dictionaries alternate keys and values)
+    markers: Set[int] = set()
+    stack: List[Tuple[Iterator[KonObject], int]] = [(iter((object,)), 0)]
+    while stack:
+        for value in stack[-1][0]:
+            cls = value.__class__
+            if cls is str:
+                index = strings.get(value) # type: ignore
+                if index is None:
+                    strings[value] = len(strings) # type: ignore
+                    encoded = value.encode('utf-8', 'surrogatepass') # type: ignore
+                    if len(encoded) < 0x100:
+                        out += _TAGGED_U8.pack(_STR8, len(encoded))
+                    else:
+                        out += _TAGGED_U32.pack(_STR32, len(encoded))
+                    out += encoded
+                elif index < 0x100:
+                    out += _TAGGED_U8.pack(_REF8, index)
+                elif index < 0x10000:
+                    out += _TAGGED_U16.pack(_REF16, index)
+                else:
+                    out += _TAGGED_U32.pack(_REF32, index)
+            elif cls is bool:
+                out.append(_TRUE if value else _FALSE)
+            elif value is None:
+                out.append(_NONE)
+            elif isinstance(value, bool):
+                out.append(_TRUE if value else _FALSE)
+            elif isinstance(value, int):
+                if -0x80 <= value < 0x80:
+                    out += _TAGGED_INT8.pack(_INT8, value)
+                elif -0x80000000 <= value < 0x80000000:
+                    out += _TAGGED_INT32.pack(_INT32, value)
+                elif -0x8000000000000000 <= value < 0x8000000000000000:
+                    out += _TAGGED_INT64.pack(_INT64, value)
+                else:
+                    encoded = int(value).to_bytes(value.bit_length() // 8 + 1, 'little', signed=True)
+                    out += _TAGGED_U32.pack(_BIGINT, len(encoded))
+                    out += encoded
+            elif isinstance(value, float):
+                out += _TAGGED_FLOAT.pack(_FLOAT, value)
+            elif isinstance(value, str):
+                # A subclass, encoded as the str it is equal to
+                stack.append((iter((str(value),)), 0))
+                break
+            elif isinstance(value, (dict, list, tuple)):
+                marker = id(value)
+                if marker in markers:
+                    raise ValueError('circular reference detected')
+                markers.add(marker)
+                is_dict = isinstance(value, dict)
+                if len(value) < 0x100:
+                    out += _TAGGED_U8.pack(_DICT8 if is_dict else _LIST8, len(value))
+                else:
+                    out += _TAGGED_U32.pack(_DICT32 if is_dict else _LIST32, len(value))
+                items = itertools.chain.from_iterable(value.items()) if is_dict else iter(value) # type: ignore
+                stack.append((items, marker))
+                break
+            elif hasattr(value, 'tolist'):
+                # An array, encoded as the list of its elements
+                stack.append((iter((value.tolist(),)), 0))
+                break
+            else:
+                raise TypeError(f'Encoded value must be a {KonObject}, but found value is {value!r}')
+        else:
+            markers.discard(stack.pop()[1])
+    return bytes(out)
+
+
+def loads(data: Union[bytes, bytearray, memoryview]) -> KonObject:
+    """
+    Decodes a KONB document, see :mod:`kon.binary`.
+
+    The document is decoded in a single pass, nested lists and dictionaries
+    on an explicit stack instead of recursively.
+
+    Args:
+        data: The encoded document.
+
+    Raises:
+        ValueError: If `data` is not a valid KONB document.
+
+    Returns:
+        KonObject: The decoded object.
+    """
+    if not isinstance(data, bytes):
+        data = bytes(data)
+    if data[:len(_MAGIC)] != _MAGIC:
+        raise ValueError('not a KONB document')
+    if len(data) <= len(_MAGIC) or data[len(_MAGIC)] != _VERSION:
+        raise ValueError('unsupported KONB version')
+    try:
+        value, end = _decode(data, len(_MAGIC) + 1)
+    except (IndexError, struct.error):
+        raise ValueError('truncated or invalid KONB document') from None
+    if end != len(data):
+        raise ValueError(f'unexpected data after the KONB document at offset {end}')
+    return value
+
+
+def load_path(path: Union[str, 'os.PathLike[str]'], cache_path: Union[str, 'os.PathLike[str]', None] = None, **kwargs) -> KonObject:
+    """
+    Parses a Kon file like :func:`kon.load_path`, caching the result as a
+    KONB document next to it, which is decoded instead of parsing the file
+    again as long as the file does not change.
+
+    The cache is identified by the size and modification time of the file,
+    and by the parser options. When it is missing or out of date, the file
+    is parsed and the cache written again. A cache that can not be written
+    (e.g. in a read-only directory) is skipped silently.
+
+    Args:
+        path: The path of the UTF-8 encoded file.
+        cache_path: The path of the cache. Defaults to None, which means the
+            path of the file with a `.konb` extension instead of `.kon`, or
+            with `.konb` appended to any other extension.
+        **kwargs: Keyword arguments to be passed to the `KonParser`, except
+            for `numeric_lists`, as arrays are decoded as lists.
+
+    Raises:
+        OSError: If the file can not be read.
+        ValueError: If the file is invalid, or `numeric_lists` is given.
+        TypeError: If the file contains a type violation.
+
+    Returns:
+        KonObject: An object representing the parsed Kon data.
+    """
+    from . import load_path as parse_path
+
+    if kwargs.get('numeric_lists') is not None:
+        raise ValueError('numeric_lists can not be combined with a KONB cache')
+    path = os.fspath(path)
+    if cache_path is None:
+        cache_path = (path[:-len('.kon')] if path.endswith('.kon') else path) + '.konb'
+    else:
+        cache_path = os.fspath(cache_path)
+    stat = os.stat(path)
+    options = _options_digest(kwargs)
+    try:
+        with io.open(cache_path, 'rb') as file:
+            cached = file.read()
+        magic, size, mtime, digest = _CACHE_HEADER.unpack_from(cached)
+        if magic == _CACHE_MAGIC and (size, mtime, digest) == (stat.st_size, stat.st_mtime_ns, options):
+            return loads(memoryview(cached)[_CACHE_HEADER.size:])
+    except (OSError, ValueError, struct.error):
+        # Missing, unreadable or invalid, it is written again
+        pass
+
+    value = parse_path(path, **kwargs)
+    # Replaced in one step, so that a concurrent load never sees half of it
+    temporary = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with io.open(temporary, 'wb') as file:
+            file.write(_CACHE_HEADER.pack(_CACHE_MAGIC, stat.st_size, stat.st_mtime_ns, options))
+            file.write(dumps(value))
+        os.replace(temporary, cache_path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return value
+
+
+def _decode(data: bytes, pos: int) -> Tuple[KonObject, int]:
+    """Decodes the value at `pos`, returns it and the offset after it."""
+    strings: List[str] = []
+    # The open lists and dictionaries, with the number of values they still
+    # need (keys and values count separately for dictionaries), and the key
+    # whose value comes next
+    stack: List[List[Any]] = []
+    container: Any = None
+    remaining = 0
+    key: Any = _NOTHING
+    while True:
+        tag = data[pos]
+        if tag == _REF8:
+            value = strings[data[pos + 1]]
+            pos += 2
+        elif tag == _STR8:
+            end = pos + 2 + data[pos + 1]
+            if end > len(data):
+                raise IndexError(end)
+            value = str(data[pos + 2:end], 'utf-8', 'surrogatepass')
+            strings.append(value)
+            pos = end
+        elif tag == _INT8:
+            value = data[pos + 1]
+            if value >= 0x80:
+                value -= 0x100
+            pos += 2
+        elif tag == _TRUE:
+            value = True
+            pos += 1
+        elif tag == _FALSE:
+            value = False
+            pos += 1
+        elif tag == _NONE:
+            value = None
+            pos += 1
+        elif tag == _FLOAT:
+            value = _F64.unpack_from(data, pos + 1)[0]
+            pos += 9
+        elif tag == _INT32:
+            value = _I32.unpack_from(data, pos + 1)[0]
+            pos += 5
+        elif tag == _REF16:
+            value = strings[_U16.unpack_from(data, pos + 1)[0]]
+            pos += 3
+        elif tag == _LIST8 or tag == _DICT8 or tag == _LIST32 or tag == _DICT32:
+            if tag == _LIST8 or tag == _DICT8:
+                count = data[pos + 1]
+                pos += 2
+            else:
+                count = _U32.unpack_from(data, pos + 1)[0]
+                pos += 5
+            is_dict = tag == _DICT8 or tag == _DICT32
+            value = {} if is_dict else []
+            if count:
+                stack.append([container, remaining, key])
+                container = value
+                remaining = count * 2 if is_dict else count
+                key = _NOTHING
+                continue
+        elif tag == _STR32:
+            length = _U32.unpack_from(data, pos + 1)[0]
+            end = pos + 5 + length
+            if end > len(data):
+                raise IndexError(end)
+            value = str(data[pos + 5:end], 'utf-8', 'surrogatepass')
+            strings.append(value)
+            pos = end
+        elif tag == _REF32:
+            value = strings[_U32.unpack_from(data, pos + 1)[0]]
+            pos += 5
+        elif tag == _INT64:
+            value = _I64.unpack_from(data, pos + 1)[0]
+            pos += 9
+        elif tag == _BIGINT:
+            length = _U32.unpack_from(data, pos + 1)[0]
+            end = pos + 5 + length
+            if end > len(data):
+                raise IndexError(end)
+            value = int.from_bytes(data[pos + 5:end], 'little', signed=True)
+            pos = end
+        else:
+            raise ValueError(f'invalid KONB tag {tag:#04x} at offset {pos}')
+
+        # Adds the value to its container, closing every container it completes
+        while True:
+            if container is None:
+                return value, pos
+            remaining -= 1
+            if container.__class__ is list:
+                container.append(value)
+            elif key is _NOTHING:
+                key = value
+            else:
+                container[key] = value
+                key = _NOTHING
+            if remaining:
+                break
+            value = container
+            container, remaining, key = stack.pop()
+
+
+def _options_digest(options: Dict[str, Any]) -> bytes:
+    """Identifies the parser options a cache was made with."""
+    return hashlib.blake2b(repr(sorted(options.items())).encode('utf-8'), digest_size=8).digest()
+
+
+__all__ = ('dumps', 'loads', 'load_path')
@@ -0,0 +1,288 @@
+"""
+Caching of parsed Kon files and strings, see :class:`CachedLoader`.
+"""
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from enum import Enum, auto
+from typing import Any, List, NamedTuple, Optional, Tuple, Union
+
+from .parser import KonParser
+from .types import KonObject
+
+
+class CachedResults(Enum):
+    """
+    Specifies how a :class:`CachedLoader` hands out its cached results, so
+    that callers can not corrupt them.
+
+    Attributes:
+        FROZEN: Return the cached result itself, deeply frozen: dictionaries
+            are :class:`FrozenDict` and lists, as well as the arrays of
+            `numeric_lists`, are tuples. Cheapest, as nothing is copied on
+            a hit.
+        COPIED: Return a deep copy of the cached result on every load, made
+            of plain dictionaries and lists.
+    """
+    FROZEN = auto()
+    COPIED = auto()
+
+
+class FrozenDict(dict):
+    """A dictionary that can not be changed, see :attr:`CachedResults.FROZEN`."""
+
+    def _immutable(self, *args: Any, **kwargs: Any) -> Any:
+        raise TypeError(f'{type(self).__name__} is immutable')
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return type(self), (dict(self),)
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'stat', 'digest')
+
+    def __init__(self, value: KonObject, size: int, stat: Optional[Tuple[int, int]], digest: bytes) -> None:
+        self.value = value
+        # The size of the source, what `max_bytes` limits
+        self.size = size
+        # (mtime_ns, size) of a file
+        self.stat = stat
+        self.digest = digest
+
+
+class CacheStats(NamedTuple):
+    """Counters of a :class:`CachedLoader`, see :meth:`CachedLoader.stats`."""
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes: int
+
+
+class CachedLoader:
+    """
+    Loads Kon files and strings, caching the parsed results.
+
+    Files are cached by their path and revalidated by their modification
+    time and size, so loading an unchanged file again only costs a `stat()`.
+    When those changed, the content is hashed, and it is only parsed again
+    if it changed too. Strings are cached by the hash of their content.
+
+    The least recently used results are evicted once there are more than
+    `max_entries` of them, or once their sources are larger than
+    `max_bytes` in total. A result larger than `max_bytes` by itself is
+    not cached at all.
+
+    A loader is safe to share between threads, but a source may be parsed
+    by more than one of them at the same time.
+
+    Attributes:
+        max_entries (int | None): The maximum number of cached results, or
+            None for no limit.
+        max_bytes (int | None): The maximum total size of the sources of
+            the cached results, or None for no limit.
+        results (CachedResults): How results are handed out.
+    """
+    max_entries: Optional[int]
+    max_bytes: Optional[int]
+    results: CachedResults
+
+    def __init__(self, *, max_entries: Optional[int] = 128, max_bytes: Optional[int] = None, results: CachedResults = CachedResults.FROZEN, **kwargs) -> None:
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_entries: The maximum number of cached results. Defaults to
+                128.
+            max_bytes: The maximum total size of the sources of the cached
+                results. Defaults to None, which means no limit.
+            results: How results are handed out. Defaults to
+                CachedResults.FROZEN.
+            **kwargs: Keyword arguments to be passed to the `KonParser`.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.results = results
+        self._options = kwargs
+        self._entries: 'OrderedDict[Union[str, bytes], _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def load_path(self, path: Union[str, 'os.PathLike[str]']) -> KonObject:
+        """
+        Parses a Kon-formatted file by its path, see :func:`kon.load_path`,
+        unless it was cached and did not change since.
+
+        Raises:
+            OSError: If the file can not be read.
+            ValueError: If the file is invalid.
+            TypeError: If the file contains a type violation.
+        """
+        return self._result(self._load_path_entry(path).value)
+
+    def _load_path_entry(self, path: Union[str, 'os.PathLike[str]']) -> _Entry:
+        """Returns the cache entry of a file, see :meth:`load_path`."""
+        key = os.path.abspath(os.fspath(path))
+        stat = os.stat(key)
+        entry = self._lookup(key, (stat.st_mtime_ns, stat.st_size))
+        if entry is not None:
+            return entry
+
+        with open(key, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            try:
+                data: Any = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Empty files, pipes and the like
+                data = file.read()
+            try:
+                digest = hashlib.blake2b(data).digest()
+                entry = self._lookup(key, None, digest)
+                if entry is None:
+                    value = self._prepare(KonParser.from_buffer(data, **self._options).parse())
+                    entry = _Entry(value, stat.st_size, None, digest)
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+        entry.stat = (stat.st_mtime_ns, stat.st_size)
+        self._store(key, entry)
+        return entry
+
+    def loads(self, source: Union[str, bytes, bytearray]) -> KonObject:
+        """
+        Parses a Kon-formatted string, bytes, or bytearray, see
+        :func:`kon.loads`, unless the same source was cached.
+
+        Raises:
+            ValueError: If the source is invalid.
+            TypeError: If the source is not a str, bytes, or bytearray, or
+                contains a type violation.
+        """
+        if isinstance(source, str):
+            data: Union[bytes, bytearray] = source.encode('utf-8', 'surrogatepass')
+        elif isinstance(source, (bytes, bytearray)):
+            data = source
+        else:
+            raise TypeError(f'source must be of type {str}, {bytes} or {bytearray}')
+        # Strings and bytes with the same content parse the same
+        key = hashlib.blake2b(data).digest()
+        entry = self._lookup(key, None)
+        if entry is None:
+            value = self._prepare(KonParser(source, **self._options).parse())
+            entry = _Entry(value, len(data), None, key)
+            self._store(key, entry)
+        return self._result(entry.value)
+
+    def stats(self) -> CacheStats:
+        """Returns the hit, miss and eviction counters, and the current size of the cache."""
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._bytes)
+
+    def invalidate(self, path: Union[str, 'os.PathLike[str]']) -> None:
+        """Forgets the cached result of a file."""
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(os.fspath(path)), None)
+            if entry is not None:
+                self._bytes -= entry.size
+
+    def clear(self) -> None:
+        """Forgets all cached results. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _lookup(self, key: Union[str, bytes], stat: Optional[Tuple[int, int]], digest: Optional[bytes] = None) -> Optional[_Entry]:
+        """
+        Returns the entry of `key` if it is still valid: if its file has the
+        same `stat`, or its content has the same `digest` when given.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry.stat == stat if digest is None else entry.digest == digest):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            if digest is not None or stat is None:
+                self._misses += 1
+            return None
+
+    def _store(self, key: Union[str, bytes], entry: _Entry) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            if self.max_bytes is not None and entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > 0 and (
+                (self.max_entries is not None and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._evictions += 1
+
+    def _prepare(self, value: KonObject) -> KonObject:
+        """Turns a freshly parsed result into the cached one."""
+        if self.results is CachedResults.FROZEN:
+            return _rebuild(value, FrozenDict, tuple)
+        return value
+
+    def _result(self, value: KonObject) -> KonObject:
+        """Turns a cached result into the one handed out."""
+        if self.results is CachedResults.COPIED:
+            return _rebuild(value, dict, list)
+        return value
+
+
+def _rebuild(value: KonObject, dict_type: Any, list_type: Any) -> KonObject:
+    """
+    Deeply copies the dictionaries and lists (or tuples) of `value` into
+    `dict_type` and `list_type`. Like the parser, this uses an explicit
+    stack instead of recursion. The arrays of `numeric_lists` are copied
+    into `list_type` too, as they can be changed in place.
+    """
+    if not isinstance(value, (dict, list, tuple)):
+        if hasattr(value, 'tolist'):
+            return list_type(value.tolist())
+        return value
+    # Frames are [is_dict, items, copied items, key of the child being copied]
+    stack: List[List[Any]] = [_rebuild_frame(value)]
+    while True:
+        frame = stack[-1]
+        is_dict, items, copied = frame[0], frame[1], frame[2]
+        for item in items:
+            child = item[1] if is_dict else item
+            if isinstance(child, (dict, list, tuple)):
+                frame[3] = item[0] if is_dict else None
+                stack.append(_rebuild_frame(child))
+                break
+            if hasattr(child, 'tolist'):
+                child = list_type(child.tolist())
+                item = (item[0], child) if is_dict else child
+            copied.append(item)
+        else:
+            stack.pop()
+            result = dict_type(copied) if is_dict else list_type(copied)
+            if not stack:
+                return result
+            parent = stack[-1]
+            parent[2].append((parent[3], result) if parent[0] else result)
+
+
+def _rebuild_frame(value: Union[dict, list, tuple]) -> List[Any]:
+    if isinstance(value, dict):
+        return [True, iter(value.items()), [], None]
+    return [False, iter(value), [], None]
+
+
+__all__ = ('CachedLoader', 'CachedResults', 'CacheStats', 'FrozenDict')
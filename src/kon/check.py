@@ -0,0 +1,200 @@
+"""
+Checking Kon sources without keeping their values, see :func:`validate`,
+and many files at once, see :func:`check_paths` and `python -m kon check`.
+"""
+import os
+import re
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .parallel import _available_cpus, _batches, _process_pool
+from .parser import KonParser
+from .tokenizer import create_tokenizer
+
+# Where an error names its position
+_AT_INDEX = re.compile(r' at index (\d+)')
+# A line that starts a top-level entry, where checking resumes after an
+# error, see `kon.parallel`
+_LINE_START = re.compile(r'\n(?=[^\s#})=,])')
+
+
+class Diagnostic(NamedTuple):
+    """An error found by :func:`validate`, at a 1-based `line` and `column`, and a 0-based `index`."""
+    line: int
+    column: int
+    index: int
+    message: str
+
+    def __str__(self) -> str:
+        return f'{self.line}:{self.column}: {self.message}'
+
+
+def validate(source: Union[str, bytes, bytearray], **kwargs) -> List[Diagnostic]:
+    """
+    Checks a Kon-formatted string, bytes, or bytearray, like `kon.loads`
+    does, but without keeping its values, and returns all of its errors.
+
+    Every check of the parser runs, e.g. for unset keys, invalid escapes
+    and unexpected characters, but lists and dictionaries are dropped as
+    soon as they were checked. After an error, checking resumes at the next
+    line that starts with a key or a brace in its first column, so an error
+    in a nested value may be followed by errors that only stem from it.
+
+    It takes about as long as `kon.loads`: nearly all of the time goes to
+    tokenizing and checking the structure, which both need, and converting
+    or building the values costs next to nothing. What it saves is memory.
+
+    Args:
+        source: The Kon-formatted data to be checked.
+        **kwargs: Additional keyword arguments to be passed to the
+            `KonParser`, which change what is valid, like `max_depth` or
+            `duplicate_keys`. Options that only change the parsed values,
+            like `intern`, are ignored.
+
+    Raises:
+        TypeError: If the source is not a str, bytes, or bytearray.
+        ValueError: If the source is not valid UTF-8.
+
+    Returns:
+        list[Diagnostic]: The errors, in the order of the source, or an
+        empty list if it is valid.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = source.decode('utf-8')
+    elif not isinstance(source, str):
+        raise TypeError(f'source must be of type {str}, {bytes} or {bytearray}')
+    options = {key: value for key, value in kwargs.items() if key in ('multiline_string_behaviour', 'allow_implicit_dicts', 'max_depth', 'duplicate_keys')}
+    if source.strip() == '':
+        return [Diagnostic(1, 1, 0, 'empty source not allowed')]
+    parser = KonParser(source, **options)
+    parser._discard = True
+    diagnostics: List[Diagnostic] = []
+    start = 0
+    while True:
+        tokens = create_tokenizer(source, parser.multiline_string_behaviour, start)
+        try:
+            next(parser._run(stream=False, tokens=tokens))
+        except StopIteration:
+            return diagnostics
+        except (ValueError, TypeError) as error:
+            message = str(error)
+            if message.startswith('unset key '):
+                message = _unset_key(parser, source, start) or message
+            match = _AT_INDEX.search(message)
+            if match is not None:
+                index = int(match.group(1))
+                message = message[:match.start()] + message[match.end():]
+            else:
+                index = min(tokens.last_start(), len(source))
+            diagnostics.append(_diagnostic(source, index, message))
+            resume = _LINE_START.search(source, max(index, start))
+            if resume is None:
+                return diagnostics
+            start = resume.end()
+
+
+def _unset_key(parser: KonParser, source: str, start: int) -> Optional[str]:
+    """
+    Checks the source from `start` again, keeping the values, for the
+    message of an unset key error, which shows the values before the key.
+    """
+    parser._discard = False
+    try:
+        next(parser._run(stream=False, tokens=create_tokenizer(source, parser.multiline_string_behaviour, start)))
+    except (ValueError, TypeError) as error:
+        return str(error)
+    except StopIteration:
+        pass
+    finally:
+        parser._discard = True
+    return None
+
+
+def _diagnostic(source: str, index: int, message: str) -> Diagnostic:
+    line_start = source.rfind('\n', 0, index) + 1
+    return Diagnostic(source.count('\n', 0, index) + 1, index - line_start + 1, index, message)
+
+
+def check_paths(
+    paths: Sequence[Union[str, 'os.PathLike[str]']],
+    *,
+    workers: Optional[int] = None,
+    executor: Union[str, Executor] = 'process',
+    batch_bytes: int = 1 << 20,
+    **kwargs,
+) -> Iterator[Tuple[str, List[Diagnostic]]]:
+    """
+    Checks many Kon-formatted files in parallel, see :func:`validate`.
+
+    The files are handed to the workers in batches, like by
+    :func:`kon.load_many`, and the results are yielded in the order of
+    `paths`, a batch at a time. A file that can not be read or decoded has
+    a single diagnostic at its start.
+
+    Args:
+        paths: The paths of the UTF-8 encoded files.
+        workers: The number of workers. Defaults to None, which means one
+            per available CPU. With a single worker, the files are checked
+            in this process, without an executor.
+        executor: `"process"` for a process pool, `"thread"` for a thread
+            pool, or an executor to submit the batches to. Defaults to
+            `"process"`.
+        batch_bytes: The total size of the files in a batch. Defaults to
+            1 MiB.
+        **kwargs: Additional keyword arguments to be passed to
+            :func:`validate`.
+
+    Raises:
+        ValueError: If `workers` is less than 1, or `executor` is not a known
+            kind.
+
+    Returns:
+        Iterator[tuple]: The `(path, diagnostics)` pairs of the files.
+    """
+    names = [os.fspath(path) for path in paths]
+    if workers is None:
+        workers = _available_cpus()
+    if workers < 1:
+        raise ValueError(f'workers must be at least 1, not {workers}')
+    if not isinstance(executor, Executor) and executor not in ('process', 'thread'):
+        raise ValueError(f'executor must be "process", "thread" or an Executor, not {executor!r}')
+    return _check(names, workers, executor, batch_bytes, kwargs)
+
+
+def _check(names: List[str], workers: int, executor: Union[str, Executor], batch_bytes: int, options: Dict[str, Any]) -> Iterator[Tuple[str, List[Diagnostic]]]:
+    if workers == 1 and not isinstance(executor, Executor):
+        yield from zip(names, _check_batch(names, options))
+        return
+    if isinstance(executor, Executor):
+        pool = executor
+    elif executor == 'process':
+        pool = _process_pool(workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    futures = []
+    try:
+        futures = [(start, pool.submit(_check_batch, names[start:end], options)) for start, end in _batches(names, workers, batch_bytes)]
+        for start, future in futures:
+            yield from zip(names[start:], future.result())
+    finally:
+        for _, future in futures:
+            future.cancel()
+        if pool is not executor:
+            pool.shutdown()
+
+
+def _check_batch(names: List[str], options: Dict[str, Any]) -> List[List[Diagnostic]]:
+    """Checks a batch of files in a worker."""
+    results = []
+    for name in names:
+        try:
+            with open(name, 'rb') as file:
+                source = file.read().decode('utf-8')
+        except (OSError, UnicodeDecodeError) as error:
+            results.append([Diagnostic(1, 1, 0, str(error))])
+            continue
+        results.append(validate(source, **options))
+    return results
+
+
+__all__ = ('Diagnostic', 'validate', 'check_paths')
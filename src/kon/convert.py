@@ -0,0 +1,347 @@
+"""
+Streaming conversion between Kon and JSON or NDJSON, see :func:`kon_to_json`
+and :func:`json_to_kon`, and `python -m kon convert`.
+
+Both directions stream by top-level entry: an entry is converted and
+written as soon as it was parsed, and dropped afterwards, so memory use
+grows with the largest top-level entry instead of the whole document. A
+Kon document is read with :func:`kon.iterload`, and written with
+:func:`kon.dumps`, an entry at a time. A JSON object is decoded a key and a value at a time,
+and NDJSON a line at a time.
+"""
+import codecs
+import json
+import re
+import time
+from json.decoder import scanstring
+from typing import Any, Callable, Iterator, List, NamedTuple, Tuple
+
+from . import dumps, iterload
+from .types import KonObject
+
+# Compact, which NDJSON lines need to be, and strict, as `Infinity` and
+# `NaN` are not JSON
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+# The start of a key in a JSON object, the separator after it, and what
+# follows a value
+_KEY = re.compile(r'[ \t\n\r]*"')
+_COLON = re.compile(r'[ \t\n\r]*:[ \t\n\r]*')
+_NEXT = re.compile(r'[ \t\n\r]*([,}])')
+
+
+class ConversionStats(NamedTuple):
+    """What a conversion did, see :func:`kon_to_json` and :func:`json_to_kon`."""
+    entries: int
+    """The number of top-level entries converted."""
+    read: int
+    """The number of bytes (or characters, from a text file) read."""
+    written: int
+    """The number of characters written."""
+    seconds: float
+    """How long the conversion took."""
+
+    @property
+    def throughput(self) -> float:
+        """The input read per second, in MB (10^6 bytes)."""
+        return self.read / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+
+class _CountingReader:
+    """Counts what is read from `file`."""
+    __slots__ = ('file', 'count')
+
+    def __init__(self, file: Any) -> None:
+        self.file = file
+        self.count = 0
+
+    def read(self, size: int = -1) -> Any:
+        data = self.file.read(size)
+        self.count += len(data)
+        return data
+
+
+class _CountingWriter:
+    """Counts what is written to `file`, collecting small writes into chunks of about `chunk_size` characters."""
+    __slots__ = ('file', 'count', 'chunk_size', '_pending', '_size')
+
+    def __init__(self, file: Any, chunk_size: int) -> None:
+        self.file = file
+        self.count = 0
+        self.chunk_size = chunk_size
+        self._pending: List[str] = []
+        self._size = 0
+
+    def write(self, data: str) -> None:
+        self._pending.append(data)
+        self._size += len(data)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            data = ''.join(self._pending)
+            self._pending.clear()
+            self._size = 0
+            self.count += len(data)
+            self.file.write(data)
+
+
+def kon_to_json(source: Any, target: Any, *, ndjson: bool = False, chunk_size: int = 1 << 16, **kwargs) -> ConversionStats:
+    """
+    Converts a Kon document to JSON, an entry at a time.
+
+    The top-level value must be a dictionary. Its entries are written in
+    order, as a JSON object, or as an NDJSON line each with `ndjson`. A key
+    that repeats is written again, so the last one wins when the JSON is
+    decoded, as it does in Kon. Keys that are not strings are converted
+    like `json.dumps` does. Infinite and NaN floats, which JSON has no
+    literal for, are an error instead of being written as `Infinity` or
+    `NaN`.
+
+    Args:
+        source: A text or binary file, binary files are decoded as UTF-8.
+        target: A text file, or any object with a `write` method.
+        ndjson: If True, writes a line with an object of a single entry per
+            top-level entry. Defaults to False.
+        chunk_size: How much to read from `source`, and to collect before
+            writing to `target`, at a time. Defaults to 65536.
+        **kwargs: Additional keyword arguments to be passed to
+            :func:`kon.iterload`.
+
+    Raises:
+        ValueError: If the source is invalid, its top-level value is not a
+            dictionary, or it contains an infinite or NaN float.
+        TypeError: If the source contains a type violation.
+
+    Returns:
+        ConversionStats: What was converted.
+    """
+    started = time.perf_counter()
+    reader = _CountingReader(source)
+    writer = _CountingWriter(target, chunk_size)
+    write = writer.write
+    encode = _ENCODER.encode
+    entries = 0
+    if not ndjson:
+        write('{')
+    for key, value in iterload(reader, chunk_size=chunk_size, **kwargs):
+        try:
+            entry = encode({key: value})
+        except ValueError:
+            raise ValueError(f'the value of {key!r} contains an infinite or NaN float, which JSON can not represent') from None
+        if ndjson:
+            write(entry + '\n')
+        else:
+            # Without its braces, to put it into the object
+            write(entry[1:-1] if not entries else ',' + entry[1:-1])
+        entries += 1
+    if not ndjson:
+        write('}\n')
+    writer.flush()
+    return ConversionStats(entries, reader.count, writer.count, time.perf_counter() - started)
+
+
+def json_to_kon(source: Any, target: Any, *, ndjson: bool = False, chunk_size: int = 1 << 16, pretty: bool = False, indent_width: int = 2) -> ConversionStats:
+    """
+    Converts JSON or NDJSON to Kon, an entry at a time.
+
+    The entries of a top-level JSON object, or of the object on each NDJSON
+    line, become top-level Kon entries, each on its own line. Any other
+    top-level JSON value is converted as a whole.
+
+    Args:
+        source: A text or binary file, binary files are decoded as UTF-8.
+        target: A text file, or any object with a `write` method.
+        ndjson: If True, reads an object per line, empty lines are skipped.
+            Defaults to False.
+        chunk_size: How much to read from `source`, and to collect before
+            writing to `target`, at a time. Defaults to 65536.
+        pretty: If True, formats the entries with newlines and indentation,
+            see :func:`kon.dumps`. Defaults to False.
+        indent_width: The number of spaces for each indentation level when
+            `pretty` is True. Defaults to 2.
+
+    Raises:
+        ValueError: If the source is invalid JSON, or an NDJSON line is not
+            an object.
+
+    Returns:
+        ConversionStats: What was converted.
+    """
+    started = time.perf_counter()
+    reader = _CountingReader(source)
+    writer = _CountingWriter(target, chunk_size)
+    read = _text_reader(reader, chunk_size)
+    entries = 0
+    if ndjson:
+        values = _json_lines(read)
+    else:
+        values = _json_document(read)
+    write = writer.write
+    for entry, value in values:
+        # An entry is small enough to be held, and `dumps` is much faster
+        # than writing what `iterdump` yields
+        if entry:
+            write(dumps({value[0]: value[1]}, pretty=pretty, indent_width=indent_width) + '\n')
+            entries += 1
+        else:
+            write(dumps(value, pretty=pretty, indent_width=indent_width) + '\n')
+    writer.flush()
+    return ConversionStats(entries, reader.count, writer.count, time.perf_counter() - started)
+
+
+def _text_reader(file: Any, chunk_size: int) -> Callable[[int], str]:
+    """Returns a function that reads at least `chunk_size` (or the given size) characters from `file`, decoding bytes as UTF-8."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def read(size: int) -> str:
+        while True:
+            data = file.read(max(size, chunk_size))
+            if not isinstance(data, (bytes, bytearray)):
+                return data
+            text = decoder.decode(data, final=not data)
+            # Only empty at the end, not when a chunk ends within a character
+            if text or not data:
+                return text
+
+    return read
+
+
+def _json_lines(read: Callable[[int], str]) -> Iterator[Tuple[bool, Any]]:
+    """Yields the entries of the object on each line, as `(True, (key, value))`."""
+    pending = ''
+    number = 0
+    while True:
+        data = read(0)
+        lines = (pending + data).split('\n')
+        pending = lines.pop() if data else ''
+        for line in lines:
+            number += 1
+            if line.strip() == '':
+                continue
+            value = json.loads(line)
+            if not isinstance(value, dict):
+                raise ValueError(f'line {number} is not a JSON object, but a(n) {type(value).__name__}')
+            for pair in value.items():
+                yield True, pair
+        if not data:
+            return
+
+
+class _JsonReader:
+    """Decodes the values of a JSON document one at a time, reading it as needed."""
+    __slots__ = ('_read', '_buffer', '_position', '_offset', '_done', '_decoder')
+
+    def __init__(self, read: Callable[[int], str]) -> None:
+        self._read = read
+        self._buffer = ''
+        self._position = 0
+        # Where the buffer starts in the document, for errors
+        self._offset = 0
+        self._done = False
+        self._decoder = json.JSONDecoder()
+
+    def _more(self) -> bool:
+        """Reads more of the document, dropping what was decoded, returns False at its end."""
+        if self._done:
+            return False
+        # At least as much as is left, so that a large value is read in
+        # doubling chunks
+        data = self._read(len(self._buffer) - self._position)
+        if not data:
+            self._done = True
+            return False
+        self._offset += self._position
+        self._buffer = self._buffer[self._position:] + data
+        self._position = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or `''` at the end."""
+        while True:
+            buffer = self._buffer
+            position = self._position
+            while position < len(buffer) and buffer[position] in ' \t\n\r':
+                position += 1
+            self._position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self._more():
+                return ''
+
+    def expect(self, character: str) -> None:
+        found = self.peek()
+        if found != character:
+            raise ValueError(f'expected {character!r} at index {self._offset + self._position}, but found {found!r}')
+        self._position += 1
+
+    def entry(self) -> Tuple[str, KonObject, bool]:
+        """Decodes a `key: value` pair of an object and what follows it, returns whether that was the object's end."""
+        # Decoded from the buffer as a whole where it can be, and piece by
+        # piece, reading more, where it is cut or invalid
+        buffer = self._buffer
+        match = _KEY.match(buffer, self._position)
+        if match is not None:
+            try:
+                key, end = scanstring(buffer, match.end())
+                match = _COLON.match(buffer, end)
+                if match is not None:
+                    value, end = self._decoder.raw_decode(buffer, match.end())
+                    # Not at the end of the buffer, where a number might continue
+                    match = _NEXT.match(buffer, end)
+                    if match is not None:
+                        self._position = match.end()
+                        return key, value, match.group(1) == '}'
+            except json.JSONDecodeError:
+                pass
+        key = self.value()
+        if not isinstance(key, str):
+            raise ValueError(f'expected a string key, but found {key!r}')
+        self.expect(':')
+        value = self.value()
+        if self.peek() == '}':
+            self.expect('}')
+            return key, value, True
+        self.expect(',')
+        return key, value, False
+
+    def value(self) -> KonObject:
+        """Decodes the value after whitespace."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError as error:
+                # Maybe cut by the end of the buffer
+                if self._more():
+                    continue
+                raise ValueError(f'{error.msg} at index {self._offset + error.pos}') from None
+            # A number might continue in what was not read yet
+            if end == len(self._buffer) and self._more():
+                continue
+            self._position = end
+            return value
+
+
+def _json_document(read: Callable[[int], str]) -> Iterator[Tuple[bool, Any]]:
+    """
+    Yields the entries of a top-level JSON object as `(True, (key, value))`,
+    or any other top-level value as `(False, value)`.
+    """
+    reader = _JsonReader(read)
+    if reader.peek() != '{':
+        yield False, reader.value()
+    else:
+        reader.expect('{')
+        if reader.peek() == '}':
+            reader.expect('}')
+        else:
+            last = False
+            while not last:
+                key, value, last = reader.entry()
+                yield True, (key, value)
+    if reader.peek() != '':
+        raise ValueError(f'extra data at index {reader._offset + reader._position}')
+
+
+__all__ = ('ConversionStats', 'kon_to_json', 'json_to_kon')
@@ -0,0 +1,450 @@
+"""
+Sidecar offset indices for random access into large Kon files, see
+:func:`build` and :func:`open`.
+
+An index maps the key path of every top-level entry of a file, e.g.
+`("node", "n123")` for `node n123 { ... }`, to the byte offset and length
+of that entry. A lookup binary searches the index and parses only the entry
+it found, instead of the whole file.
+
+The index is written next to the file, as `<path>.konidx` by default. It is
+a header (a magic number, the size and modification time of the file, and
+the number of entries), a table of fixed-size records sorted by key path,
+and the encoded key paths the records point to. It is memory mapped, so
+opening it does not read it.
+"""
+import io
+import itertools
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .parser import KonParser
+from .query import Path, _Segment, _split
+from .types import KonObject
+
+_MAGIC = b'KONIDX\x00\x01'
+# The magic number, the size and the modification time (in nanoseconds) of
+# the file, and the number of entries
+_HEADER = struct.Struct('<8sQqQ')
+# The offset and the length of the encoded key path (relative to the key
+# paths), and the byte offset and length of the entry in the file
+_RECORD = struct.Struct('<QIQQ')
+
+_KEY_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+_NOTHING: Any = object()
+
+# Files are scanned this many bytes at a time, see `_scan_file`
+_SCAN_CHUNK = 1 << 22
+# A line that may start a top-level entry, see `kon.parallel`
+_LINE_START = re.compile(rb'\n(?=[^\s#})=,])')
+
+
+class KonIndex:
+    """
+    An open index of a Kon file, see :func:`open`.
+
+    The index follows the entries of the file as :func:`kon.iterload` yields
+    them, not the merged result of :func:`kon.loads`: `node n1 {...}` and
+    `node n2 {...}` are both found, although the second one replaces the
+    first in `kon.loads`. When the same key path is written more than once,
+    the last entry wins.
+
+    The file is checked for changes on every lookup. When its size or
+    modification time changed, the index is rebuilt first.
+
+    An index is safe to share between threads.
+
+    Attributes:
+        path (str): The indexed file.
+        index_path (str): The sidecar index.
+    """
+    path: str
+    index_path: str
+
+    def __init__(self, path: str, index_path: str, options: Dict[str, Any]) -> None:
+        self.path = path
+        self.index_path = index_path
+        self._options = options
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._stat: Tuple[int, int] = (-1, 0)
+        self._count = 0
+
+    def get(self, key: Path, default: Any = _NOTHING) -> KonObject:
+        """
+        Returns the value at `key`, parsing only the entry it is in.
+
+        `key` is a path as for :func:`kon.extract`, without globs: the keys
+        of an entry (e.g. `"node.n123"`), optionally followed by keys and
+        list indices within its value (e.g. `"node.n123.ports.0"`). The
+        leading keys of entries (e.g. `"node"`) give a dictionary of all of
+        the entries they lead to.
+
+        Raises:
+            KeyError: If there is no such value and no `default` was given.
+            OSError: If the file or the index can not be read.
+            ValueError: If the entry is invalid.
+            TypeError: If the entry contains a type violation.
+        """
+        found, value = self._find(key)
+        if found:
+            return value
+        if default is _NOTHING:
+            raise KeyError(key)
+        return default
+
+    def __contains__(self, key: Path) -> bool:
+        return self._find(key)[0]
+
+    def __len__(self) -> int:
+        """Returns the number of indexed key paths."""
+        return self._count
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        """Yields the indexed key paths, in the order of the index."""
+        with self._lock:
+            mapped = self._map
+            assert mapped is not None
+            keys = _HEADER.size + self._count * _RECORD.size
+            encoded = [
+                mapped[keys + key_offset:keys + key_offset + key_length]
+                for key_offset, key_length, _, _ in _RECORD.iter_unpack(mapped[_HEADER.size:keys])
+            ]
+        for key in encoded:
+            yield tuple(json.loads(key))
+
+    def close(self) -> None:
+        """Unmaps the index."""
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+    def __enter__(self) -> 'KonIndex':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def _find(self, key: Path) -> Tuple[bool, KonObject]:
+        """Returns whether there is a value at `key`, and the value, see :meth:`get`."""
+        segments = _split(key)
+        with io.open(self.path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self._refresh((stat.st_size, stat.st_mtime_ns))
+            # The longest indexed key path wins, the rest of `key` leads into its value
+            for length in range(len(segments), 0, -1):
+                for keys in itertools.product(*(segment.keys for segment in segments[:length])):
+                    span = self._lookup(_encode(keys))
+                    if span is None:
+                        continue
+                    file.seek(span[0])
+                    found, value = _follow(KonParser(file.read(span[1]), **self._options).parse(), keys, segments[length:])
+                    if found:
+                        return True, value
+                if length == len(segments):
+                    # Or `key` leads to entries with longer key paths, e.g. `a` to `a b = 1`
+                    for keys in itertools.product(*(segment.keys for segment in segments)):
+                        found, value = self._gather(file, keys)
+                        if found:
+                            return True, value
+        return False, None
+
+    def _gather(self, file: Any, keys: Tuple[Any, ...]) -> Tuple[bool, KonObject]:
+        """Returns whether there are entries whose key paths start with `keys`, and a dictionary of their values."""
+        # The encoded key paths that start with `keys` follow each other in the index
+        records = self._prefixed(_encode(keys)[:-1] + b',')
+        if not records:
+            return False, None
+        result: Dict[Any, Any] = {}
+        # In the order of the file, the last value of a key wins
+        for encoded, offset, length in sorted(records, key=lambda record: record[1]):
+            path = tuple(json.loads(encoded))
+            file.seek(offset)
+            found, value = _follow(KonParser(file.read(length), **self._options).parse(), path, [])
+            if not found:
+                continue
+            target = result
+            for key in path[len(keys):-1]:
+                if not isinstance(target.get(key), dict):
+                    target[key] = {}
+                target = target[key]
+            target[path[-1]] = value
+        return True, result
+
+    def _refresh(self, stat: Tuple[int, int]) -> None:
+        """Maps the index, rebuilding it first if it is missing, invalid or out of date for a file with `stat`."""
+        with self._lock:
+            if self._map is not None and self._stat == stat:
+                return
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            mapped = _map(self.index_path)
+            header = _header(mapped)
+            if header is None or header[1:] != stat:
+                if mapped is not None:
+                    mapped.close()
+                build(self.path, self.index_path, **self._options)
+                mapped = _map(self.index_path)
+                header = _header(mapped)
+                if header is None:
+                    raise ValueError(f'invalid index {self.index_path!r}')
+            self._map = mapped
+            # A file changed while it was indexed is indexed again on the next lookup
+            self._stat = header[1:]
+            self._count = header[0]
+
+    def _lookup(self, encoded: bytes) -> Optional[Tuple[int, int]]:
+        """Binary searches the records for an encoded key path, returns the offset and the length of its entry."""
+        with self._lock:
+            mapped = self._map
+            assert mapped is not None
+            keys = _HEADER.size + self._count * _RECORD.size
+            low, high = 0, self._count
+            while low < high:
+                middle = (low + high) // 2
+                key_offset, key_length, offset, length = _RECORD.unpack_from(mapped, _HEADER.size + middle * _RECORD.size)
+                key = mapped[keys + key_offset:keys + key_offset + key_length]
+                if key < encoded:
+                    low = middle + 1
+                elif key > encoded:
+                    high = middle
+                else:
+                    return offset, length
+        return None
+
+    def _prefixed(self, prefix: bytes) -> List[Tuple[bytes, int, int]]:
+        """Returns the encoded key path, the offset and the length of every entry whose encoded key path starts with `prefix`."""
+        records = []
+        with self._lock:
+            mapped = self._map
+            assert mapped is not None
+            keys = _HEADER.size + self._count * _RECORD.size
+            low, high = 0, self._count
+            while low < high:
+                middle = (low + high) // 2
+                key_offset, key_length, _, _ = _RECORD.unpack_from(mapped, _HEADER.size + middle * _RECORD.size)
+                if mapped[keys + key_offset:keys + key_offset + key_length] < prefix:
+                    low = middle + 1
+                else:
+                    high = middle
+            for i in range(low, self._count):
+                key_offset, key_length, offset, length = _RECORD.unpack_from(mapped, _HEADER.size + i * _RECORD.size)
+                key = mapped[keys + key_offset:keys + key_offset + key_length]
+                if not key.startswith(prefix):
+                    break
+                records.append((key, offset, length))
+        return records
+
+
+def build(path: Union[str, 'os.PathLike[str]'], index_path: Union[str, 'os.PathLike[str]', None] = None, **kwargs) -> str:
+    """
+    Indexes the top-level entries of a Kon file, and writes the index next
+    to it, see :mod:`kon.index`. The top level must be a dictionary.
+
+    Only the top level of the file is parsed: the lists and dictionaries
+    written with brackets are skipped by matching up their brackets, like
+    `kon.loads(..., lazy=True)` does. The file is memory mapped and scanned
+    a few MiB at a time, so that only that much of it is decoded at once.
+
+    Args:
+        path: The file to be indexed.
+        index_path: Where to write the index. Defaults to None, which means
+            `<path>.konidx`.
+        **kwargs: Keyword arguments to be passed to the `KonParser`.
+
+    Raises:
+        OSError: If the file can not be read, or the index written.
+        ValueError: If the file is invalid, or its top-level value is not a
+            dictionary.
+        TypeError: If the file contains a type violation.
+
+    Returns:
+        str: The path of the index.
+    """
+    path = os.fspath(path)
+    index_path = path + '.konidx' if index_path is None else os.fspath(index_path)
+    with io.open(path, 'rb') as file:
+        stat = os.fstat(file.fileno())
+        entries = sorted(_scan_file(file, stat.st_size, kwargs).items())
+
+    table = bytearray()
+    keys = bytearray()
+    for encoded, (offset, length) in entries:
+        table += _RECORD.pack(len(keys), len(encoded), offset, length)
+        keys += encoded
+    # Replaced in one step, so that a concurrent lookup never sees half of it
+    temporary = f'{index_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with io.open(temporary, 'wb') as file:
+            file.write(_HEADER.pack(_MAGIC, stat.st_size, stat.st_mtime_ns, len(entries)))
+            file.write(table)
+            file.write(keys)
+        os.replace(temporary, index_path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return index_path
+
+
+def open(path: Union[str, 'os.PathLike[str]'], index_path: Union[str, 'os.PathLike[str]', None] = None, **kwargs) -> KonIndex:
+    """
+    Opens the index of a Kon file for lookups, see :class:`KonIndex`. The
+    index is built first if it is missing, invalid, or out of date.
+
+    Args:
+        path: The indexed file.
+        index_path: The index. Defaults to None, which means `<path>.konidx`.
+        **kwargs: Keyword arguments to be passed to the `KonParser`, when
+            building the index and parsing the entries.
+
+    Raises:
+        OSError: If the file can not be read, or the index written.
+        ValueError: If the file is invalid.
+        TypeError: If the file contains a type violation.
+    """
+    path = os.fspath(path)
+    index = KonIndex(path, path + '.konidx' if index_path is None else os.fspath(index_path), kwargs)
+    stat = os.stat(path)
+    index._refresh((stat.st_size, stat.st_mtime_ns))
+    return index
+
+
+def _scan_file(file: Any, size: int, options: Dict[str, Any]) -> Dict[bytes, Tuple[int, int]]:
+    """
+    Returns the byte offset and length of every top-level entry of a file,
+    by its encoded key path, see `_scan`.
+
+    The file is scanned in chunks of about `_SCAN_CHUNK` bytes, cut at the
+    start of a line that may start an entry, as `kon.loads` cuts a source
+    for its workers. A chunk that does not end between two entries is
+    invalid, as a cut entry, string or bracket is, and is scanned again
+    with more of the file. When the rest of the file is invalid, the whole
+    file is scanned, to raise the same error as without chunks.
+    """
+    if size <= _SCAN_CHUNK:
+        return _scan(file.read(), options)
+    entries: Dict[bytes, Tuple[int, int]] = {}
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        start = 0
+        while start < len(mapped):
+            chunk = _SCAN_CHUNK
+            while True:
+                match = _LINE_START.search(mapped, start + chunk) if start + chunk < len(mapped) else None
+                end = len(mapped) if match is None else match.end()
+                try:
+                    entries.update(_scan(mapped[start:end], options, start))
+                    break
+                except (ValueError, TypeError):
+                    if end < len(mapped):
+                        chunk *= 2
+                        continue
+                    if start == 0:
+                        raise
+                    return _scan(mapped[:], options)
+            start = end
+    return entries
+
+
+def _scan(data: bytes, options: Dict[str, Any], base: int = 0) -> Dict[bytes, Tuple[int, int]]:
+    """
+    Returns the byte offset and length of every top-level entry of `data`,
+    by its encoded key path. The offsets are counted from `base`.
+    """
+    text = data.decode('utf-8')
+    parser = KonParser(text, lazy=True, **options)
+    tokens = parser._tokens
+    # The parser strips the source, offsets are counted from the first character it kept
+    stripped = len(text) - len(text.lstrip())
+    counted = 0
+    byte_offset = base + len(text[:stripped].encode('utf-8'))
+    ascii = text.isascii()
+
+    def to_bytes(position: int) -> int:
+        nonlocal counted, byte_offset
+        if ascii:
+            return base + stripped + position
+        byte_offset += len(parser.source[counted:position].encode('utf-8'))
+        counted = position
+        return byte_offset
+
+    entries: Dict[bytes, Tuple[int, int]] = {}
+    tokens.skip_ignored(True)
+    start = to_bytes(tokens.position)
+    # Every top-level dictionary or entry is yielded as soon as it is
+    # complete, while the tokenizer is right after its last token
+    for entry in parser._run(stream=True):
+        assert entry is not None
+        end = to_bytes(tokens.position)
+        keys: Tuple[Any, ...] = ()
+        value: Any = entry
+        if entry.__class__ is tuple:
+            keys, value = (entry[0],), entry[1]
+        while type(value) is dict and len(value) == 1:
+            key, value = next(iter(value.items()))
+            keys += (key,)
+        if keys:
+            entries[_encode(keys)] = (start, end - start)
+        else:
+            # A dictionary in braces, its own keys lead into it
+            for key in value:
+                entries[_encode((key,))] = (start, end - start)
+        tokens.skip_ignored(True)
+        start = to_bytes(tokens.position)
+    return entries
+
+
+def _encode(keys: Tuple[Any, ...]) -> bytes:
+    """Encodes a key path for the index, telling apart e.g. `1`, `1.0`, `true` and `"1"`."""
+    return _KEY_ENCODER.encode(list(keys)).encode('utf-8')
+
+
+def _follow(value: KonObject, keys: Tuple[Any, ...], segments: List[_Segment]) -> Tuple[bool, KonObject]:
+    """Follows `keys` and then `segments` from the parsed entry `value`, returns whether it got there and the value."""
+    for key in keys:
+        if not isinstance(value, dict) or key not in value:
+            return False, None
+        value = value[key]
+    for segment in segments:
+        if isinstance(value, dict):
+            for key in segment.keys:
+                if key in value:
+                    value = value[key]
+                    break
+            else:
+                return False, None
+        elif isinstance(value, list) and segment.index is not None and -len(value) <= segment.index < len(value):
+            value = value[segment.index]
+        else:
+            return False, None
+    return True, value
+
+
+def _map(index_path: str) -> Optional[mmap.mmap]:
+    """Maps an index, None if it does not exist or is empty."""
+    try:
+        with io.open(index_path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _header(mapped: Optional[mmap.mmap]) -> Optional[Tuple[int, int, int]]:
+    """Returns the number of entries, and the size and modification time of the indexed file, None if `mapped` is not a valid index."""
+    if mapped is None or len(mapped) < _HEADER.size:
+        return None
+    magic, size, mtime, count = _HEADER.unpack_from(mapped)
+    if magic != _MAGIC or len(mapped) < _HEADER.size + count * _RECORD.size:
+        return None
+    return count, size, mtime
+
+
+__all__ = ('build', 'open', 'KonIndex')
@@ -0,0 +1,295 @@
+"""
+Loading of layered configuration files, see :func:`load_layers`.
+
+Layers (e.g. a base file, then region and host overrides) are merged in
+order, later layers winning. By default they are merged deeply: `a { x = 1 }`
+in one layer and `a { y = 2 }` in the next give `{a = {x = 1, y = 2}}`.
+
+Merged results share every subtree that only one layer supplies with that
+layer's parsed file, instead of copying it. Only the dictionaries that more
+than one layer writes to are created anew, so a merge costs as much as the
+layers overlap, not as much as they are large. As results are shared, they
+are frozen (see :class:`kon.cache.CachedResults`).
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .cache import CachedLoader, CachedResults, FrozenDict, _rebuild
+from .parser import DuplicateKeys
+from .query import Path, _split
+from .types import KonObject
+
+_NOTHING: Any = object()
+
+
+class _Origin:
+    """
+    Which layer supplied each value of a merged dictionary: the one in
+    `keys` for the keys in there, `layer` for every other key. The entries
+    of `keys` are the indices of layers, or origins of merged dictionaries.
+    """
+    __slots__ = ('layer', 'keys')
+
+    def __init__(self, layer: int, keys: Optional[Dict[Any, Union[int, '_Origin']]] = None) -> None:
+        self.layer = layer
+        self.keys: Dict[Any, Union[int, _Origin]] = {} if keys is None else keys
+
+    @staticmethod
+    def of(origin: Union[int, '_Origin']) -> '_Origin':
+        """Returns a copy of `origin` that can be changed, as origins are shared between cached results."""
+        if isinstance(origin, int):
+            return _Origin(origin)
+        return _Origin(origin.layer, dict(origin.keys))
+
+
+class MergedLayers:
+    """
+    The merged value of some layers, see :func:`load_layers`.
+
+    Attributes:
+        value (KonObject): The merged value.
+        layers (tuple[str, ...]): The paths of the layers, in order.
+    """
+    value: KonObject
+    layers: Tuple[str, ...]
+
+    def __init__(self, value: KonObject, layers: Tuple[str, ...], origin: Union[int, _Origin]) -> None:
+        self.value = value
+        self.layers = layers
+        self._origin = origin
+
+    def origin(self, key: Path) -> str:
+        """
+        Returns the path of the layer that supplied the value at `key`, a
+        path as for :func:`kon.extract` without globs. A dictionary that was
+        merged from several layers counts as supplied by the last of them.
+
+        Raises:
+            KeyError: If there is no value at `key`.
+        """
+        value = self.value
+        origin = self._origin
+        for segment in _split(key):
+            if isinstance(value, dict):
+                for item in segment.keys:
+                    if item in value:
+                        value = value[item]
+                        if not isinstance(origin, int):
+                            origin = origin.keys.get(item, origin.layer)
+                        break
+                else:
+                    raise KeyError(key)
+            elif isinstance(value, (list, tuple)) and segment.index is not None and -len(value) <= segment.index < len(value):
+                value = value[segment.index]
+            else:
+                raise KeyError(key)
+        if not isinstance(origin, int):
+            origin = max(_layers(origin))
+        return self.layers[origin]
+
+
+class LayeredLoader:
+    """
+    Loads and merges layers of Kon files, caching both the parsed files and
+    the merged results.
+
+    Parsed files are cached as by a :class:`kon.cache.CachedLoader`, and
+    identified by the hash of their content. Merged results are cached by
+    the strategy and the hashes of their layers, for every leading run of
+    layers: when only the last layer changed, only it is merged again.
+
+    A loader is safe to share between threads.
+
+    Attributes:
+        max_entries (int | None): The maximum number of cached files, and of
+            cached merged results, or None for no limit.
+        results (CachedResults): How results are handed out.
+    """
+    max_entries: Optional[int]
+    results: CachedResults
+
+    def __init__(self, *, max_entries: Optional[int] = 128, results: CachedResults = CachedResults.FROZEN, **kwargs) -> None:
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_entries: The maximum number of cached files, and of cached
+                merged results. Defaults to 128.
+            results: How results are handed out. Defaults to
+                CachedResults.FROZEN, which shares them between calls, and
+                with the layers they came from. COPIED gives a deep copy
+                instead, which costs as much as a result is large.
+            **kwargs: Keyword arguments to be passed to the `KonParser`.
+        """
+        self.max_entries = max_entries
+        self.results = results
+        self._files = CachedLoader(max_entries=max_entries, results=CachedResults.FROZEN, **kwargs)
+        self._merged: 'OrderedDict[Tuple[Any, ...], Tuple[KonObject, Union[int, _Origin]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, paths: Sequence[Union[str, 'os.PathLike[str]']], strategy: Union[DuplicateKeys, str] = DuplicateKeys.DEEP_MERGE) -> MergedLayers:
+        """
+        Loads and merges the layers at `paths`, see :func:`load_layers`.
+
+        Raises:
+            OSError: If a file can not be read.
+            ValueError: If a file is invalid, its top-level value is not a
+                dictionary, there are no `paths`, or a key is set by more
+                than one layer with `DuplicateKeys.ERROR`.
+            TypeError: If a file contains a type violation.
+        """
+        strategy = DuplicateKeys(strategy)
+        if len(paths) == 0:
+            raise ValueError('no layers to load')
+        names = tuple(os.fspath(path) for path in paths)
+        layers = []
+        for name in names:
+            entry = self._files._load_path_entry(name)
+            if not isinstance(entry.value, dict):
+                raise ValueError(f'the top-level value of layer {name!r} is a(n) {type(entry.value).__name__}, not a dictionary')
+            layers.append((entry.digest, entry.value))
+
+        # Continues from the longest leading run of layers that was merged before
+        key: Tuple[Any, ...] = (strategy,) + tuple(digest for digest, _ in layers)
+        cached = None
+        done = len(layers)
+        while done > 1:
+            cached = self._lookup(key[:done + 1])
+            if cached is not None:
+                break
+            done -= 1
+        merged, origin = (layers[0][1], 0) if cached is None else cached
+        for layer in range(done, len(layers)):
+            merged, origin = _merge(merged, origin, layers[layer][1], layer, strategy, names[layer])
+            self._store(key[:layer + 2], (merged, origin))
+
+        if self.results is CachedResults.COPIED:
+            merged = _rebuild(merged, dict, list)
+        return MergedLayers(merged, names, origin)
+
+    def clear(self) -> None:
+        """Forgets all cached files and merged results."""
+        self._files.clear()
+        with self._lock:
+            self._merged.clear()
+
+    def _lookup(self, key: Tuple[Any, ...]) -> Optional[Tuple[KonObject, Union[int, _Origin]]]:
+        with self._lock:
+            merged = self._merged.get(key)
+            if merged is not None:
+                self._merged.move_to_end(key)
+            return merged
+
+    def _store(self, key: Tuple[Any, ...], merged: Tuple[KonObject, Union[int, _Origin]]) -> None:
+        with self._lock:
+            self._merged[key] = merged
+            self._merged.move_to_end(key)
+            while self.max_entries is not None and len(self._merged) > self.max_entries:
+                self._merged.popitem(last=False)
+
+
+_default_loader: Optional[LayeredLoader] = None
+_default_loader_lock = threading.Lock()
+
+
+def load_layers(paths: Sequence[Union[str, 'os.PathLike[str]']], strategy: Union[DuplicateKeys, str] = DuplicateKeys.DEEP_MERGE, *, loader: Optional[LayeredLoader] = None) -> MergedLayers:
+    """
+    Loads Kon files and merges them in order, as layers that override the
+    ones before them, e.g. `load_layers(['base.kon', 'eu.kon', 'host.kon'])`.
+
+    The layers are merged as if they were a single file parsed with
+    `duplicate_keys=strategy`: with DEEP_MERGE, dictionaries are merged on
+    every level, and other values of later layers replace earlier ones. The
+    other strategies only merge the top level, as `duplicate_keys` does.
+    Their top-level values must be dictionaries.
+
+    Subtrees supplied by a single layer are shared with its parsed file
+    instead of being copied, and the parsed files and merged results are
+    cached, see :class:`LayeredLoader`. The returned value is frozen: its
+    dictionaries are :class:`kon.cache.FrozenDict` and its lists tuples.
+
+    Args:
+        paths: The paths of the layers, from the lowest to the highest.
+        strategy: How the layers are merged. Defaults to
+            DuplicateKeys.DEEP_MERGE.
+        loader: The loader to load the layers with, which sets the parser
+            options and the cache size. Defaults to None, which means a
+            loader with the default options shared by all callers.
+
+    Raises:
+        OSError: If a file can not be read.
+        ValueError: If a file is invalid, its top-level value is not a
+            dictionary, there are no `paths`, or a key is set by more than
+            one layer with `DuplicateKeys.ERROR`.
+        TypeError: If a file contains a type violation.
+
+    Returns:
+        MergedLayers: The merged value, and which layer supplied each of its
+            values.
+    """
+    global _default_loader
+    if loader is None:
+        with _default_loader_lock:
+            if _default_loader is None:
+                _default_loader = LayeredLoader()
+            loader = _default_loader
+    return loader.load(paths, strategy)
+
+
+def _merge(base: KonObject, origin: Union[int, _Origin], layer_value: KonObject, layer: int, strategy: DuplicateKeys, name: str) -> Tuple[KonObject, _Origin]:
+    """
+    Merges the dictionary `layer_value` of `layer` into the dictionary
+    `base`, whose values were supplied as in `origin`. Neither of them is
+    changed, the dictionaries that both of them have are copied, one level
+    at a time, and everything else is shared.
+    """
+    result = FrozenDict(base) # type: ignore
+    result_origin = _Origin.of(origin)
+    if strategy is not DuplicateKeys.DEEP_MERGE:
+        for key, value in layer_value.items(): # type: ignore
+            if key in result:
+                if strategy is DuplicateKeys.FIRST_WINS:
+                    continue
+                if strategy is DuplicateKeys.ERROR:
+                    raise ValueError(f'duplicate key {key!r} in layer {name!r}')
+            dict.__setitem__(result, key, value)
+            result_origin.keys[key] = layer
+        return result, result_origin
+
+    # Uses an explicit stack, like the parser, the values may be nested deeply
+    stack: List[Tuple[dict, _Origin, Any]] = [(result, result_origin, iter(layer_value.items()))] # type: ignore
+    while stack:
+        target, target_origin, items = stack[-1]
+        for key, value in items:
+            current = dict.get(target, key, _NOTHING)
+            if isinstance(current, dict) and isinstance(value, dict):
+                child = FrozenDict(current)
+                child_origin = _Origin.of(target_origin.keys.get(key, target_origin.layer))
+                dict.__setitem__(target, key, child)
+                target_origin.keys[key] = child_origin
+                stack.append((child, child_origin, iter(value.items())))
+                break
+            dict.__setitem__(target, key, value)
+            target_origin.keys[key] = layer
+        else:
+            stack.pop()
+    return result, result_origin
+
+
+def _layers(origin: _Origin) -> List[int]:
+    """Returns every layer that supplied a value of a merged dictionary."""
+    layers = [origin.layer]
+    stack = [origin]
+    while stack:
+        for child in stack.pop().keys.values():
+            if isinstance(child, int):
+                layers.append(child)
+            else:
+                layers.append(child.layer)
+                stack.append(child)
+    return layers
+
+
+__all__ = ('load_layers', 'LayeredLoader', 'MergedLayers')
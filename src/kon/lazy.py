@@ -0,0 +1,182 @@
+"""
+Lazily parsed lists and dictionaries, see `kon.loads(..., lazy=True)`.
+
+A lazy parse only matches up the brackets of every list and dictionary
+written with brackets, and puts a :class:`LazyKonList` or a
+:class:`LazyKonDict` in its place. These are a `list` and a `dict` that parse
+their own elements the first time they are used, through any of their
+methods, and keep them. Their nested lists and dictionaries are lazy again,
+so using a single value only parses the containers on the way to it.
+
+Errors in the contents of a lazy list or dictionary are raised when it is
+parsed, by the method that was used. Mismatched brackets and unterminated
+strings are still raised up front.
+
+A lazy list or dictionary keeps the whole source alive until it was parsed.
+Code that reads the storage of a `list` or a `dict` directly, without calling
+its methods (e.g. `json.dumps`), sees one that was not parsed yet as empty;
+use :meth:`LazyKonDict.load` with `deep=True` first.
+"""
+import abc
+import functools
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from .parser import KonParser
+
+_C = TypeVar('_C', bound='_LazyContainer')
+
+
+class _LazyContainer(abc.ABC):
+    """The parsing shared by :class:`LazyKonDict` and :class:`LazyKonList`."""
+    __slots__ = ()
+    _parser: Optional['KonParser']
+    _span: Optional[Tuple[int, int]]
+    _depth: int
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs) # type: ignore
+        self._parser = None
+        self._span = None
+        self._depth = 0
+
+    @classmethod
+    def _unloaded(cls: 'type[_C]', parser: 'KonParser', start: int, end: int, depth: int) -> _C:
+        """Creates a container for the brackets at `start` and `end` in the source of `parser`, parsed on first use."""
+        # Skips __init__, there is nothing to initialize the storage with
+        container = cls.__new__(cls)
+        container._parser = parser
+        container._span = (start, end)
+        container._depth = depth
+        return container
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the elements were parsed already."""
+        return self._parser is None
+
+    @property
+    def span(self) -> Optional[Tuple[int, int]]:
+        """The indices of the opening and the closing bracket in the (stripped) source, None if created directly."""
+        return self._span
+
+    def load(self, deep: bool = False) -> None:
+        """
+        Parses the elements now, if they were not parsed yet. With `deep`,
+        every nested lazy list and dictionary is parsed as well.
+
+        Raises:
+            ValueError: If the elements are invalid.
+            TypeError: If the elements contain a type violation.
+        """
+        self._load()
+        if not deep:
+            return
+        stack: List[Any] = [self]
+        while stack:
+            container = stack.pop()
+            container._load()
+            for value in (dict.values(container) if isinstance(container, dict) else container):
+                if isinstance(value, _LazyContainer):
+                    stack.append(value)
+
+    def _load(self) -> None:
+        parser = self._parser
+        if parser is None:
+            return
+        assert parser._lazy_lock is not None
+        with parser._lazy_lock:
+            # Another thread might have parsed the elements in the meantime
+            if self._parser is None:
+                return
+            self._fill(parser._parse_lazy(self._span[0], self._depth)) # type: ignore
+            self._parser = None
+
+    @abc.abstractmethod
+    def _fill(self, elements: Any) -> None:
+        """Puts the parsed `elements` in place."""
+
+
+def _loading(method: Callable, others: bool) -> Callable:
+    """Wraps a method of `dict` or `list` to parse the elements first, and those of lazy arguments if `others` is set."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._parser is not None:
+            self._load()
+        if others:
+            for arg in args:
+                if isinstance(arg, _LazyContainer):
+                    arg._load()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _wrap_methods(cls: type, base: type, names: Tuple[str, ...], others: Tuple[str, ...]) -> None:
+    for name in names + others:
+        if hasattr(base, name):
+            setattr(cls, name, _loading(getattr(base, name), name in others))
+
+
+class LazyKonDict(_LazyContainer, dict):
+    """
+    A dictionary whose entries are parsed the first time it is used, see
+    :mod:`kon.lazy`. Pickling or copying it gives a plain `dict`.
+
+    Attributes:
+        loaded (bool): Whether the entries were parsed already.
+        span (tuple[int, int] | None): The indices of its braces in the source.
+    """
+    __slots__ = ('_parser', '_span', '_depth')
+
+    def _fill(self, elements: Any) -> None:
+        dict.update(self, elements)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return dict, (dict(self.items()),)
+
+
+_wrap_methods(
+    LazyKonDict, dict,
+    (
+        '__getitem__', '__setitem__', '__delitem__', '__contains__', '__iter__', '__reversed__', '__len__', '__repr__',
+        'get', 'keys', 'values', 'items', 'pop', 'popitem', 'setdefault', 'clear', 'copy',
+    ),
+    ('__eq__', '__ne__', '__or__', '__ror__', '__ior__', 'update'),
+)
+
+
+class LazyKonList(_LazyContainer, list):
+    """
+    A list whose elements are parsed the first time it is used, see
+    :mod:`kon.lazy`. Pickling or copying it gives a plain `list`.
+
+    Attributes:
+        loaded (bool): Whether the elements were parsed already.
+        span (tuple[int, int] | None): The indices of its parentheses in the source.
+    """
+    __slots__ = ('_parser', '_span', '_depth')
+
+    def _fill(self, elements: Any) -> None:
+        list.extend(self, elements)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return list, (list(iter(self)),)
+
+    def __radd__(self, other: Any) -> Any:
+        # Concatenating to a list reads the elements directly, only parse them
+        self._load()
+        return NotImplemented
+
+
+_wrap_methods(
+    LazyKonList, list,
+    (
+        '__getitem__', '__setitem__', '__delitem__', '__contains__', '__iter__', '__reversed__', '__len__', '__repr__',
+        '__mul__', '__rmul__', '__imul__', 'append', 'insert', 'pop', 'remove', 'clear', 'index', 'count', 'sort',
+        'reverse', 'copy',
+    ),
+    ('__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__', '__add__', '__iadd__', 'extend'),
+)
+
+
+__all__ = ('LazyKonDict', 'LazyKonList')
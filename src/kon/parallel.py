@@ -0,0 +1,331 @@
+"""
+Parsing in parallel: of many Kon files, see :func:`load_many`, and of a
+single large source, split at its top-level entries, see `kon.loads` with
+`workers`.
+"""
+import bisect
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .parser import KonParser, _Entries
+from .types import KonObject
+
+# A file parsed by a worker: whether it succeeded, and its value or exception
+_Outcome = Tuple[bool, Any]
+
+# Sources are only split into chunks of at least this many characters. A
+# chunk costs about 5% more to parse in a worker than in this process, but
+# the first split has to start the pool, which takes as long as parsing
+# about 1.5 MiB, smaller chunks would take hundreds of calls to pay that back
+_MIN_CHUNK = 1 << 18
+# A line that may start a top-level entry: one that starts with a key, or a
+# dictionary in braces
+_LINE_START = re.compile(r'\n(?=[^\s#})=,])')
+
+
+def load_many(
+    paths: Sequence[Union[str, 'os.PathLike[str]']],
+    *,
+    workers: Optional[int] = None,
+    executor: Union[str, Executor] = 'process',
+    batch_bytes: int = 1 << 20,
+    return_exceptions: bool = False,
+    ordered: bool = True,
+    **kwargs,
+) -> Union[List[Any], Iterator[Tuple[str, Any]]]:
+    """
+    Parses many Kon-formatted files in parallel, see :func:`kon.load_path`.
+
+    Parsing is CPU-bound, so only a process pool makes it faster, threads
+    merely overlap reading the files. The processes are started as by
+    `multiprocessing`, so a script that uses them must guard its main code
+    with `if __name__ == '__main__':`. Consecutive files are handed to the
+    workers in batches of about `batch_bytes`, so that small files do not
+    cost a round trip to a worker each. Starting the processes takes a few
+    tenths of a second, and receiving the results costs this process under
+    a tenth of the time they took to parse, so a pool pays off for loads
+    that take seconds. Pass an executor to keep its processes between calls.
+
+    Args:
+        paths: The paths of the UTF-8 encoded files.
+        workers: The number of workers. Defaults to None, which means one
+            per available CPU. With a single worker, the files are parsed in
+            this process, without an executor.
+        executor: `"process"` for a process pool, `"thread"` for a thread
+            pool, or an executor to submit the batches to, which is not shut
+            down afterwards (`workers` is then only used for batching).
+            Defaults to `"process"`.
+        batch_bytes: The total size of the files in a batch. Batches are
+            made smaller when there would be fewer than four per worker.
+            Defaults to 1 MiB.
+        return_exceptions: If True, the exception raised for a file is put
+            in its place instead of being raised. Defaults to False.
+        ordered: If True, returns the results in the order of `paths`, once
+            all of them are done. If False, returns an iterator of the
+            `(path, result)` pairs, as each batch is done. Defaults to True.
+        **kwargs: Additional keyword arguments to be passed to the
+            `KonParser`. With `intern`, the files of a batch share a table
+            of interned strings, unless an `intern_table` is given.
+
+    Raises:
+        ValueError: If `executor` is not a known kind, or a file is invalid
+            (unless `return_exceptions` is set).
+        OSError: If a file can not be read (unless `return_exceptions` is
+            set).
+        TypeError: If a file contains a type violation (unless
+            `return_exceptions` is set).
+
+    Returns:
+        list | Iterator[tuple]: The parsed files (or their exceptions) in
+            order, or the `(path, result)` pairs as they are done.
+    """
+    names = [os.fspath(path) for path in paths]
+    if workers is None:
+        workers = _available_cpus()
+    if workers < 1:
+        raise ValueError(f'workers must be at least 1, not {workers}')
+    if not isinstance(executor, Executor) and executor not in ('process', 'thread'):
+        raise ValueError(f'executor must be "process", "thread" or an Executor, not {executor!r}')
+    if ordered:
+        results: List[Any] = [None] * len(names)
+        outcomes = _run(names, workers, executor, batch_bytes, kwargs)
+        try:
+            for index, outcome in outcomes:
+                results[index] = _result(outcome, return_exceptions)
+        finally:
+            # Cancels the batches that were not started yet, after an error
+            outcomes.close()
+        return results
+    return ((names[index], _result(outcome, return_exceptions)) for index, outcome in _run(names, workers, executor, batch_bytes, kwargs))
+
+
+def _run(names: List[str], workers: int, executor: Union[str, Executor], batch_bytes: int, options: Dict[str, Any]) -> Iterator[Tuple[int, _Outcome]]:
+    """Parses the files, yielding their indices and outcomes, a batch at a time as they are done."""
+    if workers == 1 and not isinstance(executor, Executor):
+        for index, outcome in enumerate(_load_batch(names, options)):
+            yield index, outcome
+        return
+    if isinstance(executor, Executor):
+        pool = executor
+    elif executor == 'process':
+        pool = _process_pool(workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    futures: Dict['Future[List[_Outcome]]', int] = {}
+    try:
+        for start, end in _batches(names, workers, batch_bytes):
+            futures[pool.submit(_load_batch, names[start:end], options)] = start
+        for future in as_completed(futures):
+            for offset, outcome in enumerate(future.result()):
+                yield futures[future] + offset, outcome
+    finally:
+        # When stopped early, by an error or a consumer that is done
+        for future in futures:
+            future.cancel()
+        if pool is not executor:
+            pool.shutdown()
+
+
+def _batches(names: List[str], workers: int, batch_bytes: int) -> Iterator[Tuple[int, int]]:
+    """Splits the files into runs of about `batch_bytes`, yielding their start and end indices."""
+    sizes = []
+    for name in names:
+        try:
+            sizes.append(os.stat(name).st_size)
+        except OSError:
+            # Raised by the worker, in the place of the file
+            sizes.append(0)
+    # At least four batches per worker, for an even load
+    limit = max(1, min(batch_bytes, sum(sizes) // (workers * 4)))
+    start = 0
+    total = 0
+    for index, size in enumerate(sizes):
+        total += size
+        if total >= limit:
+            yield start, index + 1
+            start = index + 1
+            total = 0
+    if start < len(names):
+        yield start, len(names)
+
+
+def _load_batch(names: List[str], options: Dict[str, Any]) -> List[_Outcome]:
+    """Parses a batch of files in a worker. Exceptions are returned in the place of a file, to keep the others."""
+    from . import load_path
+    if options.get('intern') is not None and options.get('intern_table') is None:
+        # Strings are shared between the files of a batch, which stay shared when it is sent back
+        options = dict(options, intern_table={})
+    outcomes: List[_Outcome] = []
+    for name in names:
+        try:
+            outcomes.append((True, load_path(name, **options)))
+        except Exception as e:
+            outcomes.append((False, e))
+    return outcomes
+
+
+def _result(outcome: _Outcome, return_exceptions: bool) -> KonObject:
+    succeeded, value = outcome
+    if not succeeded and not return_exceptions:
+        raise value
+    return value
+
+
+def _parse_split(source: Union[str, bytes, bytearray], workers: int, options: Dict[str, Any]) -> KonObject:
+    """
+    Parses `source` like `KonParser(source, **options).parse()` does, with
+    the chunks between some of its top-level entries parsed by `workers`
+    processes.
+
+    The boundaries are guessed first, as the starts of the lines after which
+    the chunks are about the same size. The parser of a chunk only finishes
+    when the chunk ends between two entries, as a cut entry, string or
+    bracket is invalid, and every chunk starts at an entry once the one
+    before it finished. The tokens are the same as when the whole source is
+    parsed, as no token but a string or whitespace spans a newline, so the
+    entries are the same too. When a guess was wrong, the exact starts of the
+    top-level entries are used, found by a lazy parse that only matches up
+    brackets. Every entry is then merged with the top-level rules of the
+    parser, as if they came from a single parse. When a chunk is invalid
+    after all, the whole source is parsed as usual, to raise the same error.
+    """
+    if workers < 1:
+        raise ValueError(f'workers must be at least 1, not {workers}')
+    if options.get('lazy'):
+        raise ValueError('a lazy parse can not be split between workers')
+    if any(options.get(name) is not None for name in ('schema', 'object_pairs_hook', 'list_hook')):
+        raise ValueError('a parse with a schema or a hook can not be split between workers')
+    parser = KonParser(source, **options)
+    text = parser.source
+    chunks = min(workers, len(text) // _MIN_CHUNK)
+    if chunks > 1:
+        for find_boundaries in (_guess_boundaries, _entry_boundaries):
+            try:
+                boundaries = find_boundaries(text, chunks, options)
+            except Exception:
+                # The lazy parse of an invalid source
+                break
+            if len(boundaries) < 3:
+                continue
+            try:
+                parts = _parse_chunks(text, boundaries, options)
+            except Exception:
+                continue
+            return parser._parse_parts(parts, True)
+    return parser.parse()
+
+
+def _guess_boundaries(text: str, chunks: int, options: Dict[str, Any]) -> List[int]:
+    """Returns the starts of the lines after the sizes of `chunks` even chunks, and the bounds of `text`."""
+    boundaries = [0]
+    for chunk in range(1, chunks):
+        match = _LINE_START.search(text, max(len(text) * chunk // chunks, boundaries[-1]))
+        if match is None:
+            break
+        boundaries.append(match.end())
+    boundaries.append(len(text))
+    return sorted(set(boundaries))
+
+
+def _entry_boundaries(text: str, chunks: int, options: Dict[str, Any]) -> List[int]:
+    """Returns the starts of the top-level entries after the sizes of `chunks` even chunks, and the bounds of `text`."""
+    parser = KonParser(text, **dict(options, lazy=True))
+    tokens = parser._tokens
+    starts = []
+    # The tokenizer is right after an entry when it is yielded, see `kon.index`
+    for _ in parser._run(stream=True):
+        tokens.skip_ignored(True)
+        starts.append(tokens.position)
+    boundaries = [0]
+    for chunk in range(1, chunks):
+        index = bisect.bisect_left(starts, len(text) * chunk // chunks)
+        if index < len(starts):
+            boundaries.append(starts[index])
+    boundaries.append(len(text))
+    return sorted(set(boundaries))
+
+
+def _parse_chunks(text: str, boundaries: List[int], options: Dict[str, Any]) -> List[_Entries]:
+    """Parses the chunks of `text` between `boundaries`, the first one in this process, returns all of their entries."""
+    pool = _split_pool(len(boundaries) - 2)
+    futures = []
+    try:
+        futures = [pool.submit(_parse_chunk, text[start:end], options) for start, end in zip(boundaries[1:-1], boundaries[2:])]
+        parts = _parse_chunk(text[:boundaries[1]], options)
+        for future in futures:
+            parts += future.result()
+    except BrokenProcessPool:
+        # A worker died, the next split starts a new pool
+        _drop_split_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+    return parts
+
+
+def _parse_chunk(chunk: str, options: Dict[str, Any]) -> List[_Entries]:
+    """Parses the top-level entries of a chunk, raising if it does not end between two of them."""
+    return list(KonParser(chunk, **options)._run(stream=True)) # type: ignore
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Creates a pool of `workers` processes, started by a fork server where
+    there is one: a process forked from one that runs other threads (like
+    the pool's own) can deadlock on a lock that one of them held.
+    """
+    context = None
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+# The pool that splits sources, kept from one `loads` to the next, as
+# starting one takes longer than parsing most sources
+_split_lock = threading.Lock()
+_split: Optional[Tuple[ProcessPoolExecutor, int, int]] = None
+
+
+def _split_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the pool that splits sources, started with `workers` processes
+    when there is none with as many yet. A forked process starts its own.
+    """
+    global _split
+    with _split_lock:
+        if _split is not None:
+            pool, size, pid = _split
+            if pid == os.getpid() and size >= workers:
+                return pool
+            if pid == os.getpid():
+                # Waits for the chunks it was given already. Without waiting,
+                # Python 3.8 can close the pipe that wakes its management
+                # thread up too soon, and hang on exit
+                pool.shutdown()
+        pool = _process_pool(workers)
+        _split = pool, workers, os.getpid()
+        return pool
+
+
+def _drop_split_pool(pool: ProcessPoolExecutor) -> None:
+    global _split
+    with _split_lock:
+        if _split is not None and _split[0] is pool:
+            _split = None
+    pool.shutdown()
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0)) # type: ignore
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+__all__ = ('load_many',)
@@ -1,21 +1,207 @@
-from enum import Enum, auto
-from typing import List, Optional, Union
-import textwrap
+import abc
+import codecs
+import threading
+from array import array
+from collections import deque
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Generator, Iterator, List, Optional, Tuple, Union
 
+from .lazy import LazyKonDict, LazyKonList
+from .tokenizer import END, ENTRY, InternStrings, KonTokenizer, MultilineStringBehaviour, NeedMoreData, TERMINATORS, VALUE_KINDS, _intern, create_tokenizer
 from .types import KonObject, KonDictionary
 
-class MultilineStringBehaviour(Enum):
+if TYPE_CHECKING:
+    import mmap
+
+    from .schema import Schema
+    from .spans import SpanMap
+
+_Entries = Union[KonDictionary, Tuple[KonObject, KonObject]]
+"""A dictionary, or a single entry of one as a `(key, value)` pair."""
+
+
+class DuplicateKeys(Enum):
     """
-    Specifies how to handle multiline string values.
+    Specifies what happens to a key that is set more than once in the same
+    dictionary, or at the top level. The values are the names that can be
+    passed instead of a member, e.g. `duplicate_keys='first_wins'`.
+
+    Attributes:
+        LAST_WINS: Keep the last value, as `dict.update` does.
+        FIRST_WINS: Keep the first value.
+        ERROR: Raise a ValueError.
+        DEEP_MERGE: Merge the values when both are dictionaries, on every
+            level, e.g. `a b = 1` and `a c = 2` into `{a = {b = 1, c = 2}}`.
+            Other values are replaced, as with LAST_WINS.
+    """
+    LAST_WINS = 'last_wins'
+    FIRST_WINS = 'first_wins'
+    ERROR = 'error'
+    DEEP_MERGE = 'deep_merge'
+
+
+class NumericLists(Enum):
+    """
+    Specifies what a parser turns lists of only ints and floats into, to
+    keep large ones compact. The values are the names that can be passed
+    instead of a member, e.g. `numeric_lists='array'`.
+
+    A list of ints becomes an array of 64 bit ints, and a list with any
+    float an array of floats, the ints included. Empty lists, and ints that
+    do not fit, are kept as lists.
 
     Attributes:
-        IGNORE: Keep the multiline string as is, with original indentation.
-        DEDENT: Remove common leading whitespace from every line in the string.
-        VALUE_ERROR: Raise a ValueError if a multiline string is encountered.
+        ARRAY: An `array.array`, with the type code `'q'` or `'d'`.
+        NUMPY: A one-dimensional `numpy.ndarray`, with the dtype `int64` or
+            `float64`. NumPy must be installed.
+    """
+    ARRAY = 'array'
+    NUMPY = 'numpy'
+
+
+class _SchemaMismatch(Exception):
+    """Raised by a :class:`_Spec` for a value it can not decode, the parser adds the position to the message."""
+
+
+class _Incomplete:
+    """
+    Takes the place of a dataclass that misses fields, see :mod:`kon.schema`,
+    and of everything that contains it. A later value of the same key might
+    still replace it (see `duplicate_keys`), so its error is only raised once
+    it is in the top-level value. The parser adds the position.
+    """
+    __slots__ = ('message', 'index')
+
+    def __init__(self, message: str) -> None:
+        self.message = message
+        self.index: Optional[int] = None
+
+    def error(self) -> TypeError:
+        return TypeError(f'{self.message} at index {self.index}')
+
+
+class _Spec(abc.ABC):
+    """
+    Decodes the values at one place of a schema as they are parsed, see
+    :mod:`kon.schema`. None stands for a spec that takes any value as it
+    is parsed. The parser looks up the spec of every value, lists and
+    dictionaries are built from elements that their spec decoded already.
+
+    The specs that :meth:`open` returns for a dictionary also have
+    `child(key)`, the spec of the value of `key`, and `build_dict(values)`,
+    which builds the dictionary from its decoded values. Those returned for
+    a list have `build_list(elements)` instead.
+    """
+    __slots__ = ()
+    # Set for the values of keys that the schema does not know, which are dropped
+    skip = False
+    # The spec of the elements of a list
+    item: Optional['_Spec'] = None
+
+    @abc.abstractmethod
+    def open(self, bracket: str) -> Optional['_Spec']:
+        """Returns the spec of the list (`'('`) or dictionary (`'{'`) given as the value."""
+
+    @abc.abstractmethod
+    def convert(self, value: KonObject) -> KonObject:
+        """Decodes a scalar value, or checks a list or dictionary that the spec returned by :meth:`open` built."""
+
+    def finish(self, value: KonObject) -> KonObject:
+        """
+        Finishes a value that was decoded, once it is in place. The parser
+        keeps `(key, value)` entries as tuples, so a list or dictionary is
+        only turned into a tuple by the spec of what contains it, and by
+        this method for the top-level value.
+        """
+        return value
+
+
+class _PendingDict(dict):
+    """A dictionary that `object_pairs_hook` is called with once it is in place, see :meth:`_Spec.finish`."""
+    __slots__ = ()
+
+
+class _PendingList(list):
+    """A list that `list_hook` is called with once it is in place, see :meth:`_Spec.finish`."""
+    __slots__ = ()
+
+
+class _HookSpec(_Spec):
+    """
+    Builds every dictionary with `object_pairs_hook` and every list with
+    `list_hook`, see :class:`KonParser`. As either of them might return a
+    tuple, they are called once their value is in place.
+    """
+    __slots__ = ('object_pairs_hook', 'list_hook', 'item')
+
+    def __init__(self, object_pairs_hook: Optional[Callable[[List[Tuple[KonObject, KonObject]]], Any]], list_hook: Optional[Callable[[List[Any]], Any]]) -> None:
+        self.object_pairs_hook = object_pairs_hook
+        self.list_hook = list_hook
+        self.item = self
+
+    def open(self, bracket: str) -> '_Spec':
+        return self
+
+    def child(self, key: KonObject) -> '_Spec':
+        return self
+
+    def convert(self, value: KonObject) -> KonObject:
+        return value
+
+    def build_dict(self, values: KonDictionary) -> Any:
+        for key, value in values.items():
+            if value.__class__ is _PendingDict or value.__class__ is _PendingList:
+                values[key] = self.finish(value)
+        if self.object_pairs_hook is None:
+            return values
+        return _PendingDict(values)
+
+    def build_list(self, elements: List[KonObject]) -> Any:
+        for i, element in enumerate(elements):
+            if element.__class__ is _PendingDict or element.__class__ is _PendingList:
+                elements[i] = self.finish(element)
+        if self.list_hook is None:
+            return elements
+        return _PendingList(elements)
+
+    def finish(self, value: KonObject) -> KonObject:
+        if value.__class__ is _PendingDict:
+            return self.object_pairs_hook(list(value.items())) # type: ignore
+        if value.__class__ is _PendingList:
+            return self.list_hook(list(value)) # type: ignore
+        return value
+
+
+class _PartsFrame:
+    """
+    A value being parsed from its parts, `op` is the token that started the
+    child being parsed. With a schema, `spec` decodes the value, and the
+    keys among its parts are looked up in it.
     """
-    IGNORE = auto()
-    DEDENT = auto()
-    VALUE_ERROR = auto()
+    __slots__ = ('parts', 'top_level', 'op', 'spec')
+
+    def __init__(self, parts: List[KonObject], top_level: bool, spec: '_Spec' = None) -> None:
+        self.parts = parts
+        self.top_level = top_level
+        self.op = ''
+        self.spec = spec
+
+
+class _ElementsFrame:
+    """
+    The elements of a list or a dictionary being parsed, up to the `end`
+    bracket. The elements of a dictionary are `(key, value)` entry pairs,
+    unless `mixed` is set. With a schema, `spec` decodes the list or the
+    dictionary.
+    """
+    __slots__ = ('end', 'elements', 'mixed', 'spec')
+
+    def __init__(self, end: str, spec: '_Spec' = None) -> None:
+        self.end = end
+        self.elements: List[KonObject] = []
+        self.mixed = False
+        self.spec = spec
+
 
 class KonParser:
     """
@@ -36,12 +222,30 @@ class KonParser:
             as nested dictionaries.
         multiline_string_behaviour (MultilineStringBehaviour): The default
             behaviour for handling multiline strings (when not prefixed).
+        max_depth (int | None): The maximum nesting depth of lists and
+            dictionaries, or None for no limit.
+        lazy (bool): If True, lists and dictionaries written with brackets
+            are only parsed once they are used, see :mod:`kon.lazy`.
+        duplicate_keys (DuplicateKeys): What happens to a key that is set
+            more than once in a dictionary.
+        intern (InternStrings | None): Which strings are interned, or None
+            for none of them.
+        numeric_lists (NumericLists | None): What lists of only ints and
+            floats are turned into, or None to keep them as lists.
     """
     source: str
     allow_implicit_dicts: bool
     multiline_string_behaviour: MultilineStringBehaviour
+    max_depth: Optional[int]
+    lazy: bool
+    duplicate_keys: DuplicateKeys
+    intern: Optional[InternStrings]
+    numeric_lists: Optional[NumericLists]
+    # Set to drop every list and dictionary once it was checked, which
+    # leaves only the top-level keys, see :func:`kon.check.validate`
+    _discard = False
 
-    def __init__(self, source: Union[str, bytes, bytearray], *, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, allow_implicit_dicts: bool = True) -> None:
+    def __init__(self, source: Union[str, bytes, bytearray], *, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, allow_implicit_dicts: bool = True, max_depth: Optional[int] = None, lazy: bool = False, duplicate_keys: Union[DuplicateKeys, str] = DuplicateKeys.LAST_WINS, intern: Union[InternStrings, str, None] = None, intern_table: Optional[Dict[str, str]] = None, numeric_lists: Union[NumericLists, str, None] = None, schema: Optional['Schema'] = None, object_pairs_hook: Optional[Callable[[List[Tuple[KonObject, KonObject]]], Any]] = None, list_hook: Optional[Callable[[List[Any]], Any]] = None) -> None:
         """
         Initializes the parser with the KON source data.
 
@@ -52,13 +256,54 @@ class KonParser:
                 strings are handled. Defaults to MultilineStringBehaviour.IGNORE.
             allow_implicit_dicts: If True, allows key-value pairs
                 at the root level without enclosing braces. Defaults to True.
+            max_depth: The maximum nesting depth of lists and dictionaries,
+                deeper documents raise a ValueError. Defaults to None, which
+                means no limit.
+            lazy: If True, lists and dictionaries written with brackets are
+                returned as :class:`kon.lazy.LazyKonList` and
+                :class:`kon.lazy.LazyKonDict`, which are only parsed once
+                they are used. Defaults to False.
+            duplicate_keys: What happens to a key that is set more than once
+                in a dictionary, or at the top level. Defaults to
+                DuplicateKeys.LAST_WINS.
+            intern: Which strings to intern, so that equal ones share a
+                single object, which saves memory on documents that repeat
+                their keys and values. Defaults to None, which interns none.
+            intern_table: The strings interned so far, by themselves, to
+                share strings with other parses. Only used with `intern`.
+                Defaults to None, which means a new table for this parse.
+            numeric_lists: What lists of only ints and floats are turned
+                into, see :class:`NumericLists`. Can not be combined with
+                `lazy`. Defaults to None, which keeps them as lists.
+            schema: Decodes the source into typed objects as it is parsed,
+                see :func:`kon.schema.compile`. Defaults to None.
+            object_pairs_hook: Called with the `(key, value)` pairs of every
+                dictionary once it was parsed, including the implicit ones
+                and the top-level one, in place of building a dict. Defaults
+                to None.
+            list_hook: Called with the elements of every list once it was
+                parsed, in place of returning the list. Defaults to None.
 
         Raises:
             TypeError: If the source is not a str, bytes, or bytearray.
-            ValueError: If the source is empty or contains only whitespace.
+            ValueError: If the source is empty or contains only whitespace,
+                `duplicate_keys`, `intern` or `numeric_lists` is not a known
+                option, `numeric_lists` is combined with `lazy`, a
+                `schema` or a hook with either of them or with each other,
+                or a `schema` with DuplicateKeys.DEEP_MERGE.
+            ImportError: If `numeric_lists` is NumericLists.NUMPY, but NumPy
+                is not installed.
         """
         self.allow_implicit_dicts = allow_implicit_dicts
         self.multiline_string_behaviour = multiline_string_behaviour
+        self.max_depth = max_depth
+        self.lazy = lazy
+        self.duplicate_keys = DuplicateKeys(duplicate_keys)
+        self._set_intern(intern, intern_table)
+        self._set_numeric_lists(numeric_lists)
+        if lazy and self.numeric_lists is not None:
+            raise ValueError('numeric_lists can not be combined with lazy')
+        self._set_spec(schema, object_pairs_hook, list_hook)
         if isinstance(source, str):
             self.source = source.strip()
         elif isinstance(source, (bytes, bytearray)):
@@ -67,204 +312,170 @@ class KonParser:
             raise TypeError(f'source must be of type {str}, {bytes} or {bytearray}')
         if self.source == '':
             raise ValueError('empty source not allowed')
-        self.position = 0
-
-    def _peek(self, i: int = 0):
-        """Peeks from current position by `i` characters, if beyond the end, returns ''"""
-        return self.source[self.position+i:self.position+i+1]
-
-    def _parse_numeric(self) -> Union[int, float]:
-        start = self.position
-        if self._peek() == '0' and self._peek(1) in ('x', 'o', 'b'):
-            self.position += 2
-            base_char = self.source[self.position-1]
-            valid_digits = ''
-            if base_char == 'x':
-                valid_digits = '0123456789abcdefABCDEF'
-            elif base_char == 'o':
-                valid_digits = '01234567'
-            else: # 'b'
-                valid_digits = '01'
-            
-            while self._peek() in valid_digits and self._peek() != '':
-                self.position += 1
-            num_str = self.source[start:self.position]
-            return int(num_str, base=0)
-
-        while self._peek().isdigit():
-            self.position += 1
-        if self._peek() == ".":
-            self.position += 1
-            while self._peek().isdigit():
-                self.position += 1
-        if self._peek() in "eE":
-            self.position += 1
-            if self._peek() in "+-":
-                self.position += 1
-            while self._peek().isdigit():
-                self.position += 1
-        
-        num_str = self.source[start : self.position]
-        if "." in num_str or "e" in num_str or "E" in num_str:
-            return float(num_str)
-        return int(num_str)
-
-    def _parse_str(self, *, multiline: Optional[MultilineStringBehaviour] = None) -> str:
-        r"""
-        Parse a quoted string. Supports single-line strings and multiline strings
-        introduced with a leading '<' (dedent) or '|' (ignore). When a multiline
-        marker is present the next character must be a quote (" or ').
-
-        Supported escapes: \\, \" , \' , \n , \r , \t , \xNN , \uNNNN
+        self._tokens = create_tokenizer(self.source, multiline_string_behaviour, intern=self.intern, strings=self._strings)
+        self._buffer: Optional[memoryview] = None
+        # Held while a lazy list or dictionary is being parsed
+        self._lazy_lock = threading.RLock() if lazy else None
+
+    @classmethod
+    def _streaming(cls, *, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, allow_implicit_dicts: bool = True, max_depth: Optional[int] = None, duplicate_keys: Union[DuplicateKeys, str] = DuplicateKeys.LAST_WINS, intern: Union[InternStrings, str, None] = None, intern_table: Optional[Dict[str, str]] = None, numeric_lists: Union[NumericLists, str, None] = None, schema: Optional['Schema'] = None, object_pairs_hook: Optional[Callable[[List[Tuple[KonObject, KonObject]]], Any]] = None, list_hook: Optional[Callable[[List[Any]], Any]] = None) -> 'KonParser':
+        """Creates a parser whose source is fed piece by piece to its tokenizer, see :class:`KonFeedParser`."""
+        parser = cls.__new__(cls)
+        parser.allow_implicit_dicts = allow_implicit_dicts
+        parser.multiline_string_behaviour = multiline_string_behaviour
+        parser.max_depth = max_depth
+        parser.lazy = False
+        parser.duplicate_keys = DuplicateKeys(duplicate_keys)
+        parser._set_intern(intern, intern_table)
+        parser._set_numeric_lists(numeric_lists)
+        parser._set_spec(schema, object_pairs_hook, list_hook)
+        parser.source = ''
+        parser._tokens = create_tokenizer('', multiline_string_behaviour, final=False, intern=parser.intern, strings=parser._strings)
+        parser._buffer = None
+        parser._lazy_lock = None
+        return parser
+
+    @classmethod
+    def from_buffer(cls, buffer: Union[bytes, bytearray, memoryview, 'mmap.mmap'], *, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, allow_implicit_dicts: bool = True, max_depth: Optional[int] = None, duplicate_keys: Union[DuplicateKeys, str] = DuplicateKeys.LAST_WINS, intern: Union[InternStrings, str, None] = None, intern_table: Optional[Dict[str, str]] = None, numeric_lists: Union[NumericLists, str, None] = None, schema: Optional['Schema'] = None, object_pairs_hook: Optional[Callable[[List[Tuple[KonObject, KonObject]]], Any]] = None, list_hook: Optional[Callable[[List[Any]], Any]] = None, chunk_size: int = 1 << 20) -> 'KonParser':
         """
-        # Determine whether a multiline marker is present at the current
-        # position. If a marker is present we use the marker's behaviour
-        # ("<" -> DEDENT, "|" -> IGNORE). If no marker is present, the
-        # provided `multiline` argument is treated as the default behaviour
-        # (it does not restrict marker usage). Only when the parser's global
-        # default is VALUE_ERROR and `multiline` is None should encountering
-        # a marker raise an error.
-        mark = self._peek()
-        if multiline is None:
-            multiline = self.multiline_string_behaviour
-        if mark in ('<', '|'):
-            # consume the marker and set behaviour based on it
-            self.position += 1
-        is_multiline = False
-
-        # Next char must be a quote
-        q = self._peek()
-        if q not in ('"', "'"):
-            raise ValueError(f'expected string quote at index {self.position}, found {q!r}')
-        quote = q
-        self.position += 1
-
-        chars: list[str] = []
-        while True:
-            ch = self._peek()
-            if ch == "":
-                raise ValueError('unterminated string')
-            if ch == '\n':
-                is_multiline = True
-            # handle escapes
-            if ch == "\\":
-                self.position += 1
-                esc = self._peek()
-                if esc == "":
-                    raise ValueError('unterminated escape sequence in string')
-                # simple escapes
-                if esc == 'n':
-                    chars.append('\n')
-                    self.position += 1
-                elif esc == 'r':
-                    chars.append('\r')
-                    self.position += 1
-                elif esc == 't':
-                    chars.append('\t')
-                    self.position += 1
-                elif esc in ('\\', '"', "'"):
-                    chars.append(esc)
-                    self.position += 1
-                elif esc == 'x':
-                    # two hex digits
-                    self.position += 1
-                    h1 = self._peek()
-                    h2 = self._peek(1)
-                    if h1 == '' or h2 == '':
-                        raise ValueError('incomplete \\x escape')
-                    hexstr = h1 + h2
-                    try:
-                        chars.append(chr(int(hexstr, 16)))
-                    except ValueError:
-                        raise ValueError('invalid \\x escape')
-                    self.position += 2
-                elif esc == 'u':
-                    # four hex digits
-                    self.position += 1
-                    hx = self.source[self.position:self.position+4]
-                    if len(hx) < 4:
-                        raise ValueError('incomplete \\u escape')
-                    try:
-                        chars.append(chr(int(hx, 16)))
-                    except ValueError:
-                        raise ValueError('invalid \\u escape')
-                    self.position += 4
-                elif esc == '\r' and self._peek(1) == '\n':
-                    self.position += 2
-                elif esc.isspace():
-                    self.position += 1
-                else:
-                    # unknown escape, keep the character as-is
-                    chars.append(esc)
-                    self.position += 1
-                continue
-
-            # closing quote
-            if ch == quote:
-                self.position += 1
-                break
+        Creates a parser for UTF-8 encoded source in a buffer, e.g. a memory
+        mapped file. Instead of decoding (and stripping) the whole source
+        up front, :meth:`parse` decodes and tokenizes it `chunk_size` bytes
+        at a time, dropping each chunk once it was parsed. Surrounding
+        whitespace is skipped as it is reached, without copying the source.
 
-            # normal character (including newlines in multiline strings)
-            chars.append(ch)
-            self.position += 1
-
-        result = ''.join(chars)
-
-        if is_multiline:
-            # If this was a multiline literal with dedent behaviour, use
-            # textwrap.dedent to remove common leading indentation and normalize.
-            if multiline is MultilineStringBehaviour.DEDENT:
-                # textwrap.dedent will remove common indentation; strip a leading
-                # single newline which is a common writer pattern
-                if result.startswith('\n'):
-                    result = result[1:]
-                result = textwrap.dedent(result)
-
-            # If VALUE_ERROR is configured as the global default and the caller
-            # didn't override it, raise now when the parsed string contains a
-            # newline (i.e. it is multiline). This defers the decision until we
-            # actually parsed the content.
-            elif multiline is MultilineStringBehaviour.VALUE_ERROR:
-                raise ValueError('multiline strings are not allowed')
+        Args:
+            buffer: Any object supporting the buffer protocol. It must stay
+                unchanged until :meth:`parse` returns.
+            chunk_size: The number of bytes decoded at a time. Defaults to
+                1 MiB.
 
-        return result
+        Raises:
+            TypeError: If `buffer` does not support the buffer protocol.
+        """
+        view = memoryview(buffer)
+        parser = cls._streaming(multiline_string_behaviour=multiline_string_behaviour, allow_implicit_dicts=allow_implicit_dicts, max_depth=max_depth, duplicate_keys=duplicate_keys, intern=intern, intern_table=intern_table, numeric_lists=numeric_lists, schema=schema, object_pairs_hook=object_pairs_hook, list_hook=list_hook)
+        parser._buffer = view.cast('B') if view.format != 'B' else view
+        parser._chunk_size = chunk_size
+        return parser
 
-    def _parse_list_like(self, start: str, end: str) -> List[KonObject]:
-        if self._peek() != start:
-            raise ValueError(f'expected "{start}" at index {self.position}, but found {self._peek() or "<END>"}')
-        self.position += 1
-        result = []
-        while True:
-            self._skip_whitespace()
-            if self._peek() == end:
-                self.position += 1
-                break
-            v = self.parse(_top_level = False)
-            self._skip_whitespace(newlines=False)
-            if self._peek() not in f'\n,{end}' and self._peek() != '':
-                raise ValueError(f'expected a newline, "{end}" or a comma at index {self.position}, but found {self._peek() or "<END>"}')
-            self.position += 1
-            result.append(v)
-            if self._peek(-1) == end:
-                break
+    def _set_intern(self, intern: Union[InternStrings, str, None], intern_table: Optional[Dict[str, str]]) -> None:
+        self.intern = None if intern is None else InternStrings(intern)
+        # The table of interned strings, shared with the tokenizers
+        self._strings: Optional[Dict[str, str]] = None
+        if self.intern is not None:
+            self._strings = {} if intern_table is None else intern_table
+
+    def _set_spec(self, schema: Optional['Schema'], object_pairs_hook: Optional[Callable[[List[Tuple[KonObject, KonObject]]], Any]], list_hook: Optional[Callable[[List[Any]], Any]]) -> None:
+        # Decodes the top-level value, or None to parse it as usual
+        self._spec: Optional[_Spec] = None
+        if schema is not None:
+            if object_pairs_hook is not None or list_hook is not None:
+                raise ValueError('schema can not be combined with object_pairs_hook or list_hook')
+            self._spec = schema._spec
+        elif object_pairs_hook is not None or list_hook is not None:
+            self._spec = _HookSpec(object_pairs_hook, list_hook)
+        if self._spec is not None and (self.lazy or self.numeric_lists is not None):
+            raise ValueError('a schema or a hook can not be combined with lazy or numeric_lists')
+        if schema is not None and self.duplicate_keys is DuplicateKeys.DEEP_MERGE:
+            # Dataclasses are built from the first value of a key already,
+            # before the next one could be merged into it
+            raise ValueError("a schema can not be combined with duplicate_keys='deep_merge'")
+
+    def _set_numeric_lists(self, numeric_lists: Union[NumericLists, str, None]) -> None:
+        self.numeric_lists = None if numeric_lists is None else NumericLists(numeric_lists)
+        if self.numeric_lists is NumericLists.NUMPY:
+            try:
+                import numpy # noqa: F401
+            except ImportError:
+                raise ImportError("numeric_lists='numpy' needs NumPy to be installed") from None
+
+    @property
+    def position(self) -> int:
+        """Index of the next character to be consumed."""
+        return self._tokens.position
+
+    @position.setter
+    def position(self, value: int) -> None:
+        self._tokens.position = value
+
+    def _parse_dict(self, elements: List[KonObject], mixed: bool) -> KonDictionary:
+        """
+        Builds a dictionary from its elements, after all of them were parsed.
+        They are `(key, value)` entry pairs, unless `mixed` is set.
+        """
+        if not mixed and self.duplicate_keys is DuplicateKeys.LAST_WINS:
+            return dict(elements) # type: ignore
+        return self._merge(elements)
+
+    def _numeric_list(self, elements: List[KonObject]) -> KonObject:
+        """Turns the elements of a list, after all of them were parsed, into an array if they are only ints and floats."""
+        typecode = 'q'
+        for element in elements:
+            if element.__class__ is float:
+                typecode = 'd'
+            elif element.__class__ is not int:
+                return elements
+        if not elements:
+            return elements
+        try:
+            return self._numeric_array(array(typecode, elements)) # type: ignore
+        except OverflowError:
+            return elements
+
+    def _numeric_array(self, values: array) -> KonObject:
+        """Converts an array of the elements of a list to what `numeric_lists` asks for."""
+        if self.numeric_lists is NumericLists.NUMPY:
+            import numpy
+            # Shares the memory of the array instead of copying it
+            return numpy.frombuffer(values, dtype=values.typecode)
+        return values
+
+    def _parse_parts(self, parts: List[KonObject], top_level: bool) -> KonObject:
+        """
+        Turns the parts of a value, after all of them were parsed, into the
+        value itself. A value that is a single entry is left as a pair,
+        except at the top level.
+        """
+        if len(parts) == 0:
+            raise ValueError('empty or otherwise invalid source')
+        elif len(parts) == 1:
+            part = parts[0]
+            if top_level and part.__class__ is tuple:
+                return {part[0]: part[1]} # type: ignore
+            return part
+        if top_level:
+            if self.duplicate_keys is DuplicateKeys.LAST_WINS and all(i.__class__ is tuple for i in parts):
+                return dict(parts) # type: ignore
+            return self._merge(parts)
+        # Logically everything after this is an invalid source with an unset key
+        raise ValueError(f'unset key {_shown(parts[-1])} in dictionary@({" ".join(_shown(i) for i in parts[:-1])})')
+
+    def _merge(self, elements: List[KonObject]) -> KonDictionary:
+        """Inserts entry pairs and the entries of dictionaries into a single dictionary, see `duplicate_keys`."""
+        pairs = True
+        for element in elements:
+            if element.__class__ is not tuple:
+                if not isinstance(element, dict):
+                    raise ValueError(f'unset key {_shown(elements[-1])} in dictionary@({" ".join(_shown(i) for i in elements[:-1])})')
+                pairs = False
+        policy = self.duplicate_keys
+        if pairs and policy is DuplicateKeys.LAST_WINS:
+            # The common top level of `key = value` entries, where a later
+            # value replaces an earlier one in its place, as it does in `dict`
+            return dict(elements) # type: ignore
+        result: KonDictionary = {}
+        for element in elements:
+            for key, value in ((element,) if element.__class__ is tuple else element.items()): # type: ignore
+                if policy is DuplicateKeys.LAST_WINS or key not in result:
+                    result[key] = value
+                elif policy is DuplicateKeys.ERROR:
+                    raise ValueError(f'duplicate key {key!r} in dictionary')
+                elif policy is DuplicateKeys.DEEP_MERGE:
+                    _deep_merge(result, key, value)
         return result
 
-    def _parse_list(self) -> List[KonObject]:
-        return self._parse_list_like('(', ')')
-    
-    def _parse_dict(self) -> KonDictionary:
-        mlist = self._parse_list_like('{', '}')
-        if len(mlist) == 0:
-            return {}
-        if all(isinstance(i, dict) for i in mlist):
-            mlist.reverse()
-            result = mlist.pop()
-            while len(mlist) > 0:
-                result.update(mlist.pop()) # type: ignore
-            return result # type: ignore
-        raise ValueError(f'unset key {mlist[-1]} in dictionary@({" ".join(str(i) for i in mlist[:-1])})')
-
-    def parse(self, _top_level: bool = True, *, _until: Optional[int] = None) -> KonObject:
+    def parse(self) -> KonObject:
         """
         Parses the source string into a KonObject.
 
@@ -274,10 +485,12 @@ class KonParser:
 
         It ignores line comments specified by a hash symbol (`#`).
 
-        The parsing logic handles different contexts via the `_top_level` flag.
-        When at the top level, newlines are treated as simple whitespace.
-        Inside structures like lists or dictionaries (`_top_level=False`),
-        newlines can act as terminators.
+        Nested values do not recurse, they are parsed on an explicit stack of
+        frames, so the nesting depth is only limited by `max_depth` (and
+        memory). A frame is either a value made up of parts (see below) or
+        the elements of a list or dictionary. When at the top level, newlines
+        are treated as simple whitespace. Inside structures like lists or
+        dictionaries, newlines can act as terminators.
 
         A key feature is the "collapsing" of parts. The parser can handle
         implicit key-value structures like `key1 key2 = "value"`, which is
@@ -288,12 +501,11 @@ class KonParser:
         At the top level, if the source consists of multiple dictionaries,
         they are merged into a single dictionary.
 
-        Args:
-            _top_level (bool): A boolean indicating if the parser is at the top
-                level of the source. Defaults to True.
-            _until (int): An optional integer position in the source string at which
-                to stop parsing. Used for nested structures. Defaults to None,
-                which means parsing until the end of the source.
+        When `lazy` is set, the brackets of a list or a dictionary are only
+        matched up, skipping its contents, and a lazy list or dictionary that
+        parses them once it is used takes its place. Everything around them,
+        like implicit dictionaries and the top-level merging, is parsed as
+        usual.
 
         Returns:
             The parsed KonObject, which can be a dictionary, list, string,
@@ -301,112 +513,612 @@ class KonParser:
 
         Raises:
             ValueError: If the source is empty, contains unexpected characters,
-                or has an invalid structure (e.g., a key without a value).
+                has an invalid structure (e.g., a key without a value) or is
+                nested deeper than `max_depth`.
             TypeError: If the source contains a type violation (with the unary
                 operators supported, as that is the only way to get one)
         """
-        if _until is None:
-            _until = len(self.source)
-        parts: list[KonObject] = []
-        while _until > self.position:
-            self._skip_whitespace(newlines=_top_level)
-            ch = self._peek()
-            if ch == '+':
-                self.position += 1
-                self._skip_whitespace()
-                n = self.parse(_top_level = False)
-                if not isinstance(n, (int, float)):
-                    raise TypeError(f'cannot apply unary plus a(n) {type(n).__name__}, only an int or float')
-                parts.append(n)
-            elif ch == '-':
-                self.position += 1
-                self._skip_whitespace()
-                n = self.parse(_top_level = False)
-                if not isinstance(n, (int, float)):
-                    raise TypeError(f'cannot negate a(n) {type(n).__name__}, only an int or float')
-                parts.append(-n)
-            elif ch.isdigit():
-                parts.append(self._parse_numeric())
-            elif ch in ('"', "'"):
-                parts.append(self._parse_str())
-            elif ch == '<' and self._peek(1) in ('"', "'"):
-                parts.append(self._parse_str(multiline=MultilineStringBehaviour.DEDENT))
-            elif ch == '|' and self._peek(1) in ('"', "'"):
-                parts.append(self._parse_str(multiline=MultilineStringBehaviour.IGNORE))
-            elif ch.isidentifier() or ch in "$-:":
-                parts.append(self._parse_identifier_str())
-            elif ch == '{':
-                result = self._parse_dict()
-                result = self._collapse_parts(parts, result)
-                parts.append(result)
-            elif ch == '(':
-                result = self._parse_list()
-                result = self._collapse_parts(parts, result)
-                parts.append(result)
-            elif ch == '=':
-                self.position += 1
-                result = self.parse(_top_level = False)
-                result = self._collapse_parts(parts, result)
-                parts.append(result)
-            elif ch == '#':
-                while self._peek() not in '\n':
-                    self.position += 1
-                self.position += 1
+        if self._buffer is not None:
+            return self._parse_buffer(self._buffer)
+        try:
+            # Without streaming, the engine never yields
+            next(self._run(stream=False))
+        except StopIteration as stop:
+            return stop.value
+        raise AssertionError('unreachable')
+
+    def _parse_buffer(self, buffer: memoryview) -> KonObject:
+        """Parses a buffer given to :meth:`from_buffer`, feeding it to the tokenizer a chunk at a time."""
+        tokens = self._tokens
+        chunk_size = self._chunk_size
+        # Released when done, so that e.g. a memory map can be closed
+        self._buffer = None
+        with buffer:
+            engine = self._run(stream=False)
+            # Runs until the engine asks for the first piece
+            next(engine)
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            started = False
+            # Whitespace is only fed once something follows it, which strips
+            # the end of the source
+            whitespace = ''
+            for start in range(0, len(buffer) + 1, chunk_size):
+                final = start + chunk_size > len(buffer)
+                with buffer[start:start + chunk_size] as chunk:
+                    text = decoder.decode(chunk, final)
+                if not started:
+                    text = text.lstrip()
+                    started = text != ''
+                content = text.rstrip()
+                if content == '':
+                    whitespace += text
+                    continue
+                tokens.feed(whitespace + content)
+                whitespace = text[len(content):]
+                if next(engine) is not None:
+                    raise AssertionError('unreachable')
+        if not started:
+            raise ValueError('empty source not allowed')
+        tokens.feed('', final=True)
+        try:
+            next(engine)
+        except StopIteration as stop:
+            return stop.value
+        raise AssertionError('unreachable')
+
+    def spans(self) -> 'SpanMap':
+        """
+        Returns where the keys and values of the source are, by their path,
+        see :class:`kon.spans.SpanMap`. The positions are indices of `source`,
+        which does not include the whitespace around the given source. The
+        source is parsed again for them, independent of :meth:`parse`, so
+        `lazy`, `intern`, `numeric_lists` and schemas or hooks make no
+        difference.
+
+        Raises:
+            ValueError: If the source is invalid, or the parser has none,
+                because it was created with :meth:`from_buffer`.
+            TypeError: If the source contains a type violation.
+        """
+        from .spans import _span_map
+        if self.source == '':
+            raise ValueError('the parser has no source to map, parse the buffer as a string instead')
+        return _span_map(self)
+
+    def _parse_lazy(self, start: int, depth: int) -> Union[KonDictionary, List[KonObject]]:
+        """Parses the elements of a lazy list or dictionary, whose opening bracket is at `start`."""
+        tokens = create_tokenizer(self.source, self.multiline_string_behaviour, start + 1, intern=self.intern, strings=self._strings)
+        closing = '}' if self.source[start] == '{' else ')'
+        try:
+            next(self._run(stream=False, tokens=tokens, closing=closing, depth=depth))
+        except StopIteration as stop:
+            return stop.value # type: ignore
+        raise AssertionError('unreachable')
+
+    def _run(self, stream: bool, tokens: Optional[KonTokenizer] = None, closing: Optional[str] = None, depth: int = 0) -> Generator[Optional[_Entries], None, KonObject]:
+        """
+        Runs the parsing engine, see :meth:`parse`. When the input is fed to
+        the tokenizer piece by piece, the engine yields None when it needs
+        more input. Each step of the engine only changes its state after all
+        of its tokens were read, so a step that runs out of input is simply
+        started over once more input was fed. When streaming, the engine also
+        yields every top-level dictionary (or `(key, value)` entry pair) as
+        soon as it is complete.
+
+        With a `closing` bracket, the engine parses the elements of a list or
+        a dictionary at `depth` from `tokens` instead, for a lazy one.
+        """
+        if tokens is None:
+            tokens = self._tokens
+        incremental = not tokens.final
+        max_depth = self.max_depth
+        lazy = self.lazy
+        numeric_lists = self.numeric_lists is not None
+        discard = self._discard
+        stack: List[Union[_PartsFrame, _ElementsFrame]] = []
+        frame: Union[_PartsFrame, _ElementsFrame] = _PartsFrame([], True, self._spec) if closing is None else _ElementsFrame(closing)
+        # Set when a frame was finished with `result`, and the one on top of
+        # the stack should continue with it
+        returned = False
+        result: KonObject = None
+        yielded = False
+        mark = None
+        while True:
+            child: Union[_PartsFrame, _ElementsFrame, None] = None
+            if frame.__class__ is _PartsFrame:
+                parts = frame.parts
+                top_level = frame.top_level
+                spec = frame.spec
+                done = False
+                if returned:
+                    returned = False
+                    op = frame.op
+                    if result.__class__ is tuple:
+                        # A single entry, which is only kept as a pair until it is used as a value
+                        result = {result[0]: result[1]} # type: ignore
+                        if spec is not None:
+                            result = self._typed(tokens, _build_keyed, spec, parts, result)
+                    if op == '+':
+                        if not isinstance(result, (int, float)):
+                            raise TypeError(f'cannot apply unary plus a(n) {type(result).__name__}, only an int or float')
+                        parts.append(result)
+                    elif op == '-':
+                        if not isinstance(result, (int, float)):
+                            raise TypeError(f'cannot negate a(n) {type(result).__name__}, only an int or float')
+                        parts.append(-result)
+                    elif spec is None:
+                        parts.append(self._collapse_parts(parts, result))
+                        # The value of a `=` is parsed up to the terminator
+                        done = op == '=' and not top_level
+                    else:
+                        # Lists and dictionaries were built by their own spec
+                        parts.append(self._typed(tokens, self._collapse_typed, parts, result, spec, op != '='))
+                        done = op == '=' and not top_level
+                while not done:
+                    if stream:
+                        if top_level and parts and (parts[-1].__class__ is tuple or isinstance(parts[-1], dict)):
+                            if len(parts) > 1:
+                                # Raises the unset key error
+                                self._parse_parts(parts, top_level)
+                            yield parts.pop()
+                            yielded = True
+                    if incremental:
+                        mark = tokens.mark()
+                    try:
+                        kind, value = tokens.next(newlines=top_level)
+                        if kind in VALUE_KINDS:
+                            parts.append(value)
+                        elif kind == ENTRY:
+                            if spec is None:
+                                parts.append(self._collapse_parts(parts, value))
+                            else:
+                                parts.append(self._typed(tokens, self._collapse_typed, parts, value, spec, False))
+                            done = not top_level
+                        elif kind == '=':
+                            kind, value = tokens.next(newlines=False)
+                            if kind in VALUE_KINDS:
+                                if spec is not None:
+                                    # Where the value is, for its errors
+                                    at = tokens.mark()
+                                if tokens.peek() in TERMINATORS:
+                                    # The common `key = value` case, nothing
+                                    # else can follow the value before the
+                                    # terminator
+                                    if spec is None:
+                                        parts.append(self._collapse_parts(parts, value))
+                                    else:
+                                        parts.append(self._typed(tokens, self._collapse_typed, parts, value, spec, False, at=at))
+                                    done = not top_level
+                                    continue
+                                child = _PartsFrame([value], False)
+                            else:
+                                if kind != END:
+                                    tokens.push_back()
+                                child = _PartsFrame([], False)
+                            if spec is not None:
+                                child.spec = self._typed(tokens, _navigate, spec, parts)
+                            frame.op = '='
+                        elif kind == '{' or kind == '(':
+                            depth += 1
+                            if max_depth is not None and depth > max_depth:
+                                raise ValueError(f'maximum nesting depth of {max_depth} exceeded at index {tokens.last_start()}')
+                            if lazy:
+                                start, end = tokens.skip_subtree()
+                                value = (LazyKonDict if kind == '{' else LazyKonList)._unloaded(self, start, end, depth)
+                                depth -= 1
+                                parts.append(self._collapse_parts(parts, value))
+                                continue
+                            if numeric_lists and kind == '(':
+                                # Most lists of numbers are converted in
+                                # bulk, without tokenizing their elements
+                                values = tokens.numeric_list()
+                                if values is not None:
+                                    depth -= 1
+                                    parts.append(self._collapse_parts(parts, self._numeric_array(values)))
+                                    continue
+                            child = _ElementsFrame('}' if kind == '{' else ')')
+                            if spec is not None:
+                                child.spec = self._typed(tokens, _open, spec, parts, kind)
+                                if child.spec is not None and child.spec.skip and not incremental:
+                                    # A value that the schema drops, which
+                                    # is not parsed at all
+                                    tokens.skip_subtree(resume=True)
+                                    depth -= 1
+                                    parts.append(self._collapse_typed(parts, None, spec, True))
+                                    child = None
+                                    continue
+                            frame.op = kind
+                        elif kind == '+' or kind == '-':
+                            tokens.skip_whitespace()
+                            child = _PartsFrame([], False)
+                            frame.op = kind
+                        elif kind == END:
+                            done = True
+                        elif not top_level:
+                            # A newline, a comma or a closing bracket, leave
+                            # it for the enclosing frame to consume
+                            tokens.push_back()
+                            done = True
+                    except NeedMoreData:
+                        tokens.reset(mark) # type: ignore
+                        self._skip_ignored(top_level)
+                        yield None
+                        continue
+                    if child is not None:
+                        break
+                if done:
+                    if stream and top_level:
+                        if parts or not yielded:
+                            result = self._parse_parts(parts, top_level)
+                            raise ValueError(f'only a dictionary can be streamed, but the top-level value is a(n) {type(result).__name__}')
+                        return None
+                    result = self._parse_parts(parts, top_level)
+                    if spec is not None and top_level:
+                        result = self._typed(tokens, _decode_root, spec, parts, result)
+                        if result.__class__ is _Incomplete:
+                            raise result.error()
             else:
-                if ch in '\n,)}':
-                    if not _top_level:
+                end = frame.end
+                elements = frame.elements
+                spec = frame.spec
+                # The spec of each element, which looks up the keys of an
+                # entry in the dictionary itself
+                element_spec = spec if end == '}' or spec is None else spec.item
+                while True:
+                    if incremental:
+                        mark = tokens.mark()
+                    try:
+                        # The token that the errors of a schema point to,
+                        # when it is not the last one
+                        at = None
+                        if returned:
+                            v = result
+                        else:
+                            kind, v = tokens.next_element()
+                            if kind == end:
+                                tokens.next()
+                                break
+                            if kind in VALUE_KINDS:
+                                if element_spec is not None:
+                                    at = tokens.mark()
+                                if tokens.peek() not in TERMINATORS:
+                                    child = _PartsFrame([v], False, element_spec)
+                                    break
+                            elif kind != ENTRY:
+                                child = _PartsFrame([], False, element_spec)
+                                break
+                        if element_spec is not None:
+                            # Elements are decoded here, but for the values
+                            # of entries that the frame which returned them
+                            # decoded already
+                            if v.__class__ is tuple:
+                                if not returned:
+                                    value_spec = (element_spec if end == '}' else element_spec.open('{')).child(v[0]) # type: ignore
+                                    if value_spec is not None:
+                                        v = v[0], value_spec.convert(v[1]) # type: ignore
+                                if end == ')':
+                                    v = _located(tokens, element_spec.open('{').build_dict({v[0]: v[1]}), at) # type: ignore
+                            elif end == ')' and v.__class__ is not _Incomplete:
+                                v = element_spec.convert(v)
+                        # Elements end right at the terminator that follows them
+                        kind, _ = tokens.next(newlines=False)
+                    except NeedMoreData:
+                        tokens.reset(mark) # type: ignore
+                        if not returned:
+                            self._skip_ignored(True, comments=False)
+                        yield None
+                        continue
+                    except _SchemaMismatch as error:
+                        raise TypeError(f'{error} at index {tokens.last_start(at)}') from None
+                    if kind != '\n' and kind != ',' and kind != end and kind != END:
+                        raise ValueError(f'expected a newline, "{end}" or a comma at index {tokens.last_start()}, but found {kind}')
+                    if v.__class__ is tuple:
+                        if end == ')':
+                            v = {v[0]: v[1]} # type: ignore
+                    elif end == '}':
+                        frame.mixed = True
+                    returned = False
+                    elements.append(v)
+                    if kind == end:
                         break
+                if child is None:
+                    depth -= 1
+                    if end == '}':
+                        result = self._parse_dict(elements, frame.mixed)
+                        if spec is not None:
+                            result = self._typed(tokens, spec.build_dict, result)
+                        elif discard:
+                            result = {}
+                    elif spec is not None:
+                        result = self._typed(tokens, spec.build_list, elements)
+                    elif discard:
+                        # An empty one, as None could be taken for a key
+                        result = []
+                    elif numeric_lists:
+                        result = self._numeric_list(elements)
                     else:
-                        self.position += 1
-                        continue
-                raise ValueError(f'unexpected character: {ch!r} at index {self.position}')
-            self._skip_whitespace(newlines=_top_level)
+                        result = elements
 
-        if len(parts) == 0:
-            raise ValueError('empty or otherwise invalid source')
-        elif len(parts) == 1:
-            return parts[0]
-        if _top_level and all(isinstance(i, dict) for i in parts):
-            parts.reverse()
-            result = parts.pop()
-            while len(parts) > 0:
-                result.update(parts.pop()) # type: ignore
+            if child is not None:
+                stack.append(frame)
+                frame = child
+            elif stack:
+                frame = stack.pop()
+                returned = True
+            else:
+                return result
+
+    def _skip_ignored(self, newlines: bool, comments: bool = True) -> None:
+        """
+        Skips the tokens that the step which ran out of input starts by
+        skipping, so that they are dropped on the next feed instead of being
+        kept (and tokenized again) until the step can be completed.
+        """
+        try:
+            if comments:
+                self._tokens.skip_ignored(newlines)
+            else:
+                self._tokens.skip_whitespace()
+        except NeedMoreData:
+            pass
+
+    def _typed(self, tokens: KonTokenizer, function: Callable[..., KonObject], *args: Any, at: Optional[Tuple[int, List[str], int]] = None) -> Any:
+        """
+        Calls a function that decodes values with a schema, adding the
+        position of the last token to its errors, or of the last one before
+        the mark `at`.
+        """
+        try:
+            return _located(tokens, function(*args), at)
+        except _SchemaMismatch as error:
+            raise TypeError(f'{error} at index {tokens.last_start(at)}') from None
+
+    def _collapse_typed(self, parts: List[KonObject], result: KonObject, spec: _Spec, built: bool) -> KonObject:
+        """
+        Like :meth:`_collapse_parts`, but decodes `result` and the
+        dictionaries of the keys with `spec`, except for a `result` that was
+        `built` by its own spec already.
+        """
+        keys = _trailing_keys(parts)
+        del parts[len(parts) - len(keys):]
+        strings = self._strings
+        if strings is not None:
+            keys = [strings.get(key) or _intern(strings, key) if key.__class__ is str else key for key in keys] # type: ignore
+        if result.__class__ is _Incomplete:
+            built = True
+        if len(keys) == 1 and result.__class__ is not tuple:
+            # The common `key value`
+            if not built:
+                value_spec = spec.open('{').child(keys[0]) # type: ignore
+                if value_spec is not None:
+                    result = value_spec.convert(result)
+            return keys[0], result
+        if result.__class__ is tuple:
+            keys.append(result[0]) # type: ignore
+            result = result[1] # type: ignore
+            built = False
+        # The specs of the values of each of the keys
+        specs: List[Optional[_Spec]] = [spec]
+        for key in keys:
+            specs.append(None if specs[-1] is None else specs[-1].open('{').child(key)) # type: ignore
+        if specs[-1] is not None and not built:
+            result = specs[-1].convert(result) # type: ignore
+        for i in range(len(keys) - 1, 0, -1):
+            result = {keys[i]: result}
+            if specs[i] is not None:
+                result = specs[i].open('{').build_dict(result) # type: ignore
+        if not keys:
             return result
-        # Logically everything after this is an invalid source with an unset key
-        raise ValueError(f'unset key {parts[-1]} in dictionary@({" ".join(str(i) for i in parts[:-1])})')
+        return keys[0], result
 
-    def _collapse_parts(self, parts: List[KonObject], result: KonObject):
+    def _collapse_parts(self, parts: List[KonObject], result: KonObject) -> KonObject:
+        """
+        Collapses the keys at the end of `parts` with `result`, e.g. the
+        parts of `a b = 1` into the entry `('a', {'b': 1})`. Without keys,
+        `result` is returned as is.
+        """
+        if parts:
+            part = parts[-1]
+            if part.__class__ is str and (len(parts) == 1 or parts[-2].__class__ is tuple or isinstance(parts[-2], dict)):
+                # The common single key, after the entries before it
+                parts.pop()
+                strings = self._strings
+                if strings is not None:
+                    part = strings.get(part) or _intern(strings, part)
+                if result.__class__ is tuple:
+                    result = {result[0]: result[1]} # type: ignore
+                return part, result
+        key: KonObject = _NO_KEY
+        strings = self._strings
         while len(parts) > 0:
-            key = parts.pop()
-            if key is not None and not isinstance(key, (str, int, float, bool)):
-                parts.append(key)
+            part = parts[-1]
+            if part is not None and not isinstance(part, (str, int, float, bool)):
                 break
-            result = {key: result}
-        return result
+            parts.pop()
+            if strings is not None and part.__class__ is str:
+                part = strings.get(part) or _intern(strings, part) # type: ignore
+            if key is not _NO_KEY:
+                result = {key: result}
+            elif result.__class__ is tuple:
+                result = {result[0]: result[1]} # type: ignore
+            key = part
+        if key is _NO_KEY:
+            return result
+        return key, result
+
+
+_NO_KEY: KonObject = object()
+
 
-    def _skip_whitespace(self, newlines: bool = True):
-        while self._peek().isspace() and (newlines or self._peek() != '\n'):
-            self.position += 1
+def _trailing_keys(parts: List[KonObject]) -> List[KonObject]:
+    """The keys at the end of `parts`, which `_collapse_parts` collapses with the next value."""
+    start = len(parts)
+    while start > 0 and (parts[start - 1] is None or isinstance(parts[start - 1], (str, int, float, bool))):
+        start -= 1
+    return parts[start:]
 
-    def _parse_identifier_str(self) -> Union[str, None, bool, float]:
+
+def _navigate(spec: '_Spec', parts: List[KonObject]) -> Optional['_Spec']:
+    """The spec of the value of the keys at the end of `parts`, in the value of `spec`."""
+    for key in _trailing_keys(parts):
+        spec = spec.open('{').child(key) # type: ignore
+        if spec is None:
+            break
+    return spec
+
+
+def _open(spec: '_Spec', parts: List[KonObject], bracket: str) -> Optional['_Spec']:
+    """The spec of a list or dictionary opened with `bracket` after the keys at the end of `parts`."""
+    spec = _navigate(spec, parts) # type: ignore
+    return None if spec is None else spec.open(bracket)
+
+
+def _build_keyed(spec: '_Spec', parts: List[KonObject], values: KonDictionary) -> KonObject:
+    """Builds the dictionary of a single entry, which is the value of the keys at the end of `parts`."""
+    spec = _navigate(spec, parts) # type: ignore
+    return values if spec is None else spec.open('{').build_dict(values) # type: ignore
+
+
+def _decode_root(spec: '_Spec', parts: List[KonObject], result: KonObject) -> KonObject:
+    """Decodes the top-level value, which is built from its entries unless it is a single value."""
+    if parts[-1].__class__ is tuple:
+        result = spec.open('{').build_dict(result) # type: ignore
+    elif result.__class__ is not _Incomplete:
+        result = spec.convert(result)
+    return spec.finish(result)
+
+
+def _located(tokens: KonTokenizer, value: KonObject, at: Optional[Tuple[int, List[str], int]] = None) -> KonObject:
+    """Adds the position of the last token (or the last one before `at`) to an :class:`_Incomplete` value that was just built, or entry that was."""
+    # A hook might return tuples of any length
+    incomplete = value[1] if value.__class__ is tuple and len(value) == 2 else value # type: ignore
+    if incomplete.__class__ is _Incomplete and incomplete.index is None:
+        incomplete.index = tokens.last_start(at)
+    return value
+
+
+def _shown(element: KonObject) -> str:
+    """Formats an element for an error, entry pairs as the dictionaries they stand for."""
+    if element.__class__ is tuple:
+        return str({element[0]: element[1]}) # type: ignore
+    return str(element)
+
+
+def _deep_merge(target: KonDictionary, key: KonObject, value: KonObject) -> None:
+    """Sets `key` of `target` to `value`, merging them on every level where both are dictionaries."""
+    # Uses an explicit stack, like the parser, the values may be nested deeply
+    stack = [(target, key, value)]
+    while stack:
+        target, key, value = stack.pop()
+        current = target.get(key, _NO_KEY) # type: ignore
+        if isinstance(current, dict) and isinstance(value, dict):
+            # In reverse, so that new keys are added in order
+            stack.extend((current, k, v) for k, v in reversed(list(value.items())))
+        else:
+            target[key] = value # type: ignore
+
+
+class KonFeedParser:
+    """
+    An incremental (push) parser, for Kon data that arrives in pieces of any
+    size, e.g. from a socket.
+
+    Pieces are passed to :meth:`feed` as they arrive, and :meth:`close` is
+    called after the last one. The tokenizer and the parse state are kept
+    between pieces, so a piece may end anywhere: in the middle of a UTF-8
+    sequence, an escape, a multiline string or a nested value. Only the part
+    of the input that was not parsed yet is kept.
+
+    As with :func:`kon.iterload`, the top-level value must be a dictionary.
+    Each of its key/value pairs is emitted as soon as it was parsed: passed
+    to `callback` if one was given, and otherwise collected until the
+    parser is iterated over.
+
+    Attributes:
+        callback (Callable | None): Called with every completed top-level
+            key and value, instead of collecting them.
+    """
+    callback: Optional[Callable[[KonObject, KonObject], None]]
+
+    def __init__(self, callback: Optional[Callable[[KonObject, KonObject], None]] = None, *, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, allow_implicit_dicts: bool = True, max_depth: Optional[int] = None, duplicate_keys: Union[DuplicateKeys, str] = DuplicateKeys.LAST_WINS, intern: Union[InternStrings, str, None] = None, intern_table: Optional[Dict[str, str]] = None, numeric_lists: Union[NumericLists, str, None] = None) -> None:
         """
-        Parse an identifier-like token (unquoted string). Recognize
-        keywords null/true/false and otherwise return the identifier string.
+        Initializes the parser, see :class:`KonParser` for the options.
+        `duplicate_keys` only applies to nested dictionaries, as every
+        top-level entry is emitted.
+
+        Args:
+            callback: Called with every completed top-level key and value.
+                Defaults to None, which collects them for iteration instead.
         """
-        start = self.position
-        # identifier chars: letters, digits, underscore, and a few punctuation
-        while True:
-            ch = self._peek()
-            if ch == '' or not (ch.isidentifier() or ch.isdigit() or ch in '_-:$'):
-                break
-            self.position += 1
-        ident = self.source[start:self.position]
-        if ident == 'null':
-            return None
-        if ident == 'true':
-            return True
-        if ident == 'false':
-            return False
-        if ident in ('inf', 'infinity', 'Inf', 'Infinity') or ident in ('nan', 'Nan', 'NaN'):
-            return float(ident)
-        return ident
+        self.callback = callback
+        self._parser = KonParser._streaming(multiline_string_behaviour=multiline_string_behaviour, allow_implicit_dicts=allow_implicit_dicts, max_depth=max_depth, duplicate_keys=duplicate_keys, intern=intern, intern_table=intern_table, numeric_lists=numeric_lists)
+        self._engine: Optional[Generator[Optional[_Entries], None, KonObject]] = self._parser._run(stream=True)
+        self._decoder: Optional[codecs.IncrementalDecoder] = None
+        self._pending: Deque[Tuple[KonObject, KonObject]] = deque()
+        # Runs until the engine asks for the first piece
+        self._resume()
+
+    def feed(self, data: Union[str, bytes, bytearray]) -> None:
+        """
+        Parses the next piece of the input. Bytes are decoded as UTF-8.
+
+        Raises:
+            ValueError: If the input is invalid, or the parser is closed
+                (after :meth:`close` or an error).
+            TypeError: If the input contains a type violation.
+        """
+        self._feed(self._decode(data), final=False)
+
+    def close(self) -> None:
+        """
+        Marks the end of the input, and parses what is left of it.
+
+        Raises:
+            ValueError: If the input is invalid or incomplete, or the parser
+                is closed.
+            TypeError: If the input contains a type violation.
+        """
+        text = self._decoder.decode(b'', final=True) if self._decoder is not None else ''
+        self._feed(text, final=True)
+        self._engine = None
+
+    def __iter__(self) -> Iterator[Tuple[KonObject, KonObject]]:
+        """Yields (and forgets) the key/value pairs completed so far."""
+        while self._pending:
+            yield self._pending.popleft()
+
+    def _decode(self, data: Union[str, bytes, bytearray]) -> str:
+        if isinstance(data, str):
+            return data
+        if isinstance(data, (bytes, bytearray)):
+            if self._decoder is None:
+                self._decoder = codecs.getincrementaldecoder('utf-8')()
+            return self._decoder.decode(data)
+        raise TypeError(f'data must be of type {str}, {bytes} or {bytearray}')
+
+    def _feed(self, text: str, final: bool) -> None:
+        if self._engine is None:
+            raise ValueError('the parser is closed')
+        self._parser._tokens.feed(text, final)
+        self._resume()
+
+    def _resume(self) -> None:
+        """Runs the engine until it needs more input, or it is done."""
+        engine = self._engine
+        assert engine is not None
+        try:
+            while True:
+                part = next(engine)
+                if part is None:
+                    return
+                for key, value in ((part,) if part.__class__ is tuple else part.items()): # type: ignore
+                    if self.callback is not None:
+                        self.callback(key, value)
+                    else:
+                        self._pending.append((key, value))
+        except StopIteration:
+            self._engine = None
+        except BaseException:
+            # The engine can not continue after an error
+            self._engine = None
+            raise
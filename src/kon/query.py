@@ -0,0 +1,138 @@
+"""
+Extraction of values by their path, see :func:`extract`.
+"""
+import fnmatch
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .cache import _rebuild
+from .parser import KonParser
+from .types import KonObject
+
+Path = Union[str, Sequence[Union[str, int]]]
+"""A path, either a string of segments separated by dots or a sequence of segments."""
+
+_GLOB_CHARS = frozenset('*?[')
+
+
+class _Segment:
+    """A segment of a path, matched against the keys of a dictionary or the indices of a list."""
+    __slots__ = ('text', 'glob', 'keys', 'index')
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.glob = not _GLOB_CHARS.isdisjoint(text)
+        # The keys written as `text` in Kon, e.g. `1` is both "1" and 1
+        self.keys: List[Any] = [text]
+        self.index: Optional[int] = None
+        scalar = _scalar(text) if not self.glob else None
+        if scalar is not None:
+            self.keys.append(scalar[0])
+            if type(scalar[0]) is int:
+                self.index = scalar[0]
+
+
+def extract(source: Union[str, bytes, bytearray], paths: Union[str, Iterable[Path]], **kwargs) -> Dict[Tuple[Any, ...], KonObject]:
+    """
+    Extracts the values at `paths` from a Kon-formatted string, bytes, or
+    bytearray, parsing only what it takes to reach them.
+
+    The source is parsed lazily (see :mod:`kon.lazy`): the lists and
+    dictionaries that are not on the way to a path are skipped by matching
+    up their brackets, without parsing their contents. Everything else is
+    parsed as usual, so implicit dictionaries (`widget window title = ...`)
+    and the merging of repeated keys, where the last one wins, work exactly
+    as with :func:`kon.loads`.
+
+    A path is a string of segments separated by dots, e.g.
+    `"widget.window.title"`, or a sequence of segments for keys containing
+    dots. A segment matches the key of a dictionary written the same way in
+    Kon (`1` matches both the key `1` and `"1"`, `true` both `true` and
+    `"true"`) or the index of a list, which may be negative. Segments with
+    `*`, `?` or `[...]` are globs (see :mod:`fnmatch`), matched against the
+    keys and indices as they are written in Kon, e.g. `"services.*.port"`.
+
+    Errors in parts of the source that were skipped are not noticed, besides
+    mismatched brackets and unterminated strings.
+
+    Args:
+        source: The Kon-formatted data.
+        paths: The paths to extract, or a single path string.
+        **kwargs: Additional keyword arguments to be passed to the `KonParser`.
+
+    Raises:
+        ValueError: If the source is invalid.
+        TypeError: If the source contains a type violation.
+
+    Returns:
+        dict: The values that were found, as plain dictionaries and lists,
+            by their path: a tuple of the keys and indices that lead to
+            them. Paths are in the order they were given, and the matches of
+            a glob in the order of the source. Paths that were not found are
+            left out.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    document = KonParser(source, lazy=True, **kwargs).parse()
+    result: Dict[Tuple[Any, ...], KonObject] = {}
+    for path in paths:
+        for found, value in _find(document, _split(path)):
+            result[found] = _rebuild(value, dict, list)
+    return result
+
+
+def _split(path: Path) -> List[_Segment]:
+    if isinstance(path, str):
+        return [_Segment(text) for text in path.split('.')]
+    return [_Segment(str(text)) for text in path]
+
+
+def _find(document: KonObject, segments: List[_Segment]) -> List[Tuple[Tuple[Any, ...], KonObject]]:
+    """Returns the paths and values matching `segments`, one level at a time."""
+    matches: List[Tuple[Tuple[Any, ...], KonObject]] = [((), document)]
+    for segment in segments:
+        found = []
+        for path, value in matches:
+            if isinstance(value, dict):
+                if segment.glob:
+                    for key, item in value.items():
+                        if fnmatch.fnmatchcase(_key_text(key), segment.text):
+                            found.append((path + (key,), item))
+                else:
+                    for key in segment.keys:
+                        if key in value:
+                            found.append((path + (key,), value[key]))
+            elif isinstance(value, list):
+                if segment.glob:
+                    for index, item in enumerate(value):
+                        if fnmatch.fnmatchcase(str(index), segment.text):
+                            found.append((path + (index,), item))
+                elif segment.index is not None and -len(value) <= segment.index < len(value):
+                    index = segment.index % len(value)
+                    found.append((path + (index,), value[index]))
+        matches = found
+    return matches
+
+
+def _key_text(key: Any) -> str:
+    """Returns `key` as it is written in Kon, without quotes."""
+    if isinstance(key, str):
+        return key
+    if key is None:
+        return 'null'
+    if isinstance(key, bool):
+        return 'true' if key else 'false'
+    return repr(key)
+
+
+def _scalar(text: str) -> Optional[Tuple[Any]]:
+    """Returns the number or keyword `text` is in Kon, if it is one."""
+    try:
+        value = KonParser(text).parse()
+    except (ValueError, TypeError):
+        return None
+    if value is None or isinstance(value, (bool, int, float)):
+        return (value,)
+    return None
+
+
+__all__ = ('extract', 'Path')
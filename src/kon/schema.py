@@ -0,0 +1,389 @@
+"""
+Decoders that build typed objects, like dataclasses, while a source is
+parsed, see :func:`compile`.
+
+Instead of building dictionaries and lists and converting them afterwards,
+the parser looks up the type of every value as it reaches it: dataclasses
+are created as soon as their dictionary is complete, the values of keys
+that a dataclass does not have are dropped (lists and dictionaries among
+them are skipped without parsing them), and a value of the wrong type
+raises a TypeError with its position right away. A dataclass that misses
+fields only raises once it is known to be in the result, as a later value
+of the same key may replace it. Schemas can not be combined with
+`duplicate_keys='deep_merge'`.
+
+The supported types are dataclasses, `int`, `float` (ints are converted),
+`str`, `bool`, `None`, enums (by their values), `Any`, `Optional` and other
+unions, `List[T]`, `Tuple[T, ...]` and `Dict[K, V]`, and their builtin
+spellings. The keys of a dictionary are the names of the fields of its
+dataclass, missing fields get their defaults.
+"""
+import dataclasses
+import enum
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union, get_args, get_origin, get_type_hints
+
+from .parser import _Incomplete, _SchemaMismatch, _Spec
+from .types import KonDictionary, KonObject
+
+try:
+    from types import UnionType # type: ignore
+except ImportError:
+    UnionType = None
+
+_SCALARS = {int: 'an int', float: 'a float', str: 'a string', bool: 'a bool', type(None): 'null'}
+
+
+def _found(value: KonObject) -> str:
+    """Describes a value that does not match, for errors."""
+    if isinstance(value, dict):
+        return 'a dictionary'
+    if isinstance(value, (list, tuple)):
+        return 'a list'
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return repr(value)
+    return f'a(n) {type(value).__name__}'
+
+
+def _first_incomplete(values: Iterable[KonObject]) -> Optional[_Incomplete]:
+    """The first of `values` that is incomplete, which a list or dictionary that contains it is too."""
+    for value in values:
+        if value.__class__ is _Incomplete:
+            return value # type: ignore
+    return None
+
+
+class _Decoder(_Spec):
+    """A spec that reports the values it does not take as expecting `expected` for `name`."""
+    __slots__ = ('name', 'expected')
+    needs_finish = False
+
+    def __init__(self, name: str, expected: str) -> None:
+        self.name = name
+        self.expected = expected
+
+    def _mismatch(self, found: str) -> _SchemaMismatch:
+        return _SchemaMismatch(f'expected {self.expected} for {self.name}, but found {found}')
+
+    def open(self, bracket: str) -> Optional[_Spec]:
+        raise self._mismatch('a dictionary' if bracket == '{' else 'a list')
+
+    def convert(self, value: KonObject) -> KonObject:
+        raise self._mismatch(_found(value))
+
+
+class _Scalar(_Decoder):
+    __slots__ = ('type',)
+
+    def __init__(self, name: str, type_: type) -> None:
+        super().__init__(name, _SCALARS[type_])
+        self.type = type_
+
+    def convert(self, value: KonObject) -> KonObject:
+        if value.__class__ is self.type:
+            return value
+        if self.type is float and value.__class__ is int:
+            return float(value) # type: ignore
+        raise self._mismatch(_found(value))
+
+
+class _Enum(_Decoder):
+    __slots__ = ('type',)
+
+    def __init__(self, name: str, type_: 'type[enum.Enum]') -> None:
+        super().__init__(name, f'one of {", ".join(repr(member.value) for member in type_)}')
+        self.type = type_
+
+    def convert(self, value: KonObject) -> KonObject:
+        try:
+            return self.type(value)
+        except (ValueError, TypeError):
+            raise self._mismatch(_found(value)) from None
+
+
+class _Union(_Decoder):
+    """A value of any of `members`, at most one of which is a list and one a dictionary."""
+    __slots__ = ('members', 'needs_finish')
+
+    def __init__(self, name: str, members: List[_Decoder]) -> None:
+        super().__init__(name, ' or '.join(member.expected for member in members))
+        self.members = members
+        self.needs_finish = any(member.needs_finish for member in members)
+
+    def open(self, bracket: str) -> Optional[_Spec]:
+        for member in self.members:
+            try:
+                return member.open(bracket)
+            except _SchemaMismatch:
+                pass
+        return super().open(bracket)
+
+    def convert(self, value: KonObject) -> KonObject:
+        for member in self.members:
+            try:
+                return member.convert(value)
+            except _SchemaMismatch:
+                pass
+        return super().convert(value)
+
+    def finish(self, value: KonObject) -> KonObject:
+        for member in self.members:
+            value = member.finish(value)
+        return value
+
+
+class _List(_Decoder):
+    """A list of `item`, which is turned into a tuple when `as_tuple` is set."""
+    __slots__ = ('item', 'as_tuple', 'needs_finish')
+
+    def __init__(self, name: str, item: Optional[_Decoder], as_tuple: bool) -> None:
+        super().__init__(name, 'a list')
+        self.item = item
+        self.as_tuple = as_tuple
+        self.needs_finish = as_tuple
+
+    def open(self, bracket: str) -> Optional[_Spec]:
+        if bracket == '(':
+            return self
+        return super().open(bracket)
+
+    def convert(self, value: KonObject) -> KonObject:
+        if isinstance(value, list):
+            return value
+        return super().convert(value)
+
+    def build_list(self, elements: List[KonObject]) -> KonObject:
+        incomplete = _first_incomplete(elements)
+        if incomplete is not None:
+            return incomplete
+        item = self.item
+        if item is not None and item.needs_finish:
+            elements[:] = map(item.finish, elements)
+        return elements
+
+    def finish(self, value: KonObject) -> KonObject:
+        if self.as_tuple and value.__class__ is list:
+            return tuple(value) # type: ignore
+        return value
+
+
+class _Dict(_Decoder):
+    """A dictionary of `value`, with keys that `key` takes."""
+    __slots__ = ('key', 'value')
+
+    def __init__(self, name: str, key: Optional[_Decoder], value: Optional[_Decoder]) -> None:
+        super().__init__(name, 'a dictionary')
+        self.key = key
+        self.value = value
+
+    def open(self, bracket: str) -> Optional[_Spec]:
+        if bracket == '{':
+            return self
+        return super().open(bracket)
+
+    def child(self, key: KonObject) -> Optional[_Spec]:
+        return self.value
+
+    def convert(self, value: KonObject) -> KonObject:
+        if isinstance(value, dict):
+            return value
+        return super().convert(value)
+
+    def build_dict(self, values: KonDictionary) -> KonObject:
+        incomplete = _first_incomplete(values.values())
+        if incomplete is not None:
+            return incomplete
+        if self.key is not None:
+            for key in values:
+                self.key.convert(key)
+        value_spec = self.value
+        if value_spec is not None and value_spec.needs_finish:
+            for key, value in values.items():
+                values[key] = value_spec.finish(value)
+        return values
+
+
+class _Dataclass(_Decoder):
+    """A dataclass, built from a dictionary of its fields."""
+    __slots__ = ('type', 'fields', 'required', 'finished')
+
+    def __init__(self, type_: type) -> None:
+        super().__init__(type_.__qualname__, f'a {type_.__qualname__}')
+        self.type = type_
+        # Filled in by `_compile`, after the spec was cached for recursive dataclasses
+        self.fields: Dict[str, Optional[_Decoder]] = {}
+        self.required: FrozenSet[str] = frozenset()
+        self.finished: Tuple[str, ...] = ()
+
+    def _mismatch(self, found: str) -> _SchemaMismatch:
+        # Shared by every field of this type, so it names no field
+        return _SchemaMismatch(f'expected {self.expected}, but found {found}')
+
+    def open(self, bracket: str) -> Optional[_Spec]:
+        if bracket == '{':
+            return self
+        return super().open(bracket)
+
+    def child(self, key: KonObject) -> Optional[_Spec]:
+        return self.fields.get(key, _SKIP) # type: ignore
+
+    def convert(self, value: KonObject) -> KonObject:
+        if isinstance(value, self.type):
+            return value
+        return super().convert(value)
+
+    def build_dict(self, values: KonDictionary) -> KonObject:
+        fields = self.fields
+        arguments = {key: value for key, value in values.items() if key in fields}
+        incomplete = _first_incomplete(arguments.values())
+        if incomplete is not None:
+            return incomplete
+        missing = self.required.difference(arguments)
+        if missing:
+            # Not raised yet, a later value of the same key might have them
+            return _Incomplete(f'missing {", ".join(sorted(missing))} for {self.name}')
+        for name in self.finished:
+            if name in arguments:
+                arguments[name] = fields[name].finish(arguments[name]) # type: ignore
+        return self.type(**arguments)
+
+
+class _Skip(_Spec):
+    """The values of keys that a dataclass does not have, which are dropped."""
+    __slots__ = ('item',)
+    skip = True
+
+    def __init__(self) -> None:
+        self.item = self
+
+    def open(self, bracket: str) -> _Spec:
+        return self
+
+    def child(self, key: KonObject) -> _Spec:
+        return self
+
+    def convert(self, value: KonObject) -> None:
+        return None
+
+    def build_dict(self, values: KonDictionary) -> None:
+        return None
+
+    def build_list(self, elements: List[KonObject]) -> None:
+        return None
+
+
+_SKIP = _Skip()
+
+
+class Schema:
+    """
+    A decoder for a type, see :func:`compile`. Its methods parse Kon like
+    the functions of :mod:`kon` with the same names, and take the same
+    options, except for those that do not build whole values (`lazy`,
+    `numeric_lists` and `workers`) and the hooks.
+
+    Attributes:
+        type: The type that is decoded.
+    """
+    type: Any
+
+    def __init__(self, type_: Any, spec: Optional[_Decoder]) -> None:
+        self.type = type_
+        self._spec = spec
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.type!r})'
+
+    def loads(self, source: Union[str, bytes, bytearray], **kwargs) -> Any:
+        """
+        Decodes a Kon-formatted string, bytes, or bytearray.
+
+        Raises:
+            ValueError: If the source is invalid.
+            TypeError: If a value does not have the type that the schema
+                expects there, or a dataclass misses a field without a default.
+        """
+        from . import loads
+        return loads(source, schema=self, **kwargs)
+
+    def load(self, file: Any, **kwargs) -> Any:
+        """Decodes a Kon-formatted file, see :meth:`loads`."""
+        return self.loads(file.read(), **kwargs)
+
+    def load_path(self, path: Any, **kwargs) -> Any:
+        """Decodes a Kon-formatted file by its path, see :meth:`loads` and :func:`kon.load_path`."""
+        from . import load_path
+        return load_path(path, schema=self, **kwargs)
+
+
+def compile(type_: Any) -> Schema:
+    """
+    Compiles a decoder for a type, usually a dataclass, see :mod:`kon.schema`.
+
+    Args:
+        type_: The type of the top-level value.
+
+    Raises:
+        TypeError: If the type, or the type of a field, is not supported.
+
+    Returns:
+        Schema: The decoder, whose `loads`, `load` and `load_path` methods
+        return instances of the type.
+    """
+    return Schema(type_, _compile(type_, 'the top level', {}))
+
+
+def _compile(type_: Any, name: str, dataclasses_: Dict[type, _Dataclass]) -> Optional[_Decoder]:
+    """Compiles the spec of `type_`, for values called `name`. None takes any value."""
+    if type_ is Any or type_ is object:
+        return None
+    if type_ is None:
+        type_ = type(None)
+    if type_ in _SCALARS:
+        return _Scalar(name, type_)
+    if isinstance(type_, type) and issubclass(type_, enum.Enum):
+        return _Enum(name, type_)
+    if isinstance(type_, type) and dataclasses.is_dataclass(type_):
+        spec = dataclasses_.get(type_)
+        if spec is None:
+            spec = dataclasses_[type_] = _Dataclass(type_)
+            hints = get_type_hints(type_)
+            fields = [field for field in dataclasses.fields(type_) if field.init]
+            spec.fields = {field.name: _compile(hints[field.name], f'{spec.name}.{field.name}', dataclasses_) for field in fields}
+            spec.required = frozenset(
+                field.name for field in fields
+                if field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING # type: ignore
+            )
+            spec.finished = tuple(key for key, value in spec.fields.items() if value is not None and value.needs_finish)
+        return spec
+    if type_ is list or type_ is tuple:
+        return _List(name, None, type_ is tuple)
+    if type_ is dict:
+        return _Dict(name, None, None)
+    origin, args = get_origin(type_), get_args(type_)
+    if origin is Union or (UnionType is not None and origin is UnionType):
+        members = [_compile(arg, name, dataclasses_) for arg in args]
+        if None in members:
+            # Any value, as one of them is any value
+            return None
+        if any(sum(_opens(member, bracket) for member in members) > 1 for bracket in '{('): # type: ignore
+            raise TypeError(f'unsupported type {type_!r} for {name}, a union can have one list and one dictionary type at most')
+        return _Union(name, members) # type: ignore
+    if origin is list:
+        return _List(name, _compile(args[0], f'{name}[]', dataclasses_), False)
+    if origin is tuple and len(args) == 2 and args[1] is Ellipsis:
+        return _List(name, _compile(args[0], f'{name}[]', dataclasses_), True)
+    if origin is dict:
+        return _Dict(name, _compile(args[0], f'{name} key', dataclasses_), _compile(args[1], f'{name}[]', dataclasses_))
+    raise TypeError(f'unsupported type {type_!r} for {name}')
+
+
+def _opens(spec: _Decoder, bracket: str) -> bool:
+    """Whether `spec` takes a list or dictionary opened with `bracket`."""
+    try:
+        spec.open(bracket)
+    except _SchemaMismatch:
+        return False
+    return True
+
+
+__all__ = ('Schema', 'compile')
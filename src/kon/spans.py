@@ -0,0 +1,864 @@
+"""
+Where the keys and values of a Kon document are in its source, see
+:class:`SpanMap`, and edits that rewrite and re-parse only what they
+change, see :class:`KonDocument`, :func:`reparse` and :func:`patch`.
+
+A span map is a tree of the values of a document, like the one that
+:func:`kon.loads` returns, with the start and end index of every key and
+value. Spans are stored relative to the value that contains them, so an
+edit only moves the spans on the way to it: the spans that follow it in
+each of the containers on the way are moved by a shift that the container
+keeps, and applies to them when they are looked up.
+
+An edit is re-parsed with the smallest value around it that can be parsed
+on its own: a value written with brackets, when the edit is between them,
+or a single scalar value. If the result does not end where the value did,
+e.g. because a bracket was added, the next larger value is re-parsed, up to
+the whole document.
+"""
+import io
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from .parser import DuplicateKeys, KonParser
+from .query import Path, _split
+from .tokenizer import END, ENTRY, IDENTIFIER, TERMINATORS, VALUE_KINDS, KonTokenizer, MultilineStringBehaviour, _GENERAL, _NON_ASCII_KIND, _SKIPPED, _TOKEN, _TOKEN_KINDS, create_tokenizer
+from .types import KonObject
+
+# The kinds of nodes: a scalar value, a number with a sign, a dictionary or
+# a list written with brackets, and a dictionary without them, e.g. of the
+# keys `a` and `b` in `a b c = 1`
+_SCALAR = 'scalar'
+_SIGNED = 'signed'
+_DICT = 'dict'
+_LIST = 'list'
+_IMPLICIT = 'implicit'
+_KEY_KINDS = frozenset((_SCALAR, _SIGNED))
+_DICT_KINDS = frozenset((_DICT, _IMPLICIT))
+# The number of shifts a container keeps before it applies them to its
+# children
+_MAX_SHIFTS = 16
+
+_NO_KEY: Any = object()
+
+
+class Span(NamedTuple):
+    """
+    Where a value and its key are in the source, as indices of characters,
+    see :class:`SpanMap`. The ends are exclusive.
+    """
+    start: int
+    """The first character of the value."""
+    end: int
+    """The character after the value."""
+    key_start: Optional[int]
+    """The first character of the key, None for the elements of a list and the top-level value."""
+    key_end: Optional[int]
+    """The character after the key, None for the elements of a list and the top-level value."""
+
+
+class _Node:
+    """
+    A value in a span map. Its positions are relative to the start of the
+    value that contains it, and moved by the shifts of that value from its
+    `index` on. Dictionaries have their children by key, and in the order
+    of the source, lists only in order.
+    """
+    __slots__ = ('kind', 'start', 'end', 'key', 'key_start', 'key_end', 'assigned', 'value', 'depth', 'children', 'order', 'shifts', 'index')
+
+    def __init__(self, kind: str, start: int, end: int) -> None:
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.key: KonObject = _NO_KEY
+        self.key_start: Optional[int] = None
+        self.key_end: Optional[int] = None
+        # Whether the value follows a `=`
+        self.assigned = False
+        # The value of a scalar, which might be a key
+        self.value: KonObject = None
+        # The nesting depth of a list or dictionary written with brackets
+        self.depth = 0
+        self.children: Union[Dict[KonObject, '_Node'], List['_Node'], None] = None
+        self.order: Optional[List['_Node']] = None
+        # `(index, delta)` pairs, for the children from `index` on
+        self.shifts: List[Tuple[int, int]] = []
+        self.index = 0
+
+    def shift(self, index: int) -> int:
+        """How far the child at `index` moved."""
+        return sum(delta for start, delta in self.shifts if index >= start)
+
+    def add_shift(self, index: int, delta: int) -> None:
+        """Moves the children from `index` on by `delta`."""
+        assert self.order is not None
+        if index >= len(self.order):
+            return
+        self.shifts.append((index, delta))
+        if len(self.shifts) > _MAX_SHIFTS:
+            for i, child in enumerate(self.order):
+                child._move(self.shift(i))
+            self.shifts.clear()
+
+    def _move(self, delta: int) -> None:
+        self.start += delta
+        self.end += delta
+        if self.key_start is not None:
+            self.key_start += delta
+            self.key_end += delta # type: ignore
+
+
+class SpanMap:
+    """
+    The spans of the keys and values of a Kon source, by their path, see
+    :meth:`kon.KonParser.spans`.
+
+    A path is a string of keys separated by dots, or a sequence of keys and
+    list indices, as for :func:`kon.extract`. The spans follow the values
+    that :func:`kon.loads` returns: when a key is set more than once, it is
+    the span of the value that was kept. With `duplicate_keys` set to
+    `deep_merge`, a dictionary merged from several ones has the span of the
+    first of them, and the keys of all of them.
+    """
+
+    def __init__(self, root: _Node) -> None:
+        self._root = root
+
+    def __getitem__(self, path: Path) -> Span:
+        """
+        Returns the span of the value at `path`.
+
+        Raises:
+            KeyError: If there is no such value.
+        """
+        chain, _ = self._path(path)
+        node, start = chain[-1]
+        key_start = key_end = None
+        if len(chain) > 1 and node.key_start is not None:
+            parent, parent_start = chain[-2]
+            key_start = parent_start + parent.shift(node.index) + node.key_start
+            key_end = key_start + node.key_end - node.key_start # type: ignore
+        return Span(start, start + node.end - node.start, key_start, key_end)
+
+    def get(self, path: Path, default: Optional[Span] = None) -> Optional[Span]:
+        """Returns the span of the value at `path`, or `default`."""
+        try:
+            return self[path]
+        except KeyError:
+            return default
+
+    def __contains__(self, path: Path) -> bool:
+        try:
+            self._path(path)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        """Yields the paths of all values as tuples of keys and indices, depth first in the order of the source."""
+        stack: List[Tuple[Tuple[Any, ...], _Node]] = [((), self._root)]
+        while stack:
+            path, node = stack.pop()
+            if path:
+                yield path
+            if node.order:
+                keyed = node.kind in _DICT_KINDS
+                stack.extend((path + (child.key if keyed else i,), child) for i, child in reversed(list(enumerate(node.order))))
+
+    def _path(self, path: Path) -> Tuple[List[Tuple[_Node, int]], Tuple[Any, ...]]:
+        """
+        Returns the nodes on the way to `path`, with their starts, and the
+        path as keys and indices. The keys of a sequence are looked up as
+        they are first, and then like those of a string.
+
+        Raises:
+            KeyError: If there is no such value.
+        """
+        chain = [(self._root, self._root.start)]
+        keys: Tuple[Any, ...] = ()
+        segments = _split(path) if path != () else []
+        raw = [_NO_KEY] * len(segments) if isinstance(path, str) else list(path)
+        for key, segment in zip(raw, segments):
+            node, start = chain[-1]
+            child = None
+            if node.kind in _DICT_KINDS:
+                for candidate in ([key] if key is not _NO_KEY else []) + segment.keys:
+                    try:
+                        child = node.children.get(candidate) # type: ignore
+                    except TypeError:
+                        # Not hashable
+                        continue
+                    if child is not None:
+                        keys += (child.key,)
+                        break
+            elif node.kind == _LIST:
+                index = key if key.__class__ is int else segment.index
+                if index is not None and -len(node.children) <= index < len(node.children): # type: ignore
+                    child = node.children[index] # type: ignore
+                    keys += (child.index,)
+            if child is None:
+                raise KeyError(path)
+            chain.append((child, start + node.shift(child.index) + child.start))
+        return chain, keys
+
+
+class KonDocument:
+    """
+    A Kon source together with its value and its spans, which is edited in
+    place, see :meth:`set` and :func:`reparse`. Comments and formatting
+    outside of what is edited are kept as they are.
+
+    Attributes:
+        source (str): The current source.
+        value (KonObject): Its value, as :func:`kon.loads` returns it. The
+            lists and dictionaries in it are changed in place by edits.
+        spans (SpanMap): Its spans.
+    """
+    source: str
+    value: KonObject
+    spans: SpanMap
+
+    def __init__(self, source: Union[str, bytes, bytearray], *, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, max_depth: Optional[int] = None, duplicate_keys: Union[DuplicateKeys, str] = DuplicateKeys.LAST_WINS) -> None:
+        """
+        Parses a Kon-formatted string, bytes, or bytearray, with its spans.
+
+        Args:
+            source: The Kon data, bytes-like objects are decoded as UTF-8.
+            multiline_string_behaviour: See :class:`kon.KonParser`.
+            max_depth: See :class:`kon.KonParser`.
+            duplicate_keys: See :class:`kon.KonParser`. With `deep_merge`,
+                every edit re-parses the whole document.
+
+        Raises:
+            TypeError: If the source is not a str, bytes, or bytearray, or
+                contains a type violation.
+            ValueError: If the source is invalid.
+        """
+        if isinstance(source, (bytes, bytearray)):
+            source = source.decode('utf-8')
+        elif not isinstance(source, str):
+            raise TypeError(f'source must be of type {str}, {bytes} or {bytearray}')
+        # Holds the options for the parses of parts of the source
+        self._parser = KonParser._streaming(multiline_string_behaviour=multiline_string_behaviour, max_depth=max_depth, duplicate_keys=duplicate_keys)
+        self._parse(source)
+
+    def _parse(self, source: str) -> None:
+        """Parses the whole `source`."""
+        value, root = _parse(source, self._parser)
+        self.source = source
+        self.value = value
+        self.spans = SpanMap(root)
+
+    def set(self, path: Path, value: KonObject) -> None:
+        """
+        Replaces the value at `path` with `value`, rewriting only its span
+        and re-parsing only what it takes, see :func:`reparse`. A list or a
+        dictionary that replaces one written with the same brackets keeps
+        them, and a value given to a key with `=` keeps the `=`.
+
+        Raises:
+            KeyError: If there is no value at `path`.
+            TypeError: If `value` can not be serialized.
+            ValueError: If `value` can not be serialized.
+        """
+        from . import dumps
+        chain, _ = self.spans._path(path)
+        node, start = chain[-1]
+        end = start + node.end - node.start
+        if len(chain) == 1:
+            text = dumps(value)
+        elif (node.kind == _DICT and isinstance(value, dict)) or (node.kind == _LIST and isinstance(value, (list, tuple))):
+            # Only what is between the brackets
+            text = dumps(value)
+            text = text[1:-1] if node.kind == _LIST or not value else text
+            start, end = start + 1, end - 1
+        elif node.assigned or node.key_start is None or isinstance(value, (dict, list, tuple)):
+            text = _value_text(value)
+        else:
+            # A key without a `=`, which a scalar needs
+            parent, parent_start = chain[-2]
+            start = parent_start + parent.shift(node.index) + node.key_end # type: ignore
+            if self.source[parent_start + parent.shift(node.index) + node.key_start] in '+-': # type: ignore
+                # `+2 = 5` applies the sign to `2 = 5`, only a line break ends a signed key
+                text = '\n= ' + _value_text(value)
+            else:
+                text = ' = ' + _value_text(value)
+        reparse(self, [(start, end, text)])
+
+    def _edit(self, start: int, end: int, text: str) -> Tuple[Any, ...]:
+        """Replaces `start` to `end` of the source with `text`, returns the path of what was re-parsed."""
+        source = self.source[:start] + text + self.source[end:]
+        delta = len(text) - (end - start)
+        if self._parser.duplicate_keys is not DuplicateKeys.DEEP_MERGE:
+            chain, candidates = self._candidates(start, end)
+            for length in reversed(candidates):
+                try:
+                    path = self._reparse_value(source, chain[:length], delta)
+                except (ValueError, TypeError):
+                    # Reported by the parse of the whole source
+                    path = None
+                if path is not None:
+                    self.source = source
+                    return path
+        self._parse(source)
+        return ()
+
+    def _candidates(self, start: int, end: int) -> Tuple[List[Tuple[_Node, int]], List[int]]:
+        """
+        Returns the nodes on the way to the edit from `start` to `end`, with
+        their starts, and the lengths of the parts of that way that end with
+        a value that can be re-parsed on its own.
+        """
+        node = self.spans._root
+        chain = [(node, node.start)]
+        candidates = []
+        while node.order:
+            base = chain[-1][1]
+            order = node.order
+            # The last child that starts before the edit
+            low, high = 0, len(order)
+            while low < high:
+                middle = (low + high) // 2
+                if base + order[middle].start + node.shift(middle) <= start:
+                    low = middle + 1
+                else:
+                    high = middle
+            if low == 0:
+                break
+            child = order[low - 1]
+            child_start = base + child.start + node.shift(low - 1)
+            if end > child_start + child.end - child.start:
+                break
+            chain.append((child, child_start))
+            if child.kind == _DICT or child.kind == _LIST:
+                if not child_start < start or not end < child_start + child.end - child.start:
+                    break
+                candidates.append(len(chain))
+            elif child.kind == _SCALAR:
+                candidates.append(len(chain))
+                break
+            elif child.kind == _SIGNED:
+                break
+            node = child
+        return chain, candidates
+
+    def _reparse_value(self, source: str, chain: List[Tuple[_Node, int]], delta: int) -> Optional[Tuple[Any, ...]]:
+        """
+        Re-parses the value at the end of `chain` in the edited `source`,
+        and puts it in place. Returns its path, or None if it does not end
+        where it should, and a larger part of the source has to be parsed.
+        """
+        parser = self._parser
+        node, start = chain[-1]
+        end = start + node.end - node.start + delta
+        if node.kind == _SCALAR:
+            tokens = create_tokenizer(source, parser.multiline_string_behaviour, start)
+            kind, value = tokens.next(newlines=False)
+            if kind not in VALUE_KINDS or tokens.last_start() != start or tokens.position != end or tokens.peek() not in TERMINATORS:
+                return None
+            replacement = _Node(_SCALAR, start, end)
+            replacement.value = value
+        else:
+            tokens = create_tokenizer(source, parser.multiline_string_behaviour, start + 1)
+            try:
+                next(parser._run(stream=False, tokens=tokens, closing='}' if node.kind == _DICT else ')', depth=node.depth))
+            except StopIteration as stop:
+                value = stop.value
+            if tokens.position != end:
+                return None
+            replacement = _walk(source, parser, start, node.depth)
+            assert replacement.end == end
+            _relativize(replacement)
+        # In the place of `node`, which its parent knows it by
+        replacement.end = node.start + replacement.end - replacement.start
+        replacement.start = node.start
+        replacement.key = node.key
+        replacement.key_start = node.key_start
+        replacement.key_end = node.key_end
+        replacement.assigned = node.assigned
+        replacement.index = node.index
+        path: Tuple[Any, ...] = ()
+        target = self.value
+        for i, (parent, _) in enumerate(chain[:-1]):
+            child = chain[i + 1][0]
+            key = child.key if parent.kind in _DICT_KINDS else child.index
+            path += (key,)
+            if i < len(chain) - 2:
+                target = target[key] # type: ignore
+        target[path[-1]] = value # type: ignore
+        parent = chain[-2][0]
+        parent.order[node.index] = replacement # type: ignore
+        if parent.kind in _DICT_KINDS:
+            parent.children[node.key] = replacement # type: ignore
+        # Everything after the edit moves
+        for i in range(len(chain) - 2, -1, -1):
+            ancestor = chain[i][0]
+            ancestor.end += delta
+            ancestor.add_shift(chain[i + 1][0].index + 1, delta)
+        return path
+
+
+def reparse(document: KonDocument, edits: Iterable[Tuple[int, int, str]]) -> List[Tuple[Any, ...]]:
+    """
+    Applies text edits to a document, re-parsing only the values they are
+    in, see :mod:`kon.spans`. Its value is updated in place, and its spans
+    are moved.
+
+    Each edit is a `(start, end, text)` triple, which replaces the source
+    from `start` to `end` (exclusive) with `text`. The edits are applied in
+    order, each to the source that the edits before it left.
+
+    The document is left as it was before an edit that makes it invalid,
+    but the edits before it are kept.
+
+    Args:
+        document: The document to be edited.
+        edits: The edits, as `(start, end, text)` triples.
+
+    Raises:
+        ValueError: If an edit is out of range, or makes the source invalid.
+        TypeError: If an edit makes the source contain a type violation.
+
+    Returns:
+        list[tuple]: The path of the value that each of the edits re-parsed,
+        as a tuple of keys and indices, `()` for the whole document.
+    """
+    paths = []
+    for start, end, text in edits:
+        if not 0 <= start <= end <= len(document.source):
+            raise ValueError(f'edit from {start} to {end} out of range of a source of {len(document.source)} characters')
+        paths.append(document._edit(start, end, text))
+    return paths
+
+
+def patch(path: Union[str, 'os.PathLike[str]'], changes: Mapping[Path, KonObject], **kwargs) -> KonDocument:
+    """
+    Replaces values in a Kon file, rewriting only their spans, e.g.
+    `kon.patch('app.kon', {'widget.window.width': 800})`. Comments and
+    formatting are kept, see :meth:`KonDocument.set`.
+
+    The file is written from the first byte that changed on, in place, so
+    a change near its end only writes that part of it. It is not replaced
+    in a single step, a reader may see it while it is written.
+
+    Args:
+        path: The UTF-8 encoded file.
+        changes: The new values, by their path as for :func:`kon.extract`.
+            The values must already exist.
+        **kwargs: Additional keyword arguments to be passed to the
+            :class:`KonDocument`.
+
+    Raises:
+        OSError: If the file can not be read or written.
+        KeyError: If there is no value at one of the paths, the file is
+            left as it was.
+        ValueError: If the file is invalid, or a value can not be
+            serialized.
+        TypeError: If the file contains a type violation, or a value can
+            not be serialized.
+
+    Returns:
+        KonDocument: The patched file.
+    """
+    with io.open(path, 'rb') as file:
+        source = file.read().decode('utf-8')
+    document = KonDocument(source, **kwargs)
+    for key, value in changes.items():
+        document.set(key, value)
+    new = document.source
+    if new == source:
+        return document
+    # Where the sources start to differ
+    first = 0
+    limit = min(len(new), len(source))
+    while first < limit and new[first] == source[first]:
+        first += 1
+    offset = len(source[:first].encode('utf-8'))
+    with io.open(path, 'r+b') as file:
+        file.seek(offset)
+        file.write(new[first:].encode('utf-8'))
+        file.truncate()
+    return document
+
+
+def _span_map(parser: KonParser) -> SpanMap:
+    """The spans of the source of `parser`, see :meth:`kon.KonParser.spans`."""
+    options = KonParser._streaming(multiline_string_behaviour=parser.multiline_string_behaviour, max_depth=parser.max_depth, duplicate_keys=parser.duplicate_keys)
+    return SpanMap(_parse(parser.source, options)[1])
+
+
+def _parse(source: str, parser: KonParser) -> Tuple[KonObject, _Node]:
+    """Parses the whole `source` with the options of `parser`, returns its value and the root of its spans."""
+    tokens = create_tokenizer(source, parser.multiline_string_behaviour)
+    try:
+        next(parser._run(stream=False, tokens=tokens))
+    except StopIteration as stop:
+        value = stop.value
+    # Only walked once the parse checked it
+    root = _walk(source, parser, 0)
+    _relativize(root)
+    return value, root
+
+
+def _value_text(value: KonObject) -> str:
+    """The source of `value` as the value of a key."""
+    from . import dumps
+    text = dumps(value)
+    if isinstance(value, dict) and value:
+        return '{' + text + '}'
+    return text
+
+
+class _Scanner:
+    """The tokens of a source with their positions, for :func:`_walk`, like :class:`kon.tokenizer.KonTokenizer` splits it."""
+    __slots__ = ('source', 'position', 'previous', '_tokenizer')
+
+    def __init__(self, source: str, multiline_string_behaviour: MultilineStringBehaviour, position: int) -> None:
+        self.source = source
+        self.position = position
+        self.previous = position
+        # Converts the tokens
+        self._tokenizer = KonTokenizer(source, multiline_string_behaviour, position)
+
+    def _kind(self, position: int) -> Tuple[str, int, str]:
+        """The kind of the raw token at `position`, where it ends and its text, `''` for one that is scanned character by character."""
+        match = _TOKEN.match(self.source, position)
+        if match is None:
+            return END, position, ''
+        token = match.group()
+        if token == '':
+            return _GENERAL, position, ''
+        return _TOKEN_KINDS.get(token[0], _NON_ASCII_KIND), match.end(), token
+
+    def next(self, newlines: bool = True) -> Tuple[str, KonObject, int, int]:
+        """Like :meth:`KonTokenizer.next`, but also returns the start and the end of the token, and an entry as its raw text."""
+        position = self.previous = self.position
+        while True:
+            kind, end, token = self._kind(position)
+            if kind == _SKIPPED or kind == '#' or (kind == '\n' and newlines):
+                position = end
+                continue
+            if kind == _GENERAL:
+                kind, value, end = self._tokenizer._scan(position)
+                self.position = end
+                return kind, value, position, end
+            self.position = end
+            if kind == IDENTIFIER and '=' in token:
+                return ENTRY, token, position, end
+            if kind in VALUE_KINDS:
+                return kind, self._tokenizer._value(kind, token), position, end
+            return kind, None, position, end
+
+    def next_element(self) -> Tuple[str, KonObject, int, int]:
+        """Like :meth:`KonTokenizer.next_element`, the token is only consumed if it is a value or an entry."""
+        position = self.position
+        while True:
+            kind, end, _ = self._kind(position)
+            if kind == _SKIPPED or kind == '\n':
+                position = end
+                continue
+            self.position = position
+            if kind in VALUE_KINDS:
+                return self.next()
+            return kind, None, position, position
+
+    def peek(self) -> str:
+        """Like :meth:`KonTokenizer.peek`."""
+        position = self.position
+        while True:
+            kind, end, _ = self._kind(position)
+            if kind != _SKIPPED:
+                return kind
+            position = end
+
+    def skip_whitespace(self) -> None:
+        """Like :meth:`KonTokenizer.skip_whitespace`."""
+        while True:
+            kind, end, _ = self._kind(self.position)
+            if kind != _SKIPPED and kind != '\n':
+                return
+            self.position = end
+
+    def push_back(self) -> None:
+        self.position = self.previous
+
+    def entry(self, token: str, start: int) -> _Node:
+        """The node of the value of an entry token, with its key."""
+        key, value = self._tokenizer._entry(token)
+        key_text, _, rest = token.partition('=')
+        value_start = start + len(key_text) + 1 + len(rest) - len(rest.lstrip())
+        node = _Node(_SCALAR, value_start, value_start + len(rest.strip()))
+        node.value = value
+        node.assigned = True
+        node.key = key
+        node.key_start = start
+        node.key_end = start + len(key_text.rstrip())
+        return node
+
+
+class _PartsFrame:
+    """Like :class:`kon.parser._PartsFrame`, `op_start` is where the token that started the child is."""
+    __slots__ = ('parts', 'top_level', 'op', 'op_start')
+
+    def __init__(self, parts: List[_Node], top_level: bool) -> None:
+        self.parts = parts
+        self.top_level = top_level
+        self.op = ''
+        self.op_start = 0
+
+
+class _ElementsFrame:
+    """Like :class:`kon.parser._ElementsFrame`, `start` is where its opening bracket is."""
+    __slots__ = ('end', 'elements', 'start', 'depth')
+
+    def __init__(self, end: str, start: int, depth: int) -> None:
+        self.end = end
+        self.elements: List[_Node] = []
+        self.start = start
+        self.depth = depth
+
+
+def _walk(source: str, parser: KonParser, start: int, depth: Optional[int] = None) -> _Node:
+    """
+    Builds the nodes of the value at `start`, with the positions in the
+    whole source, following the steps of :meth:`KonParser._run`. Without a
+    `depth`, that is the whole source, and otherwise the list or dictionary
+    at that depth whose opening bracket is at `start`.
+
+    The source must be valid, the parser checks it first.
+    """
+    scanner = _Scanner(source, parser.multiline_string_behaviour, start)
+    policy = parser.duplicate_keys
+    stack: List[Union[_PartsFrame, _ElementsFrame]] = []
+    frame: Union[_PartsFrame, _ElementsFrame]
+    if depth is None:
+        frame = _PartsFrame([], True)
+        depth = 0
+    else:
+        kind, _, bracket, _ = scanner.next()
+        frame = _ElementsFrame('}' if kind == '{' else ')', bracket, depth)
+    returned = False
+    result: _Node = None # type: ignore
+    while True:
+        child: Union[_PartsFrame, _ElementsFrame, None] = None
+        if frame.__class__ is _PartsFrame:
+            parts = frame.parts # type: ignore
+            top_level = frame.top_level # type: ignore
+            done = False
+            if returned:
+                returned = False
+                op = frame.op # type: ignore
+                if result.key is not _NO_KEY:
+                    result = _wrap(result)
+                if op == '+' or op == '-':
+                    signed = _Node(_SIGNED, frame.op_start, result.end) # type: ignore
+                    signed.value = result.value if op == '+' else -result.value # type: ignore
+                    parts.append(signed)
+                else:
+                    if op == '=':
+                        result.assigned = True
+                    parts.append(_collapse(parts, result))
+                    done = op == '=' and not top_level
+            while not done:
+                kind, value, token_start, token_end = scanner.next(newlines=top_level)
+                if kind in VALUE_KINDS:
+                    parts.append(_scalar(value, token_start, token_end))
+                elif kind == ENTRY:
+                    parts.append(_collapse(parts, scanner.entry(value, token_start))) # type: ignore
+                    done = not top_level
+                elif kind == '=':
+                    kind, value, token_start, token_end = scanner.next(newlines=False)
+                    if kind in VALUE_KINDS:
+                        node = _scalar(value, token_start, token_end)
+                        if scanner.peek() in TERMINATORS:
+                            node.assigned = True
+                            parts.append(_collapse(parts, node))
+                            done = not top_level
+                            continue
+                        child = _PartsFrame([node], False)
+                    else:
+                        if kind != END:
+                            scanner.push_back()
+                        child = _PartsFrame([], False)
+                    frame.op = '=' # type: ignore
+                elif kind == '{' or kind == '(':
+                    child = _ElementsFrame('}' if kind == '{' else ')', token_start, depth + 1)
+                    frame.op = kind # type: ignore
+                elif kind == '+' or kind == '-':
+                    scanner.skip_whitespace()
+                    child = _PartsFrame([], False)
+                    frame.op = kind # type: ignore
+                    frame.op_start = token_start # type: ignore
+                elif kind == END:
+                    done = True
+                elif not top_level:
+                    scanner.push_back()
+                    done = True
+                if child is not None:
+                    break
+            if done:
+                result = _result(parts, top_level, policy)
+        else:
+            end = frame.end # type: ignore
+            elements = frame.elements # type: ignore
+            close = None
+            while True:
+                if returned:
+                    element = result
+                else:
+                    kind, value, token_start, token_end = scanner.next_element()
+                    if kind == end:
+                        close = scanner.next()[3]
+                        break
+                    if kind in VALUE_KINDS:
+                        element = _scalar(value, token_start, token_end)
+                        if scanner.peek() not in TERMINATORS:
+                            child = _PartsFrame([element], False)
+                            break
+                    elif kind == ENTRY:
+                        element = scanner.entry(value, token_start) # type: ignore
+                    else:
+                        child = _PartsFrame([], False)
+                        break
+                kind, _, _, token_end = scanner.next(newlines=False)
+                if kind != '\n' and kind != ',' and kind != end and kind != END:
+                    raise ValueError(f'expected a newline, "{end}" or a comma at index {token_end}, but found {kind}')
+                if element.key is not _NO_KEY and end == ')':
+                    element = _wrap(element)
+                returned = False
+                elements.append(element)
+                if kind == end:
+                    close = token_end
+                    break
+            if child is None:
+                if end == '}':
+                    result = _dictionary(_DICT, elements, frame.start, close, policy) # type: ignore
+                else:
+                    result = _Node(_LIST, frame.start, close) # type: ignore
+                    result.children = result.order = elements
+                    for i, element in enumerate(elements):
+                        element.index = i
+                result.depth = frame.depth # type: ignore
+        if child is not None:
+            if child.__class__ is _ElementsFrame:
+                depth += 1
+            stack.append(frame)
+            frame = child
+        elif stack:
+            if frame.__class__ is _ElementsFrame:
+                depth -= 1
+            frame = stack.pop()
+            returned = True
+        else:
+            return result
+
+
+def _scalar(value: KonObject, start: int, end: int) -> _Node:
+    node = _Node(_SCALAR, start, end)
+    node.value = value
+    return node
+
+
+def _wrap(entry: _Node) -> _Node:
+    """The dictionary of a single entry, like the parser turns a `(key, value)` pair into one."""
+    node = _Node(_IMPLICIT, entry.key_start, entry.end) # type: ignore
+    node.children = {entry.key: entry}
+    node.order = [entry]
+    entry.index = 0
+    return node
+
+
+def _collapse(parts: List[_Node], result: _Node) -> _Node:
+    """Like :meth:`KonParser._collapse_parts`, collapses the keys at the end of `parts` with `result`."""
+    key = None
+    while parts and parts[-1].kind in _KEY_KINDS and parts[-1].key is _NO_KEY:
+        part = parts.pop()
+        if key is not None:
+            _set_key(result, key)
+            result = _wrap(result)
+        elif result.key is not _NO_KEY:
+            result = _wrap(result)
+        key = part
+    if key is not None:
+        _set_key(result, key)
+    return result
+
+
+def _set_key(node: _Node, key: _Node) -> None:
+    node.key = key.value
+    node.key_start = key.start
+    node.key_end = key.end
+
+
+def _result(parts: List[_Node], top_level: bool, policy: DuplicateKeys) -> _Node:
+    """Like :meth:`KonParser._parse_parts`, turns the parts of a value into its node."""
+    if len(parts) == 1:
+        part = parts[0]
+        if top_level and part.key is not _NO_KEY:
+            return _wrap(part)
+        return part
+    if not parts or not top_level:
+        raise ValueError('invalid source')
+    return _dictionary(_IMPLICIT, parts, parts[0].start if parts[0].key_start is None else parts[0].key_start, parts[-1].end, policy)
+
+
+def _dictionary(kind: str, elements: List[_Node], start: int, end: int, policy: DuplicateKeys) -> _Node:
+    """Like :meth:`KonParser._merge`, builds the node of a dictionary from its entries and the dictionaries in it."""
+    node = _Node(kind, start, end)
+    children: Dict[KonObject, _Node] = {}
+    for element in elements:
+        if element.key is not _NO_KEY:
+            _insert(children, element.key, element, policy)
+        elif element.kind in _DICT_KINDS:
+            for key, child in element.children.items(): # type: ignore
+                _insert(children, key, child, policy)
+        else:
+            raise ValueError('invalid source')
+    node.children = children
+    _order(node)
+    return node
+
+
+def _insert(children: Dict[KonObject, _Node], key: KonObject, node: _Node, policy: DuplicateKeys) -> None:
+    """Sets `key` of `children` to `node`, see `duplicate_keys`."""
+    if key not in children or policy is DuplicateKeys.LAST_WINS or policy is DuplicateKeys.ERROR:
+        children[key] = node
+    elif policy is DuplicateKeys.DEEP_MERGE:
+        # Like `kon.parser._deep_merge`
+        stack = [(children, key, node)]
+        merged = []
+        while stack:
+            children, key, node = stack.pop()
+            current = children.get(key)
+            if current is not None and current.kind in _DICT_KINDS and node.kind in _DICT_KINDS:
+                stack.extend((current.children, k, v) for k, v in reversed(list(node.children.items()))) # type: ignore
+                merged.append(current)
+            else:
+                children[key] = node
+        for current in merged:
+            _order(current)
+
+
+def _order(node: _Node) -> None:
+    """Puts the children of a dictionary in the order of the source."""
+    node.order = sorted(node.children.values(), key=_start) # type: ignore
+    for i, child in enumerate(node.order):
+        child.index = i
+
+
+def _start(node: _Node) -> int:
+    return node.start
+
+
+def _relativize(root: _Node) -> None:
+    """Makes the positions of the children of `root`, from a walk of the source, relative to their parents."""
+    stack = [(root, root.start)]
+    while stack:
+        node, start = stack.pop()
+        if node.order:
+            for child in node.order:
+                stack.append((child, child.start))
+                child._move(-start)
+
+
+__all__ = ('Span', 'SpanMap', 'KonDocument', 'reparse', 'patch')
@@ -0,0 +1,801 @@
+import re
+import sys
+import textwrap
+from array import array
+from enum import Enum, auto
+from typing import Dict, List, Optional, Tuple, Union
+
+from . import _accel
+from .types import KonObject
+
+# Token kinds. Punctuation tokens (`{}()=,+-` and newlines) use the character
+# itself as their kind, everything else is one of the constants below.
+NUMBER = 'number'
+STRING = 'string'
+IDENTIFIER = 'identifier'
+END = ''
+ENTRY = 'entry'
+"""A whole `key = value` pair, with an identifier key and nothing else
+before the terminator that follows it. Its value is a `(key, value)` pair."""
+
+VALUE_KINDS = frozenset((NUMBER, STRING, IDENTIFIER))
+
+Token = Tuple[str, KonObject]
+"""A `(kind, value)` pair, `value` is only set for value tokens."""
+
+_WHITESPACE = re.compile(r'\s*')
+_IDENTIFIER_CHARS = re.compile(r'[A-Za-z0-9_\-:$]*')
+_ASCII_DIGITS = re.compile(r'[0-9]*')
+_DECIMAL = re.compile(r'[0-9]*(?:\.[0-9]*)?(?:[eE][+-]?[0-9]*)?')
+_PREFIXED_INTEGER = {
+    'x': re.compile(r'[0-9a-fA-F]*'),
+    'o': re.compile(r'[0-7]*'),
+    'b': re.compile(r'[01]*'),
+}
+_STRING_BODY = {
+    '"': re.compile(r'[^"\\]*'),
+    "'": re.compile(r"[^'\\]*"),
+}
+_SIMPLE_ESCAPES = {'n': '\n', 'r': '\r', 't': '\t', '\\': '\\', '"': '"', "'": "'"}
+_SIMPLE_ESCAPE = re.compile(r'\\(.)')
+_KEYWORDS = {'null': None, 'true': True, 'false': False}
+_FLOAT_KEYWORDS = frozenset(('inf', 'infinity', 'Inf', 'Infinity', 'nan', 'Nan', 'NaN'))
+
+# Splits source into raw tokens. Every character ends up in exactly one token,
+# except where a token needs the general (character by character) scanning
+# path: unquoted strings or numbers with non-ASCII characters, strings with
+# `\x`/`\u`/line continuation escapes or a multiline marker and unexpected
+# characters. Those produce an empty match instead. Identifiers and numbers
+# refuse to be followed by any character that could have extended them, so
+# that they cannot backtrack into a shorter token. A simple `key = value`
+# entry is kept in a single token, as it is by far the most common line.
+_TOKEN = re.compile(r"""(
+    [A-Za-z_$:][A-Za-z0-9_\-:$]*[^\S\n]*=[^\S\n]*
+    (?: [A-Za-z_$:][A-Za-z0-9_\-:$]* | 0x[0-9a-fA-F]* | 0o[0-7]* | 0b[01]*
+      | [0-9]+(?:\.[0-9]*)?(?:[eE][+-]?[0-9]*)?
+      | "[^"\\]*(?:\\["'\\nrt][^"\\]*)*" | '[^'\\]*(?:\\["'\\nrt][^'\\]*)*'
+    )[^\S\n]*(?=[\n,)}]|\Z)
+  | [^\S\n]+
+  | \n\s*
+  | \#[^\n]*\n?
+  | [{}()=,+-]
+  | [A-Za-z_$:][A-Za-z0-9_\-:$]*(?![A-Za-z0-9_\-:$]|[^\x00-\x7f])
+  | 0x[0-9a-fA-F]* | 0o[0-7]* | 0b[01]*
+  | [0-9]+(?:\.[0-9]*)?(?:[eE][+-]?[0-9]*)?(?![0-9.eE+\-]|[^\x00-\x7f])
+  | "[^"\\]*(?:\\["'\\nrt][^"\\]*)*"
+  | '[^'\\]*(?:\\["'\\nrt][^'\\]*)*'
+  | (?=[\s\S])
+)""", re.VERBOSE)
+
+# Everything in a list or a dictionary up to its next bracket, skipping whole
+# strings and comments, which may contain brackets themselves
+_SUBTREE_CONTENT = re.compile(r'''(?:
+    [^{}()"'\#]+
+  | "[^"\\]*(?:\\[\s\S][^"\\]*)*"
+  | '[^'\\]*(?:\\[\s\S][^'\\]*)*'
+  | \#[^\n]*
+)*''', re.VERBOSE)
+_CLOSING_BRACKETS = {'{': '}', '(': ')'}
+
+# The rest of a list of decimal numbers, separated by commas or newlines,
+# whose elements can be converted in bulk, see `KonTokenizer.numeric_list`
+_NUMERIC_LIST = re.compile(r'''\s*(?:
+    [+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?
+    [^\S\n]*(?:[,\n]\s*|(?=\)))
+)+\)''', re.VERBOSE)
+_FLOAT_MARKS = re.compile(r'[.eE]')
+_INF = float('inf')
+
+# Raw tokens are classified by their first character
+_SKIPPED = 'skipped'
+_GENERAL = 'general'
+_BATCH_END = '\x00'
+_TOKEN_KINDS = {
+    **{ch: _SKIPPED for ch in ' \t\r\x0b\x0c\x1c\x1d\x1e\x1f'},
+    **{ch: ch for ch in '\n#{}()=,+-'},
+    **{ch: IDENTIFIER for ch in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$:'},
+    **{ch: NUMBER for ch in '0123456789'},
+    '"': STRING,
+    "'": STRING,
+    '': _GENERAL,
+    _BATCH_END: _BATCH_END,
+}
+# Tokens that do not start with an ASCII character are whitespace
+_NON_ASCII_KIND = _SKIPPED
+
+TERMINATORS = frozenset(('\n', ',', ')', '}', END))
+"""Kinds that end a value inside of a list or a dictionary."""
+
+_MIN_BATCH_SIZE = 64
+_SKIP_BATCH_SIZE = 32
+_MAX_BATCH_SIZE = 1 << 18
+
+
+class NeedMoreData(Exception):
+    """Raised by a :class:`KonTokenizer` that reaches the end of its source before the last piece of the input was fed."""
+
+
+class MultilineStringBehaviour(Enum):
+    """
+    Specifies how to handle multiline string values.
+
+    Attributes:
+        IGNORE: Keep the multiline string as is, with original indentation.
+        DEDENT: Remove common leading whitespace from every line in the string.
+        VALUE_ERROR: Raise a ValueError if a multiline string is encountered.
+    """
+    IGNORE = auto()
+    DEDENT = auto()
+    VALUE_ERROR = auto()
+
+
+class InternStrings(Enum):
+    """
+    Specifies which strings a parser interns: equal strings that are
+    interned are the same object, which is kept once in memory instead of
+    once per occurrence. The values are the names that can be passed
+    instead of a member, e.g. `intern='keys'`.
+
+    Attributes:
+        KEYS: The keys of dictionaries.
+        KEYS_AND_IDENTIFIERS: Keys, and unquoted strings (identifiers) that
+            are values.
+        ALL: Every string, quoted ones included.
+    """
+    KEYS = 'keys'
+    KEYS_AND_IDENTIFIERS = 'keys+identifiers'
+    ALL = 'all'
+
+
+class KonTokenizer:
+    """
+    Splits KON source into tokens.
+
+    Instead of stepping through the source one character at a time, the
+    source is cut into raw tokens a batch at a time by a single compiled
+    pattern, which matches whole runs (whitespace, comments, identifiers,
+    digits and string bodies) at once. Only the rare tokens that the pattern
+    leaves out (see `_TOKEN`) are scanned character by character, so the
+    accepted language is exactly the same as the one described in
+    :class:`kon.parser.KonParser`.
+
+    Tokens are converted to values as they are consumed through :meth:`next`,
+    which means that errors are raised in the same order as the parser
+    encounters them.
+
+    The source can also be given piece by piece, through :meth:`feed`. Until
+    the last piece was fed (while `final` is False), a token that might
+    continue in the next piece raises :class:`NeedMoreData` instead of being
+    consumed.
+
+    Attributes:
+        source (str): The text being tokenized. When fed piece by piece, only
+            the text from the last :meth:`feed` position onwards.
+        multiline_string_behaviour (MultilineStringBehaviour): The default
+            behaviour for strings without a `<` or `|` marker.
+        final (bool): Whether the end of `source` is the end of the input.
+    """
+    source: str
+    multiline_string_behaviour: MultilineStringBehaviour
+    final: bool
+
+    def __init__(self, source: str, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, position: int = 0, *, final: bool = True) -> None:
+        self.source = source
+        self.multiline_string_behaviour = multiline_string_behaviour
+        self.final = final
+        # Index of `source` in the whole input
+        self._offset = 0
+        self._batch_size = _MIN_BATCH_SIZE
+        self._fill(position)
+
+    @property
+    def position(self) -> int:
+        """Index of the first character of the next token."""
+        return self._batch_start + len(''.join(self._tokens[:self._index]))
+
+    @position.setter
+    def position(self, value: int) -> None:
+        self._fill(value)
+
+    def last_start(self, mark: Optional[Tuple[int, List[str], int]] = None) -> int:
+        """
+        Index of the first character of the last consumed token in the whole
+        input, or of the last one consumed before `mark`, for errors.
+        """
+        if mark is None:
+            return self._offset + self._last_start()
+        batch_start, tokens, index = mark
+        return self._offset + batch_start + len(''.join(tokens[:index - 1]))
+
+    def _last_start(self) -> int:
+        return self._batch_start + len(''.join(self._tokens[:self._index - 1]))
+
+    def feed(self, text: str, final: bool = False) -> None:
+        """
+        Appends `text` to the input, `final` marks it as the last piece.
+        Everything before the current position is dropped.
+        """
+        position = self.position
+        self.source = self.source[position:] + text
+        self._offset += position
+        self.final = final
+        self._fill(0)
+
+    def mark(self) -> Tuple[int, List[str], int]:
+        """Returns the current position, to go back to with :meth:`reset` before the next :meth:`feed`."""
+        return self._batch_start, self._tokens, self._index
+
+    def reset(self, mark: Tuple[int, List[str], int]) -> None:
+        """Goes back to a position returned by :meth:`mark`."""
+        batch_start, tokens, index = mark
+        self._fill(batch_start + len(''.join(tokens[:index])))
+
+    def _fill(self, position: int) -> None:
+        """Cuts the next batch of raw tokens, starting at `position`."""
+        source = self.source
+        size = self._batch_size
+        while True:
+            if position + size >= len(source):
+                tokens = _TOKEN.findall(source, position)
+                end = len(source)
+                if not self.final and tokens:
+                    # The last token might continue in the next piece
+                    end -= len(tokens.pop())
+                self._last_batch = True
+                break
+            tokens = _TOKEN.findall(source, position, position + size)
+            # The last token might continue past the end of the batch
+            if len(tokens) > 1:
+                tokens.pop()
+                end = position + len(''.join(tokens))
+                self._last_batch = False
+                break
+            size *= 2
+        tokens.append(_BATCH_END)
+        self._tokens = tokens
+        self._index = 0
+        self._batch_start = position
+        self._batch_end = end
+
+    def _refill(self) -> bool:
+        """
+        Continues with the next batch, returns False at the end of the input.
+
+        Raises:
+            NeedMoreData: At the end of `source`, before the last piece was fed.
+        """
+        if self._last_batch:
+            if not self.final:
+                raise NeedMoreData()
+            return False
+        self._batch_size = min(self._batch_size * 2, _MAX_BATCH_SIZE)
+        self._fill(self._batch_end)
+        return True
+
+    def skip_ignored(self, newlines: bool) -> None:
+        """Skips whitespace and comments, and newlines if `newlines` is set, like :meth:`next` does before its token."""
+        tokens = self._tokens
+        i = self._index
+        while True:
+            kind = _TOKEN_KINDS.get(tokens[i][:1], _NON_ASCII_KIND)
+            if kind == _SKIPPED or kind == '#' or (kind == '\n' and newlines):
+                i += 1
+                continue
+            self._index = i
+            if kind != _BATCH_END or not self._refill():
+                return
+            tokens = self._tokens
+            i = 0
+
+    def skip_subtree(self, resume: bool = False) -> Tuple[int, int]:
+        """
+        Skips the rest of the list or dictionary opened by the last consumed
+        token, only matching up its brackets (outside of strings and
+        comments) instead of tokenizing it. Returns the indices of its
+        opening and closing brackets in the whole input.
+
+        Set `resume` when the tokens after it are tokenized as usual, not
+        skipped to the next subtree, to continue with a larger batch.
+
+        Raises:
+            ValueError: If a bracket does not match, or a string is not
+                terminated.
+        """
+        start = self._last_start()
+        end = self._match_bracket(start)
+        if resume:
+            # About as large as what is usually parsed between subtrees
+            self._batch_size = max(_MIN_BATCH_SIZE, (end - start) * 2)
+        else:
+            # Subtrees are usually close to each other, start over with a
+            # batch that is just large enough to reach the next one
+            self._batch_size = _SKIP_BATCH_SIZE
+        self._fill(end + 1)
+        return self._offset + start, self._offset + end
+
+    def numeric_list(self) -> Optional[array]:
+        """
+        Consumes the rest of the list opened by the last consumed token when
+        its elements are only decimal numbers, with an optional sign, and
+        converts them in bulk. Returns an array of `'q'` (64 bit) ints, or
+        of `'d'` floats when any of them is a float, the ints included.
+
+        Returns None without consuming anything for any other list, e.g.
+        with comments or other values, one that does not fit the array or
+        one that is not complete yet, which is then parsed as usual.
+        """
+        source = self.source
+        start = self._last_start() + 1
+        match = _NUMERIC_LIST.match(source, start)
+        if match is None:
+            return None
+        end = match.end()
+        numbers = source[start:end - 1].replace(',', ' ').split()
+        try:
+            if _FLOAT_MARKS.search(source, start, end) is None:
+                values = array('q', map(int, numbers))
+            else:
+                values = array('d', map(float, numbers))
+                if _INF in values or -_INF in values:
+                    # Maybe an int that is too large for a float, which
+                    # the usual parsing reports
+                    return None
+        except OverflowError:
+            return None
+        self._batch_size = _SKIP_BATCH_SIZE
+        self._fill(end)
+        return values
+
+    def _match_bracket(self, pos: int) -> int:
+        """Returns the index of the bracket closing the one at `pos`."""
+        source = self.source
+        expected = [_CLOSING_BRACKETS[source[pos]]]
+        end = pos + 1
+        while True:
+            end = _SUBTREE_CONTENT.match(source, end).end()
+            ch = source[end:end+1]
+            if ch == '{' or ch == '(':
+                expected.append(_CLOSING_BRACKETS[ch])
+            elif ch == '}' or ch == ')':
+                closing = expected.pop()
+                if ch != closing:
+                    raise ValueError(f'expected a newline, "{closing}" or a comma at index {self._offset + end}, but found {ch}')
+                if not expected:
+                    return end
+            elif ch == '':
+                raise ValueError(f'unclosed "{source[pos]}" at index {self._offset + pos}')
+            else:
+                raise ValueError(f'unterminated string at index {self._offset + end}')
+            end += 1
+
+    def push_back(self) -> None:
+        """Un-consumes the last token returned by :meth:`next`, which must not be a value."""
+        self._index -= 1
+
+    def skip_whitespace(self) -> str:
+        """
+        Skips whitespace, including newlines but not comments. Returns the
+        kind of the following token, `'#'` for a comment.
+        """
+        tokens = self._tokens
+        i = self._index
+        while True:
+            kind = _TOKEN_KINDS.get(tokens[i][:1], _NON_ASCII_KIND)
+            if kind == _SKIPPED or kind == '\n':
+                i += 1
+                continue
+            self._index = i
+            if kind != _BATCH_END:
+                return kind
+            if not self._refill():
+                return END
+            tokens = self._tokens
+            i = 0
+
+    def next_element(self) -> Token:
+        """
+        Skips whitespace, including newlines but not comments. Then consumes
+        the next token if it is a value or an entry, otherwise only returns
+        its kind, `'#'` for a comment.
+        """
+        tokens = self._tokens
+        i = self._index
+        while True:
+            token = tokens[i]
+            kind = _TOKEN_KINDS.get(token[:1], _NON_ASCII_KIND)
+            if kind == _SKIPPED or kind == '\n':
+                i += 1
+                continue
+            if kind == IDENTIFIER or kind == NUMBER or kind == STRING:
+                self._index = i + 1
+                if kind == IDENTIFIER and '=' in token:
+                    return ENTRY, self._entry(token)
+                return kind, self._value(kind, token)
+            self._index = i
+            if kind != _BATCH_END:
+                return kind, None
+            if not self._refill():
+                return END, None
+            tokens = self._tokens
+            i = 0
+
+    def peek(self) -> str:
+        """
+        Skips whitespace other than newlines and returns the kind of the
+        next token without consuming it, `'#'` for a comment.
+        """
+        tokens = self._tokens
+        i = self._index
+        while True:
+            kind = _TOKEN_KINDS.get(tokens[i][:1], _NON_ASCII_KIND)
+            if kind == _SKIPPED:
+                i += 1
+                continue
+            self._index = i
+            if kind != _BATCH_END:
+                return kind
+            if not self._refill():
+                return END
+            tokens = self._tokens
+            i = 0
+
+    def next(self, newlines: bool = True) -> Token:
+        """
+        Skips whitespace and comments, then consumes the next token.
+
+        Newlines are only skipped when `newlines` is set. A comment runs up
+        to and including the end of its line, so it swallows the newline
+        even when `newlines` is False.
+
+        Raises:
+            ValueError: If an unexpected character or an invalid literal is found.
+        """
+        tokens = self._tokens
+        i = self._index
+        while True:
+            token = tokens[i]
+            i += 1
+            kind = _TOKEN_KINDS.get(token[:1], _NON_ASCII_KIND)
+            if kind == _SKIPPED or kind == '#' or (kind == '\n' and newlines):
+                continue
+            if kind == IDENTIFIER or kind == NUMBER or kind == STRING:
+                self._index = i
+                if kind == IDENTIFIER and '=' in token:
+                    return ENTRY, self._entry(token)
+                return kind, self._value(kind, token)
+            if kind == _BATCH_END:
+                self._index = i - 1
+                if not self._refill():
+                    return END, None
+                tokens = self._tokens
+                i = 0
+                continue
+            if kind == _GENERAL:
+                self._index = i
+                start = self._last_start()
+                kind, value, end = self._scan(start)
+                if end >= len(self.source) and not self.final:
+                    # A number or an identifier might continue in the next piece
+                    raise NeedMoreData()
+                # Tokens are sparse around the general path, keep the next batch small
+                self._batch_size = max(_MIN_BATCH_SIZE, 2 * (start - self._batch_start))
+                self._fill(end)
+                return kind, value
+            self._index = i
+            return kind, None
+
+    def _value(self, kind: str, token: str) -> KonObject:
+        """Converts a raw value token to its value."""
+        if kind == IDENTIFIER:
+            if token in _KEYWORDS:
+                return _KEYWORDS[token]
+            if token in _FLOAT_KEYWORDS:
+                return float(token)
+            return token
+        if kind == NUMBER:
+            if token[:2] in ('0x', '0o', '0b'):
+                return int(token, base=0)
+            if "." in token or "e" in token or "E" in token:
+                return float(token)
+            return int(token)
+        return self._decode_str(token[1:-1])
+
+    def _entry(self, token: str) -> Tuple[KonObject, KonObject]:
+        """Converts a raw entry token to a `(key, value)` pair."""
+        key, _, value = token.partition('=')
+        key = key.rstrip()
+        value = value.strip()
+        if key in _KEYWORDS or key in _FLOAT_KEYWORDS:
+            key = self._value(IDENTIFIER, key)
+        return key, self._value(_TOKEN_KINDS[value[0]], value)
+
+    def _decode_str(self, body: str, multiline: Optional[MultilineStringBehaviour] = None) -> str:
+        """Converts the body of a string, which can only contain single character escapes."""
+        is_multiline = '\n' in body
+        if '\\' in body:
+            body = _SIMPLE_ESCAPE.sub(_replace_simple_escape, body)
+        if is_multiline:
+            return self._apply_multiline(body, multiline)
+        return body
+
+    def _apply_multiline(self, result: str, multiline: Optional[MultilineStringBehaviour]) -> str:
+        if multiline is None:
+            multiline = self.multiline_string_behaviour
+        # If this was a multiline literal with dedent behaviour, use
+        # textwrap.dedent to remove common leading indentation and normalize.
+        if multiline is MultilineStringBehaviour.DEDENT:
+            # textwrap.dedent will remove common indentation; strip a leading
+            # single newline which is a common writer pattern
+            if result.startswith('\n'):
+                result = result[1:]
+            result = textwrap.dedent(result)
+
+        # If VALUE_ERROR is configured as the global default and the caller
+        # didn't override it, raise now when the parsed string contains a
+        # newline (i.e. it is multiline).
+        elif multiline is MultilineStringBehaviour.VALUE_ERROR:
+            raise ValueError('multiline strings are not allowed')
+        return result
+
+    def _scan(self, pos: int) -> Tuple[str, KonObject, int]:
+        """
+        Scans a value token starting at `pos` character by character, returns
+        its kind, its value and the index right after it.
+        """
+        source = self.source
+        ch = source[pos:pos+1]
+        if '0' <= ch <= '9' or (ch >= '\x80' and ch.isdigit()):
+            return (NUMBER,) + self._scan_numeric(pos)
+        if ch == '"' or ch == "'":
+            return (STRING,) + self._scan_str(pos, None)
+        if ch == '<' or ch == '|':
+            if source[pos+1:pos+2] in ('"', "'"):
+                # An explicit marker overrides the default behaviour
+                behaviour = MultilineStringBehaviour.DEDENT if ch == '<' else MultilineStringBehaviour.IGNORE
+                return (STRING,) + self._scan_str(pos + 1, behaviour)
+        elif ch.isidentifier() or ch == '$' or ch == ':':
+            return (IDENTIFIER,) + self._scan_identifier(pos)
+        if pos + 1 >= len(source) and (ch == '<' or ch == '|'):
+            # Might be the marker of a multiline string
+            raise self._incomplete(f'unexpected character: {ch!r} at index {self._offset + pos}')
+        raise ValueError(f'unexpected character: {ch!r} at index {self._offset + pos}')
+
+    def _incomplete(self, message: str) -> ValueError:
+        """Returns the error for a token cut short by the end of `source`, unless more is yet to be fed."""
+        if not self.final:
+            raise NeedMoreData()
+        return ValueError(message)
+
+    def _scan_run(self, pattern: 're.Pattern[str]', pos: int, predicate) -> int:
+        """
+        Returns the end of the run starting at `pos` matched by the ASCII-only
+        `pattern`, extended by any non-ASCII characters satisfying `predicate`.
+        """
+        source = self.source
+        end = pattern.match(source, pos).end()
+        while end < len(source) and source[end] >= '\x80' and predicate(source[end]):
+            end = pattern.match(source, end + 1).end()
+        return end
+
+    def _scan_numeric(self, pos: int) -> Tuple[Union[int, float], int]:
+        source = self.source
+        if source[pos] == '0' and source[pos+1:pos+2] in ('x', 'o', 'b'):
+            end = _PREFIXED_INTEGER[source[pos+1]].match(source, pos + 2).end()
+            if end >= len(source) and not self.final:
+                # The digits might continue in the next piece
+                raise NeedMoreData()
+            return int(source[pos:end], base=0), end
+
+        end = self._scan_run(_ASCII_DIGITS, pos, str.isdigit)
+        if source[end:end+1] == '.':
+            end = self._scan_run(_ASCII_DIGITS, end + 1, str.isdigit)
+        if source[end:end+1] in ('e', 'E'):
+            end += 1
+            if source[end:end+1] in ('+', '-'):
+                end += 1
+            end = self._scan_run(_ASCII_DIGITS, end, str.isdigit)
+        if end >= len(source) and not self.final:
+            raise NeedMoreData()
+        num_str = source[pos:end]
+        if "." in num_str or "e" in num_str or "E" in num_str:
+            return float(num_str), end
+        return int(num_str), end
+
+    def _scan_identifier(self, pos: int) -> Tuple[Union[str, None, bool, float], int]:
+        """
+        Scans an identifier-like token (unquoted string). Recognizes the
+        keywords null/true/false as well as inf/nan and otherwise returns the
+        identifier string.
+        """
+        end = self._scan_run(_IDENTIFIER_CHARS, pos, _is_identifier_char)
+        ident = self.source[pos:end]
+        if ident in _KEYWORDS:
+            return _KEYWORDS[ident], end
+        if ident in _FLOAT_KEYWORDS:
+            return float(ident), end
+        return ident, end
+
+    def _scan_str(self, pos: int, multiline: Optional[MultilineStringBehaviour]) -> Tuple[str, int]:
+        r"""
+        Scans a quoted string starting at the quote at `pos`. `multiline` is
+        the behaviour requested by a `<` or `|` marker in front of the quote,
+        if any.
+
+        Supported escapes: \\, \" , \' , \n , \r , \t , \xNN , \uNNNN
+        """
+        source = self.source
+        quote = source[pos]
+        body = _STRING_BODY[quote]
+        pos += 1
+
+        is_multiline = False
+        chunks = []
+        while True:
+            end = body.match(source, pos).end()
+            if end != pos:
+                run = source[pos:end]
+                if not is_multiline and '\n' in run:
+                    is_multiline = True
+                chunks.append(run)
+                pos = end
+            ch = source[pos:pos+1]
+            if ch == '':
+                raise self._incomplete('unterminated string')
+            if ch == quote:
+                pos += 1
+                break
+
+            # handle escapes
+            esc = source[pos+1:pos+2]
+            pos += 1
+            if esc == '':
+                raise self._incomplete('unterminated escape sequence in string')
+            if esc in _SIMPLE_ESCAPES:
+                chunks.append(_SIMPLE_ESCAPES[esc])
+                pos += 1
+            elif esc == 'x':
+                # two hex digits
+                hexstr = source[pos+1:pos+3]
+                if len(hexstr) < 2:
+                    raise self._incomplete('incomplete \\x escape')
+                try:
+                    chunks.append(chr(int(hexstr, 16)))
+                except ValueError:
+                    raise ValueError('invalid \\x escape')
+                pos += 3
+            elif esc == 'u':
+                # four hex digits
+                hx = source[pos+1:pos+5]
+                if len(hx) < 4:
+                    raise self._incomplete('incomplete \\u escape')
+                try:
+                    chunks.append(chr(int(hx, 16)))
+                except ValueError:
+                    raise ValueError('invalid \\u escape')
+                pos += 5
+            elif esc == '\r' and source[pos+1:pos+2] == '\n':
+                pos += 2
+            elif esc.isspace():
+                pos += 1
+            else:
+                # unknown escape, keep the character as-is
+                chunks.append(esc)
+                pos += 1
+
+        result = ''.join(chunks)
+        if is_multiline:
+            result = self._apply_multiline(result, multiline)
+        return result, pos
+
+
+class _CompiledKonTokenizer(KonTokenizer):
+    """
+    A :class:`KonTokenizer` that runs its token stream methods in the
+    compiled `kon._speedups` extension. The extension leaves batch ends and
+    the general scanning path to the pure-Python methods, by returning None.
+    """
+
+    def skip_whitespace(self) -> str:
+        kind = _accel.speedups.skip_whitespace(self) # type: ignore
+        if kind is None:
+            return super().skip_whitespace()
+        return kind
+
+    def next_element(self) -> Token:
+        token = _accel.speedups.next_element(self) # type: ignore
+        if token is None:
+            return super().next_element()
+        return token
+
+    def peek(self) -> str:
+        kind = _accel.speedups.peek(self) # type: ignore
+        if kind is None:
+            return super().peek()
+        return kind
+
+    def next(self, newlines: bool = True) -> Token:
+        token = _accel.speedups.next(self, newlines) # type: ignore
+        if token is None:
+            return super().next(newlines)
+        return token
+
+    def _match_bracket(self, pos: int) -> int:
+        return _accel.speedups.match_bracket(self.source, pos, self._offset) # type: ignore
+
+
+class _InterningTokenizer:
+    """
+    Interns the strings of the tokens of the :class:`KonTokenizer` it is
+    mixed into in `_strings`: the keys of entries, and the values that
+    `_intern` asks for. Other keys are only known to be keys once the parser
+    collapses them, which interns them itself.
+    """
+    _intern: InternStrings
+    _strings: Dict[str, str]
+
+    def next_element(self) -> Token:
+        return self._interned(super().next_element()) # type: ignore
+
+    def next(self, newlines: bool = True) -> Token:
+        return self._interned(super().next(newlines)) # type: ignore
+
+    def _interned(self, token: Token) -> Token:
+        kind, value = token
+        if kind == ENTRY:
+            key, value = value # type: ignore
+            strings = self._strings
+            if key.__class__ is str:
+                key = strings.get(key) or _intern(strings, key)
+            if value.__class__ is str and self._intern is not InternStrings.KEYS:
+                # The value of the entry token that was just consumed is quoted when it ends with a quote
+                if self._intern is InternStrings.ALL or self._tokens[self._index - 1].rstrip()[-1] not in '"\'': # type: ignore
+                    value = strings.get(value) or _intern(strings, value)
+            return kind, (key, value)
+        if value.__class__ is str:
+            if kind == IDENTIFIER and self._intern is not InternStrings.KEYS or kind == STRING and self._intern is InternStrings.ALL:
+                return kind, self._strings.get(value) or _intern(self._strings, value) # type: ignore
+        return token
+
+
+class _InterningKonTokenizer(_InterningTokenizer, KonTokenizer):
+    pass
+
+
+class _InterningCompiledKonTokenizer(_InterningTokenizer, _CompiledKonTokenizer):
+    pass
+
+
+def create_tokenizer(source: str, multiline_string_behaviour: MultilineStringBehaviour = MultilineStringBehaviour.IGNORE, position: int = 0, *, final: bool = True, intern: Optional[InternStrings] = None, strings: Optional[Dict[str, str]] = None) -> KonTokenizer:
+    """
+    Creates a :class:`KonTokenizer` for the backend selected by `kon._accel`,
+    which interns the strings that `intern` asks for in `strings`.
+    """
+    if intern is None:
+        if _accel.speedups is None:
+            return KonTokenizer(source, multiline_string_behaviour, position, final=final)
+        return _CompiledKonTokenizer(source, multiline_string_behaviour, position, final=final)
+    tokenizer: KonTokenizer
+    if _accel.speedups is None:
+        tokenizer = _InterningKonTokenizer(source, multiline_string_behaviour, position, final=final)
+    else:
+        tokenizer = _InterningCompiledKonTokenizer(source, multiline_string_behaviour, position, final=final)
+    tokenizer._intern = intern # type: ignore
+    tokenizer._strings = {} if strings is None else strings # type: ignore
+    return tokenizer
+
+
+def _intern(strings: Dict[str, str], value: str) -> str:
+    """
+    Adds `value` to a table of interned strings, returns the interned one.
+    It is also interned by Python, so that e.g. keys are the same objects as
+    the equal literals in code, and are looked up by identity.
+    """
+    return strings.setdefault(value, sys.intern(value))
+
+
+def _replace_simple_escape(match: 're.Match[str]') -> str:
+    return _SIMPLE_ESCAPES[match.group(1)]
+
+
+def _is_identifier_char(ch: str) -> bool:
+    return ch.isidentifier() or ch.isdigit()
@@ -0,0 +1,445 @@
+"""
+Watching Kon files for changes, see :func:`watch` and :func:`awatch`.
+
+Files are polled with `stat()`: one that has the same modification time,
+size and inode as before costs nothing more. When those changed, the file is
+read and hashed, and only parsed again if its content changed too. Instead
+of the whole document, a change lists the paths of the keys that were
+added, removed or modified, and a file that only changed in its comments or
+formatting is not reported at all.
+
+On Linux, inotify wakes the watcher up as soon as something in the
+directory of a file changed, instead of waiting for the next poll. It is
+found through `ctypes`, without any dependencies, and polling takes over
+where it is not available.
+"""
+import errno
+import hashlib
+import os
+import select
+import sys
+import threading
+import time
+import traceback
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .cache import FrozenDict, _rebuild
+from .parser import KonParser
+from .types import KonObject
+
+PathLike = Union[str, 'os.PathLike[str]']
+
+# What a change of a file is noticed by, besides its content
+_Signature = Tuple[int, int, int]
+# The events of the directory of a file that wake the watcher up: it was
+# modified, its attributes changed, it was closed after writing, moved away
+# or into place, created or deleted
+_INOTIFY_MASK = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+
+# Replaced by the tests, to debounce without waiting
+_clock = time.monotonic
+
+
+class FileChange(NamedTuple):
+    """
+    A change of a watched file, see :func:`watch`. Key paths are tuples of
+    keys, from the top-level dictionary down. Lists are compared as a
+    whole, a changed list is a modified path.
+    """
+    path: str
+    """The path of the file, as it was given."""
+    value: KonObject
+    """The new value of the file, frozen (see :class:`kon.cache.CachedResults`), None once it was removed."""
+    added: Tuple[Tuple[Any, ...], ...]
+    """The paths of the keys that were added."""
+    removed: Tuple[Tuple[Any, ...], ...]
+    """The paths of the keys that were removed."""
+    modified: Tuple[Tuple[Any, ...], ...]
+    """The paths of the keys whose values changed, `()` when a top-level value that is not a dictionary did."""
+
+
+class _File:
+    """What a :class:`Watcher` knows about a file."""
+    __slots__ = ('path', 'key', 'signature', 'pending', 'digest', 'value')
+
+    def __init__(self, path: str, key: str) -> None:
+        self.path = path
+        self.key = key
+        self.signature: Optional[_Signature] = None
+        # When the signature last changed, while it was not read since
+        self.pending: Optional[float] = None
+        self.digest: Optional[bytes] = None
+        self.value: KonObject = None
+
+
+class Watcher:
+    """
+    Watches Kon files for changes, see :func:`watch`.
+
+    A watcher that was not started only checks the files when
+    :meth:`check` is called, e.g. from an existing poll loop. A watcher is
+    safe to share between threads.
+
+    Attributes:
+        interval (float): The seconds between two polls.
+        debounce (float): How many seconds the size, modification time and
+            inode of a file have to stay the same, before it is read.
+    """
+    interval: float
+    debounce: float
+
+    def __init__(self, paths: Union[PathLike, Iterable[PathLike]], on_change: Optional[Callable[[FileChange], Any]] = None, *, interval: float = 1.0, debounce: float = 0.1, inotify: bool = True, on_error: Optional[Callable[[str, Exception], Any]] = None, **kwargs) -> None:
+        """
+        Reads the files, without starting to watch them yet.
+
+        Args:
+            paths: A path, or the paths, of the files to watch. They do not
+                have to exist, a file that is created is reported as added.
+            on_change: Called with a :class:`FileChange` for every file that
+                changed, from the thread that checked it. Defaults to None.
+            interval: The seconds between two polls. Defaults to 1.
+            debounce: How many seconds a file has to stay the same before
+                it is read, so that a file that is written in several steps
+                is read once it is complete. Defaults to 0.1.
+            inotify: If True, uses inotify where it is available to check
+                the files as soon as they changed. Defaults to True.
+            on_error: Called with the path and the error of a file that can
+                not be read or parsed, which keeps its last value until it
+                is valid again, and with the errors that `on_change` raises.
+                Defaults to None, which ignores the former and prints the
+                latter to stderr.
+            **kwargs: Keyword arguments to be passed to the `KonParser`.
+        """
+        if isinstance(paths, (str, os.PathLike)):
+            paths = [paths]
+        self.interval = interval
+        self.debounce = debounce
+        self._on_change = on_change
+        self._on_error = on_error
+        self._inotify = inotify
+        self._options = kwargs
+        self._files = [_File(os.fspath(path), os.path.abspath(os.fspath(path))) for path in paths]
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._wakeup: Optional[Tuple[int, int]] = None
+        self._wakeup_lock = threading.Lock()
+        errors: List[Tuple[str, Exception]] = []
+        for file in self._files:
+            file.signature = _signature(file.key)
+            self._reload(file, errors)
+        self._report(errors)
+
+    @property
+    def values(self) -> Dict[str, KonObject]:
+        """The current value of every file by its path, None for a file that does not exist or was never valid."""
+        with self._lock:
+            return {file.path: file.value for file in self._files}
+
+    def check(self) -> List[FileChange]:
+        """
+        Checks the files once, calls `on_change` for each one that changed,
+        and returns the changes. A file that changed less than `debounce`
+        seconds ago is left for a later check.
+        """
+        errors: List[Tuple[str, Exception]] = []
+        with self._lock:
+            changes = []
+            now = _clock()
+            for file in self._files:
+                signature = _signature(file.key)
+                if signature != file.signature:
+                    file.signature = signature
+                    file.pending = now
+                if file.pending is None or now - file.pending < self.debounce:
+                    continue
+                file.pending = None
+                change = self._reload(file, errors)
+                if change is not None:
+                    changes.append(change)
+        # Outside of the lock, so that the callbacks can use the watcher
+        self._report(errors)
+        for change in changes:
+            self._emit(change)
+        return changes
+
+    def start(self) -> 'Watcher':
+        """Starts checking the files in a background thread, returns the watcher."""
+        if self._thread is not None:
+            raise RuntimeError('the watcher was started already')
+        inotify = _Inotify.open(self._directories()) if self._inotify else None
+        if inotify is not None:
+            # Wakes the thread up from waiting for inotify when stopped
+            self._wakeup = os.pipe()
+        self._thread = threading.Thread(target=self._run, args=(inotify,), name='kon-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the background thread, and waits for it to finish."""
+        self._stopped.set()
+        with self._wakeup_lock:
+            if self._wakeup is not None:
+                os.write(self._wakeup[1], b'\0')
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def __enter__(self) -> 'Watcher':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def _run(self, inotify: Optional['_Inotify']) -> None:
+        try:
+            while not self._stopped.is_set():
+                self.check()
+                timeout = self._timeout()
+                if inotify is None:
+                    self._stopped.wait(timeout)
+                elif inotify.fileno() in select.select([inotify.fileno(), self._wakeup[0]], [], [], timeout)[0]: # type: ignore
+                    inotify.drain()
+        finally:
+            if inotify is not None:
+                inotify.close()
+                with self._wakeup_lock:
+                    for fd in self._wakeup: # type: ignore
+                        os.close(fd)
+                    self._wakeup = None
+
+    def _timeout(self) -> float:
+        """The seconds until the next check, the poll interval or the end of a debounce."""
+        timeout = self.interval
+        with self._lock:
+            now = _clock()
+            for file in self._files:
+                if file.pending is not None:
+                    timeout = min(timeout, max(0.0, file.pending + self.debounce - now))
+        return timeout
+
+    def _directories(self) -> List[str]:
+        return sorted({os.path.dirname(file.key) for file in self._files})
+
+    def _reload(self, file: _File, errors: List[Tuple[str, Exception]]) -> Optional[FileChange]:
+        """
+        Reads a file again, returns its change, or None if its value stayed
+        the same. The error of a file that is not valid is added to `errors`.
+        """
+        if file.signature is None:
+            digest = None
+            value = None
+        else:
+            try:
+                with open(file.key, 'rb') as handle:
+                    data = handle.read()
+                digest = hashlib.blake2b(data).digest()
+                if digest == file.digest:
+                    return None
+                file.digest = digest
+                value = _rebuild(KonParser(data, **self._options).parse(), FrozenDict, tuple)
+            except FileNotFoundError:
+                # Removed since its `stat()`, which the next check notices
+                return None
+            except (OSError, ValueError, TypeError) as error:
+                errors.append((file.path, error))
+                return None
+        added, removed, modified = _diff(file.value, value)
+        file.digest = digest
+        file.value = value
+        if not added and not removed and not modified:
+            return None
+        return FileChange(file.path, value, added, removed, modified)
+
+    def _report(self, errors: List[Tuple[str, Exception]]) -> None:
+        if self._on_error is not None:
+            for path, error in errors:
+                self._on_error(path, error)
+
+    def _emit(self, change: FileChange) -> None:
+        if self._on_change is None:
+            return
+        try:
+            self._on_change(change)
+        except Exception as error:
+            if self._on_error is None:
+                traceback.print_exc()
+            else:
+                self._on_error(change.path, error)
+
+
+def watch(paths: Union[PathLike, Iterable[PathLike]], on_change: Callable[[FileChange], Any], **kwargs) -> Watcher:
+    """
+    Watches Kon files, calling `on_change` from a background thread with the
+    changed key paths of every file that changed, e.g.
+    `kon.watch(['app.kon'], on_change=lambda change: print(change.modified))`.
+
+    Files are polled every `interval` seconds, and checked as soon as they
+    changed where inotify is available, see :mod:`kon.watcher`. Stop the
+    returned watcher to stop watching, e.g. by using it as a context
+    manager.
+
+    Args:
+        paths: A path, or the paths, of the files to watch.
+        on_change: Called with a :class:`FileChange` for every file that
+            changed.
+        **kwargs: Additional keyword arguments to be passed to the
+            :class:`Watcher`, e.g. `interval`, `debounce` and `on_error`, and
+            to the `KonParser`.
+
+    Returns:
+        Watcher: The started watcher.
+    """
+    return Watcher(paths, on_change, **kwargs).start()
+
+
+async def awatch(paths: Union[PathLike, Iterable[PathLike]], **kwargs) -> AsyncIterator[FileChange]:
+    """
+    Like :func:`watch`, but yields the changes to a coroutine, e.g.
+    `async for change in kon.awatch(['app.kon']): ...`. The files are read
+    and parsed in the default executor of the event loop, so that a large
+    file does not block it.
+
+    Args:
+        paths: A path, or the paths, of the files to watch.
+        **kwargs: Additional keyword arguments to be passed to the
+            :class:`Watcher`, but for `on_change`, and to the `KonParser`.
+
+    Yields:
+        FileChange: The change of a file.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    watcher = await loop.run_in_executor(None, lambda: Watcher(paths, **kwargs))
+    inotify = _Inotify.open(watcher._directories()) if watcher._inotify else None
+    woken = asyncio.Event()
+    if inotify is not None:
+        loop.add_reader(inotify.fileno(), woken.set)
+    try:
+        while True:
+            for change in await loop.run_in_executor(None, watcher.check):
+                yield change
+            try:
+                await asyncio.wait_for(woken.wait(), watcher._timeout())
+            except asyncio.TimeoutError:
+                pass
+            if inotify is not None and woken.is_set():
+                inotify.drain()
+            woken.clear()
+    finally:
+        if inotify is not None:
+            loop.remove_reader(inotify.fileno())
+            inotify.close()
+
+
+class _Inotify:
+    """An inotify instance that watches directories, only to be woken up by their changes."""
+    __slots__ = ('_fd',)
+
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+
+    @classmethod
+    def open(cls, directories: Iterable[str]) -> Optional['_Inotify']:
+        """Watches `directories`, returns None where inotify is not available."""
+        if not sys.platform.startswith('linux'):
+            return None
+        import ctypes
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return None
+        fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        for directory in directories:
+            # A directory that does not exist yet is only polled
+            add_watch(fd, os.fsencode(directory), _INOTIFY_MASK)
+        return cls(fd)
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def drain(self) -> None:
+        """Reads the pending events, which only tell that something changed."""
+        while True:
+            try:
+                if not os.read(self._fd, 1 << 16):
+                    return
+            except OSError as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def _signature(path: str) -> Optional[_Signature]:
+    """The modification time, size and inode of a file, None if it does not exist (or can not be found)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _diff(old: KonObject, new: KonObject) -> Tuple[Tuple[Tuple[Any, ...], ...], Tuple[Tuple[Any, ...], ...], Tuple[Tuple[Any, ...], ...]]:
+    """
+    The paths of the keys that were added, removed and modified from `old`
+    to `new`, on the first level where they differ. A file that does not
+    exist, None, counts as an empty dictionary.
+    """
+    if old is None:
+        old = {}
+    if new is None:
+        new = {}
+    added: List[Tuple[Any, ...]] = []
+    removed: List[Tuple[Any, ...]] = []
+    modified: List[Tuple[Any, ...]] = []
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        if _changed(old, new):
+            modified.append(())
+        return (), (), tuple(modified)
+    # Uses an explicit stack, like the parser, the values may be nested deeply
+    stack: List[Tuple[Tuple[Any, ...], dict, dict]] = [((), old, new)]
+    while stack:
+        path, before, after = stack.pop()
+        for key, value in after.items():
+            if key not in before:
+                added.append(path + (key,))
+                continue
+            previous = before[key]
+            if isinstance(previous, dict) and isinstance(value, dict):
+                stack.append((path + (key,), previous, value))
+            elif _changed(previous, value):
+                modified.append(path + (key,))
+        removed.extend(path + (key,) for key in before if key not in after)
+    return tuple(added), tuple(removed), tuple(modified)
+
+
+def _changed(old: KonObject, new: KonObject) -> bool:
+    """
+    Whether two values differ, telling apart e.g. `1`, `1.0` and `true` at
+    any depth, and taking `nan` to be the same as itself.
+    """
+    # Uses an explicit stack, like the parser, the values may be nested deeply
+    stack = [(old, new)]
+    while stack:
+        old, new = stack.pop()
+        if type(old) is not type(new):
+            return True
+        if isinstance(old, dict):
+            if old.keys() != new.keys():
+                return True
+            stack.extend((value, new[key]) for key, value in old.items())
+        elif isinstance(old, (list, tuple)):
+            if len(old) != len(new):
+                return True
+            stack.extend(zip(old, new))
+        elif old != new and not (old.__class__ is float and old != old and new != new):
+            return True
+    return False
+
+
+__all__ = ('watch', 'awatch', 'Watcher', 'FileChange')
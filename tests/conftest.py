@@ -0,0 +1,13 @@
+import pytest
+
+from kon import _accel
+
+
+@pytest.fixture(params=['pure', 'compiled'])
+def backend(request, monkeypatch):
+    """Runs a test with each backend of the tokenizer and `dumps`, see `kon._accel`."""
+    if request.param == 'pure':
+        monkeypatch.setattr(_accel, 'speedups', None)
+    elif _accel.speedups is None:
+        pytest.skip('the compiled speedups are not available')
+    return request.param
@@ -0,0 +1,394 @@
+import copy
+import dataclasses
+import io
+import json
+import os
+import timeit
+import tracemalloc
+from typing import Dict, List
+
+import pytest
+import kon
+import kon.binary
+import kon.check
+import kon.convert
+import kon.index
+import kon.schema
+import kon.spans
+import kon.watcher
+from kon.layers import LayeredLoader
+
+import baseline
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('KON_BENCHMARKS'),
+    reason='benchmarks are slow and timing sensitive, set KON_BENCHMARKS=1 to run them',
+)
+
+
+def _document(services):
+    return ''.join(f'''service_{i} {{
+    name = "Service number {i} with a fairly long description string"
+    host = "host-{i}.example.internal"
+    port = {8000 + i}
+    enabled = true
+    ratio = {i / 7:.6f}
+    tags(frontend, backend, "tag with spaces")
+    # a comment describing the limits block
+    limits {{
+        cpu = 2.5
+        memory = 0x4000
+    }}
+}}
+''' for i in range(services))
+
+
+def _best_of(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _wide_tree(entries):
+    return {f'key_{i}': (i, f'value {i}', (i, i + 1)) for i in range(entries)}
+
+
+def _deep_tree(depth, width):
+    tree = list(range(width))
+    for _ in range(depth):
+        tree = {'a': tree, 'b': tuple(range(width)), 'c': list(range(width))}
+    return tree
+
+
+def test_loads_large_document_speedup():
+    source = _document(2000)
+    assert kon.loads(source) == baseline.loads(source)
+    old = _best_of(lambda: baseline.loads(source))
+    new = _best_of(lambda: kon.loads(source))
+    print(f'\nloads of {len(source)} characters: {old:.4f}s -> {new:.4f}s ({old / new:.1f}x)')
+    assert old / new >= 5
+
+
+@pytest.mark.parametrize('pretty', [False, True])
+@pytest.mark.parametrize('make_tree', [lambda: _wide_tree(50000), lambda: _deep_tree(300, 50)], ids=['wide', 'deep'])
+def test_dumps_allocations(make_tree, pretty):
+    tree = make_tree()
+    assert kon.dumps(tree, pretty=pretty) == baseline.dumps(tree, pretty=pretty)
+    old = _peak_memory(lambda: baseline.dumps(tree, pretty=pretty))
+    new = _peak_memory(lambda: kon.dumps(tree, pretty=pretty))
+    streamed = _peak_memory(lambda: all(kon.iterdump(tree, pretty=pretty)))
+    print(f'\npeak memory of dumps: {old} -> {new} bytes, {streamed} bytes streamed')
+    assert new <= old * 0.75
+    assert streamed < new
+
+
+@pytest.mark.parametrize('indent_width', [2, 4])
+def test_dumps_pretty_speedup(indent_width):
+    value = kon.loads(_document(2000))
+    value['deep'] = _deep_tree(100, 5)
+    assert kon.dumps(value, pretty=True, indent_width=indent_width) == \
+        baseline.dumps(value, pretty=True, indent_width=indent_width)
+    old = _best_of(lambda: baseline.dumps(value, pretty=True, indent_width=indent_width))
+    new = _best_of(lambda: kon.dumps(value, pretty=True, indent_width=indent_width))
+    print(f'\npretty dumps: {old:.4f}s -> {new:.4f}s ({old / new:.1f}x)')
+    assert old / new >= 1.25
+
+
+@pytest.mark.parametrize('source', [
+    '{' + '\n'.join(f'key_{i} = {i}' for i in range(20000)) + '}',
+    '\n'.join(f'key_{i} x = "value {i}"' for i in range(20000)),
+], ids=['braced', 'top-level'])
+def test_wide_dict_allocations(source):
+    assert kon.loads(source) == baseline.loads(source)
+    old = _peak_memory(lambda: baseline.loads(source))
+    new = _peak_memory(lambda: kon.loads(source))
+    old_time = _best_of(lambda: baseline.loads(source), repeat=3)
+    new_time = _best_of(lambda: kon.loads(source))
+    print(f'\nwide dict: peak memory {old} -> {new} bytes, {old_time:.4f}s -> {new_time:.4f}s ({old_time / new_time:.1f}x)')
+    assert new <= old * 0.85
+    # About 5x on the pure backend, where tokenizing the entries is most of it
+    assert old_time / new_time >= 4
+
+
+def test_lazy_lookup_speedup():
+    source = _document(20000)
+    lookup = lambda value: value['service_10000']['limits']['cpu']
+    assert lookup(kon.loads(source, lazy=True)) == lookup(kon.loads(source))
+    old = _best_of(lambda: lookup(kon.loads(source)), repeat=3)
+    new = _best_of(lambda: lookup(kon.loads(source, lazy=True)), repeat=3)
+    print(f'\none key of {len(source)} characters: {old:.4f}s -> {new:.4f}s lazily ({old / new:.1f}x)')
+    assert old / new >= 4
+
+
+def test_index_lookup_speedup(tmp_path):
+    path = tmp_path / 'services.kon'
+    path.write_text(_document(20000))
+    with kon.index.open(path) as index:
+        assert index.get('service_10000.limits.cpu') == kon.load_path(path)['service_10000']['limits']['cpu']
+        old = _best_of(lambda: kon.load_path(path)['service_10000']['limits']['cpu'], repeat=3)
+        new = _best_of(lambda: index.get('service_10000.limits.cpu'))
+    print(f'\none key of {os.path.getsize(path)} bytes: {old:.4f}s -> {new:.6f}s indexed ({old / new:.0f}x)')
+    assert old / new >= 100
+
+
+def test_layers_merge_speedup(tmp_path):
+    base = tmp_path / 'base.kon'
+    base.write_text(_document(5000))
+    override = tmp_path / 'override.kon'
+    loader = LayeredLoader()
+    base_value = kon.load_path(base)
+
+    def copying_merge(layer):
+        # What merging layers by hand costs: copying the base, then updating it
+        merged = copy.deepcopy(base_value)
+        for service, values in layer.items():
+            merged[service].update(values)
+        return merged
+
+    overrides = iter(range(1000))
+
+    def remerge():
+        # A changed override, with the parsed base cached
+        override.write_text(f'service_10 {{ port = {next(overrides)} }}\n')
+        return loader.load([base, override]).value
+
+    assert kon.dumps(remerge()['service_10']) == kon.dumps(copying_merge(kon.load_path(override))['service_10'])
+    old = _best_of(lambda: copying_merge(kon.load_path(override)))
+    new = _best_of(remerge)
+    print(f'\nmerging an override into {len(base_value)} services: {old:.4f}s -> {new:.4f}s ({old / new:.1f}x)')
+    assert old / new >= 20
+
+
+def test_load_many_scaling(tmp_path):
+    workers = min(4, kon.parallel._available_cpus())
+    if workers < 2:
+        pytest.skip('needs at least two CPUs')
+    paths = []
+    for i in range(64):
+        path = tmp_path / f'{i}.kon'
+        path.write_text(_document(200))
+        paths.append(path)
+    # Each call starts its own pool, which is part of what is measured
+    assert kon.load_many(paths[:workers], workers=workers) == [kon.load_path(path) for path in paths[:workers]]
+    serial = _best_of(lambda: kon.load_many(paths, workers=1), repeat=3)
+    parallel = _best_of(lambda: kon.load_many(paths, workers=workers), repeat=3)
+    print(f'\nloading {len(paths)} files: {serial:.4f}s -> {parallel:.4f}s with {workers} workers ({serial / parallel:.1f}x)')
+    assert serial / parallel >= workers * 0.6
+
+
+@pytest.mark.parametrize('workers, speedup', [(4, 2.0), (8, 3.0), (16, 3.5)])
+def test_split_loads_scaling(workers, speedup):
+    if kon.parallel._available_cpus() < workers:
+        pytest.skip(f'needs at least {workers} CPUs')
+    source = _document(40000)
+    assert kon.loads(source, workers=workers) == kon.loads(source)
+    serial = _best_of(lambda: kon.loads(source), repeat=3)
+    parallel = _best_of(lambda: kon.loads(source, workers=workers), repeat=3)
+    print(f'\nparsing {len(source) / 1e6:.1f} MB: {serial:.4f}s -> {parallel:.4f}s with {workers} workers ({serial / parallel:.1f}x)')
+    assert serial / parallel >= speedup
+
+
+def test_binary_reload_speedup():
+    source = _document(5000)
+    encoded = kon.binary.dumps(kon.loads(source))
+    assert kon.binary.loads(encoded) == kon.loads(source)
+    old = _best_of(lambda: kon.loads(source))
+    new = _best_of(lambda: kon.binary.loads(encoded))
+    print(f'\nreloading {len(source)} bytes of Kon from {len(encoded)} bytes of KONB: {old:.4f}s -> {new:.4f}s ({old / new:.1f}x)')
+    assert old / new >= 2.5
+    assert len(encoded) < len(source) * 0.6
+
+
+def _retained_memory(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def test_interning_memory_and_lookups():
+    # A host inventory, repeating its keys and most of its values
+    source = ''.join(f'''host_{i} {{
+    name = web_{i % 10}
+    port = 8080
+    enabled = true
+    role = frontend
+    region = "eu-west-{i % 3}"
+    tags (linux, production, "team {i % 5}")
+}}
+''' for i in range(20000))
+    plain, plain_bytes = _retained_memory(lambda: kon.loads(source))
+    interned, interned_bytes = _retained_memory(lambda: kon.loads(source, intern='all'))
+    assert interned == plain
+
+    def lookups(value):
+        return lambda: [(host['name'], host['port'], host['role'], host['tags']) for host in value.values()]
+
+    old = _best_of(lookups(plain))
+    new = _best_of(lookups(interned))
+    print(f'\nretained by {len(plain)} hosts: {plain_bytes} -> {interned_bytes} bytes ({plain_bytes - interned_bytes} saved)')
+    print(f'looking up their keys: {old:.4f}s -> {new:.4f}s ({old / new:.2f}x)')
+    for intern in kon.InternStrings:
+        print(f'parsing with intern={intern.value}: {_best_of(lambda: kon.loads(source, intern=intern), repeat=3):.4f}s, without: {_best_of(lambda: kon.loads(source), repeat=3):.4f}s')
+    assert interned_bytes < plain_bytes * 0.7
+
+
+def test_numeric_lists_memory_and_speed():
+    # Time series, the kind of document that is mostly numbers
+    source = ''.join(f'''series_{i} {{
+    unit = "ms"
+    values ({", ".join(f"{j * 0.37:.2f}" for j in range(200))})
+    counts ({", ".join(str(j * 1000) for j in range(200))})
+}}
+''' for i in range(500))
+    plain, plain_bytes = _retained_memory(lambda: kon.loads(source))
+    arrays, array_bytes = _retained_memory(lambda: kon.loads(source, numeric_lists='array'))
+    assert {key: {name: list(item) if name != 'unit' else item for name, item in value.items()} for key, value in arrays.items()} == plain
+    old = _best_of(lambda: kon.loads(source), repeat=3)
+    new = _best_of(lambda: kon.loads(source, numeric_lists='array'), repeat=3)
+    print(f'\nretained by {len(plain)} series: {plain_bytes} -> {array_bytes} bytes as arrays')
+    print(f'parsing {len(source)} characters: {old:.4f}s -> {new:.4f}s ({old / new:.1f}x)')
+    assert kon.dumps(arrays) == kon.dumps(plain)
+    print(f'dumping: {_best_of(lambda: kon.dumps(plain)):.4f}s as lists, {_best_of(lambda: kon.dumps(arrays)):.4f}s as arrays')
+    assert array_bytes < plain_bytes * 0.4
+    assert old / new >= 2.5
+
+
+@dataclasses.dataclass
+class _Limits:
+    cpu: float
+    memory: int
+
+
+@dataclasses.dataclass
+class _Service:
+    name: str
+    host: str
+    port: int
+    enabled: bool
+    ratio: float
+    tags: List[str]
+    limits: _Limits
+
+
+def test_schema_memory_and_speed():
+    # Services with a block of metadata that the dataclasses do not have
+    source = ''.join(f'''service_{i} {{
+    name = "Service number {i}"
+    host = "host-{i}.example.internal"
+    port = {8000 + i}
+    enabled = true
+    ratio = {i / 7:.6f}
+    tags(frontend, backend, "tag with spaces")
+    limits {{ cpu = 2.5, memory = 0x4000 }}
+    metadata {{ owner = "team {i % 10}", history ({", ".join(f'"revision {j}"' for j in range(20))}) }}
+}}
+''' for i in range(5000))
+    schema = kon.schema.compile(Dict[str, _Service])
+
+    def convert():
+        # What converting the result of a plain parse by hand takes
+        return {
+            key: _Service(
+                value['name'], value['host'], value['port'], value['enabled'], value['ratio'],
+                value['tags'], _Limits(value['limits']['cpu'], value['limits']['memory']),
+            ) for key, value in kon.loads(source).items()
+        }
+
+    assert schema.loads(source) == convert()
+    old = _best_of(convert, repeat=3)
+    new = _best_of(lambda: schema.loads(source), repeat=3)
+    old_bytes = _peak_memory(convert)
+    new_bytes = _peak_memory(lambda: schema.loads(source))
+    print(f'\ndecoding {len(source)} characters into dataclasses: {old:.4f}s -> {new:.4f}s ({old / new:.1f}x)')
+    print(f'peak memory: {old_bytes} -> {new_bytes} bytes')
+    assert new_bytes < old_bytes * 0.5
+    # A single pass, which is at least as fast as the two
+    assert old / new >= 0.9
+
+
+def test_validate_memory_and_speed():
+    source = _document(20000)
+    assert kon.check.validate(source) == []
+    old = _best_of(lambda: kon.loads(source), repeat=3)
+    new = _best_of(lambda: kon.check.validate(source), repeat=3)
+    old_bytes = _peak_memory(lambda: kon.loads(source))
+    new_bytes = _peak_memory(lambda: kon.check.validate(source))
+    print(f'\nchecking {len(source)} characters: {old:.4f}s -> {new:.4f}s ({old / new:.1f}x), peak memory {old_bytes} -> {new_bytes} bytes')
+    # What is left is mostly the batch of tokens, and the top-level keys
+    assert new_bytes < old_bytes * 0.4
+    # Not faster, skipping the conversion of values saves less than 1%
+    assert old / new >= 0.9
+
+
+class _Sink:
+    def write(self, data):
+        return len(data)
+
+
+def test_convert_memory_and_speed():
+    source = _document(20000).encode()
+    json_source = json.dumps(kon.loads(source)).encode()
+
+    def kon_whole():
+        json.dump(kon.load(io.BytesIO(source)), _Sink())
+
+    def kon_streamed():
+        return kon.convert.kon_to_json(io.BytesIO(source), _Sink())
+
+    def json_whole():
+        _Sink().write(kon.dumps(json.load(io.BytesIO(json_source))))
+
+    def json_streamed():
+        return kon.convert.json_to_kon(io.BytesIO(json_source), _Sink())
+
+    # Decoding JSON a value at a time, and dumping Kon an entry at a time,
+    # costs more than the C decoder does for the whole document, as does
+    # parsing Kon a chunk at a time
+    for name, whole, streamed, speed in (('kon -> json', kon_whole, kon_streamed, 0.6), ('json -> kon', json_whole, json_streamed, 0.5)):
+        old = _best_of(whole, repeat=3)
+        new = _best_of(streamed, repeat=3)
+        old_bytes = _peak_memory(whole)
+        new_bytes = _peak_memory(streamed)
+        print(f'\n{name}: {streamed().throughput:.2f} MB/s, {old:.4f}s -> {new:.4f}s ({old / new:.1f}x), peak memory {old_bytes} -> {new_bytes} bytes')
+        # What is left is the chunk being parsed
+        assert new_bytes < old_bytes * 0.1
+        assert old / new >= speed
+
+
+def test_spans_edit_speedup():
+    source = _document(20000)
+    document = kon.spans.KonDocument(source)
+
+    def rewrite():
+        value = kon.loads(document.source)
+        value['service_10000']['limits']['cpu'] = 4.0
+        return kon.dumps(value)
+
+    old = _best_of(rewrite, repeat=3)
+    new = _best_of(lambda: document.set('service_10000.limits.cpu', 4.0), repeat=20)
+    assert document.value == kon.loads(document.source)
+    print(f'\none value of {len(source)} characters: {old:.4f}s -> {new:.6f}s in place ({old / new:.0f}x)')
+    assert old / new >= 100
+
+
+def test_watch_unchanged_speedup(tmp_path):
+    paths = []
+    for i in range(20):
+        paths.append(tmp_path / f'service_{i}.kon')
+        paths[-1].write_text(_document(500))
+    watcher = kon.watcher.Watcher(paths)
+    old = _best_of(lambda: [kon.load_path(path) for path in paths], repeat=3)
+    new = _best_of(watcher.check)
+    assert watcher.check() == []
+    print(f'\npoll of {len(paths)} unchanged files: {old:.4f}s -> {new:.6f}s watched ({old / new:.0f}x)')
+    assert old / new >= 100
@@ -0,0 +1,186 @@
+import enum
+import math
+import os
+import struct
+
+import kon
+import kon.binary
+import pytest
+
+SOURCE = '''
+name = "app"
+server {
+  host = "0.0.0.0"
+  ports (80, 443, -1, 70000, 0x7fffffffffffffff, 0x10000000000000000)
+  tls { enabled = false, ratio = 0.25, nothing = null }
+}
+1 = "one"
+2.5 = (true, -inf)
+'''
+
+
+def _same(a, b):
+    """Compares decoded values, including the types of ints and floats and nan."""
+    stack = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        assert type(a) is type(b)
+        if isinstance(a, dict):
+            assert list(a) == list(b)
+            stack.extend(zip(a.values(), b.values()))
+        elif isinstance(a, list):
+            assert len(a) == len(b)
+            stack.extend(zip(a, b))
+        elif isinstance(a, float) and math.isnan(a):
+            assert math.isnan(b)
+        elif isinstance(a, float):
+            assert struct.pack('<d', a) == struct.pack('<d', b)
+        else:
+            assert a == b
+
+
+@pytest.mark.parametrize('value', [
+    None, True, False, 0, -128, 127, 128, -2 ** 31, 2 ** 31, -2 ** 63, 2 ** 63, 2 ** 200, -(2 ** 200),
+    0.0, -0.0, 1.5, float('inf'), float('-inf'), float('nan'),
+    '', 'é', '\ud800', 'x' * 300, [], {}, [[[]]],
+    {1: 'int', 1.5: 'float', None: 'null', True: 'bool', 'a': {'b': [1, {'c': None}]}},
+])
+def test_round_trip(value):
+    _same(kon.binary.loads(kon.binary.dumps(value)), value)
+
+
+def test_parsed_document():
+    value = kon.loads(SOURCE)
+    encoded = kon.binary.dumps(value)
+    _same(kon.binary.loads(encoded), value)
+    assert kon.binary.loads(bytearray(encoded)) == kon.binary.loads(memoryview(encoded)) == value
+    assert len(encoded) < len(SOURCE)
+
+
+def test_strings_are_interned():
+    value = [{'key': 'value', f'k{i}': i} for i in range(70000)]
+    encoded = kon.binary.dumps(value)
+    decoded = kon.binary.loads(encoded)
+    assert decoded == value
+    assert decoded[0]['key'] is decoded[-1]['key']
+    assert encoded.count(b'value') == 1
+    # References to the later strings need 16 and then 32 bits
+    assert kon.binary.loads(kon.binary.dumps(value + [f'k{i}' for i in range(70000)])) == value + [f'k{i}' for i in range(70000)]
+
+
+def test_subclasses():
+    class Text(str):
+        pass
+
+    class Number(enum.IntEnum):
+        ONE = 1
+
+    value = [Text('a'), 'a', Number.ONE, ('x', 'a'), kon.loads('{a = 1}', lazy=True)]
+    decoded = kon.binary.loads(kon.binary.dumps(value))
+    _same(decoded, ['a', 'a', 1, ['x', 'a'], {'a': 1}])
+
+
+def test_deep_nesting():
+    value = []
+    for _ in range(100000):
+        value = [value]
+    decoded = kon.binary.loads(kon.binary.dumps(value))
+    for _ in range(100000):
+        assert len(decoded) == 1
+        decoded = decoded[0]
+    assert decoded == []
+
+
+def test_invalid_values():
+    with pytest.raises(TypeError):
+        kon.binary.dumps({'a': object()})
+    value = []
+    value.append(value)
+    with pytest.raises(ValueError, match='circular'):
+        kon.binary.dumps(value)
+    # A container used twice, but not within itself, is fine
+    shared = [1]
+    assert kon.binary.loads(kon.binary.dumps([shared, shared])) == [[1], [1]]
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'', 'not a KONB'),
+    (b'KON', 'not a KONB'),
+    (b'KONB', 'version'),
+    (b'KONB\x02\x00', 'version'),
+    (b'KONB\x01', 'truncated'),
+    (b'KONB\x01\x08\x05abc', 'truncated'),
+    (b'KONB\x01\x0d\x02\x00', 'truncated'),
+    (b'KONB\x01\x0a\x00', 'truncated'),
+    (b'KONB\x01\x00\x00', 'unexpected data'),
+    (b'KONB\x01\xff', 'invalid KONB tag'),
+])
+def test_invalid_documents(data, message):
+    with pytest.raises(ValueError, match=message):
+        kon.binary.loads(data)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'data.kon'
+    path.write_text(SOURCE)
+    return path
+
+
+def _rewrite(path, source):
+    # Keep the modification time to check that a changed size is noticed too
+    stat = os.stat(path)
+    path.write_text(source)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_load_path_cache(source, monkeypatch):
+    cache = source.with_suffix('.konb')
+    _same(kon.binary.load_path(source), kon.loads(SOURCE))
+    assert cache.exists()
+    parsed = []
+    original = kon.load_path
+    monkeypatch.setattr(kon, 'load_path', lambda *args, **kwargs: parsed.append(args) or original(*args, **kwargs))
+    _same(kon.binary.load_path(source), kon.loads(SOURCE))
+    assert parsed == []
+    _rewrite(source, 'changed = 12')
+    assert kon.binary.load_path(source) == {'changed': 12}
+    assert len(parsed) == 1
+    assert kon.binary.load_path(source) == {'changed': 12}
+    assert len(parsed) == 1
+
+
+def test_load_path_options(source):
+    _rewrite(source, 'a = 1\na = 2')
+    assert kon.binary.load_path(source) == {'a': 2}
+    assert kon.binary.load_path(source, duplicate_keys='first_wins') == {'a': 1}
+    assert kon.binary.load_path(source) == {'a': 2}
+
+
+def test_load_path_cache_path(source, tmp_path):
+    cache = tmp_path / 'elsewhere.bin'
+    assert kon.binary.load_path(source, cache) == kon.loads(SOURCE)
+    assert cache.exists() and not source.with_suffix('.konb').exists()
+    other = tmp_path / 'data.cfg'
+    other.write_text('a = 1')
+    assert kon.binary.load_path(other) == {'a': 1}
+    assert (tmp_path / 'data.cfg.konb').exists()
+
+
+@pytest.mark.parametrize('content', [b'', b'garbage', b'KONBCACH' + b'\x00' * 24, None])
+def test_invalid_cache_is_replaced(source, content):
+    cache = source.with_suffix('.konb')
+    kon.binary.load_path(source)
+    if content is None:
+        # A valid header, but a truncated document
+        content = cache.read_bytes()[:-3]
+    cache.write_bytes(content)
+    assert kon.binary.load_path(source) == kon.loads(SOURCE)
+    assert kon.binary.load_path(source) == kon.loads(SOURCE)
+
+
+def test_unwritable_cache(source, tmp_path):
+    assert kon.binary.load_path(source, tmp_path / 'missing' / 'data.konb') == kon.loads(SOURCE)
+    assert os.listdir(tmp_path) == ['data.kon']
+    with pytest.raises(OSError):
+        kon.binary.load_path(tmp_path / 'missing.kon')
@@ -0,0 +1,115 @@
+import array
+import mmap
+import random
+import tracemalloc
+
+import kon
+import pytest
+
+from test_conformance import FRAGMENTS, SOURCES, _outcome
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+
+  # settings
+  name = "ünïcödé"
+  server {
+    host = "10.0.0.1"
+    ports(80, 443)
+    motd = <"
+      hello
+       world"
+  }
+\t
+'''
+
+
+def _from_buffer(source, **kwargs):
+    return kon.KonParser.from_buffer(source.encode('utf-8'), **kwargs).parse()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 64, 1 << 20])
+def test_from_buffer_matches_loads(chunk_size):
+    assert _from_buffer(SOURCE, chunk_size=chunk_size) == kon.loads(SOURCE)
+
+
+@pytest.mark.parametrize('buffer', [bytearray, memoryview, lambda data: array.array('b', data)])
+def test_from_buffer_types(buffer):
+    assert kon.KonParser.from_buffer(buffer(SOURCE.encode('utf-8'))).parse() == kon.loads(SOURCE)
+
+
+def test_from_buffer_rejects_str():
+    with pytest.raises(TypeError):
+        kon.KonParser.from_buffer(SOURCE) # type: ignore
+
+
+@pytest.mark.parametrize('source', ['', ' ', '\n\t \n'])
+def test_from_buffer_empty(source):
+    with pytest.raises(ValueError, match='empty source not allowed'):
+        _from_buffer(source)
+
+
+def test_from_buffer_errors_match_loads():
+    rng = random.Random(9)
+    sources = list(SOURCES)
+    for _ in range(500):
+        sources.append(''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 40))))
+    for source in sources:
+        if source.strip() == '':
+            continue
+        for chunk_size in (1, 4, 1 << 20):
+            assert _outcome(_from_buffer, source, chunk_size=chunk_size) == _outcome(kon.loads, source), (source, chunk_size)
+
+
+def test_from_buffer_invalid_utf8():
+    with pytest.raises(UnicodeDecodeError):
+        kon.KonParser.from_buffer(b'a = "\xff"').parse()
+    with pytest.raises(UnicodeDecodeError):
+        kon.KonParser.from_buffer('a = "é"'.encode('utf-8')[:-2]).parse()
+
+
+def test_load_path(tmp_path):
+    path = tmp_path / 'settings.kon'
+    path.write_text(SOURCE, encoding='utf-8')
+    assert kon.load_path(path) == kon.loads(SOURCE)
+    assert kon.load_path(str(path), chunk_size=3) == kon.loads(SOURCE)
+    # The map was closed
+    path.unlink()
+
+
+def test_load_path_options(tmp_path):
+    path = tmp_path / 'settings.kon'
+    path.write_text(SOURCE, encoding='utf-8')
+    result = kon.load_path(path, multiline_string_behaviour=kon.MultilineStringBehaviour.IGNORE)
+    assert result == kon.loads(SOURCE, multiline_string_behaviour=kon.MultilineStringBehaviour.IGNORE)
+    with pytest.raises(ValueError, match='maximum nesting depth'):
+        kon.load_path(path, max_depth=0)
+
+
+def test_load_path_empty_file(tmp_path):
+    path = tmp_path / 'empty.kon'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError, match='empty source not allowed'):
+        kon.load_path(path)
+
+
+def test_load_path_memory(tmp_path):
+    # Mostly comments and whitespace, which are never held as a whole
+    path = tmp_path / 'large.kon'
+    path.write_text(('# ' + 'x' * 200 + '\n   \n') * 20000 + 'last = 1\n' + ' ' * 100000, encoding='utf-8')
+    size = path.stat().st_size
+    tracemalloc.start()
+    try:
+        assert kon.load_path(path, chunk_size=1 << 16) == {'last': 1}
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < size / 4
+
+
+def test_from_mmap(tmp_path):
+    path = tmp_path / 'settings.kon'
+    path.write_text(SOURCE, encoding='utf-8')
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        assert kon.KonParser.from_buffer(buffer).parse() == kon.loads(SOURCE)
@@ -0,0 +1,216 @@
+import copy
+import os
+import pickle
+import threading
+
+import kon
+import pytest
+from kon.cache import CachedLoader, CachedResults, CacheStats, FrozenDict
+
+SOURCE = '''
+name = "app"
+server {
+  ports(80, 443)
+  tls { enabled = true }
+}
+'''
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'config.kon'
+    path.write_text(SOURCE)
+    return path
+
+
+def _rewrite(path, source):
+    # Keep the modification time to check that a changed size is noticed too
+    stat = os.stat(path)
+    path.write_text(source)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_load_path_matches_loads(config):
+    loader = CachedLoader(results=CachedResults.COPIED)
+    assert loader.load_path(config) == kon.loads(SOURCE)
+    assert loader.load_path(str(config)) == kon.loads(SOURCE)
+    assert loader.stats() == CacheStats(hits=1, misses=1, evictions=0, entries=1, bytes=len(SOURCE))
+
+
+def test_unchanged_file_only_costs_a_stat(config, monkeypatch):
+    loader = CachedLoader()
+    first = loader.load_path(config)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('the file was read again')
+
+    monkeypatch.setattr('kon.cache.open', fail, raising=False)
+    monkeypatch.setattr('kon.cache.KonParser', None)
+    assert loader.load_path(config) is first
+
+
+def test_changed_file_is_parsed_again(config):
+    loader = CachedLoader()
+    loader.load_path(config)
+    _rewrite(config, 'name = "other"')
+    assert loader.load_path(config) == {'name': 'other'}
+    assert loader.stats().misses == 2
+
+    os.utime(config, ns=(0, 0))
+    config.write_text('name = "third"')
+    assert loader.load_path(config) == {'name': 'third'}
+    assert loader.stats().misses == 3
+
+
+def test_touched_file_is_not_parsed_again(config, monkeypatch):
+    loader = CachedLoader()
+    first = loader.load_path(config)
+    os.utime(config, ns=(0, 0))
+    monkeypatch.setattr('kon.cache.KonParser', None)
+    assert loader.load_path(config) is first
+    assert loader.load_path(config) is first
+    assert loader.stats()[:3] == (2, 1, 0)
+
+
+def test_deleted_file(config):
+    loader = CachedLoader()
+    loader.load_path(config)
+    config.unlink()
+    with pytest.raises(FileNotFoundError):
+        loader.load_path(config)
+
+
+def test_errors_are_not_cached(tmp_path):
+    path = tmp_path / 'invalid.kon'
+    path.write_text('a = (1')
+    loader = CachedLoader()
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            loader.load_path(path)
+    assert loader.stats() == CacheStats(hits=0, misses=2, evictions=0, entries=0, bytes=0)
+
+
+def test_loads_by_content():
+    loader = CachedLoader()
+    first = loader.loads(SOURCE)
+    assert loader.loads(SOURCE) is first
+    assert loader.loads(SOURCE.encode('utf-8')) is first
+    assert loader.loads(bytearray(SOURCE.encode('utf-8'))) is first
+    assert loader.loads(SOURCE + ' ') == first
+    assert loader.stats()[:3] == (3, 2, 0)
+    with pytest.raises(TypeError):
+        loader.loads(1) # type: ignore
+
+
+def test_frozen_results():
+    result = CachedLoader().loads(SOURCE)
+    assert result == {'name': 'app', 'server': {'ports': (80, 443), 'tls': {'enabled': True}}}
+    assert isinstance(result, FrozenDict) and isinstance(result['server'], FrozenDict)
+    assert kon.dumps(result) == kon.dumps(kon.loads(SOURCE))
+    for mutate in [
+        lambda: result.__setitem__('name', 'x'), lambda: result.__delitem__('name'), lambda: result.update(a=1),
+        lambda: result.pop('name'), lambda: result.popitem(), lambda: result.clear(), lambda: result.setdefault('a', 1),
+        lambda: result['server'].__setitem__('tls', None),
+    ]:
+        with pytest.raises(TypeError, match='immutable'):
+            mutate()
+    assert copy.deepcopy(result) == result
+    assert pickle.loads(pickle.dumps(result)) == result
+
+
+def test_copied_results():
+    loader = CachedLoader(results=CachedResults.COPIED)
+    first = loader.loads(SOURCE)
+    first['server']['ports'].append(8080)
+    first['name'] = 'changed'
+    second = loader.loads(SOURCE)
+    assert second == kon.loads(SOURCE)
+    assert type(second['server']['ports']) is list
+
+
+@pytest.mark.parametrize('results, sequence', [(CachedResults.FROZEN, tuple), (CachedResults.COPIED, list)])
+def test_numeric_lists_are_not_shared(results, sequence):
+    loader = CachedLoader(results=results, numeric_lists='array')
+    for _ in range(2):
+        result = loader.loads('a (1, 2, 3)\nb {c (1.5, 2.5)}')
+        assert result == {'a': sequence((1, 2, 3)), 'b': {'c': sequence((1.5, 2.5))}}
+        assert type(result['a']) is sequence and type(result['b']['c']) is sequence
+        if sequence is list:
+            result['a'][0] = 100
+    assert loader.loads('(1, 2)') == sequence((1, 2))
+
+
+@pytest.mark.parametrize('results', list(CachedResults))
+def test_deep_results(results):
+    source = 'a(' * 5000 + '1' + ')' * 5000
+    value = CachedLoader(results=results).loads(source)
+    while not isinstance(value, int):
+        value = value['a'] if isinstance(value, dict) else value[0]
+    assert value == 1
+
+
+@pytest.mark.parametrize('source', ['1', '"s"', 'none', '(1, (2, 3), {a = 1})'])
+def test_top_level_values(source):
+    assert CachedLoader(results=CachedResults.COPIED).loads(source) == kon.loads(source)
+    frozen = CachedLoader().loads(source)
+    assert kon.dumps(frozen) == kon.dumps(kon.loads(source))
+
+
+def test_evicts_least_recently_used_entries():
+    loader = CachedLoader(max_entries=2)
+    a = loader.loads('a = 1')
+    loader.loads('b = 2')
+    assert loader.loads('a = 1') is a
+    loader.loads('c = 3')
+    assert loader.loads('a = 1') is a
+    assert loader.stats() == CacheStats(hits=2, misses=3, evictions=1, entries=2, bytes=10)
+    loader.loads('b = 2')
+    assert loader.stats().misses == 4
+
+
+def test_evicts_by_size():
+    loader = CachedLoader(max_entries=None, max_bytes=12)
+    loader.loads('a = 1')
+    loader.loads('b = 2')
+    loader.loads('c = 3')
+    assert loader.stats() == CacheStats(hits=0, misses=3, evictions=1, entries=2, bytes=10)
+    # Too large to be cached at all, without evicting the others
+    assert loader.loads('long = "value"') == {'long': 'value'}
+    assert loader.stats() == CacheStats(hits=0, misses=4, evictions=1, entries=2, bytes=10)
+
+
+def test_invalidate_and_clear(config):
+    loader = CachedLoader()
+    loader.load_path(config)
+    loader.loads('a = 1')
+    loader.invalidate(config)
+    assert loader.stats()[3:] == (1, 5)
+    loader.load_path(config)
+    loader.clear()
+    assert loader.stats() == CacheStats(hits=0, misses=3, evictions=0, entries=0, bytes=0)
+
+
+def test_parser_options():
+    source = 'a = <"\n  x\n   y"'
+    loader = CachedLoader(multiline_string_behaviour=kon.MultilineStringBehaviour.DEDENT)
+    assert loader.loads(source) == kon.loads(source, multiline_string_behaviour=kon.MultilineStringBehaviour.DEDENT)
+    deep = CachedLoader(max_depth=1)
+    with pytest.raises(ValueError):
+        deep.loads('((1))')
+
+
+def test_threads(config):
+    loader = CachedLoader()
+    expected = loader.load_path(config)
+    results = []
+
+    def load():
+        for _ in range(100):
+            results.append(loader.load_path(config) is expected and loader.loads(SOURCE) == expected)
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results) and len(results) == 400
@@ -0,0 +1,116 @@
+import json
+import os
+import subprocess
+import sys
+
+import kon
+import kon.check
+import pytest
+from kon.__main__ import main
+from kon.check import Diagnostic
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+
+@pytest.mark.parametrize('source', [
+    'a = 1\nb { c = 2, d (1, {e = f}) }\n',
+    '(1, 2)',
+    '"string"',
+    '  a b c = 1  \n\n',
+    b'a = "\xc3\xa9"',
+    'a = -1, b = +2.5\n{c = d}',
+])
+def test_valid(source):
+    kon.loads(source)
+    assert kon.check.validate(source) == []
+    assert kon.validate is kon.check.validate
+
+
+@pytest.mark.parametrize('source', [
+    'a = 1\nb { c = . }',
+    'a (1, 2',
+    'a {\n  b = 1\n  c d\n}',
+    'a = "\\x1"',
+    'a = -"x"',
+    '(1) x = 2',
+    'a = 1 2',
+])
+def test_same_errors_as_loads(source):
+    with pytest.raises((ValueError, TypeError)):
+        kon.loads(source)
+    diagnostics = kon.check.validate(source)
+    assert len(diagnostics) == 1
+    assert 'at index' not in diagnostics[0].message
+
+
+def test_every_error_is_reported():
+    source = 'a = 1\nb { c = . }\nd = 2\ne {\n  f\n}\ng = "\\x1"\nh = 3\n'
+    assert kon.check.validate(source) == [
+        Diagnostic(2, 9, 14, "unexpected character: '.'"),
+        Diagnostic(6, 1, 32, 'unset key f in dictionary@()'),
+        Diagnostic(7, 5, 38, 'invalid \\x escape'),
+    ]
+    assert str(kon.check.validate(source)[0]) == "2:9: unexpected character: '.'"
+
+
+@pytest.mark.parametrize('source', ['a { b {c = 1} d }', 'a { (1, 2) b }', 'x = 1\n{a = 1} (1, 2)'])
+def test_unset_key_shows_values(source):
+    # The lists and dictionaries are dropped while checking, but not from the message
+    with pytest.raises(ValueError) as error:
+        kon.loads(source)
+    assert [diagnostic.message for diagnostic in kon.check.validate(source)] == [str(error.value)]
+
+
+def test_options():
+    assert kon.check.validate('a = 1\na = 2') == []
+    assert kon.check.validate('a = 1\na = 2', duplicate_keys='error') == [Diagnostic(2, 1, 6, "duplicate key 'a' in dictionary")]
+    assert kon.check.validate('a ((1))', max_depth=1) == [Diagnostic(1, 4, 3, 'maximum nesting depth of 1 exceeded')]
+    assert kon.check.validate('a = 1', intern='all') == []
+    assert kon.check.validate(' \n ') == [Diagnostic(1, 1, 0, 'empty source not allowed')]
+    with pytest.raises(TypeError):
+        kon.check.validate(1)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'ok.kon').write_text('a = 1\n')
+    (tmp_path / 'sub' / 'bad.kon').write_text('a = 1\nb { c = . }\n')
+    (tmp_path / 'binary.kon').write_bytes(b'\xff')
+    (tmp_path / 'other.txt').write_text('not checked')
+    return tmp_path
+
+
+@pytest.mark.parametrize('workers, executor', [(1, 'process'), (2, 'thread')])
+def test_check_paths(tree, workers, executor):
+    paths = [tree / 'ok.kon', tree / 'sub' / 'bad.kon', tree / 'binary.kon', tree / 'missing.kon']
+    results = dict(kon.check.check_paths(paths, workers=workers, executor=executor, batch_bytes=1))
+    assert list(results) == [os.fspath(path) for path in paths]
+    assert results[os.fspath(paths[0])] == []
+    assert results[os.fspath(paths[1])] == [Diagnostic(2, 9, 14, "unexpected character: '.'")]
+    assert 'utf-8' in results[os.fspath(paths[2])][0].message
+    assert len(results[os.fspath(paths[3])]) == 1
+    with pytest.raises(ValueError):
+        kon.check.check_paths(paths, workers=0)
+
+
+def test_cli(tree, capsys):
+    assert main(['check', os.fspath(tree), '-j', '1']) == 1
+    out, err = capsys.readouterr()
+    assert out.splitlines() == [
+        f"{tree / 'binary.kon'}:1:1: 'utf-8' codec can't decode byte 0xff in position 0: invalid start byte",
+        f"{tree / 'sub' / 'bad.kon'}:2:9: unexpected character: '.'",
+    ]
+    assert err == 'checked 3 files, found 2 errors in 2 files\n'
+    assert main(['check', os.fspath(tree / 'sub'), '--format', 'json']) == 1
+    assert json.loads(capsys.readouterr()[0]) == {'path': os.fspath(tree / 'sub' / 'bad.kon'), 'line': 2, 'column': 9, 'index': 14, 'message': "unexpected character: '.'"}
+    assert main(['check', os.fspath(tree / 'ok.kon')]) == 0
+
+
+def test_cli_processes(tree):
+    process = subprocess.run(
+        [sys.executable, '-m', 'kon', 'check', os.fspath(tree), '-j', '2', '--format', 'json'],
+        capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+    )
+    assert process.returncode == 1
+    assert [json.loads(line)['path'] for line in process.stdout.splitlines()] == [os.fspath(tree / 'binary.kon'), os.fspath(tree / 'sub' / 'bad.kon')]
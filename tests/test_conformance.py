@@ -0,0 +1,151 @@
+import random
+import textwrap
+
+import pytest
+import kon
+
+import baseline
+from baseline import BaselineKonParser
+
+# The conformance suite runs with both backends, see conftest.py
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCES = [
+    'a = 1 # c\nb = 2',
+    'a\nb = 2',
+    '(1 # c\n 2)',
+    '(1 # c\n, 2)',
+    '- # c\n\n 1',
+    '-\n\n 1',
+    '- - +1',
+    '0x', '0x1f_3', '0o17', '0b102', '1e', '1.', '1.5.3', '1e+', '1e-5x',
+    '٣', '²', '1٣.٣e٣', 'é', 'aé_١', 'a = 1',
+    '(1}', '{a=1)', '(1', '{a = 1', '(', '{,}', '(,)', '( # c\n )',
+    'a b c', 'a b { c }', 'a = 1, b = 2) c = 3}',
+    '{a = 1 # c\n b = 2}',
+    '"\\x+f" "\\u0x1f"',
+    '"a\\\r\nb"', '"a\\\rb"', '"\\', '"\\x1', '"\\u12', '"abc',
+    '<"\n   a\n    b"', '|"\n  a"', '<a', '|', '"x" <"y"',
+    "'it''s'", '"\\"\\\'\\\\"',
+    'inf nan Infinity = NaN', 'null = true',
+    '$var :key = -0.5e3',
+    '@', 'a = @', '\n\n  a = 1\n\n',
+    'a = b = c = (1, 2, {d = e})',
+    'x(\n  1\n  2\n)\ny {\n  z = 3\n}',
+    'a = 1٣', 'a = 1.5.3', 'a = 0xg', 'a = 0x', 'a = 1e', 'a\u00a0= 1\u00a0\nb = 2',
+    'x = a = 1', '(1 a = 2)', '- a = 1', 'a = "x\ny"', 'true = nan', 'a = b c', 'a = 1 # c\n)',
+]
+
+FRAGMENTS = [
+    'a', 'key', 'x-y', '$v', ':k', '_', 'é', '١٢', '²', 'true', 'null', 'inf', 'nan',
+    '0', '42', '3.14', '1e5', '1E-3', '0x1F', '0o7', '0b1', '0x',
+    '"s"', "'q'", '"a\\nb"', '"\\x41"', '"\\u00e9"', '"\\q"', '"multi\nline"', '<"\n  d\n   e"', '|"\n x"',
+    '{', '}', '(', ')', '=', ',', '+', '-', '\n', ' ', '  ', '\t', '# note\n', '#', ' ', '@', '"',
+]
+
+
+def _outcome(parse, source, **kwargs):
+    try:
+        return 'ok', repr(parse(source, **kwargs))
+    except (ValueError, TypeError) as e:
+        return type(e).__name__, str(e)
+
+
+def _baseline_loads(source, **kwargs):
+    return BaselineKonParser(source, **kwargs).parse()
+
+
+@pytest.mark.parametrize('source', SOURCES)
+def test_matches_baseline(source):
+    assert _outcome(kon.loads, source) == _outcome(_baseline_loads, source)
+
+
+@pytest.mark.parametrize('behaviour', list(kon.MultilineStringBehaviour))
+def test_matches_baseline_multiline_behaviours(behaviour):
+    source = textwrap.dedent('''
+    a = "
+      one
+       two"
+    b = <"
+      three"
+    c = |"
+      four"
+    ''')
+    assert _outcome(kon.loads, source, multiline_string_behaviour=behaviour) == \
+        _outcome(_baseline_loads, source, multiline_string_behaviour=behaviour)
+
+
+def test_matches_baseline_large_source():
+    # Large enough to be split into several batches of tokens
+    rng = random.Random(42)
+    source = '\n'.join(
+        f'key{i} {{ a = {i}\n b = "{"x" * rng.randint(0, 300)}" c(1, 2.5, {"y" * rng.randint(0, 50)}) }}'
+        for i in range(2000)
+    )
+    assert _outcome(kon.loads, source) == _outcome(_baseline_loads, source)
+
+
+def test_matches_baseline_random_sources():
+    rng = random.Random(1337)
+    for _ in range(3000):
+        source = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 40)))
+        if source.strip() == '':
+            continue
+        assert _outcome(kon.loads, source) == _outcome(_baseline_loads, source), source
+
+
+def _random_object(rng, depth=0):
+    choice = rng.randrange(10 if depth < 4 else 6)
+    if choice == 0:
+        return rng.choice(['a', 'key_1', 'with space', "it's", '', 'é', '1a', 'a\nb'])
+    if choice == 1:
+        return rng.choice([0, -3, 42, 2 ** 70])
+    if choice == 2:
+        return rng.choice([0.5, -1e-7, 1e20, float('inf'), float('nan')])
+    if choice == 3:
+        return rng.choice([True, False])
+    if choice == 4:
+        return None
+    if choice == 5:
+        return rng.choice(['x', 'y', 1, None])
+    size = rng.choice([0, 1, 1, 2, 3, 5])
+    if choice in (6, 7):
+        return {_random_key(rng): _random_object(rng, depth + 1) for _ in range(size)}
+    if choice == 8:
+        return [_random_object(rng, depth + 1) for _ in range(size)]
+    return tuple(_random_object(rng, depth + 1) for _ in range(size))
+
+
+def _random_key(rng):
+    return rng.choice(['a', 'b', 'c d', 1, 2.5, True, None, ('t', 1), ()])
+
+
+def test_dumps_matches_baseline_random_objects():
+    rng = random.Random(7)
+    for _ in range(2000):
+        value = _random_object(rng)
+        for kwargs in ({}, {'pretty': True}, {'pretty': True, 'indent_width': 4}):
+            assert kon.dumps(value, **kwargs) == baseline.dumps(value, **kwargs), (value, kwargs)
+
+
+def test_dumps_matches_baseline_subclasses():
+    import collections
+    import enum
+
+    class Color(enum.IntEnum):
+        RED = 1
+
+    class Name(str):
+        pass
+
+    class Flag(int):
+        pass
+
+    values = [
+        Color.RED, Name('a b'), Name('ok'), Flag(3),
+        collections.OrderedDict(a=1, b=collections.OrderedDict(c=2)),
+        collections.deque([1, 2]), range(3), {Name('key'): (Flag(1), [Color.RED])},
+    ]
+    for value in values:
+        for kwargs in ({}, {'pretty': True}):
+            assert kon.dumps(value, **kwargs) == baseline.dumps(value, **kwargs), value
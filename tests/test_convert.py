@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import sys
+
+import kon
+import kon.convert
+import pytest
+from kon.__main__ import main
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+# inventory
+host web01 {
+  address = "10.0.0.1"
+  tags(web, "front end")
+}
+count = -12.5e1
+"é ü" = 'ünïcödé'
+flag = true
+empty {}
+'''
+
+
+def _to_json(source, **kwargs):
+    target = io.StringIO()
+    stats = kon.convert.kon_to_json(source, target, **kwargs)
+    return target.getvalue(), stats
+
+
+def _to_kon(source, **kwargs):
+    target = io.StringIO()
+    stats = kon.convert.json_to_kon(source, target, **kwargs)
+    return target.getvalue(), stats
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 16])
+def test_kon_to_json(chunk_size):
+    output, stats = _to_json(io.StringIO(SOURCE), chunk_size=chunk_size)
+    assert json.loads(output) == kon.loads(SOURCE)
+    assert stats.entries == 5
+    assert stats.read == len(SOURCE)
+    assert stats.written == len(output)
+    binary, _ = _to_json(io.BytesIO(SOURCE.encode()), chunk_size=chunk_size)
+    assert binary == output
+
+
+def test_kon_to_ndjson():
+    output, stats = _to_json(io.StringIO('a = 1\nb {c (1, 2)}\na = "x"\n'), ndjson=True)
+    assert output == '{"a":1}\n{"b":{"c":[1,2]}}\n{"a":"x"}\n'
+    assert stats.entries == 3
+
+
+def test_kon_to_json_errors():
+    with pytest.raises(ValueError):
+        _to_json(io.StringIO('(1, 2)'))
+    with pytest.raises(ValueError):
+        _to_json(io.StringIO('a ((1))'), max_depth=1)
+
+
+@pytest.mark.parametrize('source', ['a = inf', 'a {b (1, -inf)}', 'a = nan'])
+@pytest.mark.parametrize('ndjson', [False, True])
+def test_kon_to_json_non_finite(source, ndjson):
+    # `Infinity` and `NaN` are not JSON
+    with pytest.raises(ValueError, match="'a' contains an infinite or NaN float"):
+        _to_json(io.StringIO('b = 1\n' + source), ndjson=ndjson)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1 << 16])
+def test_json_to_kon(chunk_size):
+    value = kon.loads(SOURCE)
+    source = json.dumps(value, indent=2)
+    output, stats = _to_kon(io.StringIO(source), chunk_size=chunk_size)
+    assert kon.loads(output) == value
+    assert output.count('\n') == stats.entries == 5
+    binary, _ = _to_kon(io.BytesIO(source.encode()), chunk_size=chunk_size)
+    assert binary == output
+    pretty, _ = _to_kon(io.StringIO(source), chunk_size=chunk_size, pretty=True)
+    assert kon.loads(pretty) == value
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('{}', ''),
+    (' [1, 2.5, "x"] ', '(1, 2.5, x)\n'),
+    ('12345', '12345\n'),
+    ('{"a": 123456, "b": null}', 'a = 123456\nb = null\n'),
+])
+def test_json_to_kon_values(source, expected):
+    assert _to_kon(io.StringIO(source), chunk_size=1)[0] == expected
+
+
+def test_json_to_kon_keyword_strings():
+    # Unquoted, these would come back as null, booleans and floats
+    value = {'null': 'true', 'false': ['null', 'nan', 'inf', 'Infinity', 'NaN', 'none'], 'x': {'true': 'false'}}
+    output, _ = _to_kon(io.StringIO(json.dumps(value)), chunk_size=3)
+    assert kon.loads(output) == value
+    assert json.loads(_to_json(io.StringIO(output))[0]) == value
+
+
+@pytest.mark.parametrize('source', ['{"a": 1', '{"a" 1}', '{"a": 1} 2', '{1: 2}', '[1,]', ''])
+def test_json_to_kon_errors(source):
+    with pytest.raises(ValueError):
+        _to_kon(io.StringIO(source), chunk_size=2)
+
+
+def test_ndjson_to_kon():
+    source = '{"a": 1, "b": [1, 2]}\n\n{"a": "é"}'
+    output, stats = _to_kon(io.BytesIO(source.encode()), ndjson=True, chunk_size=1)
+    assert output == 'a = 1\nb(1, 2)\na = é\n'
+    assert stats.entries == 3
+    assert stats.read == len(source.encode())
+    with pytest.raises(ValueError, match='line 2 is not a JSON object'):
+        _to_kon(io.StringIO('{}\n[1]\n'), ndjson=True)
+
+
+def test_cli(tmp_path, capsys, monkeypatch):
+    (tmp_path / 'in.kon').write_text(SOURCE, encoding='utf-8')
+    assert main(['convert', os.fspath(tmp_path / 'in.kon'), '-o', os.fspath(tmp_path / 'out.json'), '--stats']) == 0
+    assert json.loads((tmp_path / 'out.json').read_text(encoding='utf-8')) == kon.loads(SOURCE)
+    assert capsys.readouterr()[1].startswith('converted 5 entries, ')
+    assert main(['convert', os.fspath(tmp_path / 'out.json')]) == 0
+    assert kon.loads(capsys.readouterr()[0]) == kon.loads(SOURCE)
+    monkeypatch.setattr(sys, 'stdin', io.TextIOWrapper(io.BytesIO(b'a = 1\nb = 2\n')))
+    assert main(['convert', '--to', 'ndjson']) == 0
+    assert capsys.readouterr()[0] == '{"a":1}\n{"b":2}\n'
+    with pytest.raises(SystemExit):
+        main(['convert', '--from', 'json', '--to', 'ndjson'])
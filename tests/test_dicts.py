@@ -46,3 +46,75 @@ def test_mixed_values():
         "c": True,
         "d": "str \nwith\r\nsome lines\t",
     }
+
+
+@pytest.mark.parametrize('source', [
+    '{a = 1, b = 2, a = 3}',
+    'a = 1\nb = 2\na = 3',
+    '{a = 1, {a = 2, c = 4}, b = 2}',
+    'x {a = 1\n  a = 2}\nx = 3',
+])
+def test_last_key_wins(source):
+    assert kon.loads(source) == kon.loads(source, duplicate_keys=kon.DuplicateKeys.LAST_WINS)
+    assert kon.loads(source, duplicate_keys='last_wins') == kon.loads(source)
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('{a = 1, b = 2, a = 3}', {'a': 1, 'b': 2}),
+    ('a = 1\nb = 2\na = 3', {'a': 1, 'b': 2}),
+    ('{a = 1, {a = 2, c = 4}}', {'a': 1, 'c': 4}),
+    ('a x = 1\na y = 2', {'a': {'x': 1}}),
+])
+def test_first_key_wins(source, expected):
+    result = kon.loads(source, duplicate_keys='first_wins')
+    assert result == expected and list(result) == list(expected)
+
+
+@pytest.mark.parametrize('source, key', [
+    ('{a = 1, b = 2, a = 3}', "'a'"),
+    ('a = 1\na = 1', "'a'"),
+    ('x {1 = a, 1.0 = b}', '1.0'),
+    ('a x = 1\na y = 2', "'a'"),
+])
+def test_duplicate_key_error(source, key):
+    with pytest.raises(ValueError, match=f'duplicate key {key} in dictionary'):
+        kon.loads(source, duplicate_keys=kon.DuplicateKeys.ERROR)
+
+
+def test_deep_merge():
+    source = '''
+    node n1 { id = 1, tags (a) }
+    node n2 { id = 2 }
+    node n1 { name = x, tags (b) }
+    node = {n3 {id = 3}}
+    flat = 1
+    flat { a = 1 }
+    '''
+    result = kon.loads(source, duplicate_keys='deep_merge')
+    assert result == {
+        'node': {'n1': {'id': 1, 'tags': ['b'], 'name': 'x'}, 'n2': {'id': 2}, 'n3': {'id': 3}},
+        'flat': {'a': 1},
+    }
+    assert list(result['node']) == ['n1', 'n2', 'n3']
+    # Merged without recursion
+    value = kon.loads('a ' * 5000 + '= 1\n' + 'a ' * 4999 + 'b = 2', duplicate_keys='deep_merge')
+    for _ in range(4999):
+        value = value['a']
+    assert value == {'a': 1, 'b': 2}
+
+
+def test_duplicate_keys_in_lazy_dicts():
+    source = 'x {a = 1, a = 2, b {c = 1}, b {d = 2}}'
+    assert kon.loads(source, lazy=True, duplicate_keys='deep_merge')['x'] == {'a': 2, 'b': {'c': 1, 'd': 2}}
+    with pytest.raises(ValueError, match='duplicate key'):
+        kon.loads(source, lazy=True, duplicate_keys='error')['x']['a']
+
+
+def test_invalid_duplicate_keys():
+    with pytest.raises(ValueError):
+        kon.loads('a = 1', duplicate_keys='sum')
+
+
+def test_unset_key_after_entries():
+    with pytest.raises(ValueError, match=r"unset key c in dictionary@\({'a': 1} {'b': {'x': 2}}\)"):
+        kon.loads('{a = 1, b x = 2, c}')
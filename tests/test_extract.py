@@ -0,0 +1,84 @@
+import kon
+import pytest
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+widget window title = "Main"
+widget debug = off
+services {
+  web { port = 80, host = "a.example" }
+  db { port = 5432 }
+  cache { host = "c.example" }
+}
+items ({name = a}, {name = b}, 3)
+1 = one
+null = nothing
+'''
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('widget.debug', {('widget', 'debug'): 'off'}),
+    ('services.web', {('services', 'web'): {'port': 80, 'host': 'a.example'}}),
+    ('services.*.port', {('services', 'web', 'port'): 80, ('services', 'db', 'port'): 5432}),
+    ('services.[cw]*.host', {('services', 'web', 'host'): 'a.example', ('services', 'cache', 'host'): 'c.example'}),
+    ('items.0.name', {('items', 0, 'name'): 'a'}),
+    ('items.-1', {('items', 2): 3}),
+    ('items.*.name', {('items', 0, 'name'): 'a', ('items', 1, 'name'): 'b'}),
+    ('items.?', {('items', 0): {'name': 'a'}, ('items', 1): {'name': 'b'}, ('items', 2): 3}),
+    ('1', {(1,): 'one'}),
+    ('null', {(None,): 'nothing'}),
+    ('*', {(key,): value for key, value in kon.loads(SOURCE).items()}),
+    ('items.3', {}),
+    ('items.name', {}),
+    ('services.web.port.x', {}),
+    ('missing', {}),
+])
+def test_paths(path, expected):
+    assert kon.extract(SOURCE, [path]) == expected
+
+
+def test_implicit_dicts_and_merging():
+    # The later `widget` replaces the earlier one, as with `kon.loads`
+    assert kon.extract(SOURCE, ['widget.window.title']) == {}
+    source = 'widget window title = "Main"\nwidget {window {title = "Other"}}\na {x = 1}\na {y = 2}\n'
+    assert kon.extract(source, ['widget.window.title', 'a.x', 'a.y']) == {('widget', 'window', 'title'): 'Other', ('a', 'y'): 2}
+    assert kon.extract('{a = 1, a = 2}', 'a') == {('a',): 2}
+
+
+def test_several_paths():
+    result = kon.extract(SOURCE, ['items.1.name', ('widget', 'debug'), 'services.db.port', 'missing'])
+    assert list(result.items()) == [(('items', 1, 'name'), 'b'), (('widget', 'debug'), 'off'), (('services', 'db', 'port'), 5432)]
+    assert kon.extract('"a.b" = 1', [('a.b',)]) == {('a.b',): 1}
+    assert kon.extract('l (1, 2)', [('l', 1)]) == {('l', 1): 2}
+
+
+def test_values_are_plain():
+    result = kon.extract(SOURCE, ['services', 'items'])
+    assert type(result[('services',)]) is dict and type(result[('services',)]['web']) is dict
+    assert type(result[('items',)]) is list and type(result[('items',)][0]) is dict
+    assert result[('services',)] == kon.loads(SOURCE)['services']
+
+
+def test_top_level_list():
+    assert kon.extract('({a = 1}, {a = 2})', ['*.a', '1']) == {(0, 'a'): 1, (1, 'a'): 2, (1,): {'a': 2}}
+    assert kon.extract('1', ['a']) == {}
+
+
+def test_skipped_parts_are_not_parsed():
+    source = 'bad {x = @}\nalso (1 2 3 = )\ngood {y = 1}'
+    assert kon.extract(source, ['good.y']) == {('good', 'y'): 1}
+    with pytest.raises(ValueError):
+        kon.extract(source, ['bad.x'])
+    with pytest.raises(ValueError, match='unclosed'):
+        kon.extract('a {b (', ['c'])
+
+
+def test_parser_options():
+    source = 'a {b {c (1)}}'
+    with pytest.raises(ValueError, match='maximum nesting depth'):
+        kon.extract(source, ['a.b.c'], max_depth=2)
+    assert kon.extract(source, ['a'], max_depth=3) == {('a',): {'b': {'c': [1]}}}
+    source = 'a (<"\n  x\n   y")'
+    assert kon.extract(source, ['a.0'], multiline_string_behaviour=kon.MultilineStringBehaviour.DEDENT) == \
+        {('a', 0): kon.loads(source, multiline_string_behaviour=kon.MultilineStringBehaviour.DEDENT)['a'][0]}
@@ -0,0 +1,134 @@
+import asyncio
+import random
+
+import kon
+import pytest
+
+from test_conformance import FRAGMENTS
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''name = "Zoë"
+escapes = "tab\\tnew\\nhex\\x41 uni\\u00e9 \\\\ \\""
+text = |"
+  first
+    second"
+dedented = <"
+    one
+      two"
+server {
+  ports(80, 443, 0x1F90)
+  limits { cpu = -2.5e0, memory = +512 }
+}
+'''
+
+
+def _pairs(pieces, **kwargs):
+    parser = kon.KonFeedParser(**kwargs)
+    pairs = []
+    for piece in pieces:
+        parser.feed(piece)
+        pairs.extend(parser)
+    parser.close()
+    pairs.extend(parser)
+    return pairs
+
+
+def test_feed_whole():
+    assert _pairs([SOURCE]) == list(kon.loads(SOURCE).items())
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7])
+def test_feed_bytes_in_pieces(size):
+    data = SOURCE.encode('utf-8')
+    # Splits UTF-8 sequences, escapes, multiline strings and numbers
+    pieces = [data[i:i + size] for i in range(0, len(data), size)]
+    assert _pairs(pieces) == list(kon.loads(SOURCE).items())
+
+
+def test_feed_split_line_continuation():
+    assert _pairs(['a = "x\\\r', '\ny"']) == [('a', 'xy')]
+    assert _pairs(['a = <', '"\n  b"']) == [('a', 'b')]
+
+
+@pytest.mark.parametrize('source', ['a = 1٣.٣e٣', 'a = 1.5e-3', 'a = 0x1f', 'a = ٣٣٣', 'a = (1٣e٣, 2)'])
+def test_feed_split_numbers(source):
+    expected = list(kon.loads(source + '\nz = 0').items())
+    for i in range(1, len(source)):
+        assert _pairs([source[:i], source[i:], '\nz = 0']) == expected, i
+
+
+def test_feed_emits_completed_pairs():
+    parser = kon.KonFeedParser()
+    parser.feed('a = 1\nb {c = ')
+    assert list(parser) == [('a', 1)]
+    parser.feed('2}\nc = 3')
+    assert list(parser) == [('b', {'c': 2})]
+    # The last value could still continue (e.g. `c = 34`)
+    parser.close()
+    assert list(parser) == [('c', 3)]
+
+
+def test_feed_callback():
+    received = []
+    parser = kon.KonFeedParser(lambda key, value: received.append((key, value)))
+    parser.feed(b'x = (1, 2)\ny = null\n')
+    assert received == [('x', [1, 2]), ('y', None)]
+    parser.close()
+    assert list(parser) == []
+
+
+def test_feed_errors():
+    parser = kon.KonFeedParser()
+    with pytest.raises(ValueError, match='unexpected character'):
+        parser.feed('a = 1\nb = @\n')
+    with pytest.raises(ValueError, match='closed'):
+        parser.feed('c = 2')
+
+    parser = kon.KonFeedParser()
+    parser.feed('a = (1, 2')
+    with pytest.raises(ValueError):
+        parser.close()
+
+    parser = kon.KonFeedParser()
+    parser.feed(b'a = "\xc3')
+    with pytest.raises(ValueError):
+        parser.close()
+
+    parser = kon.KonFeedParser()
+    with pytest.raises(ValueError, match='empty'):
+        parser.close()
+    with pytest.raises(ValueError, match='closed'):
+        parser.close()
+
+    with pytest.raises(TypeError):
+        kon.KonFeedParser().feed(1) # type: ignore
+
+
+def test_feed_matches_loads_random_sources():
+    rng = random.Random(99)
+    for _ in range(1500):
+        source = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 30)))
+        cuts = sorted(rng.randint(0, len(source)) for _ in range(rng.randint(0, 6)))
+        pieces = [source[i:j] for i, j in zip([0] + cuts, cuts + [len(source)])]
+        try:
+            expected = kon.loads(source)
+        except (ValueError, TypeError):
+            expected = None
+        if isinstance(expected, dict):
+            assert dict(_pairs(pieces)) == expected, pieces
+        else:
+            with pytest.raises((ValueError, TypeError)):
+                _pairs(pieces)
+
+
+def test_aiterload():
+    async def main():
+        reader = asyncio.StreamReader()
+        data = SOURCE.encode('utf-8')
+        for i in range(0, len(data), 5):
+            reader.feed_data(data[i:i + 5])
+        reader.feed_eof()
+        return [pair async for pair in kon.aiterload(reader, chunk_size=3)]
+
+    assert asyncio.run(main()) == list(kon.loads(SOURCE).items())
@@ -0,0 +1,195 @@
+import os
+import threading
+
+import kon
+import kon.index
+import pytest
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+# nodes
+node n1 { id = 1, tags (a, b) }
+node n2 {
+  id = 2
+  name = "ü{" ,note = '# }'
+}
+flat = 1
+1 = "one"
+deep a b = (x, {y = "é"})
+{ braced = true, other = (1) }
+node n1 { id = -1 }
+'''
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / 'data.kon'
+    path.write_bytes(SOURCE.encode('utf-8'))
+    return path
+
+
+def _rewrite(path, source):
+    # Keep the modification time to check that a changed size is noticed too
+    stat = os.stat(path)
+    path.write_text(source)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+@pytest.mark.parametrize('key, expected', [
+    ('node.n1', {'id': -1}),
+    ('node.n2', {'id': 2, 'name': 'ü{', 'note': '# }'}),
+    ('node.n2.name', 'ü{'),
+    ('flat', 1),
+    ('1', 'one'),
+    (('1',), 'one'),
+    ('deep.a.b', ['x', {'y': 'é'}]),
+    ('deep.a.b.-1.y', 'é'),
+    ('braced', True),
+    ('other.0', 1),
+    # Leading keys of entries
+    ('node', {'n1': {'id': -1}, 'n2': {'id': 2, 'name': 'ü{', 'note': '# }'}}),
+    ('deep', {'a': {'b': ['x', {'y': 'é'}]}}),
+    ('deep.a', {'b': ['x', {'y': 'é'}]}),
+])
+def test_get(data, key, expected):
+    with kon.index.open(data) as index:
+        assert index.get(key) == expected
+        assert key in index
+
+
+@pytest.mark.parametrize('key', ['nod', 'node.n3', 'node.n1.tags', 'deep.b', 'deep.a.b.2', 'flat.x', 'missing'])
+def test_missing(data, key):
+    with kon.index.open(data) as index:
+        with pytest.raises(KeyError):
+            index.get(key)
+        assert index.get(key, 'default') == 'default'
+        assert key not in index
+
+
+def test_build(data, tmp_path):
+    assert kon.index.build(data) == str(data) + '.konidx'
+    assert os.path.exists(str(data) + '.konidx')
+    custom = tmp_path / 'custom.idx'
+    assert kon.index.build(data, custom) == str(custom)
+    with kon.index.open(data, custom) as index:
+        assert index.index_path == str(custom)
+        assert len(index) == 7
+        assert set(index) == {('node', 'n1'), ('node', 'n2'), ('flat',), (1,), ('deep', 'a', 'b'), ('braced',), ('other',)}
+
+
+def test_open_builds_a_missing_index(data):
+    with kon.index.open(data) as index:
+        assert os.path.exists(index.index_path)
+        assert index.get('flat') == 1
+
+
+def test_changed_file_is_indexed_again(data):
+    with kon.index.open(data) as index:
+        assert index.get('flat') == 1
+        _rewrite(data, 'flat = 22\nnew { x = 1 }')
+        assert index.get('flat') == 22
+        assert index.get('new.x') == 1
+        assert 'node.n1' not in index
+        stat = os.stat(data)
+        data.write_text('flat = 33\nnew { x = 2 }')
+        os.utime(data, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert index.get('new.x') == 2
+    with kon.index.open(data) as index:
+        assert index.get('flat') == 33
+
+
+def test_invalid_index_is_rebuilt(data):
+    index_path = str(data) + '.konidx'
+    for content in [b'', b'garbage', b'KONIDX\x00\x01' + b'\xff' * 40]:
+        with open(index_path, 'wb') as file:
+            file.write(content)
+        with kon.index.open(data) as index:
+            assert index.get('node.n2.id') == 2
+
+
+def test_only_the_entry_is_parsed(tmp_path):
+    path = tmp_path / 'data.kon'
+    path.write_text('a {x = @}\nb {y = 1}\nc (1 2 = )')
+    with kon.index.open(path) as index:
+        assert index.get('b.y') == 1
+        with pytest.raises(ValueError):
+            index.get('a.x')
+
+
+@pytest.mark.parametrize('source', ['(1, 2)', 'a b', 'a {', '"x"'])
+def test_invalid_top_level(tmp_path, source):
+    path = tmp_path / 'data.kon'
+    path.write_text(source)
+    with pytest.raises(ValueError):
+        kon.index.build(path)
+
+
+def test_parser_options(tmp_path):
+    path = tmp_path / 'data.kon'
+    path.write_text('a {b {c (1)}}\nd = 1')
+    with kon.index.open(path, max_depth=2) as index:
+        assert index.get('d') == 1
+        with pytest.raises(ValueError, match='maximum nesting depth'):
+            index.get('a')
+
+
+def test_matches_iterload(tmp_path):
+    source = ''.join(f'item i{i} {{ value = {i}, text = "ä{i}" }}\nflat{i} = {i}\n' for i in range(500))
+    path = tmp_path / 'data.kon'
+    path.write_text(source)
+    with open(path) as file:
+        entries = list(kon.iterload(file))
+    with kon.index.open(path) as index:
+        assert len(index) == len(entries)
+        for key, value in entries:
+            (name, inner), = value.items() if isinstance(value, dict) else ((None, value),)
+            if name is None:
+                assert index.get(key) == value
+            else:
+                assert index.get((key, name)) == inner
+
+
+@pytest.mark.parametrize('source', [
+    ''.join(f'item i{i} {{ value = {i}, text = "ä{i}" }}\nflat{i} = {i}\n' for i in range(200)),
+    # Lines that look like the start of an entry, but are not
+    'a {\nb = 1\nc = (\n1\n2)\n}\ntext = "\nnot = a key\n"\n' * 20 + 'last = 1',
+    # Newlines are whitespace at the top level, this is `x y = 1`
+    'x\ny = 1\n' * 30,
+])
+def test_scanned_in_chunks(tmp_path, monkeypatch, source):
+    path = tmp_path / 'data.kon'
+    path.write_bytes(source.encode('utf-8'))
+    whole = tmp_path / 'whole.idx'
+    kon.index.build(path, whole)
+    monkeypatch.setattr(kon.index, '_SCAN_CHUNK', 16)
+    chunked = tmp_path / 'chunked.idx'
+    kon.index.build(path, chunked)
+    assert chunked.read_bytes() == whole.read_bytes()
+
+
+def test_scanned_in_chunks_errors(tmp_path, monkeypatch):
+    path = tmp_path / 'data.kon'
+    path.write_text('a = 1\n' * 20 + 'b = (1,\n' + 'c = 2\n' * 20)
+    with pytest.raises(ValueError) as whole:
+        kon.index.build(path)
+    monkeypatch.setattr(kon.index, '_SCAN_CHUNK', 16)
+    with pytest.raises(ValueError) as chunked:
+        kon.index.build(path)
+    assert str(chunked.value) == str(whole.value)
+
+
+def test_threads(data):
+    index = kon.index.open(data)
+    results = []
+
+    def use():
+        results.append(all(index.get('node.n2.id') == 2 and index.get('flat') == 1 for _ in range(50)))
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    index.close()
+    assert results == [True] * 4
@@ -0,0 +1,95 @@
+import io
+
+import kon
+import pytest
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+# Two hosts with the same keys and values, each written in every way a key
+# or a value can be: entries, implicit dictionaries, lists, quoted and not
+SOURCE = '''
+host_a {
+  name = web_server
+  role = "frontend role"
+  tags (web_server, "frontend role")
+  "quoted key" = 1
+  limits cpu = 2
+}
+host_b {
+  name = web_server
+  role = "frontend role"
+  tags (web_server, "frontend role")
+  "quoted key" = 1
+  limits cpu = 2
+}
+'''
+
+
+def _shared(value):
+    """Which of the keys and values of the two hosts are the same objects."""
+    a, b = value['host_a'], value['host_b']
+    return {
+        'keys': all(x is y for x, y in zip(a, b)) and list(a['limits'])[0] is list(b['limits'])[0],
+        'identifiers': a['name'] is b['name'] and a['tags'][0] is b['tags'][0],
+        'strings': a['role'] is b['role'] and a['tags'][1] is b['tags'][1],
+    }
+
+
+@pytest.mark.parametrize('intern, keys, identifiers, strings', [
+    (None, False, False, False),
+    ('keys', True, False, False),
+    ('keys+identifiers', True, True, False),
+    (kon.InternStrings.ALL, True, True, True),
+])
+def test_modes(intern, keys, identifiers, strings):
+    value = kon.loads(SOURCE, intern=intern)
+    assert value == kon.loads(SOURCE)
+    assert _shared(value) == {'keys': keys, 'identifiers': identifiers, 'strings': strings}
+
+
+def test_values_are_unchanged():
+    source = 'a = "x = y"\nb = \'q\'\nc = é_ident\nd {e = null, f = true, g = inf, h = x}\n1 = "one"'
+    for intern in kon.InternStrings:
+        assert kon.loads(source, intern=intern) == kon.loads(source)
+
+
+def test_shared_table():
+    table = {}
+    first = kon.loads(SOURCE, intern='all', intern_table=table)
+    second = kon.loads(SOURCE, intern='all', intern_table=table)
+    assert first['host_a']['role'] is second['host_b']['role']
+    assert table['frontend role'] is first['host_a']['role']
+    assert set(table) >= {'host_a', 'name', 'web_server', 'frontend role', 'quoted key', 'cpu'}
+    # Without `intern`, the table is not used
+    kon.loads('other = 1', intern_table=table)
+    assert 'other' not in table
+
+
+def test_streaming_parsers(tmp_path):
+    path = tmp_path / 'hosts.kon'
+    path.write_text(SOURCE)
+    assert _shared(kon.load_path(path, intern='all', chunk_size=16))['strings']
+    parser = kon.KonFeedParser(intern='keys+identifiers')
+    for i in range(0, len(SOURCE), 7):
+        parser.feed(SOURCE[i:i + 7])
+    parser.close()
+    assert _shared(dict(parser))['identifiers']
+    assert _shared(kon.loads(SOURCE, lazy=True, intern='all'))['strings']
+
+
+def test_load_many_shares_a_table_per_batch(tmp_path):
+    paths = []
+    for name in 'ab':
+        path = tmp_path / f'{name}.kon'
+        path.write_text(SOURCE)
+        paths.append(path)
+    first, second = kon.load_many(paths, workers=1, intern='keys')
+    assert list(first)[0] is list(second)[0]
+    # A table that is given is shared by all the batches
+    first, second = kon.load_many(paths, workers=2, executor='thread', intern='keys', intern_table={})
+    assert list(first)[0] is list(second)[0]
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        kon.loads('a = 1', intern='values')
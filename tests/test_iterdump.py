@@ -0,0 +1,98 @@
+import io
+import random
+import tracemalloc
+
+import kon
+import pytest
+
+from test_conformance import _random_object
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+
+def _wide(count):
+    return {f'item_{i}': {'name': f'name {i}', 'values': [i, i / 2, None], 'on': i % 2 == 0} for i in range(count)}
+
+
+class _CountingWriter(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'pretty': True}, {'pretty': True, 'indent_width': 4}])
+def test_iterdump_matches_dumps(kwargs):
+    rng = random.Random(11)
+    for _ in range(500):
+        value = _random_object(rng)
+        assert ''.join(kon.iterdump(value, **kwargs)) == kon.dumps(value, **kwargs), value
+
+
+def test_iterdump_yields_chunks():
+    value = _wide(2000)
+    chunks = list(kon.iterdump(value, pretty=True))
+    assert len(chunks) > 1
+    assert all(chunks)
+    assert ''.join(chunks) == kon.dumps(value, pretty=True)
+
+
+def test_iterdump_scalar():
+    assert list(kon.iterdump(42)) == ['42']
+    assert list(kon.iterdump({})) == ['{}']
+
+
+def test_iterdump_is_lazy():
+    consumed = []
+
+    def rows(i):
+        consumed.append(i)
+        yield from range(100)
+
+    chunks = kon.iterdump([rows(i) for i in range(100)])
+    next(chunks)
+    assert len(consumed) < 100
+    list(chunks)
+    assert consumed == list(range(100))
+
+
+def test_iterdump_errors_are_raised_lazily():
+    chunks = kon.iterdump([list(range(5000)), object()])
+    assert next(chunks)
+    with pytest.raises(TypeError):
+        list(chunks)
+
+
+def test_iterdump_memory_is_bounded():
+    value = {f'row_{i}': {'name': f'row {i}', 'index': i, 'range': [i, i + 1]} for i in range(20000)}
+    size = len(kon.dumps(value))
+    tracemalloc.start()
+    try:
+        for _ in kon.iterdump(value):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < size / 4
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'pretty': True}])
+def test_dump_writes_in_chunks(kwargs):
+    value = _wide(2000)
+    file = _CountingWriter()
+    kon.dump(value, file, **kwargs)
+    assert file.getvalue() == kon.dumps(value, **kwargs)
+    assert file.writes > 1
+
+
+def test_dump_file_roundtrip(tmp_path):
+    value = _wide(500)
+    path = tmp_path / 'out.kon'
+    with open(path, 'w', encoding='utf-8') as file:
+        kon.dump(value, file, pretty=True)
+    assert path.read_text(encoding='utf-8') == kon.dumps(value, pretty=True)
+    with open(path, encoding='utf-8') as file:
+        assert kon.load(file) == value
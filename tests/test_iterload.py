@@ -0,0 +1,101 @@
+import io
+import random
+
+import kon
+import pytest
+
+from test_conformance import FRAGMENTS
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+# inventory
+host web01 {
+  address = "10.0.0.1"
+  tags(web, "front end")
+  note = <"
+    multi
+    line"
+}
+host web02 {address = "10.0.0.2", port = 0x50}
+count = -12.5e1
+"é ü" = 'ünïcödé \\u00e9'
+flag = true
+'''
+
+
+def _iterload(source, **kwargs):
+    return list(kon.iterload(io.StringIO(source), **kwargs))
+
+
+def test_iterload_pairs_in_order():
+    assert _iterload(SOURCE) == [
+        ('host', {'web01': {'address': '10.0.0.1', 'tags': ['web', 'front end'], 'note': 'multi\nline'}}),
+        ('host', {'web02': {'address': '10.0.0.2', 'port': 80}}),
+        ('count', -125.0),
+        ('é ü', 'ünïcödé é'),
+        ('flag', True),
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 8, 13, 64])
+def test_iterload_chunk_sizes(chunk_size):
+    assert _iterload(SOURCE, chunk_size=chunk_size) == _iterload(SOURCE)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5])
+def test_iterload_binary_file_split_characters(chunk_size):
+    pairs = list(kon.iterload(io.BytesIO(SOURCE.encode('utf-8')), chunk_size=chunk_size))
+    assert pairs == _iterload(SOURCE)
+
+
+def test_iterload_reads_incrementally():
+    source = ''.join(f'entry{i} {{ value = {i} }}\n' for i in range(10000))
+
+    class Reader(io.StringIO):
+        consumed = 0
+
+        def read(self, size=-1):
+            data = super().read(size)
+            self.consumed += len(data)
+            return data
+
+    reader = Reader(source)
+    pairs = kon.iterload(reader, chunk_size=1024)
+    assert next(pairs) == ('entry0', {'value': 0})
+    assert reader.consumed <= 1024
+    assert dict(pairs) == {key: value for key, value in kon.loads(source).items() if key != 'entry0'}
+    assert reader.consumed == len(source)
+
+
+def test_iterload_large_entry():
+    big = {f'k{i}': list(range(i % 7)) for i in range(5000)}
+    source = 'small = 1\nbig {' + kon.dumps(big, pretty=True) + '}\nlast = 2'
+    assert _iterload(source, chunk_size=16) == [('small', 1), ('big', big), ('last', 2)]
+
+
+def test_iterload_errors():
+    with pytest.raises(ValueError, match='only a dictionary can be streamed'):
+        _iterload('(1, 2)')
+    with pytest.raises(ValueError):
+        _iterload('')
+    with pytest.raises(ValueError, match='at index 12'):
+        _iterload('a = 1\nb = 2 @', chunk_size=4)
+    with pytest.raises(ValueError, match='maximum nesting depth'):
+        _iterload('a((1))', max_depth=1)
+
+
+def test_iterload_matches_loads_random_sources():
+    rng = random.Random(4242)
+    for _ in range(1500):
+        source = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 30)))
+        try:
+            expected = kon.loads(source)
+        except (ValueError, TypeError):
+            expected = None
+        chunk_size = rng.choice([1, 2, 3, 7, 1 << 16])
+        if isinstance(expected, dict):
+            assert dict(_iterload(source, chunk_size=chunk_size)) == expected, source
+        else:
+            with pytest.raises((ValueError, TypeError)):
+                _iterload(source, chunk_size=chunk_size)
@@ -0,0 +1,175 @@
+import os
+import threading
+
+import kon
+import pytest
+from kon.cache import CachedResults, FrozenDict
+from kon.layers import LayeredLoader, MergedLayers
+
+BASE = '''
+name = "app"
+server {
+  host = "0.0.0.0"
+  ports (80, 443)
+  tls { enabled = false, ciphers (a, b) }
+}
+limits { cpu = 1 }
+'''
+REGION = '''
+server {
+  tls enabled = true
+  host = "eu.example"
+}
+region = eu
+'''
+HOST = '''
+server { ports (8080) }
+limits = null
+'''
+
+
+@pytest.fixture
+def layers(tmp_path):
+    paths = []
+    for name, source in [('base', BASE), ('region', REGION), ('host', HOST)]:
+        path = tmp_path / f'{name}.kon'
+        path.write_text(source)
+        paths.append(str(path))
+    return paths
+
+
+def _rewrite(path, source):
+    # Keep the modification time to check that a changed size is noticed too
+    stat = os.stat(path)
+    with open(path, 'w') as file:
+        file.write(source)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_deep_merge(layers):
+    merged = kon.load_layers(layers, loader=LayeredLoader(results=CachedResults.COPIED))
+    assert merged.value == {
+        'name': 'app',
+        'server': {'host': 'eu.example', 'ports': [8080], 'tls': {'enabled': True, 'ciphers': ['a', 'b']}},
+        'limits': None,
+        'region': 'eu',
+    }
+    assert merged.value == kon.loads(BASE + REGION + HOST, duplicate_keys='deep_merge')
+    assert merged.layers == tuple(layers)
+
+
+@pytest.mark.parametrize('strategy', ['last_wins', 'first_wins'])
+def test_shallow_strategies(layers, strategy):
+    merged = kon.load_layers(layers, strategy, loader=LayeredLoader(results=CachedResults.COPIED))
+    assert merged.value == kon.loads(BASE + REGION + HOST, duplicate_keys=strategy)
+
+
+def test_error_strategy(layers):
+    with pytest.raises(ValueError, match=f"duplicate key 'server' in layer {layers[1]!r}"):
+        kon.load_layers(layers, kon.DuplicateKeys.ERROR)
+    assert kon.load_layers(layers[:1], kon.DuplicateKeys.ERROR).value['name'] == 'app'
+
+
+def test_origin(layers):
+    base, region, host = layers
+    merged = kon.load_layers(layers)
+    assert isinstance(merged, MergedLayers)
+    for key, layer in [
+        ('name', base), ('region', region), ('limits', host),
+        ('server.host', region), ('server.ports', host), ('server.ports.0', host),
+        ('server.tls.enabled', region), ('server.tls.ciphers.1', base),
+        ('server.tls', region), ('server', host), (('server', 'tls'), region),
+    ]:
+        assert merged.origin(key) == layer, key
+    for key in ['missing', 'server.tls.x', 'server.ports.1', 'name.x', 'limits.cpu']:
+        with pytest.raises(KeyError):
+            merged.origin(key)
+
+
+def test_untouched_subtrees_are_shared(layers):
+    loader = LayeredLoader()
+    merged = loader.load(layers).value
+    assert merged['server']['tls']['ciphers'] is loader.load(layers[:1]).value['server']['tls']['ciphers']
+    assert merged['server']['tls'] is not loader.load(layers[:1]).value['server']['tls']
+    assert isinstance(merged, FrozenDict) and isinstance(merged['server'], FrozenDict)
+    with pytest.raises(TypeError):
+        merged['server']['host'] = 'x'
+    # The layers were not changed by merging them
+    assert loader.load(layers[:1]).value['server']['host'] == '0.0.0.0'
+    assert loader.load(layers[1:2]).value == {'server': {'tls': {'enabled': True}, 'host': 'eu.example'}, 'region': 'eu'}
+
+
+def test_merged_results_are_cached(layers, monkeypatch):
+    loader = LayeredLoader()
+    first = loader.load(layers)
+    assert loader.load(layers).value is first.value
+    merges = []
+    original = kon.layers._merge
+    monkeypatch.setattr(kon.layers, '_merge', lambda *args: merges.append(args[3]) or original(*args))
+    _rewrite(layers[2], 'server { ports (1) }')
+    changed = loader.load(layers)
+    # Only the changed last layer was merged again
+    assert merges == [2]
+    assert changed.value['server']['ports'] == (1,)
+    assert changed.value['server']['tls'] is first.value['server']['tls']
+    _rewrite(layers[2], HOST)
+    assert loader.load(layers).value is first.value
+    assert merges == [2]
+
+
+def test_copied_results(layers):
+    loader = LayeredLoader(results=CachedResults.COPIED)
+    first = loader.load(layers).value
+    first['server']['host'] = 'x'
+    assert type(first) is dict and type(first['server']['ports']) is list
+    assert loader.load(layers).value['server']['host'] == 'eu.example'
+
+
+def test_invalid_layers(tmp_path):
+    path = tmp_path / 'list.kon'
+    path.write_text('(1, 2)')
+    with pytest.raises(ValueError, match='not a dictionary'):
+        kon.load_layers([path])
+    with pytest.raises(ValueError, match='no layers'):
+        kon.load_layers([])
+    with pytest.raises(ValueError):
+        kon.load_layers([path], 'sum')
+    with pytest.raises(OSError):
+        kon.load_layers([tmp_path / 'missing.kon'])
+
+
+def test_parser_options(tmp_path):
+    path = tmp_path / 'dup.kon'
+    path.write_text('a = 1\na = 2')
+    assert kon.load_layers([path], loader=LayeredLoader(duplicate_keys='first_wins')).value == {'a': 1}
+    with pytest.raises(ValueError, match='duplicate key'):
+        kon.load_layers([path], loader=LayeredLoader(duplicate_keys='error'))
+
+
+def test_deep_layers(tmp_path):
+    paths = []
+    for name in 'ab':
+        path = tmp_path / f'{name}.kon'
+        path.write_text('x ' * 3000 + f'{name} = 1')
+        paths.append(path)
+    value = kon.load_layers(paths).value
+    for _ in range(3000):
+        value = value['x']
+    assert value == {'a': 1, 'b': 1}
+
+
+def test_threads(layers):
+    loader = LayeredLoader()
+    expected = loader.load(layers).value
+    loader.clear()
+    results = []
+
+    def use():
+        results.append(all(loader.load(layers).value == expected for _ in range(20)))
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 4
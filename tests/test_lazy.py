@@ -0,0 +1,233 @@
+import copy
+import json
+import pickle
+import random
+import threading
+
+import kon
+import pytest
+from kon.lazy import LazyKonDict, LazyKonList
+
+from test_conformance import FRAGMENTS, SOURCES, _outcome
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+# settings
+a b c = 1
+server {
+  host = "x(" # )
+  ports(80, 443)
+  nested { deep = (1, {q = '}'}) }
+}
+list (1, 2, (3, 4))
+server { other = 1 }
+'''
+
+
+def _lazy_loads(source, **kwargs):
+    value = kon.loads(source, lazy=True, **kwargs)
+    # Uses every nested list and dictionary, which parses them
+    repr(value)
+    return value
+
+
+def test_matches_loads():
+    rng = random.Random(11)
+    sources = list(SOURCES)
+    for _ in range(3000):
+        sources.append(''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 40))))
+    for source in sources:
+        if source.strip() == '':
+            continue
+        expected = _outcome(kon.loads, source)
+        if expected[0] == 'ok':
+            assert _outcome(_lazy_loads, source) == expected, source
+        else:
+            # Errors are raised in a different order, but never missed
+            with pytest.raises((ValueError, TypeError)):
+                _lazy_loads(source)
+
+
+def test_containers_are_parsed_on_use():
+    value = kon.loads(SOURCE, lazy=True)
+    assert type(value) is dict
+    assert value['a'] == {'b': {'c': 1}}
+    server = value['server']
+    assert isinstance(server, LazyKonDict) and not server.loaded
+    assert server == {'other': 1}
+    assert server.loaded
+    numbers = value['list']
+    assert isinstance(numbers, LazyKonList) and not numbers.loaded
+    assert numbers[2] == [3, 4]
+    assert isinstance(numbers[2], LazyKonList)
+    assert value == kon.loads(SOURCE)
+
+
+def test_spans():
+    source = 'a {b = (1, 2)}\nc(3)'
+    value = kon.loads(source, lazy=True)
+    assert value['a'].span == (2, 13)
+    assert value['a']['b'].span == (7, 12)
+    assert value['c'].span == (16, 18)
+    assert LazyKonDict(x=1).span is None and LazyKonDict(x=1).loaded
+
+
+@pytest.mark.parametrize('source', ['{a = 1}', '(1, {b = 2})', '{a = 1} {b = 2}', '1', '"s"', 'x = {}', '()'])
+def test_top_level_values(source):
+    assert _lazy_loads(source) == kon.loads(source)
+    assert kon.dumps(kon.loads(source, lazy=True)) == kon.dumps(kon.loads(source))
+
+
+def test_errors_are_raised_on_use():
+    value = kon.loads('a {b = @}\nc = 1', lazy=True)
+    assert value['c'] == 1
+    for _ in range(2):
+        with pytest.raises(ValueError, match="unexpected character: '@' at index 7"):
+            value['a']['b']
+    assert not value['a'].loaded
+
+
+@pytest.mark.parametrize('source, message', [
+    ('a (1}', 'expected a newline, "\\)" or a comma at index 4, but found }'),
+    ('a {(}', 'expected a newline, "\\)" or a comma at index 4, but found }'),
+    ('a {b = "}', 'unterminated string at index 7'),
+    ("a {b = 'x\\'}", 'unterminated string at index 7'),
+    ('a {b = (1, 2)', 'unclosed "{" at index 2'),
+    ('a {# }\n', 'unclosed "{" at index 2'),
+])
+def test_bracket_errors_are_raised_up_front(source, message):
+    with pytest.raises(ValueError, match=message):
+        kon.loads(source, lazy=True)
+
+
+def test_brackets_in_strings_and_comments():
+    source = 'a {\n  b = "(}" # )}\n  c = \'{\\\'\'\n  d = <"\n    )\n  "\n}\ne = 1'
+    assert _lazy_loads(source) == kon.loads(source)
+
+
+def test_max_depth():
+    value = kon.loads('a (((1)))', lazy=True, max_depth=2)
+    with pytest.raises(ValueError, match='maximum nesting depth of 2 exceeded at index 4'):
+        value['a'][0][0]
+    with pytest.raises(ValueError, match='maximum nesting depth of 0 exceeded'):
+        kon.loads('a (1)', lazy=True, max_depth=0)
+
+
+def test_multiline_string_behaviour():
+    source = 'a (<"\n  x\n   y", "\n  z")'
+    for behaviour in kon.MultilineStringBehaviour:
+        assert _outcome(_lazy_loads, source, multiline_string_behaviour=behaviour) == _outcome(kon.loads, source, multiline_string_behaviour=behaviour)
+
+
+def test_dict_methods():
+    source = 'd {a = 1, b = (2), c = {x = 3}}'
+    for use, expected in [
+        (lambda d: list(d), ['a', 'b', 'c']),
+        (lambda d: len(d), 3),
+        (lambda d: 'b' in d, True),
+        (lambda d: d.get('a'), 1),
+        (lambda d: list(d.items())[0], ('a', 1)),
+        (lambda d: list(d.values())[1], [2]),
+        (lambda d: list(reversed(d)), ['c', 'b', 'a']),
+        (lambda d: d.pop('a'), 1),
+        (lambda d: d.setdefault('a', 5), 1),
+        (lambda d: d.copy(), {'a': 1, 'b': [2], 'c': {'x': 3}}),
+        (lambda d: dict(d), {'a': 1, 'b': [2], 'c': {'x': 3}}),
+        (lambda d: {**d}['a'], 1),
+        (lambda d: repr(d), "{'a': 1, 'b': [2], 'c': {'x': 3}}"),
+        (lambda d: d != {}, True),
+        (lambda d: {} == d, False),
+        (lambda d: bool(d), True),
+    ]:
+        assert use(kon.loads(source, lazy=True)['d']) == expected
+
+
+def test_dict_mutation():
+    value = kon.loads('d {a = 1}\ne {b = 2}', lazy=True)
+    d = value['d']
+    d['z'] = 0
+    assert d == {'a': 1, 'z': 0}
+    d.update(value['e'])
+    assert d == {'a': 1, 'z': 0, 'b': 2}
+    other = {}
+    other.update(kon.loads('d {a = 1}', lazy=True)['d'])
+    assert other == {'a': 1}
+    cleared = kon.loads('d {a = 1}', lazy=True)['d']
+    cleared.clear()
+    assert cleared == {} and cleared.loaded
+
+
+def test_list_methods():
+    source = 'l (3, 1, (2))'
+    for use, expected in [
+        (lambda l: list(l), [3, 1, [2]]),
+        (lambda l: len(l), 3),
+        (lambda l: l[-1], [2]),
+        (lambda l: l[:2], [3, 1]),
+        (lambda l: 1 in l, True),
+        (lambda l: l.index(1), 1),
+        (lambda l: l.count(3), 1),
+        (lambda l: l + [4], [3, 1, [2], 4]),
+        (lambda l: [0] + l, [0, 3, 1, [2]]),
+        (lambda l: l * 2, [3, 1, [2]] * 2),
+        (lambda l: tuple(l), (3, 1, [2])),
+        (lambda l: list(reversed(l)), [[2], 1, 3]),
+        (lambda l: l < [4], True),
+        (lambda l: [3, 1, [2]] == l, True),
+        (lambda l: sorted(l[:2]), [1, 3]),
+    ]:
+        assert use(kon.loads(source, lazy=True)['l']) == expected
+    value = kon.loads('l (3, 1)\nm (2)', lazy=True)
+    value['l'].append(0)
+    value['l'].extend(value['m'])
+    value['l'].sort()
+    assert value['l'] == [0, 1, 2, 3]
+    concatenated = kon.loads('l (1)', lazy=True)['l']
+    concatenated += kon.loads('l (2)', lazy=True)['l']
+    assert concatenated == [1, 2]
+
+
+def test_copies_are_plain():
+    value = kon.loads(SOURCE, lazy=True)
+    for copied in [pickle.loads(pickle.dumps(value)), copy.deepcopy(value)]:
+        assert copied == kon.loads(SOURCE)
+        assert type(copied['server']) is dict and type(copied['list'][2]) is list
+    assert type(copy.copy(value['server'])) is dict
+
+
+def test_json_after_deep_load():
+    value = kon.loads('{a = (1, {b = 2})}', lazy=True)
+    value.load(deep=True)
+    assert json.loads(json.dumps(value)) == {'a': [1, {'b': 2}]}
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'pretty': True}])
+def test_dumps(kwargs):
+    assert kon.dumps(kon.loads(SOURCE, lazy=True), **kwargs) == kon.dumps(kon.loads(SOURCE), **kwargs)
+
+
+def test_load_and_load_path(tmp_path):
+    path = tmp_path / 'lazy.kon'
+    path.write_text(SOURCE)
+    value = kon.load_path(path, lazy=True)
+    assert isinstance(value['server'], LazyKonDict)
+    assert value == kon.loads(SOURCE)
+    with open(path) as file:
+        assert isinstance(kon.load(file, lazy=True)['list'], LazyKonList)
+
+
+def test_threads():
+    source = 'l (' + ', '.join(f'{{i = {i}}}' for i in range(200)) + ')'
+    value = kon.loads(source, lazy=True)['l']
+    results = []
+
+    def use():
+        results.append(len(value) == 200 and all(item['i'] == i for i, item in enumerate(value)))
+
+    threads = [threading.Thread(target=use) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [True] * 4
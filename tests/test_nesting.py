@@ -0,0 +1,64 @@
+import kon
+import pytest
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+DEPTH = 20_000
+
+
+def _depth(value):
+    depth = 0
+    while isinstance(value, (list, dict)):
+        value = value[0] if isinstance(value, list) else next(iter(value.values()))
+        depth += 1
+    return depth, value
+
+
+def _nested_lists(depth):
+    value = [1]
+    for _ in range(depth - 1):
+        value = [value]
+    return value
+
+
+def test_deeply_nested_lists():
+    assert _depth(kon.loads('(' * DEPTH + '1' + ')' * DEPTH)) == (DEPTH, 1)
+
+
+def test_deeply_nested_dicts():
+    assert _depth(kon.loads('{a = ' * DEPTH + '1' + '}' * DEPTH)) == (DEPTH, 1)
+
+
+def test_deeply_nested_operators():
+    assert kon.loads('- ' * (DEPTH + 1) + '1') == -1
+    assert _depth(kon.loads('a = ' * DEPTH + '1')) == (DEPTH, 1)
+
+
+def test_dumps_deeply_nested():
+    source = kon.dumps(_nested_lists(DEPTH))
+    assert source == '(' * DEPTH + '1' + ')' * DEPTH
+    assert _depth(kon.loads(source)) == (DEPTH, 1)
+    assert _depth(kon.loads(kon.dumps(_nested_lists(DEPTH), pretty=True))) == (DEPTH, 1)
+
+
+def test_loads_max_depth():
+    assert kon.loads('a { b(1, (2)) }', max_depth=3) == {'a': {'b': [1, [2]]}}
+    with pytest.raises(ValueError, match='maximum nesting depth of 2 exceeded at index 9'):
+        kon.loads('a { b(1, (2)) }', max_depth=2)
+
+
+def test_dumps_max_depth():
+    value = {'a': {'b': [1, [2]]}}
+    assert kon.dumps(value, max_depth=3) == 'a {b(1, (2))}'
+    with pytest.raises(ValueError, match='maximum nesting depth of 2 exceeded'):
+        kon.dumps(value, max_depth=2)
+
+
+def test_dumps_circular_reference():
+    value = [1]
+    value.append(value)
+    with pytest.raises(ValueError, match='circular reference'):
+        kon.dumps(value)
+    # The same object more than once is fine, as long as it is not nested in itself
+    shared = [1]
+    assert kon.dumps([shared, shared]) == '((1), (1))'
@@ -0,0 +1,127 @@
+import io
+import sys
+from array import array
+
+import kon
+import kon.binary
+import pytest
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+ints (1, 2, -3, +4, 007)
+floats = (1.5, -2, 1e3, 2.5E-3,)
+lines (
+  1
+  2
+)
+nested ((1, 2), (3.0))
+spaced ( 1 , 2 )
+'''
+
+
+def _lists(value):
+    """The parsed value with its arrays turned back into lists."""
+    if isinstance(value, dict):
+        return {key: _lists(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_lists(item) for item in value]
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return value
+
+
+def test_arrays():
+    value = kon.loads(SOURCE, numeric_lists='array')
+    assert value['ints'] == array('q', [1, 2, -3, 4, 7])
+    assert value['floats'] == array('d', [1.5, -2.0, 1000.0, 0.0025])
+    assert value['lines'] == array('q', [1, 2])
+    assert value['nested'] == [array('q', [1, 2]), array('d', [3.0])]
+    assert value['spaced'] == array('q', [1, 2])
+    assert _lists(value) == kon.loads(SOURCE)
+    assert kon.loads('(1, 2)', numeric_lists=kon.NumericLists.ARRAY) == array('q', [1, 2])
+
+
+@pytest.mark.parametrize('source, expected', [
+    # Parsed element by element, but still converted
+    ('(1, # one\n2)', array('q', [1, 2])),
+    ('(0x10, 0b1)', array('q', [16, 1])),
+    ('(1., - 2)', array('d', [1.0, -2.0])),
+    ('(inf, 1)', array('d', [float('inf'), 1.0])),
+    ('(1e999, 1)', array('d', [float('inf'), 1.0])),
+    # Kept as lists
+    ('()', []),
+    ('(1, true)', [1, True]),
+    ('(1, "2")', [1, '2']),
+    ('(1, null)', [1, None]),
+    ('(9223372036854775808, 1)', [9223372036854775808, 1]),
+    ('(1' + '0' * 400 + ', 1.5)', [10 ** 400, 1.5]),
+    ('({a = 1}, 2)', [{'a': 1}, 2]),
+])
+def test_fallbacks(source, expected):
+    value = kon.loads(source, numeric_lists='array')
+    assert type(value) is type(expected)
+    assert value == expected
+
+
+def test_errors_are_unchanged():
+    for source in ('x (1 2)', 'x (1,, 2)', 'x (1, 2', 'x (1a, 2)'):
+        with pytest.raises(ValueError) as plain:
+            kon.loads(source)
+        with pytest.raises(ValueError) as numeric:
+            kon.loads(source, numeric_lists='array')
+        assert str(numeric.value) == str(plain.value)
+
+
+def test_max_depth():
+    assert kon.loads('a ((1))', numeric_lists='array', max_depth=2) == {'a': [array('q', [1])]}
+    with pytest.raises(ValueError, match='depth'):
+        kon.loads('a ((1))', numeric_lists='array', max_depth=1)
+
+
+@pytest.mark.parametrize('pretty', [False, True])
+def test_dumps(pretty):
+    value = kon.loads(SOURCE, numeric_lists='array')
+    assert kon.dumps(value, pretty=pretty) == kon.dumps(_lists(value), pretty=pretty)
+    assert ''.join(kon.iterdump(value, pretty=pretty)) == kon.dumps(value, pretty=pretty)
+    assert kon.loads(kon.dumps(value, pretty=pretty), numeric_lists='array') == value
+    assert kon.dumps({'a': array('b', [1, 2]), 'f': array('f', [0.5])}) == 'a(1, 2), f(0.5)'
+
+
+def test_streaming_parsers(tmp_path):
+    expected = kon.loads(SOURCE, numeric_lists='array')
+    path = tmp_path / 'data.kon'
+    path.write_text(SOURCE)
+    assert kon.load_path(path, numeric_lists='array', chunk_size=8) == expected
+    assert dict(kon.iterload(io.StringIO(SOURCE), chunk_size=3, numeric_lists='array')) == expected
+    assert kon.loads(SOURCE, numeric_lists='array', workers=2) == expected
+
+
+def test_binary():
+    value = kon.loads(SOURCE, numeric_lists='array')
+    assert kon.binary.loads(kon.binary.dumps(value)) == kon.loads(SOURCE)
+    with pytest.raises(ValueError, match='numeric_lists'):
+        kon.binary.load_path('data.kon', numeric_lists='array')
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        kon.loads('a (1)', numeric_lists='list')
+    with pytest.raises(ValueError, match='lazy'):
+        kon.loads('a (1)', numeric_lists='array', lazy=True)
+
+
+def test_numpy():
+    numpy = pytest.importorskip('numpy')
+    value = kon.loads(SOURCE, numeric_lists='numpy')
+    assert isinstance(value['ints'], numpy.ndarray) and value['ints'].dtype == numpy.int64
+    assert value['floats'].dtype == numpy.float64
+    assert _lists(value) == kon.loads(SOURCE)
+    assert kon.dumps(value) == kon.dumps(kon.loads(SOURCE, numeric_lists='array'))
+    assert kon.dumps(numpy.arange(6).reshape(2, 3)) == '((0, 1, 2), (3, 4, 5))'
+
+
+def test_numpy_missing(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    with pytest.raises(ImportError, match='NumPy'):
+        kon.loads('a (1)', numeric_lists='numpy')
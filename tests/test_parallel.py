@@ -0,0 +1,175 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import kon
+import pytest
+from kon.parallel import _batches
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(20):
+        path = tmp_path / f'{i}.kon'
+        path.write_text(f'id = {i}\nitems ({", ".join(str(j) for j in range(i))})')
+        paths.append(str(path))
+    return paths
+
+
+def _expected(i):
+    return {'id': i, 'items': list(range(i))}
+
+
+@pytest.mark.parametrize('executor, workers', [('process', 2), ('thread', 3), ('thread', 1), ('process', None)])
+def test_order(files, executor, workers):
+    results = kon.load_many(files, workers=workers, executor=executor, batch_bytes=16)
+    assert results == [_expected(i) for i in range(len(files))]
+
+
+def test_custom_executor(files):
+    with ThreadPoolExecutor(2) as executor:
+        assert kon.load_many(files, workers=2, executor=executor) == [_expected(i) for i in range(len(files))]
+        # Not shut down by load_many
+        assert executor.submit(int, '1').result() == 1
+
+
+@pytest.mark.parametrize('executor', ['process', 'thread'])
+def test_return_exceptions(files, tmp_path, executor):
+    invalid = tmp_path / 'invalid.kon'
+    invalid.write_text('a = @')
+    paths = [files[0], str(tmp_path / 'missing.kon'), str(invalid), files[3]]
+    results = kon.load_many(paths, workers=2, executor=executor, batch_bytes=1, return_exceptions=True)
+    assert results[0] == _expected(0) and results[3] == _expected(3)
+    assert isinstance(results[1], FileNotFoundError)
+    assert isinstance(results[2], ValueError)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_raises(files, tmp_path, workers):
+    with pytest.raises(FileNotFoundError):
+        kon.load_many(files + [tmp_path / 'missing.kon'], workers=workers, executor='thread')
+
+
+def test_unordered(files, tmp_path):
+    results = kon.load_many(files, workers=2, executor='thread', batch_bytes=1, ordered=False)
+    assert not isinstance(results, list)
+    assert dict(results) == {path: _expected(i) for i, path in enumerate(files)}
+    missing = str(tmp_path / 'missing.kon')
+    assert dict(kon.load_many([missing], workers=1, ordered=False, return_exceptions=True))[missing].__class__ is FileNotFoundError
+
+
+def test_batches(tmp_path):
+    paths = []
+    for size in [10, 10, 10, 50, 5, 5]:
+        path = tmp_path / f'{len(paths)}.kon'
+        path.write_text('a' * size)
+        paths.append(str(path))
+    assert list(_batches(paths, 1, 20)) == [(0, 2), (2, 4), (4, 6)]
+    # Four batches per worker at least
+    assert list(_batches(paths, 2, 1000)) == [(0, 2), (2, 4), (4, 6)]
+    assert list(_batches(paths, 100, 1000)) == [(i, i + 1) for i in range(6)]
+    assert list(_batches(paths + [str(tmp_path / 'missing.kon')], 1, 1000)) == [(0, 3), (3, 4), (4, 7)]
+    assert list(_batches([], 1, 1000)) == []
+
+
+def test_invalid_arguments(files):
+    with pytest.raises(ValueError, match='workers'):
+        kon.load_many(files, workers=0)
+    with pytest.raises(ValueError, match='executor'):
+        kon.load_many(files, executor='fiber')
+
+
+def test_parser_options(tmp_path):
+    path = tmp_path / 'dup.kon'
+    path.write_text('a = 1\na = 2')
+    assert kon.load_many([path, path], workers=2, executor='thread', duplicate_keys='first_wins') == [{'a': 1}] * 2
+    assert kon.load_many([path], workers=2, duplicate_keys='error', return_exceptions=True)[0].__class__ is ValueError
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(kon.parallel, '_MIN_CHUNK', 16)
+
+
+SPLIT_SOURCES = [
+    ''.join(f'item i{i} {{ value = {i}, text = "ä{i}" }}\nflat{i} = {i}\n' for i in range(50)),
+    # Lines that look like the start of an entry, but are not
+    'a {\nb = 1\nc = (\n1\n2)\n}\ntext = "\nnot = a key\n"\n' * 20 + 'last = 1',
+    '# comment\n' + 'x {\n# x = 1\n  y = 2\n}\n' * 30 + '{ braced = 1, x = null }\n',
+    'key = 1\n' * 40,
+    'deep { a b c = (1, {d = 2}) }\n' * 30,
+    # Newlines are whitespace at the top level, this is `x y = 1`
+    'x\ny = 1\n' * 30,
+]
+
+
+@pytest.mark.parametrize('source', SPLIT_SOURCES)
+@pytest.mark.parametrize('duplicate_keys', ['last_wins', 'first_wins', 'deep_merge'])
+def test_loads_split(small_chunks, source, duplicate_keys):
+    assert kon.loads(source, workers=4, duplicate_keys=duplicate_keys) == kon.loads(source, duplicate_keys=duplicate_keys)
+
+
+def test_loads_split_bytes(small_chunks):
+    source = SPLIT_SOURCES[0]
+    assert kon.loads(source.encode('utf-8'), workers=3) == kon.loads(source)
+
+
+@pytest.mark.parametrize('source', [
+    SPLIT_SOURCES[0] + 'broken = (1, 2\n' + SPLIT_SOURCES[3],
+    SPLIT_SOURCES[3] + '(1, 2)\n' + SPLIT_SOURCES[3],
+    SPLIT_SOURCES[3] + 'unset',
+    SPLIT_SOURCES[0] + 'x = @\n',
+])
+def test_loads_split_errors(small_chunks, source):
+    with pytest.raises(ValueError) as serial:
+        kon.loads(source)
+    with pytest.raises(ValueError) as split:
+        kon.loads(source, workers=4)
+    assert str(split.value) == str(serial.value)
+    with pytest.raises(ValueError, match='duplicate key'):
+        kon.loads(SPLIT_SOURCES[3], workers=4, duplicate_keys='error')
+
+
+def test_split_pool_is_kept(small_chunks):
+    source = SPLIT_SOURCES[0]
+    kon.loads(source, workers=3)
+    pool = kon.parallel._split_pool(2)
+    assert kon.loads(source, workers=3) == kon.loads(source)
+    assert kon.parallel._split_pool(2) is pool
+    # A larger one replaces it
+    bigger = kon.parallel._split_pool(4)
+    assert bigger is not pool and kon.parallel._split_pool(3) is bigger
+
+
+def test_boundaries(small_chunks):
+    from kon.parallel import _entry_boundaries, _guess_boundaries
+    source = SPLIT_SOURCES[1]
+    for boundaries in (_guess_boundaries(source, 4, {}), _entry_boundaries(source, 4, {})):
+        assert boundaries[0] == 0 and boundaries[-1] == len(source)
+        assert boundaries == sorted(set(boundaries))
+        assert all(source[i - 1] == '\n' for i in boundaries[1:-1])
+    # Only whole entries are between the exact boundaries
+    for start in _entry_boundaries(source, 4, {})[1:-1]:
+        assert source[start:].startswith(('a {', 'text =', 'last ='))
+
+
+def test_loads_workers_arguments():
+    assert kon.loads('a = 1', workers=8) == {'a': 1}
+    assert kon.loads(SPLIT_SOURCES[0], workers=1) == kon.loads(SPLIT_SOURCES[0])
+    with pytest.raises(ValueError, match='workers'):
+        kon.loads('a = 1', workers=0)
+    with pytest.raises(ValueError, match='lazy'):
+        kon.loads('a = 1', workers=2, lazy=True)
+
+
+def test_lazy_import():
+    # Only imported once they are used, as `import kon` is on the startup path of its users
+    code = 'import sys, kon; print(sorted(m for m in ("multiprocessing", "concurrent.futures", "kon.parallel", "kon.watcher", "kon.spans") if m in sys.modules)); kon.load_many; print("kon.parallel" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}).stdout
+    assert output == '[]\nTrue\n'
+    assert kon.load_many is kon.parallel.load_many
+    assert {'load_many', 'validate', 'watch'} <= set(dir(kon))
+    with pytest.raises(AttributeError):
+        kon.missing
@@ -22,3 +22,27 @@ def test_pretty_dict():
     assert kon.dumps(val, pretty=True) == '1 = 2\n2 {\n  abc = def\n  gulp = tomb\n}'
     val[2] = [1]
     assert kon.dumps(val, pretty=True) == '1 = 2\n2(1)'
+
+
+def test_generator_values():
+    def gen(*values):
+        yield from values
+
+    assert kon.dumps({'a': gen(1, 2), 'b': gen(3)}, pretty=True) == 'a(\n  1\n  2\n)\nb(3)'
+    assert kon.dumps({'a': gen(1, 2), 'b': gen()}, pretty=True) == 'a(\n  1\n  2\n)\nb()'
+    assert kon.dumps({'a': gen(1, 2)}) == 'a(1, 2)'
+    assert kon.dumps([gen(1, gen(2, 3))], pretty=True) == '((1, (2, 3)))'
+    assert kon.dumps({'x': {'y': gen(4, 5)}}, pretty=True) == 'x y(\n  4\n  5\n)'
+
+
+def test_sequences_are_not_copied():
+    class Tracked(list):
+        iterations = 0
+
+        def __iter__(self):
+            Tracked.iterations += 1
+            return super().__iter__()
+
+    value = {'a': Tracked([1, 2]), 'b': [Tracked([3])]}
+    assert kon.dumps(value, pretty=True) == 'a(\n  1\n  2\n)\nb((3))'
+    assert Tracked.iterations == 2
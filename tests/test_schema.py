@@ -0,0 +1,196 @@
+import collections
+import dataclasses
+import enum
+import io
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import kon
+import kon.schema
+import pytest
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+
+class Mode(enum.Enum):
+    FAST = 'fast'
+    SLOW = 'slow'
+
+
+@dataclasses.dataclass
+class Limits:
+    cpu: float
+    memory: int = 0
+
+
+@dataclasses.dataclass
+class Server:
+    host: str
+    port: int
+    mode: Mode = Mode.FAST
+    tags: Tuple[str, ...] = ()
+    limits: Optional[Limits] = None
+    extra: Dict[str, int] = dataclasses.field(default_factory=dict)
+    children: List['Server'] = dataclasses.field(default_factory=list)
+    anything: Any = None
+
+
+SOURCE = '''
+web {
+  host = "web.internal"
+  port = 8080
+  mode = slow
+  tags (frontend, public)
+  limits cpu = 2
+  unknown { deep (1, 2, {z = 3}), more = "x" }
+  extra { retries = 3 }
+  children ({host = a, port = 1}, {host = b, port = 2, limits {cpu = 0.5, memory = 64}})
+  anything (1, {b = 2})
+}
+db = { host = db, port = 5432 }
+'''
+
+EXPECTED = {
+    'web': Server(
+        'web.internal', 8080, Mode.SLOW, ('frontend', 'public'), Limits(2.0), {'retries': 3},
+        [Server('a', 1), Server('b', 2, limits=Limits(0.5, 64))], [1, {'b': 2}],
+    ),
+    'db': Server('db', 5432),
+}
+
+SERVERS = kon.schema.compile(Dict[str, Server])
+
+
+def test_dataclasses():
+    value = SERVERS.loads(SOURCE)
+    assert value == EXPECTED
+    assert type(value['web'].tags) is tuple and type(value['web'].limits.cpu) is float
+    assert kon.loads(SOURCE, schema=SERVERS) == EXPECTED
+    assert SERVERS.load(io.StringIO(SOURCE)) == EXPECTED
+    assert repr(SERVERS).startswith('Schema(')
+
+
+@pytest.mark.parametrize('type_, source, expected', [
+    (Server, 'host = h\nport = 1', Server('h', 1)),
+    (Server, 'host = h, port = 1, limits = null', Server('h', 1)),
+    (List[int], '(1, 2)', [1, 2]),
+    (Tuple[float, ...], '(1, 2.5)', (1.0, 2.5)),
+    (List[Tuple[int, ...]], '((1), (2, 3))', [(1,), (2, 3)]),
+    (Dict[str, List[int]], 'a (1)\nb = ()', {'a': [1], 'b': []}),
+    (Dict[int, str], '1 = one', {1: 'one'}),
+    (Dict[str, Union[int, str, List[int]]], 'a = 1, b = x, c (1)', {'a': 1, 'b': 'x', 'c': [1]}),
+    (Dict[str, Optional[Tuple[int, ...]]], 'a (1), b = null', {'a': (1,), 'b': None}),
+    (dict, 'a b = (1)', {'a': {'b': [1]}}),
+    (Any, 'a (1)', {'a': [1]}),
+    (Dict[str, Any], 'a {b (1)}', {'a': {'b': [1]}}),
+])
+def test_types(type_, source, expected):
+    value = kon.schema.compile(type_).loads(source)
+    assert value == expected
+    assert type(value) is type(expected)
+
+
+@pytest.mark.parametrize('source, message', [
+    ('s {host = x, port = "1"}', "expected an int for Server.port, but found '1' at index 13"),
+    ('s {host = x}', 'missing port for Server at index 11'),
+    # Optional fields that are set do not make up for required ones
+    ('s {host = x, mode = fast}', 'missing port for Server at index 24'),
+    ('s {mode = fast, tags (a), limits {memory = 1}}', 'missing cpu for Limits at index 44'),
+    ('s {host = x, port = 1, children ({mode = fast, tags (a)})}', 'missing host, port for Server at index 55'),
+    ('s (1)', 'expected a Server, but found a list at index 2'),
+    ('s = 1', 'expected a Server, but found 1 at index 0'),
+    ('s {host = x, port = 1, mode = medium}', "expected one of 'fast', 'slow' for Server.mode, but found 'medium' at index 23"),
+    ('s {host = x, port = 1, tags (a, 1)}', 'expected a string for Server.tags[], but found 1 at index 32'),
+    ('s {host = x, port = 1, limits (1)}', 'expected a Limits or null for Server.limits, but found a list'),
+    ('s {host = x, port = 1, extra {a = true}}', 'expected an int for Server.extra[], but found True'),
+    ('s {host = x, port = 1, children ({host = y})}', 'missing port for Server'),
+    ('s {host = x, port = 1}\nt = 2', 'expected a Server, but found 2 at index 23'),
+    ('s {host = x\nport = (1)}', 'but found a list at index 19'),
+])
+def test_mismatches(source, message):
+    with pytest.raises(TypeError) as error:
+        SERVERS.loads(source)
+    assert message in str(error.value)
+    assert 'at index' in str(error.value)
+
+
+def test_mismatches_fail_fast():
+    # The invalid part of the source is not reached
+    with pytest.raises(TypeError):
+        SERVERS.loads('s {host = x, port = 1.5}\nt {')
+    with pytest.raises(ValueError):
+        kon.loads('s {host = x, port = 1.5}\nt {')
+
+
+@pytest.mark.parametrize('source', [
+    's {host = x}\ns {host = y, port = 2}',
+    's host = x\ns = {host = y, port = 2}',
+    's {host = x, children ({host = z})}\ns {host = y, port = 2}',
+    's {host = x, port = 1, children ({host = z})}\ns {host = y, port = 2}',
+])
+def test_shadowed_values_are_not_checked(source):
+    # Only what is left once the later value replaced it has to be complete
+    assert SERVERS.loads(source) == {'s': Server('y', 2)}
+    with pytest.raises(TypeError, match='missing port for Server at index'):
+        SERVERS.loads(source, duplicate_keys='first_wins')
+    with pytest.raises(ValueError, match='duplicate'):
+        SERVERS.loads(source, duplicate_keys='error')
+
+
+def test_unknown_keys_are_dropped():
+    @dataclasses.dataclass
+    class Port:
+        port: int
+
+    assert kon.schema.compile(Port).loads('port = 1, skipped {a (1, {b = (2)}), c = d}, other = x') == Port(1)
+    # A skipped value does not need to have any type
+    assert kon.schema.compile(Dict[str, Port]).loads('a { port = 1, extra ((1), 2) }') == {'a': Port(1)}
+
+
+@dataclasses.dataclass
+class Node:
+    name: str
+    computed: int = dataclasses.field(init=False, default=0)
+    next: Optional['Node'] = None
+
+
+def test_dataclass_fields():
+    value = kon.schema.compile(Node).loads('name = a, next {name = b, next {name = c}}')
+    assert value == Node('a', Node('b', Node('c')))
+    # Fields that are not passed to `__init__` are skipped too
+    assert kon.schema.compile(Node).loads('name = a, computed = 1').computed == 0
+
+
+@pytest.mark.parametrize('type_', [set, List[set], Tuple[int, str], Union[List[int], Tuple[int, ...]], Union[Server, dict]])
+def test_unsupported_types(type_):
+    with pytest.raises(TypeError, match='unsupported'):
+        kon.schema.compile(type_)
+
+
+def test_hooks():
+    source = 'b = 1\na {d (1, (2, 3)), c = x}'
+    assert kon.loads(source, object_pairs_hook=collections.OrderedDict) == kon.loads(source)
+    assert kon.loads(source, object_pairs_hook=list) == [('b', 1), ('a', [('d', [1, [2, 3]]), ('c', 'x')])]
+    # A tuple from a hook is not taken for an entry
+    assert kon.loads(source, list_hook=tuple) == {'b': 1, 'a': {'d': (1, (2, 3)), 'c': 'x'}}
+    assert kon.loads('(1, (2), 3)', list_hook=tuple) == (1, (2,), 3)
+    assert kon.loads('a = (1)', list_hook=tuple, object_pairs_hook=tuple) == (('a', (1,)),)
+
+
+def test_load_path(tmp_path):
+    path = tmp_path / 'servers.kon'
+    path.write_text(SOURCE)
+    assert SERVERS.load_path(path, chunk_size=16) == EXPECTED
+    assert kon.load_path(path, object_pairs_hook=list) == kon.loads(SOURCE, object_pairs_hook=list)
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError, match='hook'):
+        kon.loads('a = 1', schema=SERVERS, list_hook=tuple)
+    for options in ({'lazy': True}, {'numeric_lists': 'array'}):
+        with pytest.raises(ValueError, match='lazy or numeric_lists'):
+            kon.loads('a = 1', schema=SERVERS, **options)
+    with pytest.raises(ValueError, match='workers'):
+        kon.loads('a = 1', list_hook=tuple, workers=2)
+    # The first value of a key is built before a later one could be merged into it
+    with pytest.raises(ValueError, match='deep_merge'):
+        kon.loads('s host = x\ns port = 1', schema=SERVERS, duplicate_keys='deep_merge')
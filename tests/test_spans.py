@@ -0,0 +1,185 @@
+import random
+
+import kon
+import pytest
+from kon.spans import KonDocument, Span, reparse
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''# settings of the main window
+widget {
+  window {
+    # shown in the title bar
+    title = "Main"
+    width = 640
+    height = -480
+  }
+  tags(a, "b c", 3, {k = v}, (1, 2))
+}
+count=12
+x y z = true
+'''
+
+
+def _spans(document):
+    return {path: document.spans[path] for path in document.spans}
+
+
+def test_span_map():
+    spans = kon.KonParser(SOURCE).spans()
+    source = SOURCE.strip()
+    span = spans['widget.window.title']
+    assert source[span.start:span.end] == '"Main"'
+    assert source[span.key_start:span.key_end] == 'title'
+    span = spans['count']
+    assert source[span.start:span.end] == '12'
+    assert source[span.key_start:span.key_end] == 'count'
+    span = spans[('widget', 'tags', 3)]
+    assert source[span.start:span.end] == '{k = v}'
+    assert span.key_start is None
+    assert spans['widget.tags.-1'] == spans[('widget', 'tags', 4)]
+    assert source[spans['widget.window.height'].start:spans['widget.window.height'].end] == '-480'
+    assert source[spans['x.y'].start:spans['x.y'].end] == 'z = true'
+    assert 'x.y.z' in spans
+    assert 'x.z' not in spans
+    assert spans.get('missing') is None
+    with pytest.raises(KeyError):
+        spans['widget.tags.9']
+    assert list(spans)[:3] == [('widget',), ('widget', 'window'), ('widget', 'window', 'title')]
+
+
+def test_span_map_follows_values():
+    spans = kon.KonParser('a = 1\nb = 2\na {c = 3}').spans()
+    assert spans['a'] == Span(14, 21, 12, 13)
+    spans = kon.KonParser('true = 1').spans()
+    assert spans[(True,)] == spans['true'] == Span(7, 8, 0, 4)
+    with pytest.raises(ValueError):
+        kon.KonParser('a {').spans()
+    with pytest.raises(ValueError):
+        kon.KonParser.from_buffer(b'a = 1').spans()
+
+
+@pytest.mark.parametrize('path, value, expected', [
+    ('widget.window.width', 800, 'width = 800'),
+    ('widget.window.title', 'Main window', "title = 'Main window'"),
+    ('widget.window', {'w': 1}, 'window {w = 1}'),
+    ('widget.window', {}, 'window {}'),
+    ('widget.tags', [1], 'tags(1)'),
+    ('widget.tags.3', 'x', '"b c", 3, x, (1, 2)'),
+    ('widget.tags.1', {'k': 1}, 'a, {k = 1}, 3'),
+    ('count', [1, 2], 'count=(1, 2)'),
+    ('x.y', 5, 'x y = 5'),
+    ('x.y', {'q': None}, 'x y {q = null}'),
+])
+def test_set(path, value, expected):
+    document = KonDocument(SOURCE)
+    document.set(path, value)
+    assert expected in document.source
+    # Everything else is kept as it was
+    assert document.source.startswith('# settings of the main window\n')
+    assert '# shown in the title bar' in document.source or path == 'widget.window'
+    assert document.value == kon.loads(document.source)
+    assert _spans(document) == _spans(KonDocument(document.source))
+
+
+def test_set_root():
+    document = KonDocument('# a number\n5\n')
+    document.set((), [1, 2])
+    assert document.source == '# a number\n(1, 2)\n'
+    assert document.value == [1, 2]
+    with pytest.raises(KeyError):
+        document.set('a', 1)
+
+
+@pytest.mark.parametrize('source, key', [('+2\nb = 1', 2), ('-2\nb = 1\nc = 3', -2)])
+def test_set_signed_key(source, key):
+    document = KonDocument(source)
+    document.set((key,), 5)
+    assert document.value == kon.loads(document.source) == {key: 5, **({'c': 3} if key < 0 else {})}
+    document.set((key,), {'d': 1})
+    assert document.value == kon.loads(document.source)
+    assert document.value[key] == {'d': 1}
+    document.set((key,), 6)
+    assert document.value[key] == 6
+    assert _spans(document) == _spans(KonDocument(document.source))
+
+
+def test_reparse():
+    document = KonDocument(SOURCE)
+    width = document.spans['widget.window.width']
+    title = document.spans['widget.window.title']
+    assert reparse(document, [(width.start, width.end, '1024'), (title.start + 1, title.start + 1, 'The ')]) == [('widget', 'window', 'width'), ('widget', 'window', 'title')]
+    assert document.value['widget']['window'] == {'title': 'The Main', 'width': 1024, 'height': -480}
+    # Within the brackets of a dictionary, but not of a value
+    window = document.spans['widget.window']
+    assert reparse(document, [(window.end - 1, window.end - 1, 'depth = 2\n')]) == [('widget', 'window')]
+    assert document.value['widget']['window']['depth'] == 2
+    # Past a closing bracket
+    tags = document.spans['widget.tags']
+    assert reparse(document, [(tags.end, tags.end, '\nmore = 1')]) == [('widget',)]
+    # Around the top-level value
+    assert reparse(document, [(0, 0, 'first = 1\n')]) == [()]
+    assert document.value == kon.loads(document.source)
+    assert _spans(document) == _spans(KonDocument(document.source))
+
+
+def test_reparse_errors():
+    document = KonDocument(SOURCE)
+    width = document.spans['widget.window.width']
+    with pytest.raises(ValueError):
+        reparse(document, [(width.start, width.end, '{')])
+    with pytest.raises(ValueError):
+        reparse(document, [(0, len(SOURCE) + 1, '')])
+    # Left as it was
+    assert document.source == SOURCE
+    assert document.value == kon.loads(SOURCE)
+    assert document.spans['widget.window.width'] == width
+    with pytest.raises(TypeError):
+        reparse(document, [(width.start, width.end, '-x')])
+
+
+@pytest.mark.parametrize('duplicate_keys', ['last_wins', 'deep_merge'])
+def test_random_edits(duplicate_keys):
+    rng = random.Random(7)
+    source = SOURCE + 'x y {w = 1}\n'
+    snippets = ['1', 'q', ' ', '\n', ',', '{', '}', '(', ')', '=', '"', '#', '-', 'k = 2', '{a = 1}', 'v w = 1', '']
+    for _ in range(150):
+        document = KonDocument(source, duplicate_keys=duplicate_keys)
+        for _ in range(4):
+            start = rng.randrange(len(document.source) + 1)
+            end = min(len(document.source), start + rng.choice([0, 1, 3]))
+            text = rng.choice(snippets)
+            edited = document.source[:start] + text + document.source[end:]
+            try:
+                expected = kon.loads(edited, duplicate_keys=duplicate_keys)
+            except (ValueError, TypeError):
+                with pytest.raises((ValueError, TypeError)):
+                    reparse(document, [(start, end, text)])
+                continue
+            reparse(document, [(start, end, text)])
+            assert document.source == edited
+            assert document.value == expected
+            assert _spans(document) == _spans(KonDocument(edited, duplicate_keys=duplicate_keys))
+
+
+def test_many_edits():
+    document = KonDocument('values(' + ', '.join(['0'] * 50) + ')\nlast = 0')
+    for i in range(50):
+        document.set(('values', i), 'x' * i)
+        document.set('last', i)
+    assert document.value == kon.loads(document.source)
+    assert _spans(document) == _spans(KonDocument(document.source))
+
+
+def test_patch(tmp_path):
+    path = tmp_path / 'app.kon'
+    path.write_text(SOURCE.replace('Main', 'Mäin'), encoding='utf-8')
+    document = kon.patch(path, {'widget.window.width': 800, 'x.y.z': False})
+    assert path.read_text(encoding='utf-8') == SOURCE.replace('Main', 'Mäin').replace('640', '800').replace('z = true', 'z = false')
+    assert document.value == kon.load_path(path)
+    kon.patch(path, {'widget.window.width': 8})
+    assert kon.load_path(path)['widget']['window']['width'] == 8
+    before = path.read_text(encoding='utf-8')
+    with pytest.raises(KeyError):
+        kon.patch(path, {'widget.missing': 1})
+    assert path.read_text(encoding='utf-8') == before
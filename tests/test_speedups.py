@@ -0,0 +1,121 @@
+import collections
+import os
+import random
+import subprocess
+import sys
+
+import kon
+import pytest
+from kon import _accel
+
+from test_conformance import FRAGMENTS, SOURCES, _outcome, _random_object
+
+pytestmark = pytest.mark.skipif(_accel.speedups is None, reason='the compiled speedups are not available')
+
+
+def _pure(func, *args, **kwargs):
+    speedups, _accel.speedups = _accel.speedups, None
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _accel.speedups = speedups
+
+
+def _both(func, *args, **kwargs):
+    def outcome():
+        try:
+            return 'ok', repr(func(*args, **kwargs))
+        except (ValueError, TypeError) as e:
+            return type(e).__name__, str(e)
+    return _pure(outcome), outcome()
+
+
+@pytest.mark.parametrize('behaviour', list(kon.MultilineStringBehaviour))
+def test_loads_random_sources(behaviour):
+    rng = random.Random(2024)
+    sources = list(SOURCES)
+    for _ in range(3000):
+        sources.append(''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 40))))
+    for source in sources:
+        if source.strip() == '':
+            continue
+        pure, compiled = _both(kon.loads, source, multiline_string_behaviour=behaviour)
+        assert pure == compiled, source
+
+
+def test_loads_error_positions():
+    for source in ['(1}', '{a=1)', 'a = 1.5.3', '(1 @)', 'a = "x" @', 'x {\n  y = (1, 2}\n}']:
+        pure, compiled = _both(kon.loads, source)
+        assert pure[0] == 'ValueError'
+        assert 'at index' in pure[1]
+        assert pure == compiled
+
+
+def test_lazy_random_sources():
+    rng = random.Random(17)
+    sources = list(SOURCES)
+    for _ in range(3000):
+        sources.append(''.join(rng.choice(FRAGMENTS + ['{', '(', ')', '}']) for _ in range(rng.randint(1, 40))))
+    for source in sources:
+        if source.strip() == '':
+            continue
+        pure, compiled = _both(lambda: kon.loads(source, lazy=True))
+        assert pure == compiled, source
+
+
+def test_feed_random_chunks():
+    rng = random.Random(5)
+    for _ in range(300):
+        source = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 40)))
+        cuts = sorted(rng.sample(range(len(source) + 1), min(3, len(source) + 1)))
+        pieces = [source[i:j] for i, j in zip([0] + cuts, cuts + [len(source)])]
+
+        def feed():
+            parser = kon.KonFeedParser()
+            for piece in pieces:
+                parser.feed(piece)
+            parser.close()
+            return list(parser)
+
+        pure, compiled = _both(feed)
+        assert pure == compiled, pieces
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'pretty': True}, {'pretty': True, 'indent_width': 3}, {'max_depth': 2}])
+def test_dumps_random_objects(kwargs):
+    rng = random.Random(99)
+    for _ in range(2000):
+        value = _random_object(rng)
+        pure, compiled = _both(kon.dumps, value, **kwargs)
+        assert pure == compiled, value
+
+
+def test_dumps_other_types():
+    class Name(str):
+        pass
+
+    def gen():
+        yield 1
+        yield {'a': (2, 3)}
+
+    circular = [1]
+    circular.append(circular)
+    values = [
+        lambda: Name('a b'), lambda: collections.OrderedDict(x=Name('y')), lambda: range(3),
+        gen, lambda: {'g': gen(), 'h': [gen()]}, lambda: collections.deque([{}]), lambda: circular,
+        lambda: {1: object()}, lambda: {(1, 2): 'tuple key'}, lambda: [b'ab'],
+    ]
+    for value in values:
+        for kwargs in ({}, {'pretty': True}):
+            pure, compiled = _both(lambda: kon.dumps(value(), **kwargs))
+            assert pure == compiled, value()
+
+
+def test_pure_python_environment_variable():
+    env = dict(os.environ, KON_PURE_PYTHON='1', PYTHONPATH=os.path.dirname(os.path.dirname(kon.__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', 'from kon import _accel; print(_accel.backend())'],
+        env=env, check=True, stdout=subprocess.PIPE, universal_newlines=True,
+    ).stdout
+    assert output.strip() == 'pure'
+    assert _accel.backend() == 'compiled'
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import threading
+
+import kon
+import kon.watcher
+import pytest
+from kon.cache import _rebuild
+from kon.watcher import FileChange, Watcher
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+SOURCE = '''
+name = "app"
+server {
+  ports(80, 443)
+  tls { enabled = true }
+}
+'''
+
+
+def _thawed(value):
+    return _rebuild(value, dict, list)
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'config.kon'
+    path.write_text(SOURCE)
+    return path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(kon.watcher, '_clock', lambda: now[0])
+    return now
+
+
+def test_changed_keys(config):
+    changes = []
+    watcher = Watcher(config, changes.append, debounce=0)
+    assert _thawed(watcher.values[str(config)]) == kon.loads(SOURCE)
+    assert watcher.check() == []
+    config.write_text(SOURCE.replace('443', '8443').replace('enabled = true', 'enabled = 1') + 'debug = true\n')
+    change, = watcher.check()
+    assert changes == [change]
+    assert _thawed(change.value) == kon.loads(config.read_text())
+    assert change[2:] == ((('debug',),), (), (('server', 'ports'), ('server', 'tls', 'enabled')))
+    # Frozen, as it is shared with every subscriber
+    with pytest.raises(TypeError):
+        change.value['name'] = 'other'
+    config.write_text('name = "app"')
+    assert watcher.check()[0][2:] == ((), (('server',), ('debug',)), ())
+
+
+def test_unchanged_content_is_not_parsed(config, monkeypatch):
+    parses = []
+
+    class CountingParser(kon.KonParser):
+        def parse(self):
+            parses.append(self.source)
+            return super().parse()
+
+    watcher = Watcher(config, debounce=0)
+    monkeypatch.setattr(kon.watcher, 'KonParser', CountingParser)
+    os.utime(config, ns=(0, 0))
+    assert watcher.check() == []
+    assert parses == []
+    # Parsed, but nothing that subscribers see changed
+    config.write_text(SOURCE + '# only a comment\n')
+    assert watcher.check() == []
+    config.write_text('\n'.join(line.strip() for line in SOURCE.splitlines()))
+    assert watcher.check() == []
+    assert len(parses) == 2
+
+
+def test_debounce(config, clock):
+    watcher = Watcher(config, debounce=0.5)
+    config.write_text('name = "half written"')
+    assert watcher.check() == []
+    clock[0] += 0.4
+    config.write_text('name = "done"')
+    assert watcher.check() == []
+    clock[0] += 0.4
+    assert watcher.check() == []
+    clock[0] += 0.1
+    assert watcher.check()[0].modified == (('name',),)
+    assert watcher.values[str(config)] == {'name': 'done'}
+
+
+def test_created_and_removed(tmp_path):
+    path = tmp_path / 'later.kon'
+    watcher = Watcher([path], debounce=0)
+    assert watcher.values == {str(path): None}
+    path.write_text('a = 1, b = 2')
+    assert watcher.check() == [FileChange(str(path), {'a': 1, 'b': 2}, (('a',), ('b',)), (), ())]
+    path.unlink()
+    assert watcher.check() == [FileChange(str(path), None, (), (('a',), ('b',)), ())]
+    path.write_text('(1, 2)')
+    assert watcher.check()[0][2:] == ((), (), ((),))
+
+
+def test_errors(config):
+    errors = []
+    watcher = Watcher(config, debounce=0, on_error=lambda path, error: errors.append((path, type(error))))
+    config.write_text('name {')
+    assert watcher.check() == []
+    assert errors == [(str(config), ValueError)]
+    assert _thawed(watcher.values[str(config)]) == kon.loads(SOURCE)
+    config.write_text('name = "fixed"')
+    assert watcher.check()[0].removed == (('server',),)
+
+    def fail(change):
+        raise RuntimeError(change.path)
+
+    watcher = Watcher(config, fail, debounce=0, on_error=lambda path, error: errors.append((path, type(error))))
+    config.write_text('name = "again"')
+    assert len(watcher.check()) == 1
+    assert errors[-1] == (str(config), RuntimeError)
+
+
+def test_error_callback_reads_values(config):
+    seen = []
+    watcher = Watcher(config, debounce=0, on_error=lambda path, error: seen.append(watcher.values[path]))
+    config.write_text('name {')
+    # Run in a thread, a callback under the lock of the watcher would never return
+    thread = threading.Thread(target=watcher.check, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert [_thawed(value) for value in seen] == [kon.loads(SOURCE)]
+
+
+@pytest.mark.parametrize('inotify', [True, False])
+def test_watch(config, inotify):
+    changed = threading.Event()
+    changes = []
+
+    def on_change(change):
+        changes.append(change)
+        changed.set()
+
+    with kon.watch([config], on_change, interval=0.05, debounce=0.01, inotify=inotify):
+        config.write_text('name = "watched"')
+        assert changed.wait(10)
+    assert changes[0].modified == (('name',),)
+
+
+def test_awatch(config):
+    async def first_change():
+        changes = kon.awatch(config, interval=0.05, debounce=0.01)
+        waiting = asyncio.ensure_future(changes.__anext__())
+        await asyncio.sleep(0.1)
+        config.write_text('name = "async"')
+        change = await asyncio.wait_for(waiting, 10)
+        await changes.aclose()
+        return change
+
+    assert asyncio.run(first_change()).modified == (('name',),)
+
+
+def test_nested_types_and_nan(config):
+    config.write_text('a = (1, 2)\nb {c (1.0)}\nn = nan\nm (nan)\n')
+    watcher = Watcher(config, debounce=0)
+    config.write_text('a = (true, 2)\nb {c (1)}\nn = nan\nm (nan)\n')
+    assert watcher.check()[0].modified == (('a',), ('b', 'c'))
+    # Only the formatting changed, nan is still nan
+    config.write_text('a = (true, 2)\nb {c (1)}\n# a comment\nn = nan\nm (nan)\n')
+    assert watcher.check() == []